@@ -0,0 +1,103 @@
+"""
+Benchmark for concurrently inserting records (insert_general) from many processes
+
+Starts a number of processes, each acting as a separate client that adds singlepoint records
+(and their molecules) in batches. The molecules added by the different processes are
+mostly distinct, with a fraction shared between all processes to exercise deduplication.
+Reports the overall insert throughput and checks that shared records were only inserted once.
+"""
+
+import argparse
+import multiprocessing
+
+from helpers import temporary_storage_socket, shifted_molecules, Timer, print_table
+from qcfractal.components.singlepoint.testing_helpers import load_test_data
+from qcfractal.db_socket.socket import SQLAlchemySocket
+from qcportal.record_models import PriorityEnum
+
+
+def run_client(qcf_config, molecules, spec, batch_size: int, barrier, result_queue) -> None:
+    storage_socket = SQLAlchemySocket(qcf_config)
+
+    record_ids = []
+    n_inserted = 0
+
+    barrier.wait()
+    for i in range(0, len(molecules), batch_size):
+        meta, ids = storage_socket.records.singlepoint.add(
+            molecules[i : i + batch_size], spec, "*", PriorityEnum.normal, None, None, True
+        )
+        assert meta.success
+        record_ids.extend(ids)
+        n_inserted += meta.n_inserted
+
+    storage_socket.engine.dispose()
+    result_queue.put((record_ids, n_inserted))
+
+
+def run_n_clients(storage_socket, n_clients: int, n_records: int, batch_size: int, shared_frac: float, offset: int):
+    spec, molecule, _ = load_test_data("sp_psi4_water_energy")
+
+    # Each client gets n_records molecules, of which some are shared by all clients
+    n_shared = int(n_records * shared_frac)
+    n_unique = n_records - n_shared
+    shared_molecules = shifted_molecules(molecule, n_shared, start=offset)
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(n_clients + 1)
+    result_queue = ctx.Queue()
+
+    procs = []
+    for idx in range(n_clients):
+        unique_molecules = shifted_molecules(molecule, n_unique, start=offset + n_shared + idx * n_unique)
+
+        # Interleave shared and unique molecules so that the clients contend for the shared ones
+        molecules = unique_molecules + shared_molecules
+        molecules = molecules[0::2] + molecules[1::2]
+
+        args = (storage_socket.qcf_config, molecules, spec, batch_size, barrier, result_queue)
+        procs.append(ctx.Process(target=run_client, args=args))
+
+    for p in procs:
+        p.start()
+
+    barrier.wait()
+    with Timer() as t:
+        results = [result_queue.get() for _ in procs]
+
+    for p in procs:
+        p.join()
+
+    # Shared molecules must map to the same records in all the clients
+    all_ids = set(rid for ids, _ in results for rid in ids)
+    n_inserted = sum(n for _, n in results)
+    n_expected = n_shared + n_clients * n_unique
+    assert len(all_ids) == n_expected
+    assert n_inserted == n_expected
+
+    return n_clients * n_records / t.elapsed, n_inserted / t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inserting records from many concurrent processes")
+    parser.add_argument("--n-records", type=int, default=1000, help="Number of records added by each process")
+    parser.add_argument("--batch-size", type=int, default=500, help="Number of records added at a time")
+    parser.add_argument("--shared-frac", type=float, default=0.1, help="Fraction of records shared by all processes")
+    parser.add_argument("--n-clients", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    with temporary_storage_socket() as storage_socket:
+        rows = []
+        offset = 0
+        for n_clients in args.n_clients:
+            records_per_sec, inserted_per_sec = run_n_clients(
+                storage_socket, n_clients, args.n_records, args.batch_size, args.shared_frac, offset
+            )
+            offset += (n_clients + 1) * args.n_records
+            rows.append((n_clients, n_clients * args.n_records, records_per_sec, inserted_per_sec))
+
+    print_table(("processes", "records added", "records/sec", "inserted/sec"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark for loading molecule geometries of completed tasks when iterating services
+
+Torsiondrives need the initial and final geometry of every optimization completed in an iteration.
+This compares fetching them with one query per optimization (the previous behavior of
+TorsiondriveRecordSocket.iterate_service) with a single batched query (MoleculeSocket.get_geometries),
+for various grid sizes.
+"""
+
+import argparse
+
+from helpers import temporary_storage_socket, shifted_molecules, Timer, print_table
+from qcarchivetesting import load_molecule_data
+
+
+def fetch_individually(storage_socket, mol_ids, session):
+    geometries = []
+    for initial_id, final_id in zip(mol_ids[0::2], mol_ids[1::2]):
+        mol_data = storage_socket.molecules.get([initial_id, final_id], include=["geometry"], session=session)
+        geometries.append(mol_data[0]["geometry"].tolist())
+        geometries.append(mol_data[1]["geometry"].tolist())
+    return geometries
+
+
+def fetch_batched(storage_socket, mol_ids, session):
+    return [x.tolist() for x in storage_socket.molecules.get_geometries(mol_ids, session=session)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading geometries for service iterations")
+    parser.add_argument("--grid-sizes", type=int, nargs="+", default=[24, 144, 576], help="Number of grid points")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times to repeat each measurement")
+    args = parser.parse_args()
+
+    molecule = load_molecule_data("hooh")
+
+    with temporary_storage_socket() as storage_socket:
+        # Two molecules (initial & final) per grid point
+        max_points = max(args.grid_sizes)
+        _, all_ids = storage_socket.molecules.add(shifted_molecules(molecule, 2 * max_points))
+
+        rows = []
+        for grid_size in args.grid_sizes:
+            mol_ids = all_ids[: 2 * grid_size]
+
+            timings = {}
+            for name, func in (("individual", fetch_individually), ("batched", fetch_batched)):
+                best = None
+                for _ in range(args.repeat):
+                    with storage_socket.session_scope(read_only=True) as session:
+                        with Timer() as t:
+                            geometries = func(storage_socket, mol_ids, session)
+                    assert len(geometries) == 2 * grid_size
+                    best = t.elapsed if best is None else min(best, t.elapsed)
+                timings[name] = best * 1000
+
+            speedup = timings["individual"] / timings["batched"]
+            rows.append((grid_size, timings["individual"], timings["batched"], speedup))
+
+    print_table(("grid points", "individual (ms)", "batched (ms)", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
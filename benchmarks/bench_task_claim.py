@@ -0,0 +1,106 @@
+"""
+Benchmark for claiming tasks (TaskSocket.claim_tasks) with many concurrent managers
+
+Submits many singlepoint records spread over several tags, then starts a number of processes,
+each acting as a separate manager that handles all the tags (in a different order of preference).
+Each manager claims tasks until there are none left. Reports the overall claim throughput and the
+latency of the individual claims, and checks that no task was claimed twice.
+"""
+
+import argparse
+import multiprocessing
+import random
+import statistics
+
+from helpers import temporary_storage_socket, activate_manager, shifted_molecules, Timer, print_table
+from qcfractal.components.singlepoint.testing_helpers import load_test_data
+from qcfractal.db_socket.socket import SQLAlchemySocket
+from qcportal.record_models import PriorityEnum
+
+
+def run_manager(qcf_config, uuid: str, tags, claim_size: int, barrier, result_queue) -> None:
+    storage_socket = SQLAlchemySocket(qcf_config)
+    mname, manager_programs = activate_manager(storage_socket, uuid=uuid, tags=tags)
+
+    claimed = []
+    durations = []
+
+    barrier.wait()
+    while True:
+        with Timer() as t:
+            tasks = storage_socket.tasks.claim_tasks(mname.fullname, manager_programs, tags, limit=claim_size)
+
+        if not tasks:
+            break
+
+        durations.append(t.elapsed)
+        claimed.extend(x["id"] for x in tasks)
+
+    storage_socket.engine.dispose()
+    result_queue.put((claimed, durations))
+
+
+def run_n_managers(storage_socket, n_managers: int, n_tasks: int, n_tags: int, claim_size: int, mol_offset: int):
+    spec, molecule, _ = load_test_data("sp_psi4_water_energy")
+    molecules = shifted_molecules(molecule, n_tasks, start=mol_offset)
+    all_tags = [f"tag{i}" for i in range(n_tags)]
+
+    # Spread the tasks over all the tags and priorities
+    for i in range(n_tags):
+        for j, priority in enumerate(PriorityEnum):
+            mols = molecules[i::n_tags][j :: len(PriorityEnum)]
+            if mols:
+                storage_socket.records.singlepoint.add(mols, spec, all_tags[i], priority, None, None, True)
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(n_managers + 1)
+    result_queue = ctx.Queue()
+
+    procs = []
+    for idx in range(n_managers):
+        tags = all_tags.copy()
+        random.shuffle(tags)
+        args = (storage_socket.qcf_config, f"manager-{mol_offset}-{idx}", tags, claim_size, barrier, result_queue)
+        procs.append(ctx.Process(target=run_manager, args=args))
+
+    for p in procs:
+        p.start()
+
+    barrier.wait()
+    with Timer() as t:
+        results = [result_queue.get() for _ in procs]
+
+    for p in procs:
+        p.join()
+
+    all_claimed = [task_id for claimed, _ in results for task_id in claimed]
+    assert len(all_claimed) == n_tasks
+    assert len(set(all_claimed)) == n_tasks
+
+    durations = sorted(d for _, durations in results for d in durations)
+    p95 = durations[int(0.95 * (len(durations) - 1))]
+
+    return n_tasks / t.elapsed, len(durations) / t.elapsed, statistics.median(durations) * 1000, p95 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark claiming tasks with many concurrent managers")
+    parser.add_argument("--n-tasks", type=int, default=2000, help="Number of tasks to claim for each run")
+    parser.add_argument("--n-tags", type=int, default=8, help="Number of tags the tasks are spread over")
+    parser.add_argument("--claim-size", type=int, default=20, help="Number of tasks claimed at a time")
+    parser.add_argument("--n-managers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    with temporary_storage_socket() as storage_socket:
+        rows = []
+        for i, n_managers in enumerate(args.n_managers):
+            tasks_per_sec, claims_per_sec, median_ms, p95_ms = run_n_managers(
+                storage_socket, n_managers, args.n_tasks, args.n_tags, args.claim_size, i * args.n_tasks
+            )
+            rows.append((n_managers, args.n_tasks, tasks_per_sec, claims_per_sec, median_ms, p95_ms))
+
+    print_table(("managers", "tasks", "tasks/sec", "claims/sec", "median claim (ms)", "p95 claim (ms)"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark for returning finished tasks to the server (TaskSocket.update_finished)
+
+Submits and claims many singlepoint records, then returns the (identical) results
+in batches of various sizes, reporting the number of tasks stored per second.
+"""
+
+import argparse
+
+from helpers import temporary_storage_socket, activate_manager, shifted_molecules, Timer, print_table
+from qcfractal.components.singlepoint.testing_helpers import load_test_data
+from qcfractalcompute.compress import compress_result
+from qcportal.record_models import PriorityEnum
+
+
+def run_batch_size(storage_socket, mname, manager_programs, n_tasks: int, batch_size: int, mol_offset: int) -> float:
+    spec, molecule, result = load_test_data("sp_psi4_water_energy")
+    molecules = shifted_molecules(molecule, n_tasks, start=mol_offset)
+
+    meta, record_ids = storage_socket.records.singlepoint.add(
+        molecules, spec, "*", PriorityEnum.normal, None, None, True
+    )
+    assert meta.n_inserted == n_tasks
+
+    tasks = storage_socket.tasks.claim_tasks(mname.fullname, manager_programs, ["*"], limit=n_tasks)
+    assert len(tasks) == n_tasks
+
+    # Compress ahead of time - we are only interested in the server side
+    result_compressed = compress_result(result.dict())
+    task_ids = [t["id"] for t in tasks]
+
+    with Timer() as t:
+        for i in range(0, n_tasks, batch_size):
+            batch = {task_id: result_compressed for task_id in task_ids[i : i + batch_size]}
+            rmeta = storage_socket.tasks.update_finished(mname.fullname, batch)
+            assert rmeta.n_accepted == len(batch)
+
+    return n_tasks / t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark returning finished tasks")
+    parser.add_argument("--n-tasks", type=int, default=1000, help="Number of tasks to return for each batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50, 100, 500])
+    args = parser.parse_args()
+
+    # Tasks claim limit is also applied on the server side
+    extra_config = {"api_limits": {"manager_tasks_claim": args.n_tasks, "manager_tasks_return": max(args.batch_sizes)}}
+
+    with temporary_storage_socket(extra_config) as storage_socket:
+        mname, manager_programs = activate_manager(storage_socket)
+
+        rows = []
+        for i, batch_size in enumerate(args.batch_sizes):
+            tasks_per_sec = run_batch_size(
+                storage_socket, mname, manager_programs, args.n_tasks, batch_size, i * args.n_tasks
+            )
+            rows.append((batch_size, args.n_tasks, tasks_per_sec))
+
+    print_table(("batch size", "tasks", "tasks/sec"), rows)
+
+
+if __name__ == "__main__":
+    main()
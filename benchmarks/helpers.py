@@ -0,0 +1,118 @@
+"""
+Helpers shared by the benchmark scripts
+
+These create a temporary postgres instance (using the same machinery as the test suite)
+and a storage socket connected to it.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import secrets
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+from qcarchivetesting.testing_classes import QCATestingPostgresServer, _activated_manager_programs
+from qcfractal.config import FractalConfig
+from qcfractal.db_socket.socket import SQLAlchemySocket
+from qcportal.managers import ManagerName
+from qcportal.molecules import Molecule
+from qcportal.utils import update_nested_dict
+
+if TYPE_CHECKING:
+    from typing import Iterator, Dict, Any, Optional, List, Tuple
+
+
+@contextlib.contextmanager
+def temporary_storage_socket(extra_config: Optional[Dict[str, Any]] = None) -> Iterator[SQLAlchemySocket]:
+    """
+    Creates a temporary postgres database and a storage socket attached to it
+
+    Everything is deleted when the context manager exits.
+    """
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pg_server = QCATestingPostgresServer(tmpdir)
+        pg_harness = pg_server.get_new_harness("qcf_benchmark")
+
+        cfg_dict = {
+            "base_folder": tmpdir,
+            "loglevel": "WARNING",
+            "database": pg_harness.config.dict(),
+            "api": {"secret_key": secrets.token_urlsafe(32), "jwt_secret_key": secrets.token_urlsafe(32)},
+        }
+
+        if extra_config:
+            cfg_dict = update_nested_dict(cfg_dict, extra_config)
+
+        socket = SQLAlchemySocket(FractalConfig(**cfg_dict))
+
+        try:
+            yield socket
+        finally:
+            socket.engine.dispose()
+            pg_server.harness.shutdown()
+
+
+def activate_manager(
+    storage_socket: SQLAlchemySocket, uuid: str = "1234-5678-1234-5678", tags: Optional[List[str]] = None
+) -> Tuple[ManagerName, Dict[str, List[str]]]:
+    """
+    Activates a manager that can claim all the test programs
+
+    Returns the manager name and the programs the manager has
+    """
+
+    mname = ManagerName(cluster="bench_cluster", hostname="a_host", uuid=uuid)
+    storage_socket.managers.activate(
+        name_data=mname,
+        manager_version="v2.0",
+        username="bench",
+        programs=_activated_manager_programs,
+        tags=tags if tags else ["*"],
+    )
+
+    return mname, _activated_manager_programs
+
+
+def shifted_molecules(molecule: Molecule, n: int, start: int = 0) -> List[Molecule]:
+    """
+    Creates n distinct copies of a molecule by slightly shifting the geometry
+
+    This is used to create many records that are not deduplicated on insertion
+    """
+
+    ret = []
+    for i in range(start, start + n):
+        geometry = molecule.geometry.copy()
+        geometry[0, 0] += 1.0e-4 * (i + 1)
+        ret.append(
+            Molecule(
+                symbols=molecule.symbols,
+                geometry=geometry,
+                molecular_charge=molecule.molecular_charge,
+                molecular_multiplicity=molecule.molecular_multiplicity,
+            )
+        )
+
+    return ret
+
+
+class Timer:
+    """
+    Simple wall-clock timer used as a context manager
+    """
+
+    def __enter__(self) -> Timer:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.elapsed = time.perf_counter() - self.start
+
+
+def print_table(headers: Tuple[str, ...], rows: List[Tuple[Any, ...]]) -> None:
+    import tabulate
+
+    print(tabulate.tabulate(rows, headers=headers, floatfmt=".3f"))
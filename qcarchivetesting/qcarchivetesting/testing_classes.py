@@ -149,6 +149,12 @@ class QCATestingSnowflake(FractalSnowflake):
         qcf_config["log_access"] = log_access
         qcf_config["access_log_keep"] = 1
 
+        # Write access log entries immediately, so they can be checked right after a request
+        qcf_config["access_log_flush_frequency"] = 0
+
+        # Share metrics of the job runner quickly, so they can be checked by tests
+        qcf_config["metrics_write_frequency"] = 1
+
         if ip_tests_enabled:
             qcf_config["geoip2_dir"] = geoip_path
             qcf_config["geoip2_filename"] = geoip_filename
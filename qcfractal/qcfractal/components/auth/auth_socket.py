@@ -4,8 +4,9 @@ import logging
 from typing import TYPE_CHECKING, Tuple, List, Dict, Any, Optional
 
 from qcportal.auth import UserInfo, RoleInfo
-from qcportal.exceptions import AuthorizationFailure
-from .policyuniverse import Policy
+from qcportal.exceptions import AuthorizationFailure, UserManagementError
+from qcportal.utils import hash_dict
+from .compiled_policy import PolicyCache
 
 if TYPE_CHECKING:
     from sqlalchemy.orm.session import Session
@@ -24,9 +25,34 @@ class AuthSocket:
         self.security_enabled = self.root_socket.qcf_config.enable_security
         self.allow_unauthenticated_read = self.root_socket.qcf_config.allow_unauthenticated_read
 
-        self.unauth_read_permissions = self.root_socket.roles.get("read")["permissions"]
         self.protected_resources = {"users", "roles", "me"}
 
+        # Compiled policies and authorization decisions
+        self._policy_cache = PolicyCache()
+        self._load_unauth_read_permissions()
+
+    def _load_unauth_read_permissions(self) -> None:
+        try:
+            permissions = self.root_socket.roles.get("read")["permissions"]
+        except UserManagementError:
+            # Read role has been deleted. Nothing is allowed without logging in
+            self._logger.warning("Read role does not exist - unauthenticated users will not be able to read anything")
+            permissions = {}
+
+        # Stored with its cache key in a single assignment, so other threads always see a matching pair
+        self._unauth_read_policy = (hash_dict(permissions), permissions)
+        self.unauth_read_permissions = permissions
+
+    def invalidate_cache(self) -> None:
+        """
+        Clears cached authorization decisions, and reloads the permissions used for unauthenticated reads
+
+        This should be called whenever roles are changed
+        """
+
+        self._policy_cache.clear()
+        self._load_unauth_read_permissions()
+
     def authenticate(
         self, username: str, password: str, *, session: Optional[Session] = None
     ) -> Tuple[UserInfo, RoleInfo]:
@@ -124,15 +150,14 @@ class AuthSocket:
         # uppercase by convention
         action = action.upper()
 
-        context = {"Principal": subject["username"], "Action": action, "Resource": resource["type"]}
-
-        policy = Policy(policies)
-        if not policy.evaluate(context):
+        principal = subject["username"]
+        if not self._policy_cache.evaluate(hash_dict(policies), policies, principal, resource["type"], action):
             # If that doesn't work, but we allow unauthenticated read, then try that
             if not self.allow_unauthenticated_read:
                 return False, f"User {subject} is not authorized to access '{resource}'"
 
-            if not Policy(self.unauth_read_permissions).evaluate(context):
+            read_key, read_permissions = self._unauth_read_policy
+            if not self._policy_cache.evaluate(read_key, read_permissions, principal, resource["type"], action):
                 return False, f"User {subject} is not authorized to access '{resource}'"
 
         return True, "Allowed"
@@ -178,17 +203,17 @@ class AuthSocket:
                     continue
                 allowed.extend((resource, x) for x in actions)
         else:
-            read_policy = Policy(self.unauth_read_permissions)
-            policy = Policy(policies)
+            read_policy = self._policy_cache.get_policy(*self._unauth_read_policy)
+            policy = self._policy_cache.get_policy(hash_dict(policies), policies)
+            principal = subject["username"]
 
             for resource in resources:
                 for action in actions:
-                    context = {"Principal": subject["username"], "Action": action, "Resource": resource}
-                    if policy.evaluate(context):
+                    if policy.evaluate(principal, resource, action):
                         allowed.append((resource, action))
                     elif (
                         self.allow_unauthenticated_read
-                        and read_policy.evaluate(context)
+                        and read_policy.evaluate(principal, resource, action)
                         and not resource.endswith("/me")
                     ):
                         allowed.append((resource, action))
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .policyuniverse.statement import Statement
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+
+def _compile_statement(
+    statement: Dict[str, Any],
+) -> Tuple[bool, Optional[FrozenSet], Optional[FrozenSet], Optional[FrozenSet]]:
+    """
+    Compiles a single statement into a tuple of (is_allow, resources, actions, principals)
+
+    Resources, actions, and principals are sets of values that match. None means any value matches.
+    """
+
+    st = Statement(statement)
+
+    resources = None if "*" in st.resources else frozenset(st.resources)
+    actions = None if "*" in st.actions else frozenset(st.actions)
+
+    # No principals means any principal matches
+    principals = None if (len(st.principals) == 0 or "*" in st.principals) else frozenset(st.principals)
+
+    return st.effect == "Allow", resources, actions, principals
+
+
+class CompiledPolicy:
+    """
+    A permissions policy whose statements have been compiled for fast evaluation
+
+    Evaluation gives the same result as :class:`Policy` from policyuniverse, but the statements
+    are only parsed once.
+    """
+
+    def __init__(self, policy: Dict[str, Any]):
+        statements = policy.get("Statement", [])
+        if not isinstance(statements, list):
+            statements = [statements]
+
+        self._statements: List[Tuple] = [_compile_statement(s) for s in statements]
+
+        # If no statement refers to a principal, then the result of evaluation does not depend on it
+        self.uses_principals = any(s[3] is not None for s in self._statements)
+
+    def evaluate(self, principal: Optional[str], resource: str, action: str) -> bool:
+        allow = False
+        for is_allow, resources, actions, principals in self._statements:
+            if resources is not None and resource not in resources:
+                continue
+            if actions is not None and action not in actions:
+                continue
+            if principals is not None and principal not in principals:
+                continue
+
+            # Statement applies. Deny overrides everything else
+            if not is_allow:
+                return False
+            allow = True
+
+        return allow
+
+
+class PolicyCache:
+    """
+    Cache of compiled policies and the authorization decisions made with them
+
+    Policies are keyed by a hash of their contents, so a policy that changes (for example, when the permissions
+    of a role are modified) is compiled and cached anew. Clearing the cache is only needed to free memory.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self._max_entries = max_entries
+        self._policies: Dict[str, CompiledPolicy] = {}
+        self._decisions: Dict[Tuple[str, Optional[str], str, str], bool] = {}
+
+    def clear(self) -> None:
+        self._policies = {}
+        self._decisions = {}
+
+    def get_policy(self, policy_key: str, policy: Dict[str, Any]) -> CompiledPolicy:
+        """
+        Returns the compiled version of a policy, compiling it if it has not been seen before
+
+        The key should uniquely identify the contents of the policy (for example, a hash)
+        """
+
+        compiled = self._policies.get(policy_key, None)
+        if compiled is None:
+            compiled = CompiledPolicy(policy)
+
+            # Don't grow without bounds (could happen with lots of custom roles)
+            if len(self._policies) >= self._max_entries:
+                self._policies = {}
+
+            self._policies[policy_key] = compiled
+
+        return compiled
+
+    def evaluate(
+        self, policy_key: str, policy: Dict[str, Any], principal: Optional[str], resource: str, action: str
+    ) -> bool:
+        """
+        Evaluates a policy with the given principal, resource, and action, using a cached decision if available
+        """
+
+        compiled = self.get_policy(policy_key, policy)
+
+        # Share decisions between principals if the policy doesn't depend on them
+        if not compiled.uses_principals:
+            principal = None
+
+        decision_key = (policy_key, principal, resource, action)
+        allowed = self._decisions.get(decision_key, None)
+        if allowed is None:
+            allowed = compiled.evaluate(principal, resource, action)
+
+            if len(self._decisions) >= self._max_entries:
+                self._decisions = {}
+
+            self._decisions[decision_key] = allowed
+
+        return allowed
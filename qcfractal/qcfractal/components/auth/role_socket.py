@@ -45,6 +45,7 @@ default_roles: Dict[str, Any] = {
                     "/api/v1/access_logs",
                     "/api/v1/tasks",
                     "/api/v1/internal_jobs",
+                    "/api/v1/metrics",
                 ],
             },
         ]
@@ -78,6 +79,7 @@ default_roles: Dict[str, Any] = {
                     "/api/v1/access_logs",
                     "/api/v1/tasks",
                     "/api/v1/internal_jobs",
+                    "/api/v1/metrics",
                 ],
             },
             {
@@ -180,6 +182,7 @@ class RoleSocket:
         except IntegrityError:
             raise UserManagementError(f"Role {role_info.rolename} already exists")
 
+        self.root_socket.auth.invalidate_cache()
         self._logger.info(f"Role {role_info.rolename} added")
 
     def modify(self, role_info: RoleInfo, *, session: Optional[Session] = None) -> Dict[str, Any]:
@@ -204,6 +207,7 @@ class RoleSocket:
             role.permissions = role_info.permissions.dict()
             session.commit()
 
+            self.root_socket.auth.invalidate_cache()
             self._logger.info(f"Role {role_info.rolename} modified")
             return self.get(role_info.rolename, session=session)
 
@@ -233,6 +237,7 @@ class RoleSocket:
         except IntegrityError:
             raise UserManagementError("Role could not be deleted. Likely it is being referenced somewhere")
 
+        self.root_socket.auth.invalidate_cache()
         self._logger.info(f"Role {rolename} deleted")
 
     def reset_defaults(self, *, session: Optional[Session] = None) -> None:
@@ -258,4 +263,5 @@ class RoleSocket:
                 else:
                     role_data.permissions = permissions
 
+        self.root_socket.auth.invalidate_cache()
         self._logger.warning(f"Reset all roles to defaults")
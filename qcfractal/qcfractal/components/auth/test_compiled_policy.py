@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import itertools
+from typing import TYPE_CHECKING
+
+import pytest
+
+from qcfractal.components.auth.compiled_policy import CompiledPolicy, PolicyCache
+from qcfractal.components.auth.policyuniverse import Policy
+from qcfractal.components.auth.role_socket import default_roles
+from qcportal.auth import RoleInfo
+from qcportal.exceptions import AuthorizationFailure
+from qcportal.utils import hash_dict
+
+if TYPE_CHECKING:
+    from qcfractal.db_socket import SQLAlchemySocket
+
+
+test_policies = [
+    *default_roles.values(),
+    {},
+    {"Statement": {"Effect": "Allow", "Action": ["READ", "WRITE"], "Resource": "/api/v1/molecules"}},
+    {
+        "Statement": [
+            {"Effect": "Allow", "Action": "*", "Resource": "*", "Principal": ["user_1", "user_2"]},
+            {"Effect": "Deny", "Action": "WRITE", "Resource": "*", "Principal": "user_2"},
+            {"Effect": "Allow", "Action": "READ", "Resource": "/api/v1/records", "Principal": "*"},
+        ]
+    },
+    {"Statement": [{"Effect": "Allow", "NotResource": "/api/v1/users", "Action": "READ"}]},
+    {"Statement": [{"Effect": "Allow", "Resource": "*"}, {"Action": "READ", "Resource": "/api/v1/tasks"}]},
+]
+
+test_principals = [None, "user_1", "user_2", "user_3"]
+test_resources = ["/api/v1/molecules", "/api/v1/records", "/api/v1/users", "/api/v1/tasks", "/compute/v1/tasks"]
+test_actions = ["READ", "WRITE", "DELETE"]
+
+
+@pytest.mark.parametrize("policy", test_policies)
+def test_compiled_policy_matches_policy(policy):
+    compiled = CompiledPolicy(policy)
+    reference = Policy(policy)
+
+    for principal, resource, action in itertools.product(test_principals, test_resources, test_actions):
+        context = {"Principal": principal, "Action": action, "Resource": resource}
+        assert compiled.evaluate(principal, resource, action) == reference.evaluate(context)
+
+
+def test_compiled_policy_cache():
+    cache = PolicyCache(max_entries=8)
+
+    for policy in test_policies:
+        key = hash_dict(policy)
+        reference = Policy(policy)
+
+        # Twice - the second time is cached
+        for _ in range(2):
+            for principal, resource, action in itertools.product(test_principals, test_resources, test_actions):
+                context = {"Principal": principal, "Action": action, "Resource": resource}
+                assert cache.evaluate(key, policy, principal, resource, action) == reference.evaluate(context)
+
+    assert len(cache._decisions) <= 8
+    assert len(cache._policies) <= 8
+
+
+def test_compiled_policy_role_change(storage_socket: SQLAlchemySocket):
+    auth = storage_socket.auth
+    auth.security_enabled = True
+    auth.allow_unauthenticated_read = True
+
+    subject = {"user_id": None, "username": None}
+    resource = {"type": "/api/v1/molecules"}
+
+    auth.assert_authorized(resource, "READ", subject, {}, {})
+
+    # Remove read permissions for unauthenticated users
+    read_role = RoleInfo(rolename="read", permissions={"Statement": []})
+    storage_socket.roles.modify(read_role)
+
+    with pytest.raises(AuthorizationFailure):
+        auth.assert_authorized(resource, "READ", subject, {}, {})
+
+    storage_socket.roles.reset_defaults()
+    auth.assert_authorized(resource, "READ", subject, {}, {})
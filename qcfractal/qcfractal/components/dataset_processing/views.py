@@ -77,7 +77,8 @@ def create_view_file(
     ptl_entry_type = ptl_dataset_type._entry_type
     ptl_specification_type = ptl_dataset_type._specification_type
 
-    view_db = DatasetCache(output_path, read_only=False, dataset_type=ptl_dataset_type)
+    # Views are shared, so don't compress with dictionaries (which older clients cannot read)
+    view_db = DatasetCache(output_path, read_only=False, dataset_type=ptl_dataset_type, use_dictionaries=False)
 
     stmt = select(ds_socket.dataset_orm).where(ds_socket.dataset_orm.id == dataset_id)
     stmt = stmt.options(selectinload("*"))
@@ -162,6 +163,9 @@ def create_view_file(
 
         for id_chunk in chunk_iterable(record_ids, 200):
             record_dicts = record_socket.get(id_chunk, include=include, exclude=exclude, session=session)
+
+            # Views are used without the server, so outputs cannot be compressed with a server-side dictionary
+            socket.records.remove_record_output_dictionaries(record_dicts, session=session)
             record_data = [record_type(**r) for r in record_dicts]
             view_db.update_records(record_data)
 
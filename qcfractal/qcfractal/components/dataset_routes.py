@@ -10,6 +10,8 @@ from qcportal.dataset_models import (
     DatasetAddBody,
     DatasetQueryModel,
     DatasetFetchRecordsBody,
+    DatasetFetchRecordPropertiesBody,
+    DatasetRecordChangesBody,
     DatasetFetchEntryBody,
     DatasetFetchSpecificationBody,
     DatasetCreateViewBody,
@@ -342,6 +344,38 @@ def fetch_dataset_records_v1(dataset_type: str, dataset_id: int, body_data: Data
     )
 
 
+@api_v1.route("/datasets/<string:dataset_type>/<int:dataset_id>/records/properties/bulkFetch", methods=["POST"])
+@wrap_route("READ")
+def fetch_dataset_record_properties_v1(dataset_type: str, dataset_id: int, body_data: DatasetFetchRecordPropertiesBody):
+    limit = current_app.config["QCFRACTAL_CONFIG"].api_limits.get_dataset_properties
+
+    n_requested = len(body_data.entry_names) * len(body_data.specification_names)
+    if n_requested > limit:
+        raise LimitExceededError(f"Cannot get properties of {n_requested} dataset records - limit is {limit}")
+
+    ds_socket = storage_socket.datasets.get_socket(dataset_type)
+
+    return ds_socket.fetch_record_properties(
+        dataset_id,
+        property_names=body_data.property_names,
+        entry_names=body_data.entry_names,
+        specification_names=body_data.specification_names,
+        status=body_data.status,
+    )
+
+
+@api_v1.route("/datasets/<string:dataset_type>/<int:dataset_id>/records/changes", methods=["POST"])
+@wrap_route("READ")
+def fetch_dataset_record_changes_v1(dataset_type: str, dataset_id: int, body_data: DatasetRecordChangesBody):
+    limit = current_app.config["QCFRACTAL_CONFIG"].api_limits.get_dataset_record_changes
+
+    if body_data.limit is None or body_data.limit > limit:
+        body_data.limit = limit
+
+    ds_socket = storage_socket.datasets.get_socket(dataset_type)
+    return ds_socket.get_record_changes(dataset_id, body_data.since, body_data.skip, body_data.limit)
+
+
 @api_v1.route("/datasets/<string:dataset_type>/<int:dataset_id>/records/bulkDelete", methods=["POST"])
 @wrap_route("DELETE")
 def remove_dataset_records_v1(dataset_type: str, dataset_id: int, body_data: DatasetRemoveRecordsBody):
@@ -3,6 +3,7 @@ from __future__ import annotations
 import logging
 import os
 import tempfile
+from datetime import datetime, timedelta
 from typing import TYPE_CHECKING
 
 from sqlalchemy import select, delete, func, union, text, and_
@@ -24,7 +25,7 @@ from qcfractal.db_socket.helpers import (
     get_general,
     get_query_proj_options,
 )
-from qcportal.dataset_models import DatasetAttachmentType
+from qcportal.dataset_models import DatasetAttachmentType, encode_property_column
 from qcportal.exceptions import AlreadyExistsError, MissingDataError, UserReportableError
 from qcportal.internal_jobs import InternalJobStatusEnum
 from qcportal.metadata_models import InsertMetadata, DeleteMetadata, UpdateMetadata, InsertCountsMetadata
@@ -58,6 +59,10 @@ class BaseDatasetSocket:
     record_item_orm = None
     record_orm = None
 
+    # How far back (in seconds) from the current time the record change feed restarts from, to catch
+    # modifications made in transactions that were not yet committed
+    _record_changes_margin = 300
+
     def __init__(
         self,
         root_socket: SQLAlchemySocket,
@@ -1114,6 +1119,138 @@ class BaseDatasetSocket:
             record_items = session.execute(stmt).scalars().all()
             return [(x.entry_name, x.specification_name, x.record_id) for x in record_items]
 
+    def fetch_record_properties(
+        self,
+        dataset_id: int,
+        property_names: Sequence[str],
+        entry_names: Iterable[str],
+        specification_names: Iterable[str],
+        status: Optional[Iterable[RecordStatusEnum]] = None,
+        *,
+        session: Optional[Session] = None,
+    ) -> Dict[str, Any]:
+        """
+        Obtain properties of records in a dataset, by column
+
+        The properties are taken directly from the properties column of the records, without
+        loading the full records.
+
+        Parameters
+        ----------
+        dataset_id
+            ID of a dataset
+        property_names
+            Names of the properties (keys in the properties dictionary of the records) to obtain
+        entry_names
+            Fetch properties of records belonging to these entries
+        specification_names
+            Fetch properties of records belonging to these specifications
+        status
+            Fetch properties of records whose status is in the given list (or other iterable) of statuses
+        session
+            An existing SQLAlchemy session to use. If None, one will be created. If an existing session
+            is used, it will be flushed (but not committed) before returning from this function.
+
+        Returns
+        -------
+        :
+            Dictionary corresponding to a :class:`qcportal.dataset_models.DatasetRecordPropertyColumns`.
+            Records without a given property will have a missing value (None or NaN) in that column.
+        """
+
+        property_names = list(property_names)
+
+        stmt = select(
+            self.record_item_orm.entry_name,
+            self.record_item_orm.specification_name,
+            self.record_item_orm.record_id,
+            *[BaseRecordORM.properties[p] for p in property_names],
+        )
+        stmt = stmt.join(BaseRecordORM, BaseRecordORM.id == self.record_item_orm.record_id)
+        stmt = stmt.where(self.record_item_orm.dataset_id == dataset_id)
+        stmt = stmt.where(self.record_item_orm.entry_name.in_(entry_names))
+        stmt = stmt.where(self.record_item_orm.specification_name.in_(specification_names))
+
+        if status:
+            stmt = stmt.where(BaseRecordORM.status.in_(status))
+
+        with self.root_socket.optional_session(session, True) as session:
+            rows = session.execute(stmt).all()
+
+        # Transpose into columns
+        if rows:
+            all_columns = list(zip(*rows))
+        else:
+            all_columns = [()] * (3 + len(property_names))
+
+        return {
+            "entry_names": list(all_columns[0]),
+            "specification_names": list(all_columns[1]),
+            "record_ids": list(all_columns[2]),
+            "columns": {p: encode_property_column(c) for p, c in zip(property_names, all_columns[3:])},
+        }
+
+    def get_record_changes(
+        self,
+        dataset_id: int,
+        since: Optional[datetime],
+        skip: int = 0,
+        limit: Optional[int] = None,
+        *,
+        session: Optional[Session] = None,
+    ) -> Dict[str, Any]:
+        """
+        Obtain information about records of a dataset that have been modified since a given time
+
+        The returned ``next_since`` should be passed as ``since`` the next time this is called. It is a bit earlier
+        than the current time, since records may be modified in transactions that have not been committed yet.
+        Therefore, some records may be returned again on the next call.
+
+        Parameters
+        ----------
+        dataset_id
+            ID of a dataset
+        since
+            Return records modified after this time. If None, no records are returned (only ``next_since``)
+        skip
+            Skip this many records (for paging through many changes)
+        limit
+            Return at most this many records
+        session
+            An existing SQLAlchemy session to use. If None, one will be created. If an existing session
+            is used, it will be flushed (but not committed) before returning from this function.
+
+        Returns
+        -------
+        :
+            Dictionary corresponding to a :class:`qcportal.dataset_models.DatasetRecordChanges`.
+        """
+
+        next_since = now_at_utc() - timedelta(seconds=self._record_changes_margin)
+
+        if since is None:
+            return {"changes": [], "next_since": next_since}
+
+        stmt = select(
+            self.record_item_orm.entry_name,
+            self.record_item_orm.specification_name,
+            self.record_item_orm.record_id,
+            BaseRecordORM.status,
+            BaseRecordORM.modified_on,
+        )
+        stmt = stmt.join(BaseRecordORM, BaseRecordORM.id == self.record_item_orm.record_id)
+        stmt = stmt.where(self.record_item_orm.dataset_id == dataset_id)
+        stmt = stmt.where(BaseRecordORM.modified_on > since)
+        stmt = stmt.order_by(
+            self.record_item_orm.record_id, self.record_item_orm.entry_name, self.record_item_orm.specification_name
+        )
+        stmt = stmt.offset(skip).limit(limit)
+
+        with self.root_socket.optional_session(session, True) as session:
+            rows = session.execute(stmt).all()
+
+        return {"changes": [tuple(x) for x in rows], "next_since": next_since}
+
     def remove_records(
         self,
         dataset_id: int,
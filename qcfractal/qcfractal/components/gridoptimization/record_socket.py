@@ -12,7 +12,7 @@ try:
     from pydantic.v1 import BaseModel, Extra, parse_obj_as
 except ImportError:
     from pydantic import BaseModel, Extra, parse_obj_as
-from sqlalchemy import select, func
+from sqlalchemy import select
 from sqlalchemy.orm import lazyload, joinedload, selectinload, undefer, defer
 
 from qcfractal import __version__ as qcfractal_version
@@ -47,7 +47,6 @@ if TYPE_CHECKING:
 
 # Meaningless, but unique to gridoptimizations
 gridoptimization_insert_lock_id = 14300
-gridoptimization_spec_insert_lock_id = 14301
 
 
 def expand_ndimensional_grid(
@@ -270,11 +269,14 @@ class GridoptimizationRecordSocket(BaseRecordSocket):
             complete_deps = service_orm.dependencies
 
             # Maps keys to Molecule (for the next iteration)
-            molecule_map = {}
+            # All the final molecules are obtained at once
+            final_ids = [dep.record.final_molecule_id for dep in complete_deps]
+            final_molecules = self.root_socket.molecules.get(final_ids, session=session)
 
-            for dep in complete_deps:
+            molecule_map = {}
+            for dep, mol_data in zip(complete_deps, final_molecules):
                 key = dep.extras["key"]
-                molecule_map[key] = dep.record.final_molecule.to_model(Molecule)
+                molecule_map[key] = Molecule(**mol_data)
 
             # Build out the new set of seeds
             complete_seeds = set(deserialize_key(dep.extras["key"]) for dep in complete_deps)
@@ -477,7 +479,7 @@ class GridoptimizationRecordSocket(BaseRecordSocket):
                     GridoptimizationSpecificationORM.optimization_specification_id,
                 ),
                 (GridoptimizationSpecificationORM.id,),
-                gridoptimization_spec_insert_lock_id,
+                lock_id=None,
             )
 
             return meta, [x[0] for x in ids]
@@ -638,9 +640,6 @@ class GridoptimizationRecordSocket(BaseRecordSocket):
         with self.root_socket.optional_session(session, False) as session:
             self.root_socket.users.assert_group_member(owner_user_id, owner_group_id, session=session)
 
-            # Lock for the entire transaction
-            session.execute(select(func.pg_advisory_xact_lock(gridoptimization_insert_lock_id))).scalar()
-
             all_orm = []
             for mid in initial_molecule_ids:
                 go_orm = GridoptimizationRecordORM(
@@ -3,6 +3,7 @@ from __future__ import annotations
 import inspect
 import logging
 import select as io_select
+import time
 import traceback
 import uuid
 from datetime import datetime, timedelta
@@ -15,6 +16,7 @@ from sqlalchemy import select, delete, update, and_, or_
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
+from qcfractal import metrics
 from qcfractal.components.auth.db_models import UserIDMapSubquery
 from qcfractal.db_socket.helpers import get_query_proj_options
 from qcportal.exceptions import MissingDataError
@@ -336,6 +338,9 @@ class InternalJobSocket:
 
         # For logging (ORM may end up detached or somthing)
         job_id = job_orm.id
+        job_function = job_orm.function
+
+        start = time.perf_counter()
 
         try:
             func_attr = attrgetter(job_orm.function)
@@ -392,6 +397,10 @@ class InternalJobSocket:
             logger.error(f"Job {job_id} failed with exception:\n{job_orm.result}")
             job_orm.status = InternalJobStatusEnum.error
 
+        metrics.internal_job_duration.observe(
+            time.perf_counter() - start, function=job_function, status=job_orm.status.value
+        )
+
         if job_progress.deleted:
             # Row does not exist anymore
             session.expunge(job_orm)
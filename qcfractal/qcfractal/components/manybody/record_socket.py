@@ -13,6 +13,7 @@ from sqlalchemy import select, func
 from sqlalchemy.dialects.postgresql import array_agg, aggregate_order_by
 from sqlalchemy.orm import defer, undefer, lazyload, joinedload, selectinload
 
+from qcfractal.components.record_db_models import BaseRecordORM
 from qcfractal.components.services.db_models import ServiceQueueORM, ServiceDependencyORM
 from qcfractal.components.singlepoint.record_db_models import QCSpecificationORM
 from qcfractal.db_socket.helpers import insert_general
@@ -115,6 +116,39 @@ class ManybodyRecordSocket(BaseRecordSocket):
         )
         return [stmt]
 
+    @staticmethod
+    def _get_cluster_energies(session: Session, manybody_id: int) -> Tuple[Sequence, ...]:
+        """
+        Obtains the energies of the singlepoint calculations of all clusters of a manybody record
+
+        The data is returned as columns (mc_level, fragments, basis, molecule_id, singlepoint_id, energy),
+        ordered by cluster. All singlepoint calculations are expected to have been completed.
+        """
+
+        stmt = select(
+            ManybodyClusterORM.mc_level,
+            ManybodyClusterORM.fragments,
+            ManybodyClusterORM.basis,
+            ManybodyClusterORM.molecule_id,
+            ManybodyClusterORM.singlepoint_id,
+            BaseRecordORM.properties["return_energy"],
+        )
+        stmt = stmt.join(BaseRecordORM, BaseRecordORM.id == ManybodyClusterORM.singlepoint_id)
+        stmt = stmt.where(ManybodyClusterORM.manybody_id == manybody_id)
+        stmt = stmt.order_by(ManybodyClusterORM.id)
+
+        rows = session.execute(stmt).all()
+
+        missing = [r[4] for r in rows if r[5] is None]
+        if missing:
+            raise MissingDataError(f"Singlepoint records {missing} are missing the return energy")
+
+        # Transpose into columns
+        if rows:
+            return tuple(zip(*rows))
+        else:
+            return ((),) * 6
+
     def initialize_service(self, session: Session, service_orm: ServiceQueueORM) -> None:
         mb_orm: ManybodyRecordORM = service_orm.record
 
@@ -254,14 +288,11 @@ class ManybodyRecordSocket(BaseRecordSocket):
 
         output += "=" * 20 + "\nSinglepoint results\n" + "=" * 20 + "\n\n"
 
-        # Make a nice output table
-        table_rows = []
-        for cluster in mb_orm.clusters:
-            mol_id = cluster.molecule_id
+        # Load all the energies at once, rather than going through the clusters (one query per singlepoint)
+        mc_levels, fragments, basis, mol_ids, sp_ids, energies = self._get_cluster_energies(session, mb_orm.id)
 
-            energy = cluster.singlepoint_record.properties["return_energy"]
-            table_row = [cluster.mc_level, cluster.fragments, cluster.basis, energy, mol_id, cluster.singlepoint_id]
-            table_rows.append(table_row)
+        # Make a nice output table
+        table_rows = list(zip(mc_levels, fragments, basis, energies, mol_ids, sp_ids))
 
         output += tabulate.tabulate(
             table_rows,
@@ -270,14 +301,8 @@ class ManybodyRecordSocket(BaseRecordSocket):
         )
 
         # Analyze the actual results
-        component_results = {}
-        for cluster in mb_orm.clusters:
-            mc_level = cluster.mc_level
-            label = qcmanybody.labeler(mc_level, cluster.fragments, cluster.basis)
-            energy = cluster.singlepoint_record.properties["return_energy"]
-
-            component_results.setdefault(label, {})
-            component_results[label]["energy"] = energy
+        labels = map(qcmanybody.labeler, mc_levels, fragments, basis)
+        component_results = {label: {"energy": energy} for label, energy in zip(labels, energies)}
 
         # Swallow any output
         qcmb_stdout = io.StringIO()
@@ -143,6 +143,16 @@ def test_manybody_socket_run(
     unique_sp = set(x.singlepoint_id for x in rec.clusters)
     assert len(unique_sp) == n_singlepoints
 
+    # Energies loaded in bulk match those of the individual singlepoints
+    mc_levels, fragments, basis, mol_ids, sp_ids, energies = storage_socket.records.manybody._get_cluster_energies(
+        session, id_1
+    )
+    clusters = sorted(rec.clusters, key=lambda x: x.id)
+    assert list(sp_ids) == [c.singlepoint_id for c in clusters]
+    assert list(mol_ids) == [c.molecule_id for c in clusters]
+    assert list(mc_levels) == [c.mc_level for c in clusters]
+    assert list(energies) == [c.singlepoint_record.properties["return_energy"] for c in clusters]
+
 
 def test_manybody_socket_run_duplicate(
     storage_socket: SQLAlchemySocket,
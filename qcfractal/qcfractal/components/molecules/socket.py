@@ -3,6 +3,7 @@ from __future__ import annotations
 import logging
 from typing import TYPE_CHECKING
 
+import numpy as np
 from qcelemental.molutil import order_molecular_formula
 from sqlalchemy.orm import load_only
 from sqlalchemy.orm.attributes import flag_modified
@@ -29,10 +30,6 @@ if TYPE_CHECKING:
     from typing import List, Union, Tuple, Optional, Sequence, Dict, Any
 
 
-# Basically random, but unique to molecules
-molecule_insert_lock_id = 24773
-
-
 class MoleculeSocket:
     """
     Socket for managing/querying molecules
@@ -95,9 +92,9 @@ class MoleculeSocket:
         molecule_orm = [self.molecule_to_orm(x) for x in molecules]
 
         with self.root_socket.optional_session(session) as session:
-            # lock id is basically random, but unique to molecules
+            # molecule_hash is unique, so no lock is needed
             meta, added_ids = insert_general(
-                session, molecule_orm, (MoleculeORM.molecule_hash,), (MoleculeORM.id,), lock_id=molecule_insert_lock_id
+                session, molecule_orm, (MoleculeORM.molecule_hash,), (MoleculeORM.id,), lock_id=None
             )
 
         # added_ids is a list of tuple, with each tuple only having one value. Flatten that out
@@ -140,6 +137,42 @@ class MoleculeSocket:
         with self.root_socket.optional_session(session, True) as session:
             return get_general(session, MoleculeORM, MoleculeORM.id, molecule_id, include, exclude, missing_ok)
 
+    def get_geometries(self, molecule_id: Sequence[int], *, session: Optional[Session] = None) -> List[np.ndarray]:
+        """
+        Obtain only the geometries of molecules with specified IDs from the database
+
+        This is meant for services, which often need the geometries of many molecules at once.
+        All the geometries are obtained with a single query.
+
+        Parameters
+        ----------
+        molecule_id
+            A list or other sequence of molecule IDs. May contain duplicates.
+        session
+            An existing SQLAlchemy session to use. If None, one will be created. If an existing session
+            is used, it will be flushed (but not committed) before returning from this function.
+
+        Returns
+        -------
+        :
+            List of geometries (as numpy arrays of shape (n_atoms, 3)) in the same order as the given ids.
+        """
+
+        unique_ids = set(molecule_id)
+        if not unique_ids:
+            return []
+
+        stmt = select(MoleculeORM.id, MoleculeORM.geometry).where(MoleculeORM.id.in_(unique_ids))
+
+        with self.root_socket.optional_session(session, True) as session:
+            geometry_map = {mid: np.asarray(geom, dtype=np.float64) for mid, geom in session.execute(stmt)}
+
+        missing = unique_ids - geometry_map.keys()
+        if missing:
+            raise MissingDataError(f"Could not find molecules with ids {sorted(missing)}")
+
+        return [geometry_map[mid] for mid in molecule_id]
+
     def add_mixed(
         self, molecule_data: Sequence[Union[int, Molecule]], *, session: Optional[Session] = None
     ) -> Tuple[InsertMetadata, List[Optional[int]]]:
@@ -182,7 +215,7 @@ class MoleculeSocket:
                 MoleculeORM.id,
                 (MoleculeORM.molecule_hash,),
                 (MoleculeORM.id,),
-                lock_id=molecule_insert_lock_id,
+                lock_id=None,
             )
 
         # added_ids is a list of tuple, with each tuple only having one value. Flatten that out
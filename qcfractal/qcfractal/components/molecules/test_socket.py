@@ -2,7 +2,11 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+import numpy as np
+import pytest
+
 from qcarchivetesting import load_molecule_data
+from qcportal.exceptions import MissingDataError
 from qcportal.molecules import Molecule, MoleculeQueryFilters
 
 if TYPE_CHECKING:
@@ -50,6 +54,29 @@ def test_molecules_socket_get_proj(storage_socket: SQLAlchemySocket):
     assert mols[1]["validated"] is True
 
 
+def test_molecules_socket_get_geometries(storage_socket: SQLAlchemySocket):
+    water = load_molecule_data("water_dimer_minima")
+    hooh = load_molecule_data("hooh")
+
+    meta, ids = storage_socket.molecules.add([water, hooh])
+
+    # Duplicates and order are preserved
+    geometries = storage_socket.molecules.get_geometries([ids[1], ids[0], ids[1]])
+    assert len(geometries) == 3
+    assert isinstance(geometries[0], np.ndarray)
+    assert geometries[0].shape == (len(hooh.symbols), 3)
+    assert geometries[1].shape == (len(water.symbols), 3)
+    np.testing.assert_allclose(geometries[0], hooh.geometry)
+    np.testing.assert_allclose(geometries[1], water.geometry)
+    np.testing.assert_allclose(geometries[2], hooh.geometry)
+
+    assert storage_socket.molecules.get_geometries([]) == []
+
+    missing_id = max(ids) + 1
+    with pytest.raises(MissingDataError, match=str(missing_id)):
+        storage_socket.molecules.get_geometries([ids[0], missing_id])
+
+
 def test_molecules_socket_add_mixed_1(storage_socket: SQLAlchemySocket):
     # Tests a simple add_mixed
     water = load_molecule_data("water_dimer_minima")
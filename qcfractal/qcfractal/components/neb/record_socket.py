@@ -239,15 +239,13 @@ class NEBRecordSocket(BaseRecordSocket):
 
                 else:
                     complete_tasks = sorted(service_orm.dependencies, key=lambda x: x.extras["position"])
-                    geometries = []
+                    geometries = self.root_socket.molecules.get_geometries(
+                        [task.record.molecule_id for task in complete_tasks], session=session
+                    )
                     energies = []
                     gradients = []
                     for task in complete_tasks:
                         sp_record = task.record
-                        mol_data = self.root_socket.molecules.get(
-                            molecule_id=[sp_record.molecule_id], include=["geometry"], session=session
-                        )
-                        geometries.append(mol_data[0]["geometry"])
                         energies.append(sp_record.properties["return_energy"])
                         gradients.append(convert_numpy_recursive(sp_record.properties["return_result"], flatten=True))
                     service_state.nebinfo["geometry"] = convert_numpy_recursive(geometries, flatten=False)
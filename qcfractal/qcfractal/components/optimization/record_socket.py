@@ -35,7 +35,6 @@ if TYPE_CHECKING:
 
 # Meaningless, but unique to optimizations
 optimization_insert_lock_id = 14100
-optimization_spec_insert_lock_id = 14101
 
 
 class OptimizationRecordSocket(BaseRecordSocket):
@@ -149,6 +148,36 @@ class OptimizationRecordSocket(BaseRecordSocket):
         stmt = update(OptimizationRecordORM).where(OptimizationRecordORM.id == record_id).values(record_updates)
         session.execute(stmt)
 
+    def update_completed_tasks(
+        self, session: Session, record_ids: Sequence[int], results: Sequence[QCEl_OptimizationResult]
+    ) -> None:
+
+        # Add all the final molecules at once
+        meta, final_mol_ids = self.root_socket.molecules.add([r.final_molecule for r in results], session=session)
+        if not meta.success:
+            raise RuntimeError("Unable to add final molecules: " + meta.error_string)
+
+        # Insert all the trajectories at once, then split them back up
+        all_traj = [traj for r in results for traj in r.trajectory]
+        all_traj_ids = self.root_socket.records.insert_complete_schema_v1(session, all_traj)
+
+        record_updates = []
+        traj_start = 0
+        for record_id, result, final_mol_id in zip(record_ids, results, final_mol_ids):
+            traj_ids = all_traj_ids[traj_start : traj_start + len(result.trajectory)]
+            traj_start += len(result.trajectory)
+
+            for position, traj_id in enumerate(traj_ids):
+                assoc_orm = OptimizationTrajectoryORM(singlepoint_id=traj_id)
+                assoc_orm.optimization_id = record_id
+                assoc_orm.position = position
+                session.add(assoc_orm)
+
+            record_updates.append({"id": record_id, "final_molecule_id": final_mol_id, "energies": result.energies})
+
+        # Bulk update by primary key
+        session.execute(update(OptimizationRecordORM), record_updates)
+
     def insert_complete_schema_v1(
         self,
         session: Session,
@@ -287,7 +316,7 @@ class OptimizationRecordSocket(BaseRecordSocket):
                 to_add,
                 (OptimizationSpecificationORM.specification_hash, OptimizationSpecificationORM.qc_specification_id),
                 (OptimizationSpecificationORM.id,),
-                optimization_spec_insert_lock_id,
+                lock_id=None,
             )
 
             return meta, [x[0] for x in ids]
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import threading
 from typing import TYPE_CHECKING
 
 import pytest
@@ -9,6 +10,7 @@ from qcfractal.components.optimization.record_db_models import OptimizationRecor
 from qcfractal.components.optimization.testing_helpers import test_specs, load_test_data, run_test_data
 from qcfractal.components.testing_helpers import convert_to_plain_qcschema_result
 from qcfractal.db_socket import SQLAlchemySocket
+from qcfractalcompute.compress import compress_result
 from qcportal.managers import ManagerName
 from qcportal.molecules import Molecule
 from qcportal.optimization import (
@@ -288,6 +290,70 @@ def test_optimization_socket_run(
         _compare_record_with_schema(record, plain_result)
 
 
+def test_optimization_socket_run_concurrent(
+    storage_socket: SQLAlchemySocket, session: Session, activated_manager_programs: Dict[str, List[str]]
+):
+    # Identical results returned by several managers at the same time. The final & trajectory molecules
+    # and specifications are shared between all the results, and must only be inserted once
+    input_spec, molecule, result = load_test_data("opt_psi4_benzene")
+    result_compressed = compress_result(result.dict())
+
+    n_managers = 4
+    n_tasks = 2
+
+    meta, record_ids = storage_socket.records.optimization.add(
+        [molecule] * (n_managers * n_tasks), input_spec, "*", PriorityEnum.normal, None, None, False
+    )
+    assert meta.n_inserted == n_managers * n_tasks
+
+    manager_tasks = []
+    for i in range(n_managers):
+        mname = ManagerName(cluster="test_cluster", hostname=f"host_{i}", uuid=f"1234-5678-1234-567{i}")
+        storage_socket.managers.activate(
+            name_data=mname,
+            manager_version="v2.0",
+            username="bill",
+            programs=activated_manager_programs,
+            tags=["*"],
+        )
+
+        tasks = storage_socket.tasks.claim_tasks(mname.fullname, activated_manager_programs, ["*"], limit=n_tasks)
+        assert len(tasks) == n_tasks
+        manager_tasks.append((mname, tasks))
+
+    barrier = threading.Barrier(n_managers)
+    returned = {}
+
+    def _return_results(mname: ManagerName, tasks):
+        s = SQLAlchemySocket(storage_socket.qcf_config)
+        barrier.wait()
+        returned[mname.fullname] = s.tasks.update_finished(mname.fullname, {t["id"]: result_compressed for t in tasks})
+        s.engine.dispose()
+
+    threads = [threading.Thread(target=_return_results, args=x) for x in manager_tasks]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(60)
+        assert not t.is_alive()
+
+    assert len(returned) == n_managers
+    for rmeta in returned.values():
+        assert rmeta.n_accepted == n_tasks
+        assert rmeta.rejected_info == []
+
+    records = [session.get(OptimizationRecordORM, rid) for rid in record_ids]
+    assert all(r.status == RecordStatusEnum.complete for r in records)
+
+    # All records point to the same final molecule and the same trajectory molecules & specifications
+    assert len(set(r.final_molecule_id for r in records)) == 1
+    traj_mol_ids = [tuple(t.singlepoint_record.molecule_id for t in r.trajectory) for r in records]
+    traj_spec_ids = [tuple(t.singlepoint_record.specification_id for t in r.trajectory) for r in records]
+    assert len(traj_mol_ids[0]) == len(result.trajectory)
+    assert len(set(traj_mol_ids)) == 1
+    assert len(set(traj_spec_ids)) == 1
+
+
 def test_optimization_socket_insert_complete_schema_v1(storage_socket: SQLAlchemySocket, session: Session):
     test_names = [
         "opt_psi4_benzene",
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Column,
     String,
     Integer,
+    BigInteger,
     ForeignKey,
     ForeignKeyConstraint,
     Enum,
@@ -25,12 +26,12 @@ from sqlalchemy.orm.collections import attribute_keyed_dict
 from qcfractal.components.auth.db_models import UserORM, GroupORM, UserIDMapSubquery, GroupIDMapSubquery
 from qcfractal.components.managers.db_models import ComputeManagerORM
 from qcfractal.db_socket import BaseORM
-from qcportal.compression import CompressionEnum, decompress
+from qcportal.compression import CompressionEnum, compress, decompress, get_zstd_dictionary
 from qcportal.record_models import RecordStatusEnum, OutputTypeEnum
 from qcportal.utils import now_at_utc
 
 if TYPE_CHECKING:
-    from typing import Dict, Any, Optional, Iterable
+    from typing import Dict, Any, Optional, Iterable, Tuple
 
 
 class RecordCommentORM(BaseORM):
@@ -86,9 +87,92 @@ class RecordInfoBackupORM(BaseORM):
     _qcportal_model_excludes = ["id", "record_id"]
 
 
+class OutputStoreChunkORM(BaseORM):
+    """
+    Table for storing text that has been appended to an output
+
+    Each chunk is compressed independently, so appending to an output (for example, the stdout of a
+    service, which is appended to every iteration) does not require rewriting the existing data.
+    """
+
+    __tablename__ = "output_store_chunk"
+
+    id = Column(Integer, primary_key=True)
+    output_id = Column(Integer, ForeignKey("output_store.id", ondelete="cascade"), nullable=False)
+
+    compression_type = Column(Enum(CompressionEnum), nullable=False)
+    compression_level = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (Index("ix_output_store_chunk_output_id", "output_id"),)
+
+    def get_output(self) -> Any:
+        return decompress(self.data, self.compression_type)
+
+
+def merge_output_chunks(
+    data: bytes,
+    compression_type: CompressionEnum,
+    chunks: Iterable[Tuple[bytes, CompressionEnum]],
+    dictionary: Optional[bytes] = None,
+) -> Tuple[bytes, CompressionEnum, int]:
+    """
+    Merges an output with the chunks appended to it, returning the compressed result
+
+    The chunks are decompressed one at a time, and the full output is only compressed once. If the output
+    was compressed with a dictionary, the result is compressed without it (so that it can be decompressed by
+    anyone, not only by the server).
+    """
+
+    zstd_dict = get_zstd_dictionary(dictionary) if dictionary is not None else None
+
+    all_str = [decompress(data, compression_type, zstd_dict)]
+    all_str.extend(decompress(c_data, c_type) for c_data, c_type in chunks)
+
+    # Use a fast compression level, since this is generally done on-the-fly
+    return compress("".join(all_str), CompressionEnum.zstd, 3)
+
+
+class CompressionDictionaryORM(BaseORM):
+    """
+    Table for storing trained zstd dictionaries used to compress outputs
+
+    There is a dictionary for each type of output and program, trained from existing outputs. Dictionaries
+    are versioned - outputs refer to the dictionary they were compressed with, so a new version can be trained
+    without having to recompress everything at once.
+    """
+
+    __tablename__ = "compression_dictionary"
+
+    id = Column(Integer, primary_key=True)
+
+    output_type = Column(Enum(OutputTypeEnum), nullable=False)
+    program = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+    created_on = Column(TIMESTAMP(timezone=True), nullable=False, default=now_at_utc)
+
+    compression_level = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    # Statistics about the outputs used for training the dictionary
+    n_samples = Column(Integer, nullable=False)
+    samples_size = Column(BigInteger, nullable=False)  # Uncompressed
+    samples_compressed_size = Column(BigInteger, nullable=False)  # As they were stored before
+    samples_dictionary_size = Column(BigInteger, nullable=False)  # Compressed with this dictionary
+
+    __table_args__ = (
+        UniqueConstraint("output_type", "program", "version", name="ux_compression_dictionary_type_program_version"),
+    )
+
+    def get_dictionary(self):
+        return get_zstd_dictionary(self.data)
+
+
 class OutputStoreORM(BaseORM):
     """
     Table for storing raw computation outputs (text) and errors (json)
+
+    Text outputs may have additional chunks appended to them (see :class:`OutputStoreChunkORM`)
     """
 
     __tablename__ = "output_store"
@@ -101,12 +185,52 @@ class OutputStoreORM(BaseORM):
     compression_level = Column(Integer, nullable=False)
     data = deferred(Column(LargeBinary, nullable=False))
 
-    __table_args__ = (UniqueConstraint("history_id", "output_type", name="ux_output_store_id_type"),)
+    # If set, the data was compressed with this (zstd) dictionary
+    compression_dictionary_id = Column(Integer, ForeignKey(CompressionDictionaryORM.id), nullable=True)
+
+    chunks = relationship(
+        OutputStoreChunkORM, order_by=OutputStoreChunkORM.id, cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    compression_dictionary = relationship(CompressionDictionaryORM)
+
+    __table_args__ = (
+        UniqueConstraint("history_id", "output_type", name="ux_output_store_id_type"),
+        Index("ix_output_store_compression_dictionary_id", "compression_dictionary_id"),
+    )
+
+    _qcportal_model_excludes = [
+        "id",
+        "history_id",
+        "compression_level",
+        "chunks",
+        "compression_dictionary",
+    ]
+
+    def model_dict(self, exclude: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        d = BaseORM.model_dict(self, exclude)
+
+        # Only merge if the data was loaded (it is deferred)
+        # Merged data is compressed without a dictionary
+        if "data" in d and self.chunks:
+            chunks = [(c.data, c.compression_type) for c in self.chunks]
+            dictionary = self.compression_dictionary.data if self.compression_dictionary_id is not None else None
+            d["data"], d["compression_type"], _ = merge_output_chunks(
+                d["data"], d["compression_type"], chunks, dictionary
+            )
+            d["compression_dictionary_id"] = None
 
-    _qcportal_model_excludes = ["id", "history_id", "compression_level"]
+        return d
 
     def get_output(self) -> Any:
-        return decompress(self.data, self.compression_type)
+        zstd_dict = None
+        if self.compression_dictionary_id is not None:
+            zstd_dict = self.compression_dictionary.get_dictionary()
+
+        out = decompress(self.data, self.compression_type, zstd_dict)
+        for c in self.chunks:
+            out += c.get_output()
+        return out
 
 
 # Mark the storage of the data column as external
@@ -303,8 +427,7 @@ class BaseRecordORM(BaseORM):
 
 
 # Function for deleting large binary when derived classes are deleted
-_del_baserecord_triggerfunc = DDL(
-    """
+_del_baserecord_triggerfunc = DDL("""
     CREATE OR REPLACE FUNCTION public.qca_base_record_delete()
     RETURNS trigger
     LANGUAGE plpgsql
@@ -315,7 +438,6 @@ _del_baserecord_triggerfunc = DDL(
         END
         $_$
     ;
-"""
-)
+""")
 
 event.listen(BaseRecordORM.__table__, "after_create", _del_baserecord_triggerfunc.execute_if(dialect=("postgresql")))
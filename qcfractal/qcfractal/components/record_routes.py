@@ -1,11 +1,12 @@
 from typing import Optional
 
-from flask import current_app, g
+from flask import current_app, g, request
 
 from qcfractal.flask_app import storage_socket
 from qcfractal.flask_app.api_v1.blueprint import api_v1
 from qcfractal.flask_app.api_v1.helpers import wrap_route
 from qcportal.base_models import ProjURLParameters, CommonBulkGetBody
+from qcportal.compression import compression_dictionaries_header
 from qcportal.exceptions import LimitExceededError
 from qcportal.record_models import (
     RecordModifyBody,
@@ -15,6 +16,12 @@ from qcportal.record_models import (
 )
 
 
+def _client_has_dictionaries() -> bool:
+    # Older clients cannot obtain compression dictionaries from the server. For those, outputs
+    # compressed with a dictionary are recompressed without it
+    return compression_dictionaries_header in request.headers
+
+
 #################################################################
 # Base record route
 # A few things can be done directly through /records (rather than
@@ -73,7 +80,12 @@ def get_record_waiting_reason_v1(record_id: int):
 @wrap_route("READ")
 def get_records_v1(record_id: int, url_params: ProjURLParameters, record_type: Optional[str] = None):
     record_socket = storage_socket.records.get_socket(record_type)
-    return record_socket.get([record_id], url_params.include, url_params.exclude)[0]
+    records = record_socket.get([record_id], url_params.include, url_params.exclude)
+
+    if not _client_has_dictionaries():
+        storage_socket.records.remove_record_output_dictionaries(records)
+
+    return records[0]
 
 
 @api_v1.route("/records/<string:record_type>/bulkGet", methods=["POST"])
@@ -87,10 +99,15 @@ def bulk_get_records_v1(body_data: CommonBulkGetBody, record_type: Optional[str]
     # Getting is handled a little differently. If no type specified, use the more generic version
     # in the upper-level record socket
     if record_type is None:
-        return storage_socket.records.get(body_data.ids, body_data.include, body_data.exclude, body_data.missing_ok)
+        records = storage_socket.records.get(body_data.ids, body_data.include, body_data.exclude, body_data.missing_ok)
     else:
         record_socket = storage_socket.records.get_socket(record_type)
-        return record_socket.get(body_data.ids, body_data.include, body_data.exclude, body_data.missing_ok)
+        records = record_socket.get(body_data.ids, body_data.include, body_data.exclude, body_data.missing_ok)
+
+    if not _client_has_dictionaries():
+        storage_socket.records.remove_record_output_dictionaries(records)
+
+    return records
 
 
 @api_v1.route("/records/<string:record_type>/<int:record_id>", methods=["GET"])
@@ -105,6 +122,9 @@ def get_general_records_v1(record_id: int, url_params: ProjURLParameters, record
         record_socket = storage_socket.records.get_socket(record_type)
         records = record_socket.get([record_id], url_params.include, url_params.exclude)
 
+    if not _client_has_dictionaries():
+        storage_socket.records.remove_record_output_dictionaries(records)
+
     return records[0]
 
 
@@ -141,21 +161,36 @@ def get_record_service_v1(record_id: int, record_type: Optional[str] = None):
 @wrap_route("READ")
 def get_record_history_v1(record_id: int, record_type: Optional[str] = None):
     record_socket = storage_socket.records.get_socket(record_type)
-    return record_socket.get_all_compute_history(record_id)
+    histories = record_socket.get_all_compute_history(record_id)
+
+    if not _client_has_dictionaries():
+        storage_socket.records.remove_output_dictionaries(o for h in histories for o in h.get("outputs", {}).values())
+
+    return histories
 
 
 @api_v1.route("/records/<string:record_type>/<int:record_id>/compute_history/<int:history_id>", methods=["GET"])
 @wrap_route("READ")
 def get_record_history_single_v1(record_id: int, history_id: int, record_type: Optional[str] = None):
     record_socket = storage_socket.records.get_socket(record_type)
-    return record_socket.get_single_compute_history(record_id, history_id)
+    history = record_socket.get_single_compute_history(record_id, history_id)
+
+    if not _client_has_dictionaries():
+        storage_socket.records.remove_output_dictionaries(history.get("outputs", {}).values())
+
+    return history
 
 
 @api_v1.route("/records/<string:record_type>/<int:record_id>/compute_history/<int:history_id>/outputs", methods=["GET"])
 @wrap_route("READ")
 def get_record_outputs_v1(record_id: int, history_id: int, record_type: Optional[str] = None):
     record_socket = storage_socket.records.get_socket(record_type)
-    return record_socket.get_all_output_metadata(record_id, history_id)
+    outputs = record_socket.get_all_output_metadata(record_id, history_id)
+
+    if not _client_has_dictionaries():
+        storage_socket.records.remove_output_dictionaries(outputs.values())
+
+    return outputs
 
 
 @api_v1.route(
@@ -165,7 +200,12 @@ def get_record_outputs_v1(record_id: int, history_id: int, record_type: Optional
 @wrap_route("READ")
 def get_record_outputs_single_v1(record_id: int, history_id: int, output_type: str, record_type: Optional[str] = None):
     record_socket = storage_socket.records.get_socket(record_type)
-    return record_socket.get_single_output_metadata(record_id, history_id, output_type)
+    output = record_socket.get_single_output_metadata(record_id, history_id, output_type)
+
+    if not _client_has_dictionaries():
+        storage_socket.records.remove_output_dictionaries([output])
+
+    return output
 
 
 @api_v1.route(
@@ -175,7 +215,20 @@ def get_record_outputs_single_v1(record_id: int, history_id: int, output_type: s
 @wrap_route("READ")
 def get_record_outputs_data_v1(record_id: int, history_id: int, output_type: str, record_type: Optional[str] = None):
     record_socket = storage_socket.records.get_socket(record_type)
-    return record_socket.get_single_output_rawdata(record_id, history_id, output_type)
+    data, ctype, dictionary_id = record_socket.get_single_output_rawdata(record_id, history_id, output_type)
+
+    if _client_has_dictionaries():
+        return data, ctype, dictionary_id
+
+    output = {"data": data, "compression_type": ctype, "compression_dictionary_id": dictionary_id}
+    storage_socket.records.remove_output_dictionaries([output])
+    return output["data"], output["compression_type"]
+
+
+@api_v1.route("/compression_dictionaries/<int:dictionary_id>", methods=["GET"])
+@wrap_route("READ")
+def get_compression_dictionary_v1(dictionary_id: int):
+    return storage_socket.records.get_compression_dictionary(dictionary_id)
 
 
 @api_v1.route("/records/<string:record_type>/<int:record_id>/native_files", methods=["GET"])
@@ -2,8 +2,11 @@ from __future__ import annotations
 
 import logging
 from collections import defaultdict
+from datetime import timedelta
 from typing import TYPE_CHECKING
 
+import msgpack
+import zstandard
 from qcelemental.models import FailedOperation
 from sqlalchemy import select, delete, update, union, or_, func, text
 from sqlalchemy.orm import (
@@ -26,7 +29,7 @@ from qcfractal.db_socket.helpers import (
     get_general,
     delete_general,
 )
-from qcportal.compression import CompressionEnum, compress, decompress
+from qcportal.compression import CompressionEnum, compress, decompress, get_zstd_dictionary
 from qcportal.exceptions import UserReportableError, MissingDataError
 from qcportal.managers.models import ManagerStatusEnum
 from qcportal.metadata_models import DeleteMetadata, UpdateMetadata
@@ -38,13 +41,17 @@ from .record_db_models import (
     RecordInfoBackupORM,
     RecordCommentORM,
     OutputStoreORM,
+    OutputStoreChunkORM,
+    CompressionDictionaryORM,
     NativeFileORM,
+    merge_output_chunks,
 )
 
 if TYPE_CHECKING:
     from sqlalchemy.orm.session import Session
     from sqlalchemy.sql import Select
     from qcfractal.db_socket.socket import SQLAlchemySocket
+    from qcfractal.components.internal_jobs.status import JobProgress
     from qcportal.all_results import AllResultTypes
     from qcportal.record_models import RecordQueryFilters
     from typing import List, Dict, Tuple, Optional, Sequence, Any, Iterable, Type
@@ -52,6 +59,20 @@ if TYPE_CHECKING:
 
 _default_error = {"error_type": "not_supplied", "error_message": "No error message found on task."}
 
+# Program that created an output (used for picking a compression dictionary), as a column expression
+_output_program_column = func.lower(RecordComputeHistoryORM.provenance["creator"].as_string())
+
+
+def get_output_program(provenance: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Determines the program that created an output from the provenance of a computation
+
+    This is the python equivalent of `_output_program_column`
+    """
+
+    creator = provenance.get("creator", None) if provenance else None
+    return creator.lower() if creator else None
+
 
 def build_extras_properties(result: AllResultTypes) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     # Gets rid of numpy arrays
@@ -203,6 +224,18 @@ class BaseRecordSocket:
         """
         raise NotImplementedError(f"updated_completed not implemented for {type(self)}! This is a developer error")
 
+    def update_completed_tasks(
+        self, session: Session, record_ids: Sequence[int], results: Sequence[AllResultTypes]
+    ) -> None:
+        """
+        Update many record ORMs based on the results of successfully-completed computations
+
+        By default, this calls update_completed_task for each record. Derived classes may override
+        this to perform the updates with fewer statements.
+        """
+        for record_id, result in zip(record_ids, results):
+            self.update_completed_task(session, record_id, result)
+
     def insert_complete_schema_v1(
         self,
         session: Session,
@@ -387,22 +420,45 @@ class BaseRecordSocket:
         output_type: str,
         *,
         session: Optional[Session] = None,
-    ) -> Tuple[bytes, CompressionEnum]:
-        stmt = select(OutputStoreORM.data, OutputStoreORM.compression_type)
+    ) -> Tuple[bytes, CompressionEnum, Optional[int]]:
+        """
+        Get the raw (compressed) data of an output
+
+        Returns the data, the compression type, and the id of the compression dictionary used
+        to compress the data (or None if a dictionary was not used).
+
+        If chunks have been appended to the output, they are merged into the stored output first
+        (see :meth:`RecordSocket.compact_output`).
+        """
+
+        stmt = select(
+            OutputStoreORM.id,
+            OutputStoreORM.data,
+            OutputStoreORM.compression_type,
+            OutputStoreORM.compression_dictionary_id,
+            OutputStoreORM.chunks.any(),
+        )
         stmt = stmt.join(RecordComputeHistoryORM, RecordComputeHistoryORM.id == OutputStoreORM.history_id)
         stmt = stmt.join(self.record_orm, RecordComputeHistoryORM.record_id == self.record_orm.id)
         stmt = stmt.where(RecordComputeHistoryORM.record_id == record_id)
         stmt = stmt.where(OutputStoreORM.history_id == history_id)
         stmt = stmt.where(OutputStoreORM.output_type == output_type)
 
-        with self.root_socket.optional_session(session, True) as session:
-            output_data = session.execute(stmt).one_or_none()
+        with self.root_socket.optional_session(session, True) as ro_session:
+            output_data = ro_session.execute(stmt).one_or_none()
             if output_data is None:
                 raise MissingDataError(
                     f"Record {record_id}/history {history_id} does not have {output_type} output (or record/history does not exist)"
                 )
 
-            return output_data[0], output_data[1]
+            output_id, data, ctype, dictionary_id, has_chunks = output_data
+
+        # Most outputs do not have any appended chunks
+        if not has_chunks:
+            return data, ctype, dictionary_id
+
+        # Merge the chunks into the stored output, so later reads do not need to merge them again
+        return self.root_socket.records.compact_output(output_id, session=session)
 
     def get_single_output_uncompressed(
         self, record_id: int, history_id: int, output_type: OutputTypeEnum, *, session: Optional[Session] = None
@@ -411,8 +467,18 @@ class BaseRecordSocket:
         Get an uncompressed output from a record
         """
 
-        raw_data, ctype = self.get_single_output_rawdata(record_id, history_id, output_type, session=session)
-        return decompress(raw_data, ctype)
+        # Not read-only, since reading may merge appended chunks into the output
+        with self.root_socket.optional_session(session) as session:
+            raw_data, ctype, dictionary_id = self.get_single_output_rawdata(
+                record_id, history_id, output_type, session=session
+            )
+
+            zstd_dict = None
+            if dictionary_id is not None:
+                dictionary = self.root_socket.records.get_compression_dictionary(dictionary_id, session=session)
+                zstd_dict = get_zstd_dictionary(dictionary)
+
+            return decompress(raw_data, ctype, zstd_dict)
 
     def get_all_native_files_metadata(
         self,
@@ -515,6 +581,15 @@ class RecordSocket:
         self.root_socket = root_socket
         self._logger = logging.getLogger(__name__)
 
+        # Compression level used with compression dictionaries. Dictionaries give a good
+        # compression ratio even at moderate levels, which are much faster
+        self._output_dictionary_compression_level = 9
+
+        # Recompressing data (for example, compressed by managers with a fast level) once it is no longer modified
+        self._recompress_cold_data_frequency = root_socket.qcf_config.recompress_cold_data_frequency
+        self._recompress_cold_data_age = root_socket.qcf_config.recompress_cold_data_age
+        self._recompress_cold_data_level = root_socket.qcf_config.recompress_cold_data_level
+
         # All the subsockets
         from .services.socket import ServiceSubtaskRecordSocket
         from .singlepoint.record_socket import SinglepointRecordSocket
@@ -569,6 +644,19 @@ class RecordSocket:
         # Union them into a single CTE
         self._child_cte = union(*selects).cte()
 
+        if self._recompress_cold_data_frequency > 0:
+            with self.root_socket.session_scope() as session:
+                self.root_socket.internal_jobs.add(
+                    "recompress_cold_data",
+                    now_at_utc(),
+                    "records.recompress_cold_data",
+                    {},
+                    user_id=None,
+                    unique_name=True,
+                    repeat_delay=self._recompress_cold_data_frequency,
+                    session=session,
+                )
+
     def get_socket(self, record_type: str) -> BaseRecordSocket:
         """
         Get the socket for a specific kind of record type
@@ -849,6 +937,9 @@ class RecordSocket:
                 options.append(
                     selectinload(orm_type.compute_history, RecordComputeHistoryORM.outputs).undefer(OutputStoreORM.data)
                 )
+                options.append(
+                    selectinload(orm_type.compute_history, RecordComputeHistoryORM.outputs, OutputStoreORM.chunks)
+                )
             if is_included("task", include, exclude, False):
                 options.append(joinedload(orm_type.task))
             if is_included("service", include, exclude, False):
@@ -1027,18 +1118,640 @@ class RecordSocket:
         compute_history = record_orm.compute_history[-1]
         if output_type in compute_history.outputs:
             out_orm = compute_history.outputs[output_type]
-            out_str = decompress(out_orm.data, out_orm.compression_type)
-            out_str += to_append
 
-            new_data, new_ctype, new_clevel = compress(out_str, CompressionEnum.zstd)
-            out_orm.data = new_data
-            out_orm.compression_type = new_ctype
-            out_orm.compression_level = new_clevel
+            # Store as a new, independently-compressed chunk. This way, the existing
+            # output does not need to be decompressed and rewritten
+            compressed_out, compression_type, compression_level = compress(to_append, CompressionEnum.zstd)
+            chunk_orm = OutputStoreChunkORM(
+                compression_type=compression_type,
+                compression_level=compression_level,
+                data=compressed_out,
+            )
+
+            # Don't load all the existing chunks just to add one
+            if "chunks" in out_orm.__dict__:
+                out_orm.chunks.append(chunk_orm)
+            else:
+                if out_orm.id is None:
+                    session.flush()
+                chunk_orm.output_id = out_orm.id
+                session.add(chunk_orm)
         else:
             compute_history.outputs[output_type] = self.create_output_orm(output_type, to_append)
 
         session.flush()
 
+    def compact_output(
+        self, output_id: int, *, session: Optional[Session] = None
+    ) -> Tuple[bytes, CompressionEnum, Optional[int]]:
+        """
+        Merges the chunks appended to an output into the stored output
+
+        This is done when an output with chunks is read, so that later reads do not need to merge the chunks
+        again. The merged output is compressed at a fast level, without a compression dictionary (it will
+        be recompressed later, see :meth:`recompress_outputs` and :meth:`recompress_cold_data`).
+
+        Chunks appended while merging (by a running service) are left for the next time.
+
+        Returns the merged data, the compression type, and the id of the compression dictionary used (always None).
+        """
+
+        with self.root_socket.optional_session(session) as session:
+            # Lock the output, so concurrent reads do not merge the same chunks. Appending new chunks is not blocked
+            stmt = select(OutputStoreORM).where(OutputStoreORM.id == output_id)
+            stmt = stmt.options(undefer(OutputStoreORM.data), selectinload(OutputStoreORM.compression_dictionary))
+            stmt = stmt.with_for_update(key_share=True)
+            out_orm = session.execute(stmt).scalar_one()
+
+            chunk_stmt = select(OutputStoreChunkORM.id, OutputStoreChunkORM.data, OutputStoreChunkORM.compression_type)
+            chunk_stmt = chunk_stmt.where(OutputStoreChunkORM.output_id == output_id)
+            chunk_stmt = chunk_stmt.order_by(OutputStoreChunkORM.id)
+            chunks = session.execute(chunk_stmt).tuples().all()
+
+            # Already merged by someone else
+            if not chunks:
+                return out_orm.data, out_orm.compression_type, out_orm.compression_dictionary_id
+
+            dictionary = None
+            if out_orm.compression_dictionary_id is not None:
+                dictionary = out_orm.compression_dictionary.data
+
+            # Chunks are decompressed one at a time as they are merged
+            out_orm.data, out_orm.compression_type, out_orm.compression_level = merge_output_chunks(
+                out_orm.data, out_orm.compression_type, [(c_data, c_type) for _, c_data, c_type in chunks], dictionary
+            )
+            out_orm.compression_dictionary_id = None
+
+            chunk_ids = [c_id for c_id, _, _ in chunks]
+            session.execute(delete(OutputStoreChunkORM).where(OutputStoreChunkORM.id.in_(chunk_ids)))
+            session.flush()
+
+            return out_orm.data, out_orm.compression_type, None
+
+    def compact_outputs(self, session: Session, record_orm: BaseRecordORM) -> None:
+        """
+        Merges all the chunks appended to the outputs of the latest compute history of a record
+
+        This is done once a record is finished, so that later reads of the outputs do not need to
+        merge the chunks every time. The merged outputs are compressed with a compression dictionary,
+        if one exists for the output type and program.
+        """
+
+        if len(record_orm.compute_history) == 0:
+            return
+
+        output_ids = [o.id for o in record_orm.compute_history[-1].outputs.values() if o.id is not None]
+        if not output_ids:
+            return
+
+        stmt = select(OutputStoreORM).where(OutputStoreORM.id.in_(output_ids))
+        stmt = stmt.where(OutputStoreORM.chunks.any())
+        stmt = stmt.options(undefer(OutputStoreORM.data), selectinload(OutputStoreORM.chunks))
+
+        to_compact = session.execute(stmt).scalars().all()
+        if not to_compact:
+            return
+
+        program = get_output_program(record_orm.compute_history[-1].provenance)
+        dictionaries = self._get_output_dictionaries(session) if program else {}
+
+        for out_orm in to_compact:
+            output = out_orm.get_output()
+
+            # Recompress with the usual compression level, since this is only done once
+            dict_orm = dictionaries.get((out_orm.output_type, program), None)
+            if dict_orm is None:
+                out_orm.data, out_orm.compression_type, out_orm.compression_level = compress(
+                    output, CompressionEnum.zstd
+                )
+                out_orm.compression_dictionary_id = None
+            else:
+                zstd_dict = get_zstd_dictionary(dict_orm.data, dict_orm.compression_level)
+                out_orm.data, out_orm.compression_type, out_orm.compression_level = compress(
+                    output, CompressionEnum.zstd, dict_orm.compression_level, zstd_dict
+                )
+                out_orm.compression_dictionary_id = dict_orm.id
+
+            out_orm.chunks = []
+
+        session.flush()
+
+    def _get_output_dictionaries(self, session: Session) -> Dict[Tuple[OutputTypeEnum, str], CompressionDictionaryORM]:
+        """
+        Obtains the latest version of all the compression dictionaries, keyed by (output type, program)
+        """
+
+        stmt = select(CompressionDictionaryORM)
+        stmt = stmt.distinct(CompressionDictionaryORM.output_type, CompressionDictionaryORM.program)
+        stmt = stmt.order_by(
+            CompressionDictionaryORM.output_type,
+            CompressionDictionaryORM.program,
+            CompressionDictionaryORM.version.desc(),
+        )
+
+        return {(d.output_type, d.program): d for d in session.execute(stmt).scalars()}
+
+    def get_output_dictionaries(self, *, session: Optional[Session] = None) -> List[Dict[str, Any]]:
+        """
+        Obtains information about all compression dictionaries (all versions), not including the dictionaries
+        themselves
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session to use. If None, one will be created
+
+        Returns
+        -------
+        :
+            Information about each dictionary, ordered by output type, program, and version
+        """
+
+        stmt = select(CompressionDictionaryORM).options(defer(CompressionDictionaryORM.data))
+        stmt = stmt.order_by(
+            CompressionDictionaryORM.output_type,
+            CompressionDictionaryORM.program,
+            CompressionDictionaryORM.version,
+        )
+
+        with self.root_socket.optional_session(session, True) as session:
+            # Include the number of outputs using each dictionary
+            count_stmt = select(OutputStoreORM.compression_dictionary_id, func.count())
+            count_stmt = count_stmt.where(OutputStoreORM.compression_dictionary_id.is_not(None))
+            count_stmt = count_stmt.group_by(OutputStoreORM.compression_dictionary_id)
+            n_outputs = dict(session.execute(count_stmt).all())
+
+            ret = []
+            for d in session.execute(stmt).scalars():
+                d_dict = d.model_dict(exclude=["data"])
+                d_dict["n_outputs"] = n_outputs.get(d.id, 0)
+                ret.append(d_dict)
+
+            return ret
+
+    def get_compression_dictionary(self, dictionary_id: int, *, session: Optional[Session] = None) -> bytes:
+        """
+        Obtains the raw contents of a compression dictionary
+
+        Parameters
+        ----------
+        dictionary_id
+            ID of the compression dictionary
+        session
+            An existing SQLAlchemy session to use. If None, one will be created
+
+        Returns
+        -------
+        :
+            The trained zstd dictionary
+        """
+
+        stmt = select(CompressionDictionaryORM.data).where(CompressionDictionaryORM.id == dictionary_id)
+
+        with self.root_socket.optional_session(session, True) as session:
+            dictionary = session.execute(stmt).scalar_one_or_none()
+            if dictionary is None:
+                raise MissingDataError(f"Cannot find compression dictionary {dictionary_id}")
+            return dictionary
+
+    def remove_output_dictionaries(
+        self, outputs: Iterable[Dict[str, Any]], *, session: Optional[Session] = None
+    ) -> None:
+        """
+        Recompresses output data that was compressed with a compression dictionary, in place
+
+        This is used for clients that cannot obtain the dictionaries from the server, and
+        for data stored outside the server (such as dataset views). The outputs are dictionaries
+        as returned from :meth:`OutputStoreORM.model_dict`. The compression_dictionary_id
+        key is removed from all outputs.
+        """
+
+        outputs = list(outputs)
+        dictionary_ids = {o.get("compression_dictionary_id") for o in outputs if "data" in o}
+        dictionary_ids.discard(None)
+
+        dictionaries = {}
+        if dictionary_ids:
+            stmt = select(CompressionDictionaryORM.id, CompressionDictionaryORM.data)
+            stmt = stmt.where(CompressionDictionaryORM.id.in_(dictionary_ids))
+            with self.root_socket.optional_session(session, True) as session:
+                dictionaries = dict(session.execute(stmt).tuples().all())
+
+        for o in outputs:
+            dictionary_id = o.pop("compression_dictionary_id", None)
+            if dictionary_id is not None and "data" in o:
+                o["data"], o["compression_type"], _ = merge_output_chunks(
+                    o["data"], o["compression_type"], [], dictionaries[dictionary_id]
+                )
+
+    def remove_record_output_dictionaries(
+        self, records: Iterable[Optional[Dict[str, Any]]], *, session: Optional[Session] = None
+    ) -> None:
+        """
+        Recompresses output data that was compressed with a compression dictionary, for records in dictionary form
+
+        See :meth:`remove_output_dictionaries`
+        """
+
+        outputs = []
+        for r in records:
+            if r is None:
+                continue
+            for h in r.get("compute_history") or []:
+                outputs.extend((h.get("outputs") or {}).values())
+
+        self.remove_output_dictionaries(outputs, session=session)
+
+    def train_output_dictionaries(
+        self,
+        output_types: Optional[Iterable[OutputTypeEnum]] = None,
+        programs: Optional[Iterable[str]] = None,
+        max_samples: int = 2000,
+        dictionary_size: int = 112640,
+        *,
+        session: Optional[Session] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Trains new versions of the dictionaries used for compressing outputs
+
+        A dictionary is trained for each output type and program (the creator in the provenance of the
+        computation), using the most recent outputs as samples. A new dictionary is only stored if the samples
+        compress better with it than how they are currently stored.
+
+        Existing outputs are not recompressed by this function (see :meth:`recompress_outputs`).
+
+        Parameters
+        ----------
+        output_types
+            Only train dictionaries for these output types. If None, train for all output types
+        programs
+            Only train dictionaries for these programs. If None, train for all programs
+        max_samples
+            Maximum number of outputs to use for training each dictionary
+        dictionary_size
+            Maximum size of each dictionary (in bytes)
+        session
+            An existing SQLAlchemy session to use. If None, one will be created. If an existing session
+            is used, it will be flushed (but not committed) before returning from this function.
+
+        Returns
+        -------
+        :
+            Information about the training of each dictionary, including whether a new dictionary was stored
+        """
+
+        compression_level = self._output_dictionary_compression_level
+
+        with self.root_socket.optional_session(session) as session:
+            stmt = select(OutputStoreORM.output_type, _output_program_column, func.count())
+            stmt = stmt.join(RecordComputeHistoryORM, RecordComputeHistoryORM.id == OutputStoreORM.history_id)
+            stmt = stmt.where(_output_program_column.is_not(None))
+
+            if output_types is not None:
+                stmt = stmt.where(OutputStoreORM.output_type.in_(output_types))
+            if programs is not None:
+                stmt = stmt.where(_output_program_column.in_([p.lower() for p in programs]))
+
+            stmt = stmt.group_by(OutputStoreORM.output_type, _output_program_column)
+            groups = sorted(session.execute(stmt).all())
+
+            all_info = []
+
+            for output_type, program, n_outputs in groups:
+                # Outputs that still have chunks are still being written to
+                stmt = select(OutputStoreORM.data, OutputStoreORM.compression_type, CompressionDictionaryORM.data)
+                stmt = stmt.join(RecordComputeHistoryORM, RecordComputeHistoryORM.id == OutputStoreORM.history_id)
+                stmt = stmt.join(
+                    CompressionDictionaryORM,
+                    CompressionDictionaryORM.id == OutputStoreORM.compression_dictionary_id,
+                    isouter=True,
+                )
+                stmt = stmt.where(OutputStoreORM.output_type == output_type)
+                stmt = stmt.where(_output_program_column == program)
+                stmt = stmt.where(~OutputStoreORM.chunks.any())
+                stmt = stmt.order_by(OutputStoreORM.id.desc())
+                stmt = stmt.limit(max_samples)
+
+                # Dictionaries are trained on the serialized data, since that is what is actually compressed
+                samples = []
+                compressed_size = 0
+                for data, ctype, old_dict_data in session.execute(stmt).all():
+                    old_dict = get_zstd_dictionary(old_dict_data) if old_dict_data is not None else None
+                    samples.append(msgpack.packb(decompress(data, ctype, old_dict), use_bin_type=True))
+                    compressed_size += len(data)
+
+                info = {
+                    "output_type": output_type,
+                    "program": program,
+                    "n_samples": len(samples),
+                    "samples_size": sum(len(x) for x in samples),
+                    "samples_compressed_size": compressed_size,
+                    "samples_dictionary_size": None,
+                    "id": None,
+                    "version": None,
+                    "message": None,
+                }
+                all_info.append(info)
+
+                try:
+                    dict_data = zstandard.train_dictionary(dictionary_size, samples, level=compression_level).as_bytes()
+                except zstandard.ZstdError as e:
+                    info["message"] = f"Unable to train dictionary: {str(e)}"
+                    continue
+
+                zstd_dict = get_zstd_dictionary(dict_data, compression_level)
+                cctx = zstandard.ZstdCompressor(level=compression_level, dict_data=zstd_dict)
+                info["samples_dictionary_size"] = sum(len(cctx.compress(x)) for x in samples)
+
+                if info["samples_dictionary_size"] >= compressed_size:
+                    info["message"] = "Dictionary does not improve compression"
+                    continue
+
+                stmt = select(func.max(CompressionDictionaryORM.version))
+                stmt = stmt.where(CompressionDictionaryORM.output_type == output_type)
+                stmt = stmt.where(CompressionDictionaryORM.program == program)
+                latest_version = session.execute(stmt).scalar_one_or_none()
+
+                dict_orm = CompressionDictionaryORM(
+                    output_type=output_type,
+                    program=program,
+                    version=1 if latest_version is None else latest_version + 1,
+                    compression_level=compression_level,
+                    data=dict_data,
+                    n_samples=info["n_samples"],
+                    samples_size=info["samples_size"],
+                    samples_compressed_size=info["samples_compressed_size"],
+                    samples_dictionary_size=info["samples_dictionary_size"],
+                )
+                session.add(dict_orm)
+                session.flush()
+
+                info["id"] = dict_orm.id
+                info["version"] = dict_orm.version
+
+                self._logger.info(
+                    f"Trained compression dictionary {dict_orm.id} for {output_type.value}/{program} "
+                    f"(version {dict_orm.version}) from {len(samples)} outputs: "
+                    f"{compressed_size} -> {info['samples_dictionary_size']} bytes"
+                )
+
+        return all_info
+
+    def recompress_outputs(
+        self, session: Session, job_progress: Optional[JobProgress] = None, batch_size: int = 250
+    ) -> int:
+        """
+        Recompresses existing outputs with the latest compression dictionaries
+
+        Outputs of a type and program that has a compression dictionary, but that were not compressed
+        with the latest version of that dictionary, are recompressed. Outputs that still have chunks appended to
+        them are skipped (they are recompressed when they are compacted). This is meant to be run as an
+        internal job. Outputs are processed in batches, with each batch being committed separately.
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session to use. This session will be periodically committed
+        job_progress
+            Object used to update the progress of the job, and to check if the job has been cancelled
+        batch_size
+            Number of outputs to recompress at once
+
+        Returns
+        -------
+        :
+            The number of outputs that were recompressed
+        """
+
+        dictionaries = self._get_output_dictionaries(session)
+
+        def _filter_stmt(stmt, dict_orm):
+            stmt = stmt.join(RecordComputeHistoryORM, RecordComputeHistoryORM.id == OutputStoreORM.history_id)
+            stmt = stmt.where(OutputStoreORM.output_type == dict_orm.output_type)
+            stmt = stmt.where(_output_program_column == dict_orm.program)
+            stmt = stmt.where(
+                or_(
+                    OutputStoreORM.compression_dictionary_id.is_(None),
+                    OutputStoreORM.compression_dictionary_id != dict_orm.id,
+                )
+            )
+            stmt = stmt.where(~OutputStoreORM.chunks.any())
+            return stmt
+
+        n_total = 0
+        for dict_orm in dictionaries.values():
+            n_total += session.execute(_filter_stmt(select(func.count(OutputStoreORM.id)), dict_orm)).scalar_one()
+
+        n_recompressed = 0
+
+        for dict_orm in dictionaries.values():
+            zstd_dict = get_zstd_dictionary(dict_orm.data, dict_orm.compression_level)
+            last_id = 0
+
+            while True:
+                if job_progress is not None:
+                    job_progress.raise_if_cancelled()
+
+                stmt = select(
+                    OutputStoreORM.id,
+                    OutputStoreORM.data,
+                    OutputStoreORM.compression_type,
+                    CompressionDictionaryORM.data,
+                )
+                stmt = stmt.join(
+                    CompressionDictionaryORM,
+                    CompressionDictionaryORM.id == OutputStoreORM.compression_dictionary_id,
+                    isouter=True,
+                )
+                stmt = _filter_stmt(stmt, dict_orm)
+                stmt = stmt.where(OutputStoreORM.id > last_id)
+                stmt = stmt.order_by(OutputStoreORM.id)
+                stmt = stmt.limit(batch_size)
+
+                # Outputs being modified (ie, compacted) at the same time are left for later
+                stmt = stmt.with_for_update(of=OutputStoreORM, skip_locked=True)
+
+                rows = session.execute(stmt).all()
+                if not rows:
+                    break
+
+                output_updates = []
+                for output_id, data, ctype, old_dict_data in rows:
+                    old_dict = get_zstd_dictionary(old_dict_data) if old_dict_data is not None else None
+                    new_data, new_ctype, new_level = compress(
+                        decompress(data, ctype, old_dict), CompressionEnum.zstd, dict_orm.compression_level, zstd_dict
+                    )
+
+                    output_updates.append(
+                        {
+                            "id": output_id,
+                            "data": new_data,
+                            "compression_type": new_ctype,
+                            "compression_level": new_level,
+                            "compression_dictionary_id": dict_orm.id,
+                        }
+                    )
+
+                session.execute(update(OutputStoreORM), output_updates)
+                session.commit()
+
+                last_id = rows[-1][0]
+                n_recompressed += len(rows)
+
+                if job_progress is not None:
+                    job_progress.update_progress(int(100 * min(n_recompressed / max(n_total, 1), 1.0)))
+
+        self._logger.info(f"Recompressed {n_recompressed} outputs with compression dictionaries")
+        return n_recompressed
+
+    def add_recompress_outputs_job(self, *, session: Optional[Session] = None) -> int:
+        """
+        Adds an internal job that recompresses outputs with the latest compression dictionaries
+
+        If such a job is already waiting, a new one is not added.
+
+        Returns
+        -------
+        :
+            ID of the internal job
+        """
+
+        return self.root_socket.internal_jobs.add(
+            name="recompress_outputs",
+            scheduled_date=now_at_utc(),
+            unique_name=True,
+            function="records.recompress_outputs",
+            kwargs={},
+            user_id=None,
+            session=session,
+        )
+
+    def recompress_cold_data(
+        self, session: Session, job_progress: Optional[JobProgress] = None, batch_size: int = 250
+    ) -> int:
+        """
+        Recompresses outputs and native files that have not been modified in a while
+
+        Compute managers may compress data with a fast, low compression level. Outputs and native files compressed
+        with zstd (or not compressed at all) at a level lower than the configured level are recompressed, once the
+        computation (for outputs) or the record (for native files) has not been modified for the configured amount
+        of time. Outputs are compressed with the latest compression dictionary for their type and program, if
+        there is one. Data compressed with lzma or with a compression dictionary is left alone, as are outputs that
+        still have chunks appended to them.
+
+        This is meant to be run as a periodic internal job. Data is processed in batches, with each batch
+        being committed separately.
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session to use. This session will be periodically committed
+        job_progress
+            Object used to update the progress of the job, and to check if the job has been cancelled
+        batch_size
+            Number of outputs or native files to recompress at once
+
+        Returns
+        -------
+        :
+            The number of outputs and native files that were recompressed
+        """
+
+        cutoff = now_at_utc() - timedelta(seconds=self._recompress_cold_data_age)
+        compression_level = self._recompress_cold_data_level
+        dictionaries = self._get_output_dictionaries(session)
+
+        def _filter_outputs(stmt):
+            stmt = stmt.join(RecordComputeHistoryORM, RecordComputeHistoryORM.id == OutputStoreORM.history_id)
+            stmt = stmt.where(RecordComputeHistoryORM.modified_on < cutoff)
+            stmt = stmt.where(OutputStoreORM.compression_dictionary_id.is_(None))
+            stmt = stmt.where(OutputStoreORM.compression_type != CompressionEnum.lzma)
+            stmt = stmt.where(OutputStoreORM.compression_level < compression_level)
+            stmt = stmt.where(~OutputStoreORM.chunks.any())
+            return stmt
+
+        def _filter_native_files(stmt):
+            stmt = stmt.join(BaseRecordORM, BaseRecordORM.id == NativeFileORM.record_id)
+            stmt = stmt.where(BaseRecordORM.modified_on < cutoff)
+            stmt = stmt.where(NativeFileORM.compression_type != CompressionEnum.lzma)
+            stmt = stmt.where(NativeFileORM.compression_level < compression_level)
+            return stmt
+
+        def _recompress_output(output_id, data, ctype, output_type, program):
+            dict_orm = dictionaries.get((output_type, program), None)
+            if dict_orm is None:
+                new_data, new_ctype, new_level = compress(
+                    decompress(data, ctype), CompressionEnum.zstd, compression_level
+                )
+                dict_id = None
+            else:
+                zstd_dict = get_zstd_dictionary(dict_orm.data, dict_orm.compression_level)
+                new_data, new_ctype, new_level = compress(
+                    decompress(data, ctype), CompressionEnum.zstd, dict_orm.compression_level, zstd_dict
+                )
+                dict_id = dict_orm.id
+
+            return {
+                "id": output_id,
+                "data": new_data,
+                "compression_type": new_ctype,
+                "compression_level": new_level,
+                "compression_dictionary_id": dict_id,
+            }
+
+        def _recompress_native_file(nf_id, data, ctype):
+            new_data, new_ctype, new_level = compress(decompress(data, ctype), CompressionEnum.zstd, compression_level)
+            return {"id": nf_id, "data": new_data, "compression_type": new_ctype, "compression_level": new_level}
+
+        output_stmt = select(
+            OutputStoreORM.id,
+            OutputStoreORM.data,
+            OutputStoreORM.compression_type,
+            OutputStoreORM.output_type,
+            _output_program_column,
+        )
+        native_file_stmt = select(NativeFileORM.id, NativeFileORM.data, NativeFileORM.compression_type)
+
+        to_recompress = [
+            (OutputStoreORM, _filter_outputs(output_stmt), _recompress_output),
+            (NativeFileORM, _filter_native_files(native_file_stmt), _recompress_native_file),
+        ]
+
+        n_total = session.execute(_filter_outputs(select(func.count(OutputStoreORM.id)))).scalar_one()
+        n_total += session.execute(_filter_native_files(select(func.count(NativeFileORM.id)))).scalar_one()
+
+        n_recompressed = 0
+
+        for orm_type, stmt, recompress_func in to_recompress:
+            last_id = 0
+
+            while True:
+                if job_progress is not None:
+                    job_progress.raise_if_cancelled()
+
+                batch_stmt = stmt.where(orm_type.id > last_id)
+                batch_stmt = batch_stmt.order_by(orm_type.id)
+                batch_stmt = batch_stmt.limit(batch_size)
+
+                # Data being modified at the same time is left for later
+                batch_stmt = batch_stmt.with_for_update(of=orm_type, skip_locked=True)
+
+                rows = session.execute(batch_stmt).all()
+                if not rows:
+                    break
+
+                session.execute(update(orm_type), [recompress_func(*row) for row in rows])
+                session.commit()
+
+                last_id = rows[-1][0]
+                n_recompressed += len(rows)
+
+                if job_progress is not None:
+                    job_progress.update_progress(int(100 * min(n_recompressed / max(n_total, 1), 1.0)))
+
+        self._logger.info(f"Recompressed {n_recompressed} cold outputs and native files")
+        return n_recompressed
+
     def update_completed_task(
         self, session: Session, record_id: int, record_type: str, result: AllResultTypes, manager_name: str
     ):
@@ -1059,40 +1772,83 @@ class RecordSocket:
             The manager that produced the result
         """
 
+        self.update_completed_tasks(session, record_type, [(record_id, result)], manager_name)
+
+    def update_completed_tasks(
+        self,
+        session: Session,
+        record_type: str,
+        results: Sequence[Tuple[int, AllResultTypes]],
+        manager_name: str,
+    ):
+        """
+        Update many record ORMs (of the same type) based on the results of successfully-completed computations
+
+        Compute history, outputs, native files, record updates, and deletions from the task queue
+        are done with multi-row statements rather than one round trip per record.
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session
+        record_type
+            Type of all the records to update
+        results
+            Tuples of (record id, result). The results should all be successful results
+        manager_name
+            The manager that produced the results
+        """
+
+        if not results:
+            return
+
+        record_ids = [record_id for record_id, _ in results]
+        type_results = [result for _, result in results]
+
         # Do these before calling the record-specific handler
         # (these may pull stuff out of extras)
-        history_orm = self.create_compute_history_entry(result)
-        history_orm.record_id = record_id
-        history_orm.manager_name = manager_name
-        session.add(history_orm)
+        history_orms: List[RecordComputeHistoryORM] = []
+        native_files_orms: List[NativeFileORM] = []
 
-        native_files_orms = self.create_native_files_orms(result)
-        for v in native_files_orms.values():
-            v.record_id = record_id
-            session.add(v)
+        for record_id, result in results:
+            history_orm = self.create_compute_history_entry(result)
+            history_orm.record_id = record_id
+            history_orm.manager_name = manager_name
+            history_orms.append(history_orm)
 
-        # Now update fields specific to each record
-        record_socket = self._handler_map[record_type]
-        record_socket.update_completed_task(session, record_id, result)
+            for nf_orm in self.create_native_files_orms(result).values():
+                nf_orm.record_id = record_id
+                native_files_orms.append(nf_orm)
 
-        # Now extras and properties
-        extras, properties = build_extras_properties(result)
+        # Compute history (and outputs) and native files are inserted in bulk on flush
+        session.add_all(history_orms)
+        session.add_all(native_files_orms)
 
-        # What updates we have for this record
-        record_updates = {
-            "extras": extras,
-            "properties": properties,
-            "status": RecordStatusEnum.complete,
-            "manager_name": manager_name,
-            "modified_on": history_orm.modified_on,
-        }
+        # Now update fields specific to each record
+        record_socket = self._handler_map[record_type]
+        record_socket.update_completed_tasks(session, record_ids, type_results)
+
+        # What updates we have for each record (extras & properties + common fields)
+        record_updates = []
+        for record_id, result, history_orm in zip(record_ids, type_results, history_orms):
+            extras, properties = build_extras_properties(result)
+
+            record_updates.append(
+                {
+                    "id": record_id,
+                    "extras": extras,
+                    "properties": properties,
+                    "status": RecordStatusEnum.complete,
+                    "manager_name": manager_name,
+                    "modified_on": history_orm.modified_on,
+                }
+            )
 
-        # Actually update the record
-        stmt = update(BaseRecordORM).where(BaseRecordORM.id == record_id).values(record_updates)
-        session.execute(stmt)
+        # Actually update the records (bulk update by primary key)
+        session.execute(update(BaseRecordORM), record_updates)
 
-        # Delete the task from the task queue since it is completed
-        stmt = delete(TaskQueueORM).where(TaskQueueORM.record_id == record_id)
+        # Delete the tasks from the task queue since they are completed
+        stmt = delete(TaskQueueORM).where(TaskQueueORM.record_id.in_(record_ids))
         session.execute(stmt)
 
     def update_failed_task(self, session: Session, record_id: int, failed_result: FailedOperation, manager_name: str):
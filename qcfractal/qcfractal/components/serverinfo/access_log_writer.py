@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING
+
+from sqlalchemy import insert
+
+from .db_models import AccessLogORM
+
+if TYPE_CHECKING:
+    from qcfractal.db_socket.socket import SQLAlchemySocket
+    from typing import Dict, Any, List
+
+
+# All the columns that can be specified when logging an access. Entries are all given the same
+# columns, so that they can be inserted with a single multi-row insert
+_access_log_columns = (
+    "timestamp",
+    "method",
+    "module",
+    "full_uri",
+    "request_duration",
+    "request_bytes",
+    "response_bytes",
+    "request_bytes_uncompressed",
+    "response_bytes_uncompressed",
+    "user_id",
+    "ip_address",
+    "user_agent",
+)
+
+# Minimum time (in seconds) between warnings about dropped entries
+_drop_warning_interval = 60.0
+
+
+class AccessLogWriter:
+    """
+    Buffers access log entries in memory, writing them to the database in batches
+
+    Entries are written by a background thread, either periodically (every ``flush_frequency`` seconds)
+    or when ``batch_size`` entries are waiting to be written. If the database can't keep up and more than
+    ``max_buffered`` entries are waiting, new entries are dropped (and counted) rather than slowing down requests.
+    A warning is logged when entries start being dropped, and then at most every minute while they still are.
+    """
+
+    def __init__(self, root_socket: SQLAlchemySocket, flush_frequency: float, batch_size: int, max_buffered: int):
+        self.root_socket = root_socket
+        self._logger = logging.getLogger(__name__)
+
+        self._flush_frequency = flush_frequency
+        self._batch_size = batch_size
+        self._max_buffered = max_buffered
+
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+
+        # Counters
+        self._n_logged = 0  # Entries added to the buffer
+        self._n_written = 0  # Entries written to the database
+        self._n_dropped = 0  # Entries dropped because the buffer was full
+        self._n_failed = 0  # Entries that could not be written to the database
+        self._n_flushes = 0  # Number of times the buffer was written
+
+        # When we last warned about dropped entries (time.monotonic())
+        self._last_drop_warning = None
+
+        # _flush_event is set when a batch is ready to be written
+        # _th_cancel is set when we want the writing thread to end
+        self._flush_event = threading.Event()
+        self._th_cancel = threading.Event()
+        self._th = threading.Thread(
+            target=self._writer_thread, args=(self._flush_event, self._th_cancel), name="access_log_writer", daemon=True
+        )
+
+        self._th.start()
+
+        # Create the finalizer that will stop the writing thread (writing any remaining entries)
+        self._finalizer = weakref.finalize(self, self._stop_thread, self._flush_event, self._th_cancel, self._th)
+
+    def _writer_thread(self, flush_event: threading.Event, end_thread: threading.Event):
+        while not end_thread.is_set():
+            flush_event.wait(self._flush_frequency)
+            flush_event.clear()
+            self.flush()
+
+        # Write anything left over
+        self.flush()
+
+    @staticmethod
+    def _stop_thread(flush_event: threading.Event, cancel_event: threading.Event, thread: threading.Thread):
+        ####################################################################################
+        # This is written as a class method so that it can be called by a weakref finalizer
+        ####################################################################################
+
+        cancel_event.set()
+        flush_event.set()
+        thread.join()
+
+    def stop(self):
+        """
+        Stops the background thread, writing any entries still in the buffer
+        """
+
+        self._finalizer()
+
+    def add(self, log_data: Dict[str, Any]) -> None:
+        """
+        Adds an access log entry to the buffer
+        """
+
+        row = {k: log_data.get(k, None) for k in _access_log_columns}
+
+        warn_dropped = None
+
+        with self._lock:
+            if len(self._buffer) >= self._max_buffered:
+                self._n_dropped += 1
+
+                now = time.monotonic()
+                if self._last_drop_warning is None or now - self._last_drop_warning >= _drop_warning_interval:
+                    self._last_drop_warning = now
+                    warn_dropped = self._n_dropped
+
+                n_buffered = None
+            else:
+                self._buffer.append(row)
+                self._n_logged += 1
+                n_buffered = len(self._buffer)
+
+        if warn_dropped is not None:
+            self._logger.warning(
+                f"Access log buffer is full ({self._max_buffered} entries waiting to be written). "
+                f"Dropping access log entries ({warn_dropped} dropped so far)"
+            )
+
+        if n_buffered is not None and n_buffered >= self._batch_size:
+            self._flush_event.set()
+
+    def flush(self) -> int:
+        """
+        Writes all entries in the buffer to the database
+
+        Returns
+        -------
+        :
+            The number of entries written
+        """
+
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+
+        if not rows:
+            return 0
+
+        try:
+            with self.root_socket.session_scope() as session:
+                session.execute(insert(AccessLogORM), rows)
+        except Exception as e:
+            self._logger.error(f"Unable to write {len(rows)} access log entries: {str(e)}")
+            with self._lock:
+                self._n_failed += len(rows)
+            return 0
+
+        with self._lock:
+            self._n_written += len(rows)
+            self._n_flushes += 1
+
+        return len(rows)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters of the entries handled by this writer
+        """
+
+        with self._lock:
+            return {
+                "logged": self._n_logged,
+                "written": self._n_written,
+                "dropped": self._n_dropped,
+                "failed": self._n_failed,
+                "flushes": self._n_flushes,
+                "buffered": len(self._buffer),
+            }
@@ -36,6 +36,10 @@ class AccessLogORM(BaseORM):
     request_bytes = Column(BigInteger, nullable=False)
     response_bytes = Column(BigInteger, nullable=False)
 
+    # Sizes before compression (null if unknown)
+    request_bytes_uncompressed = Column(BigInteger, nullable=True)
+    response_bytes_uncompressed = Column(BigInteger, nullable=True)
+
     user_id = Column(Integer, ForeignKey(UserORM.id), nullable=True)
 
     user = relationship(
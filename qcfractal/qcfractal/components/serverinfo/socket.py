@@ -6,6 +6,7 @@ import logging
 import os
 import re
 import tarfile
+import threading
 from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import TYPE_CHECKING
@@ -23,6 +24,7 @@ from qcportal.serverinfo import (
     ErrorLogQueryFilters,
 )
 from qcportal.utils import now_at_utc
+from .access_log_writer import AccessLogWriter
 from .db_models import AccessLogORM, InternalErrorLogORM, MessageOfTheDayORM, ServerStatsMetadataORM
 
 if TYPE_CHECKING:
@@ -59,6 +61,14 @@ class ServerInfoSocket:
         self._access_log_enabled = root_socket.qcf_config.log_access
         self._delete_access_log_frequency = 60 * 60 * 24  # one day
         self._access_log_keep = root_socket.qcf_config.access_log_keep
+
+        # Access log entries are buffered and written in batches by a writer (and its thread). This is created
+        # when first needed, so that only processes actually handling requests have one
+        self._access_log_flush_frequency = root_socket.qcf_config.access_log_flush_frequency
+        self._access_log_batch_size = root_socket.qcf_config.access_log_batch_size
+        self._access_log_max_buffered = root_socket.qcf_config.access_log_max_buffered
+        self._access_log_writer: Optional[AccessLogWriter] = None
+        self._access_log_writer_lock = threading.Lock()
         self._geoip2_enabled = geoip2_found and self._access_log_enabled
 
         # MOTD contents
@@ -324,6 +334,9 @@ class ServerInfoSocket:
         """
         Saves information about a request/access to the database
 
+        Unless the access log flush frequency is 0 or an existing session is given, the entry is buffered
+        and written to the database later (in a batch with other entries).
+
         Parameters
         ----------
         log_data
@@ -333,10 +346,54 @@ class ServerInfoSocket:
             is used, it will be flushed (but not committed) before returning from this function.
         """
 
+        if session is None and self._access_log_flush_frequency > 0:
+            # Store the time of the access, not the time the entry is written
+            log_data = {"timestamp": now_at_utc(), **log_data}
+            self._get_access_log_writer().add(log_data)
+            return
+
         with self.root_socket.optional_session(session) as session:
             log = AccessLogORM(**log_data)
             session.add(log)
 
+    def _get_access_log_writer(self) -> AccessLogWriter:
+        with self._access_log_writer_lock:
+            if self._access_log_writer is None:
+                self._access_log_writer = AccessLogWriter(
+                    self.root_socket,
+                    self._access_log_flush_frequency,
+                    self._access_log_batch_size,
+                    self._access_log_max_buffered,
+                )
+            return self._access_log_writer
+
+    def flush_access_log(self) -> int:
+        """
+        Writes any buffered access log entries to the database
+
+        Returns
+        -------
+        :
+            The number of entries written
+        """
+
+        if self._access_log_writer is None:
+            return 0
+        return self._access_log_writer.flush()
+
+    def get_access_log_writer_stats(self) -> Dict[str, int]:
+        """
+        Returns counters for the buffered access log entries handled by this process
+
+        This includes the number of entries logged, written, dropped (because the buffer was full),
+        and failed (could not be written to the database), as well as the number of batches written and
+        the number of entries currently waiting to be written.
+        """
+
+        if self._access_log_writer is None:
+            return {"logged": 0, "written": 0, "dropped": 0, "failed": 0, "flushes": 0, "buffered": 0}
+        return self._access_log_writer.stats
+
     def save_error(self, error_data: Dict[str, Any], *, session: Optional[Session] = None) -> int:
         """
         Saves information about an internal error to the database
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, List
 
 from qcarchivetesting import test_users
 from qcarchivetesting.testing_classes import QCATestingSnowflake
+from qcportal.molecules import Molecule
+from qcportal.serialization import serialize, deserialize
 from qcportal.utils import now_at_utc
 
 if TYPE_CHECKING:
@@ -78,6 +81,31 @@ def test_serverinfo_client_access_not_logged(postgres_server, pytestconfig):
         assert len(list(query_res)) == 0
 
 
+def test_serverinfo_client_access_buffered(postgres_server, pytestconfig):
+    pg_harness = postgres_server.get_new_harness("serverinfo_client_access_buffered")
+    encoding = pytestconfig.getoption("--client-encoding")
+
+    extra_config = {"access_log_flush_frequency": 0.5}
+    with QCATestingSnowflake(pg_harness, encoding, extra_config=extra_config) as server:
+        client = server.client()
+
+        time_0 = now_at_utc()
+        client.query_molecules(molecular_formula=["C"])
+        client.get_molecules([123], missing_ok=True)
+
+        # Entries are written periodically, in the background
+        for _ in range(50):
+            accesses = [x for x in client.query_access_log(after=time_0) if x.full_uri.startswith("/api/v1/molecules")]
+            if len(accesses) >= 2:
+                break
+            time.sleep(0.1)
+
+        assert [x.full_uri for x in accesses] == ["/api/v1/molecules/bulkGet", "/api/v1/molecules/query"]
+
+        # Timestamps are from when the request was made, not when it was written
+        assert accesses[1].timestamp < accesses[0].timestamp
+
+
 def test_serverinfo_client_access_delete(snowflake_client: PortalClient):
     time_0 = now_at_utc()
     snowflake_client.query_access_log()
@@ -106,3 +134,48 @@ def test_serverinfo_client_access_delete(snowflake_client: PortalClient):
     # All of the above generated accesses!
     n_deleted = snowflake_client.delete_access_log(now_at_utc())
     assert n_deleted == 7
+
+
+def test_serverinfo_client_access_compression(snowflake_client: PortalClient):
+    # Enough molecules to fill a single request
+    n_mol = min(snowflake_client.api_limits["get_molecules"], snowflake_client.api_limits["add_molecules"])
+    molecules = [
+        Molecule(symbols=["he"] * 20, geometry=[[0, 0, 2.0 * j + 0.01 * i] for j in range(20)]) for i in range(n_mol)
+    ]
+
+    time_0 = now_at_utc()
+    _, mol_ids = snowflake_client.add_molecules(molecules)
+    snowflake_client.make_request("post", "api/v1/molecules/bulkGet", List[Molecule], body={"ids": mol_ids})
+
+    # Small requests/responses are not compressed
+    snowflake_client.get_molecules(mol_ids[0])
+
+    # Don't compress requests
+    snowflake_client.compress_request_min_size = None
+    snowflake_client.add_molecules(molecules)
+
+    accesses = list(snowflake_client.query_access_log(after=time_0))
+    assert [x.full_uri for x in accesses] == [
+        "/api/v1/molecules/bulkCreate",
+        "/api/v1/molecules/bulkGet",
+        "/api/v1/molecules/bulkGet",
+        "/api/v1/molecules/bulkCreate",
+    ]
+
+    add_nocompress, get_small, get_large, add_compress = accesses
+
+    assert add_compress.request_bytes < add_compress.request_bytes_uncompressed
+    assert get_large.response_bytes < get_large.response_bytes_uncompressed
+    assert get_small.response_bytes == get_small.response_bytes_uncompressed
+    assert add_nocompress.request_bytes == add_nocompress.request_bytes_uncompressed
+    assert add_nocompress.request_bytes == add_compress.request_bytes_uncompressed
+
+    # Fallback to gzip if the client doesn't accept zstd
+    r = snowflake_client._request(
+        "post",
+        "api/v1/molecules/bulkGet",
+        body=serialize({"ids": mol_ids}, snowflake_client.encoding),
+        additional_headers={"Accept-Encoding": "gzip"},
+    )
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert len(deserialize(r.content, r.headers["Content-Type"])) == len(mol_ids)
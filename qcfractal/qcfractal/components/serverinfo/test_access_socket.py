@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import ipaddress
+import time
+from typing import TYPE_CHECKING
 
 import pytest
 
 from qcarchivetesting import load_ip_test_data, ip_tests_enabled
 from qcarchivetesting.testing_classes import QCATestingSnowflake
+from qcfractal.components.serverinfo.access_log_writer import AccessLogWriter
 from qcportal.serverinfo.models import AccessLogQueryFilters
 from qcportal.utils import now_at_utc
 
+if TYPE_CHECKING:
+    from qcfractal.db_socket import SQLAlchemySocket
+
 # First part of the tuple is the ip address
 # second is the range, as stored in the MaxMind test JSON file
 test_ips = [
@@ -165,3 +171,69 @@ def test_serverinfo_socket_save_access(secure_snowflake: QCATestingSnowflake):
                 assert ac_db["ip_lat"] == ip_ref_data["location"]["latitude"]
             if ac_db.get("ip_long") is not None:
                 assert ac_db["ip_long"] == ip_ref_data["location"]["longitude"]
+
+
+def test_serverinfo_socket_access_log_writer(storage_socket: SQLAlchemySocket, caplog):
+    time_0 = now_at_utc()
+
+    access = {
+        "module": "api",
+        "method": "GET",
+        "full_uri": "/api/v1/information",
+        "request_duration": 0.01,
+        "request_bytes": 0,
+        "response_bytes": 1234,
+    }
+
+    # Long flush frequency - only written when the batch is full, or explicitly flushed
+    writer = AccessLogWriter(storage_socket, flush_frequency=3600, batch_size=5, max_buffered=8)
+
+    try:
+        for i in range(3):
+            writer.add({**access, "timestamp": now_at_utc(), "request_bytes": i})
+
+        assert writer.stats["buffered"] == 3
+        assert storage_socket.serverinfo.query_access_log(AccessLogQueryFilters(after=time_0)) == []
+
+        n_written = writer.flush()
+        assert n_written == 3
+        assert writer.stats["written"] == 3
+        assert writer.stats["flushes"] == 1
+
+        accesses = storage_socket.serverinfo.query_access_log(AccessLogQueryFilters(after=time_0))
+        assert sorted(x["request_bytes"] for x in accesses) == [0, 1, 2]
+
+        # Filling the batch wakes up the writing thread
+        for i in range(5):
+            writer.add(access)
+
+        for _ in range(100):
+            if writer.stats["written"] == 8:
+                break
+            time.sleep(0.05)
+
+        assert writer.stats["written"] == 8
+        assert writer.stats["flushes"] == 2
+
+        # Entries are dropped if too many are waiting to be written
+        with writer._lock:
+            for i in range(10):
+                writer._buffer.append(dict(access))
+        writer.add(access)
+
+        assert writer.stats["dropped"] == 1
+        assert writer.stats["logged"] == 8
+
+        # Warned when entries start being dropped, but not for every dropped entry
+        writer.add(access)
+        assert writer.stats["dropped"] == 2
+        drop_warnings = [x for x in caplog.records if "Dropping access log entries" in x.getMessage()]
+        assert len(drop_warnings) == 1
+        assert drop_warnings[0].levelname == "WARNING"
+    finally:
+        # Remaining entries are written when stopping
+        writer.stop()
+
+    assert writer.stats["written"] == 18
+    assert writer.stats["buffered"] == 0
+    assert len(storage_socket.serverinfo.query_access_log(AccessLogQueryFilters(after=time_0))) == 18
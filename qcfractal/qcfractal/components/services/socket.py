@@ -1,18 +1,25 @@
 from __future__ import annotations
 
 import logging
+import math
+import time
 import traceback
 from typing import TYPE_CHECKING
 
-from sqlalchemy import select, update, or_
+from sqlalchemy import select, update, or_, func
 from sqlalchemy.dialects.postgresql import array_agg
 from sqlalchemy.orm import contains_eager, aliased, defer, selectinload, joinedload, load_only, lazyload
 
+from qcfractal import metrics
+from qcfractal.components.managers.db_models import ComputeManagerORM
+from qcfractal.components.optimization.record_db_models import OptimizationRecordORM
 from qcfractal.components.record_db_models import BaseRecordORM, RecordComputeHistoryORM
+from qcfractal.components.singlepoint.record_db_models import SinglepointRecordORM
 from qcfractal.db_socket.helpers import (
     get_count,
 )
 from qcportal.generic_result import GenericTaskResult
+from qcportal.managers import ManagerStatusEnum
 from qcportal.metadata_models import InsertMetadata
 from qcportal.record_models import PriorityEnum, RecordStatusEnum, OutputTypeEnum
 from qcportal.utils import now_at_utc
@@ -22,7 +29,7 @@ from ..record_socket import BaseRecordSocket
 if TYPE_CHECKING:
     from sqlalchemy.orm.session import Session
     from qcfractal.db_socket.socket import SQLAlchemySocket
-    from typing import List, Dict, Tuple, Optional, Any, Union, Sequence
+    from typing import List, Dict, Tuple, Optional, Any, Union, Sequence, Iterable
 
 
 class ServiceSocket:
@@ -34,6 +41,8 @@ class ServiceSocket:
         self.root_socket = root_socket
         self._logger = logging.getLogger(__name__)
         self._max_active_services = root_socket.qcf_config.max_active_services
+        self._adaptive_max_active_services = root_socket.qcf_config.adaptive_max_active_services
+        self._adaptive_queue_factor = root_socket.qcf_config.adaptive_service_queue_factor
         self._service_frequency = root_socket.qcf_config.service_frequency
 
         with self.root_socket.session_scope() as session:
@@ -57,10 +66,100 @@ class ServiceSocket:
         service_orm.record.modified_on = now_at_utc()
         session.delete(service_orm)
 
+        # Merge the outputs (stdout) that were appended to while the service was running
+        self.root_socket.records.compact_outputs(session, service_orm.record)
+
         session.commit()
         self.root_socket.notify_finished_watch(service_orm.record_id, RecordStatusEnum.complete)
 
-    def _iterate_service(self, session: Session, service_id: int) -> bool:
+    def _queue_service_iteration(self, session: Session, service_id: int, initialize: bool = False) -> int:
+        """
+        Adds an internal job to iterate a service
+
+        If a job to iterate the service is already waiting, a new one is not added.
+        Adding the job notifies the internal job runners (once the session is committed).
+
+        If initialize is True, the service is initialized before its first iteration.
+
+        Returns
+        -------
+        :
+            ID of the internal job
+        """
+
+        kwargs = {"service_id": service_id}
+        if initialize:
+            kwargs["initialize"] = True
+
+        return self.root_socket.internal_jobs.add(
+            name=f"iterate_service_{service_id}",
+            scheduled_date=now_at_utc(),
+            unique_name=True,
+            function="services._iterate_service",
+            kwargs=kwargs,
+            user_id=None,
+            session=session,
+        )
+
+    def queue_ready_services(self, session: Session, completed_record_ids: Iterable[int]) -> List[int]:
+        """
+        Queues iteration of running services for which the given records were the last outstanding dependencies
+
+        This is called when tasks are returned by managers, so services can iterate as soon as their
+        dependencies are complete rather than waiting for the periodic check in :meth:`iterate_services`
+        (which remains as a safety net, and handles services with errored dependencies).
+
+        The check should be done after the status of the completed records has been committed. That way,
+        if the last dependencies of a service are completed concurrently, at least one of the checks will
+        see all the dependencies as complete.
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session to use. The internal jobs are added to this session, but not committed
+        completed_record_ids
+            IDs of records that have just been completed
+
+        Returns
+        -------
+        :
+            IDs of the services that were queued for iteration
+        """
+
+        completed_record_ids = list(completed_record_ids)
+        if not completed_record_ids:
+            return []
+
+        # Any dependency of the same service that isn't complete yet
+        a_dep = aliased(ServiceDependencyORM)
+        a_br_dep = aliased(BaseRecordORM)
+        outstanding = (
+            select(a_dep.id)
+            .join(a_br_dep, a_br_dep.id == a_dep.record_id)
+            .where(a_dep.service_id == ServiceDependencyORM.service_id)
+            .where(a_br_dep.status != RecordStatusEnum.complete)
+            .exists()
+        )
+
+        stmt = (
+            select(ServiceDependencyORM.service_id)
+            .distinct()
+            .join(ServiceQueueORM, ServiceQueueORM.id == ServiceDependencyORM.service_id)
+            .join(BaseRecordORM, BaseRecordORM.id == ServiceQueueORM.record_id)
+            .where(ServiceDependencyORM.record_id.in_(completed_record_ids))
+            .where(BaseRecordORM.status == RecordStatusEnum.running)
+            .where(~outstanding)
+        )
+
+        service_ids = session.execute(stmt).scalars().all()
+
+        for service_id in service_ids:
+            job_id = self._queue_service_iteration(session, service_id)
+            self._logger.debug(f"Internal job {job_id} for service {service_id} queued - dependencies complete")
+
+        return service_ids
+
+    def _iterate_service(self, session: Session, service_id: int, initialize: bool = False) -> bool:
         """
         Iterate a single service given its service id
 
@@ -70,6 +169,8 @@ class ServiceSocket:
             An existing SQLAlchemy session to use. This session will be committed at the end of this function
         service_id
             ID of the service to iterate (not the record ID)
+        initialize
+            If True, the service was just started, and is initialized before being iterated for the first time
 
         Returns
         -------
@@ -79,7 +180,11 @@ class ServiceSocket:
 
         stmt = select(ServiceQueueORM)
         stmt = stmt.options(selectinload(ServiceQueueORM.record))
-        stmt = stmt.options(selectinload(ServiceQueueORM.dependencies))
+        stmt = stmt.options(
+            selectinload(ServiceQueueORM.dependencies)
+            .selectinload(ServiceDependencyORM.record)
+            .selectin_polymorphic([OptimizationRecordORM, SinglepointRecordORM])
+        )
         stmt = stmt.where(ServiceQueueORM.id == service_id)
         stmt = stmt.with_for_update()
 
@@ -99,37 +204,113 @@ class ServiceSocket:
             )
             return False
 
-        # Call record-dependent iterate service
-        # If that function returns 0, indicating that the service has successfully completed
-        # Handle cleanup if there is an error
-        try:
-            self._logger.debug(
-                f"Record {service_orm.record_id} (service {service_orm.id}) has all tasks completed. Iterating..."
-            )
-            completed = self.root_socket.records.iterate_service(session, service_orm)
-            service_orm.record.modified_on = now_at_utc()
-        except Exception as err:
-            session.rollback()
+        # Only used for metrics. Read now, since the ORM is expired on rollback
+        record_type = service_orm.record.record_type
 
-            error = {
-                "error_type": "service_iteration_error",
-                "error_message": "Error iterating service: " + str(err) + "\n" + traceback.format_exc(),
-            }
+        with metrics.service_iteration_duration.time(record_type=record_type):
+            if initialize:
+                try:
+                    self.root_socket.records.initialize_service(session, service_orm)
+                except Exception as err:
+                    session.rollback()
 
-            self.root_socket.records.update_failed_service(session, service_orm.record, error)
-            session.commit()
-            self.root_socket.notify_finished_watch(service_orm.record_id, RecordStatusEnum.error)
+                    error = {
+                        "error_type": "service_initialization_error",
+                        "error_message": "Error in initialization of service: "
+                        + str(err)
+                        + "\n"
+                        + traceback.format_exc(),
+                    }
 
-            return True
+                    self.root_socket.records.update_failed_service(session, service_orm.record, error)
+                    session.commit()
+                    self.root_socket.notify_finished_watch(service_orm.record_id, RecordStatusEnum.error)
 
-        if completed:
-            # Will commit inside this function
-            self.mark_service_complete(session, service_orm)
-            return True
-        else:
-            # Commit the changes
-            session.commit()
-            return False
+                    return True
+
+            # Call record-dependent iterate service
+            # If that function returns 0, indicating that the service has successfully completed
+            # Handle cleanup if there is an error
+            try:
+                self._logger.debug(
+                    f"Record {service_orm.record_id} (service {service_orm.id}) has all tasks completed. Iterating..."
+                )
+                completed = self.root_socket.records.iterate_service(session, service_orm)
+                service_orm.record.modified_on = now_at_utc()
+            except Exception as err:
+                session.rollback()
+
+                error = {
+                    "error_type": "service_iteration_error",
+                    "error_message": "Error iterating service: " + str(err) + "\n" + traceback.format_exc(),
+                }
+
+                self.root_socket.records.update_failed_service(session, service_orm.record, error)
+                session.commit()
+                self.root_socket.notify_finished_watch(service_orm.record_id, RecordStatusEnum.error)
+
+                return True
+
+            if completed:
+                # Will commit inside this function
+                self.mark_service_complete(session, service_orm)
+                return True
+            else:
+                # Commit the changes
+                session.commit()
+                return False
+
+    def _get_new_service_count(self, session: Session, running_count: int) -> int:
+        """
+        Determines how many new services should be started
+
+        Up to max_active_services services are always allowed to be running. Beyond that (up to
+        adaptive_max_active_services), services are only started if there are not enough waiting tasks to
+        keep the compute managers busy.
+
+        What the compute managers can handle is estimated from the number of tasks they are currently
+        running (counting at least one for each active manager). We try to keep adaptive_service_queue_factor
+        times that many tasks waiting. How many tasks a new service will create is estimated from the
+        services that are already running.
+        """
+
+        new_service_count = self._max_active_services - running_count
+
+        max_adaptive_count = self._adaptive_max_active_services - running_count
+        if max_adaptive_count <= max(new_service_count, 0):
+            return new_service_count
+
+        stmt = select(func.count(), func.coalesce(func.sum(ComputeManagerORM.active_tasks), 0))
+        stmt = stmt.where(ComputeManagerORM.status == ManagerStatusEnum.active)
+        n_managers, n_running_tasks = session.execute(stmt).one()
+
+        if n_managers == 0:
+            return new_service_count
+
+        target_waiting = self._adaptive_queue_factor * max(n_running_tasks, n_managers)
+        n_waiting = sum(x["n_waiting"] for x in self.root_socket.tasks.get_queue_depth(session=session))
+
+        if n_waiting >= target_waiting:
+            return new_service_count
+
+        # Number of dependencies (tasks) of running services, per service
+        a_br_svc = aliased(BaseRecordORM)
+        stmt = select(func.count())
+        stmt = stmt.select_from(ServiceDependencyORM)
+        stmt = stmt.join(ServiceQueueORM, ServiceQueueORM.id == ServiceDependencyORM.service_id)
+        stmt = stmt.join(a_br_svc, a_br_svc.id == ServiceQueueORM.record_id)
+        stmt = stmt.where(a_br_svc.status == RecordStatusEnum.running)
+        n_dependencies = session.execute(stmt).scalar_one()
+
+        tasks_per_service = max(n_dependencies / running_count, 1.0) if running_count > 0 else 1.0
+        adaptive_count = min(math.ceil((target_waiting - n_waiting) / tasks_per_service), max_adaptive_count)
+
+        self._logger.info(
+            f"{n_waiting} waiting tasks for {n_managers} managers running {n_running_tasks} tasks. "
+            f"Allowing {adaptive_count} new services (estimated {tasks_per_service:.1f} tasks per service)"
+        )
+
+        return max(new_service_count, adaptive_count)
 
     def iterate_services(self, session: Session) -> int:
         """
@@ -155,6 +336,8 @@ class ServiceSocket:
 
         self._logger.info("Iterating on services")
 
+        start = time.perf_counter()
+
         #
         # A CTE that contains just service id and all the statuses as an array
         #
@@ -226,16 +409,7 @@ class ServiceSocket:
 
         # Add an internal job for each completed service, calling the internal function
         for service_id in service_ids:
-            jobname = f"iterate_service_{service_id}"
-            job_id = self.root_socket.internal_jobs.add(
-                name=jobname,
-                scheduled_date=now_at_utc(),
-                unique_name=True,
-                function="services._iterate_service",
-                kwargs={"service_id": service_id},
-                user_id=None,
-                session=session,
-            )
+            job_id = self._queue_service_iteration(session, service_id)
             self._logger.debug(f"Internal job {job_id} for service {service_id} queued")
 
             # Commit after each one to allow it to be picked up by an internal job worker
@@ -251,15 +425,11 @@ class ServiceSocket:
 
         self._logger.info(f"After iteration, now {running_count} running services. Max is {self._max_active_services}")
 
-        while True:
-            # Start up to 10 services at a time until we are full
-            new_service_count = min(10, self._max_active_services - running_count)
-
-            # we could possibly have a negative number here if the max active services was lowered or
-            # something weird was done manually, services restarted, etc
-            if new_service_count <= 0:
-                break
+        # we could possibly have a negative number here if the max active services was lowered or
+        # something weird was done manually, services restarted, etc
+        new_service_count = self._get_new_service_count(session, running_count)
 
+        if new_service_count > 0:
             stmt = (
                 select(ServiceQueueORM)
                 .join(ServiceQueueORM.record)
@@ -270,13 +440,11 @@ class ServiceSocket:
             )
 
             new_services = session.execute(stmt).scalars().all()
-
-            # No more services available to be started
-            if len(new_services) == 0:
-                break
-
             running_count += len(new_services)
 
+            # Services that need to be initialized (rather than being restarted)
+            to_initialize: List[int] = []
+
             for service_orm in new_services:
                 now = now_at_utc()
                 service_orm.record.modified_on = now
@@ -311,41 +479,22 @@ class ServiceSocket:
                         f"\nRestarting service: {service_orm.record.record_type} at {now}",
                     )
 
-                session.commit()
+                if fresh_start:
+                    to_initialize.append(service_orm.id)
 
-                try:
-                    if fresh_start:
-                        self.root_socket.records.initialize_service(session, service_orm)
-
-                        jobname = f"iterate_service_{service_orm.id}"
-                        job_id = self.root_socket.internal_jobs.add(
-                            name=jobname,
-                            scheduled_date=now_at_utc(),
-                            unique_name=True,
-                            function="services._iterate_service",
-                            kwargs={"service_id": service_orm.id},
-                            user_id=None,
-                            session=session,
-                        )
-                        self._logger.debug(
-                            f"Internal job {job_id} for service {service_orm.id} queued - first iteration"
-                        )
-                        session.commit()
+            session.commit()
 
-                except Exception as err:
-                    session.rollback()
+            # Initialization (and the first iteration) is done in an internal job for each service.
+            # That way, starting many services is spread across all the internal job runners
+            for service_id in to_initialize:
+                job_id = self._queue_service_iteration(session, service_id, initialize=True)
+                self._logger.debug(f"Internal job {job_id} for service {service_id} queued - initialization")
 
-                    import traceback
+            session.commit()
 
-                    traceback.print_exc()
-                    error = {
-                        "error_type": "service_initialization_error",
-                        "error_message": "Error in initialization/iteration of service: " + str(err),
-                    }
+            self._logger.info(f"Started {len(new_services)} services ({len(to_initialize)} to be initialized)")
 
-                    self.root_socket.records.update_failed_service(session, service_orm.record, error)
-                    session.commit()
-                    self.root_socket.notify_finished_watch(service_orm.record_id, RecordStatusEnum.error)
+        metrics.service_sweep_duration.observe(time.perf_counter() - start)
 
         return running_count
 
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import logging
+from contextlib import contextmanager
 from typing import TYPE_CHECKING
 
 from qcelemental.models import FailedOperation
+from sqlalchemy import select
 
 from qcfractal.components.gridoptimization.testing_helpers import (
     submit_test_data as submit_go_test_data,
 )
+from qcfractal.components.internal_jobs.db_models import InternalJobORM
+from qcfractal.components.manybody.testing_helpers import (
+    submit_test_data as submit_mb_test_data,
+    generate_task_key as generate_mb_task_key,
+)
 from qcfractal.components.record_db_models import BaseRecordORM
 from qcfractal.components.torsiondrive.record_db_models import TorsiondriveRecordORM
 from qcfractal.components.torsiondrive.testing_helpers import (
@@ -14,9 +22,10 @@ from qcfractal.components.torsiondrive.testing_helpers import (
     generate_task_key as generate_td_task_key,
 )
 from qcfractal.db_socket import SQLAlchemySocket
-from qcfractal.testing_helpers import run_service
+from qcfractal.testing_helpers import run_service, DummyJobProgress
+from qcfractalcompute.compress import compress_result
 from qcportal.managers import ManagerName
-from qcportal.record_models import RecordStatusEnum, PriorityEnum
+from qcportal.record_models import RecordStatusEnum, PriorityEnum, RecordTask
 from qcportal.utils import now_at_utc
 
 if TYPE_CHECKING:
@@ -24,6 +33,19 @@ if TYPE_CHECKING:
     from sqlalchemy.orm.session import Session
 
 
+@contextmanager
+def _service_limits(storage_socket: SQLAlchemySocket, **limits):
+    # Temporarily override the service limits (_max_active_services, etc) of the service socket
+    old_limits = {k: getattr(storage_socket.services, f"_{k}") for k in limits}
+    try:
+        for k, v in limits.items():
+            setattr(storage_socket.services, f"_{k}", v)
+        yield
+    finally:
+        for k, v in old_limits.items():
+            setattr(storage_socket.services, f"_{k}", v)
+
+
 def test_service_socket_error(storage_socket: SQLAlchemySocket, session: Session, activated_manager_name: ManagerName):
     id_1, result_data_1 = submit_td_test_data(storage_socket, "td_H2O2_mopac_pm6", "test_tag", PriorityEnum.low)
 
@@ -67,11 +89,7 @@ def test_service_socket_error(storage_socket: SQLAlchemySocket, session: Session
 
 
 def test_service_socket_iterate_order(storage_socket: SQLAlchemySocket, session: Session):
-    # TODO - Ugly
-    max_active_services = storage_socket.services._max_active_services
-    try:
-        storage_socket.services._max_active_services = 1
-
+    with _service_limits(storage_socket, max_active_services=1):
         id_1, _ = submit_td_test_data(storage_socket, "td_H2O2_mopac_pm6", "*", PriorityEnum.normal)
         id_2, _ = submit_go_test_data(storage_socket, "go_H3NS_psi4_pbe", "*", PriorityEnum.high)
 
@@ -80,5 +98,102 @@ def test_service_socket_iterate_order(storage_socket: SQLAlchemySocket, session:
 
         assert session.get(BaseRecordORM, id_1).status == RecordStatusEnum.waiting
         assert session.get(BaseRecordORM, id_2).status == RecordStatusEnum.running
-    finally:
-        storage_socket.services._max_active_services = max_active_services
+
+
+def test_service_socket_iterate_on_dependency_completion(
+    storage_socket: SQLAlchemySocket, session: Session, activated_manager_name: ManagerName
+):
+    id_1, result_data_1 = submit_mb_test_data(storage_socket, "mb_cp_he4_psi4_mp2", "*", PriorityEnum.normal)
+
+    # Start the service and run the first iteration (which creates the dependencies)
+    with storage_socket.session_scope() as s:
+        storage_socket.services.iterate_services(s)
+
+    rec = session.get(BaseRecordORM, id_1)
+    service_id = rec.service.id
+    jobname = f"iterate_service_{service_id}"
+
+    def _get_iterate_job(s):
+        stmt = select(InternalJobORM).where(InternalJobORM.unique_name == jobname)
+        return s.execute(stmt).scalar_one_or_none()
+
+    with storage_socket.session_scope() as s:
+        storage_socket.internal_jobs._run_single(
+            s, _get_iterate_job(s), logging.getLogger("internal_job"), DummyJobProgress()
+        )
+
+    # Claim all the tasks for the dependencies
+    manager_programs = storage_socket.managers.get([activated_manager_name.fullname])[0]["programs"]
+    manager_tasks = []
+    while True:
+        claimed = storage_socket.tasks.claim_tasks(activated_manager_name.fullname, manager_programs, ["*"])
+        if not claimed:
+            break
+        manager_tasks.extend(RecordTask(**x) for x in claimed)
+
+    assert len(manager_tasks) > 1
+
+    # Return them one at a time. The service is queued for iteration only after the last one is returned,
+    # without needing to run iterate_services
+    for t in manager_tasks:
+        with storage_socket.session_scope() as s:
+            assert _get_iterate_job(s) is None
+
+        task_result = result_data_1[generate_mb_task_key(t)]
+        rmeta = storage_socket.tasks.update_finished(
+            activated_manager_name.fullname, {t.id: compress_result(task_result.dict())}
+        )
+        assert rmeta.n_accepted == 1
+
+    with storage_socket.session_scope() as s:
+        job_orm = _get_iterate_job(s)
+        assert job_orm is not None
+        assert job_orm.function == "services._iterate_service"
+        assert job_orm.kwargs == {"service_id": service_id}
+
+
+def test_service_socket_adaptive_scheduling(
+    storage_socket: SQLAlchemySocket, session: Session, activated_manager_name: ManagerName
+):
+    with _service_limits(storage_socket, max_active_services=1, adaptive_max_active_services=10):
+        id_1, _ = submit_mb_test_data(storage_socket, "mb_cp_he4_psi4_mp2", "*", PriorityEnum.high)
+
+        with storage_socket.session_scope() as s:
+            storage_socket.services.iterate_services(s)
+
+        rec = session.get(BaseRecordORM, id_1)
+        assert rec.status == RecordStatusEnum.running
+
+        # Initialization is done in the internal job
+        jobname = f"iterate_service_{rec.service.id}"
+        with storage_socket.session_scope() as s:
+            job_orm = s.execute(select(InternalJobORM).where(InternalJobORM.unique_name == jobname)).scalar_one()
+            assert job_orm.kwargs == {"service_id": rec.service.id, "initialize": True}
+            storage_socket.internal_jobs._run_single(s, job_orm, logging.getLogger("internal_job"), DummyJobProgress())
+
+        n_tasks = sum(x["n_waiting"] for x in storage_socket.tasks.get_queue_depth())
+        assert n_tasks > 2
+
+        id_2, _ = submit_td_test_data(storage_socket, "td_H2O2_mopac_pm6", "*", PriorityEnum.normal)
+        id_3, _ = submit_go_test_data(storage_socket, "go_H3NS_psi4_pbe", "*", PriorityEnum.normal)
+
+        # Plenty of tasks for the (single) manager. No new services are started
+        with storage_socket.session_scope() as s:
+            assert storage_socket.services.iterate_services(s) == 1
+
+        # Manager claims all the tasks, so more services are started, even though max_active_services is reached
+        manager_programs = storage_socket.managers.get([activated_manager_name.fullname])[0]["programs"]
+        while storage_socket.tasks.claim_tasks(activated_manager_name.fullname, manager_programs, ["*"]):
+            pass
+
+        with storage_socket.session_scope() as s:
+            assert storage_socket.services.iterate_services(s) == 2
+
+        session.expire_all()
+        statuses = {session.get(BaseRecordORM, i).status for i in (id_2, id_3)}
+        assert statuses == {RecordStatusEnum.running, RecordStatusEnum.waiting}
+
+        # Without adaptive scheduling, only max_active_services are started
+        storage_socket.services._adaptive_max_active_services = 0
+        with storage_socket.session_scope() as s:
+            assert storage_socket.services.iterate_services(s) == 2
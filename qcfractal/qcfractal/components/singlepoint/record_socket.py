@@ -30,7 +30,6 @@ if TYPE_CHECKING:
 
 # Meaningless, but unique to singlepoints
 singlepoint_insert_lock_id = 14000
-singlepoint_spec_insert_lock_id = 14001
 
 
 class SinglepointRecordSocket(BaseRecordSocket):
@@ -115,6 +114,19 @@ class SinglepointRecordSocket(BaseRecordSocket):
             wavefunction_orm.record_id = record_id
             session.add(wavefunction_orm)
 
+    def update_completed_tasks(
+        self, session: Session, record_ids: Sequence[int], results: Sequence[QCEl_AtomicResult]
+    ) -> None:
+        wavefunction_orms = []
+        for record_id, result in zip(record_ids, results):
+            if result.wavefunction:
+                wavefunction_orm = self.create_wavefunction_orm(result.wavefunction)
+                wavefunction_orm.record_id = record_id
+                wavefunction_orms.append(wavefunction_orm)
+
+        # Inserted together on flush
+        session.add_all(wavefunction_orms)
+
     def insert_complete_schema_v1(
         self,
         session: Session,
@@ -223,7 +235,7 @@ class SinglepointRecordSocket(BaseRecordSocket):
                 to_add,
                 (QCSpecificationORM.specification_hash,),
                 (QCSpecificationORM.id,),
-                singlepoint_spec_insert_lock_id,
+                lock_id=None,
             )
 
             return meta, [x[0] for x in ids]
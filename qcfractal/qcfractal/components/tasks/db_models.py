@@ -1,6 +1,7 @@
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
     ForeignKey,
     Index,
@@ -8,6 +9,8 @@ from sqlalchemy import (
     CheckConstraint,
     UniqueConstraint,
     Boolean,
+    DDL,
+    event,
 )
 from sqlalchemy.dialects.postgresql import ARRAY, TEXT, TIMESTAMP
 from sqlalchemy.orm import relationship
@@ -45,11 +48,37 @@ class TaskQueueORM(BaseORM):
     # explicit sort will have to process all the data to identify the first n
     # rows, but if there is an index matching the ORDER BY, the first n rows
     # can be retrieved directly, without scanning the remainder at all.
+    #
+    # These indices only contain available tasks, and include the other columns needed for claiming
+    # (so that the table itself does not need to be read until the tasks have been chosen)
     __table_args__ = (
         Index("ix_task_queue_tag", "tag"),
         Index("ix_task_queue_required_programs", "required_programs", postgresql_using="gin"),
         Index(
-            "ix_task_queue_sort", priority.desc(), sort_date.asc(), id.asc(), tag, postgresql_where=(available == True)
+            "ix_task_queue_sort",
+            priority.desc(),
+            sort_date.asc(),
+            id.asc(),
+            postgresql_where=(available == True),
+            postgresql_include=["tag", "required_programs", "record_id"],
+        ),
+        Index(
+            "ix_task_queue_tag_sort",
+            tag,
+            priority.desc(),
+            sort_date.asc(),
+            id.asc(),
+            postgresql_where=(available == True),
+            postgresql_include=["required_programs", "record_id"],
+        ),
+        # Only contains tasks whose function kwargs still need to be generated. Generating them
+        # removes the task from this index, so each batch doesn't have to skip over finished ones
+        Index(
+            "ix_task_queue_generate_sort",
+            priority.desc(),
+            sort_date.asc(),
+            id.asc(),
+            postgresql_where=((available == True) & function.is_(None)),
         ),
         UniqueConstraint("record_id", name="ux_task_queue_record_id"),
         # WARNING - these are not autodetected by alembic
@@ -62,3 +91,97 @@ class TaskQueueORM(BaseORM):
     # Remove sort_date from the model. For backwards compatibility (and because it's only used for sorting)
     # Also remove the "available" column - is somewhat redundant with the record status
     _qcportal_model_excludes = ["sort_date", "available"]
+
+
+class TaskQueueDepthORM(BaseORM):
+    """
+    Table for storing the number of available tasks, per tag and set of required programs
+
+    Changes to the task queue are recorded (by triggers) in the task_queue_depth_delta table, and
+    are periodically folded into this table. The actual queue depth is the sum of the two.
+    """
+
+    __tablename__ = "task_queue_depth"
+
+    tag = Column(String, primary_key=True)
+    required_programs = Column(ARRAY(TEXT), primary_key=True)
+    n_waiting = Column(Integer, nullable=False)
+
+
+class TaskQueueDepthDeltaORM(BaseORM):
+    """
+    Table for storing changes to the number of available tasks
+
+    Rows are only ever appended (by triggers on the task_queue table) and then removed when
+    folded into the task_queue_depth table. This avoids many concurrent transactions (such as
+    managers claiming tasks) all needing to update the same rows of task_queue_depth.
+    """
+
+    __tablename__ = "task_queue_depth_delta"
+
+    id = Column(BigInteger, primary_key=True)
+    tag = Column(String, nullable=False)
+    required_programs = Column(ARRAY(TEXT), nullable=False)
+    delta = Column(Integer, nullable=False)
+
+
+# Function that records changes in the number of available tasks
+# Used with statement-level triggers, so there is (at most) one row inserted per (tag, programs) per statement
+_task_queue_depth_triggerfunc = DDL(
+    """
+    CREATE OR REPLACE FUNCTION public.qca_task_queue_depth_delta()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $_$
+        BEGIN
+          IF TG_OP = 'INSERT' THEN
+            INSERT INTO task_queue_depth_delta (tag, required_programs, delta)
+            SELECT tag, required_programs, count(*) FROM new_table WHERE available
+            GROUP BY tag, required_programs;
+          ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO task_queue_depth_delta (tag, required_programs, delta)
+            SELECT tag, required_programs, -count(*) FROM old_table WHERE available
+            GROUP BY tag, required_programs;
+          ELSE
+            INSERT INTO task_queue_depth_delta (tag, required_programs, delta)
+            SELECT tag, required_programs, sum(d) FROM (
+              SELECT tag, required_programs, 1 AS d FROM new_table WHERE available
+              UNION ALL
+              SELECT tag, required_programs, -1 AS d FROM old_table WHERE available
+            ) AS changes
+            GROUP BY tag, required_programs HAVING sum(d) <> 0;
+          END IF;
+          RETURN NULL;
+        END
+        $_$
+    ;
+"""
+)
+
+_task_queue_depth_triggers = [
+    DDL(
+        """
+        CREATE TRIGGER qca_task_queue_depth_insert_tr
+        AFTER INSERT ON task_queue REFERENCING NEW TABLE AS new_table
+        FOR EACH STATEMENT EXECUTE PROCEDURE qca_task_queue_depth_delta();
+        """
+    ),
+    DDL(
+        """
+        CREATE TRIGGER qca_task_queue_depth_update_tr
+        AFTER UPDATE ON task_queue REFERENCING OLD TABLE AS old_table NEW TABLE AS new_table
+        FOR EACH STATEMENT EXECUTE PROCEDURE qca_task_queue_depth_delta();
+        """
+    ),
+    DDL(
+        """
+        CREATE TRIGGER qca_task_queue_depth_delete_tr
+        AFTER DELETE ON task_queue REFERENCING OLD TABLE AS old_table
+        FOR EACH STATEMENT EXECUTE PROCEDURE qca_task_queue_depth_delta();
+        """
+    ),
+]
+
+event.listen(TaskQueueORM.__table__, "after_create", _task_queue_depth_triggerfunc.execute_if(dialect=("postgresql")))
+for _trigger in _task_queue_depth_triggers:
+    event.listen(TaskQueueORM.__table__, "after_create", _trigger.execute_if(dialect=("postgresql")))
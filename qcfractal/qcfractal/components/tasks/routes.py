@@ -1,6 +1,7 @@
 from flask import current_app
 
 from qcfractal.flask_app import storage_socket
+from qcfractal.flask_app.api_v1.blueprint import api_v1
 from qcfractal.flask_app.api_v1.helpers import wrap_route  # uses the same wrap_route as the user api
 from qcfractal.flask_app.compute_v1.blueprint import compute_v1
 from qcportal.exceptions import LimitExceededError
@@ -38,3 +39,19 @@ def return_tasks_v1(body_data: TaskReturnBody):
     return storage_socket.tasks.update_finished(
         manager_name=body_data.name_data.fullname, results_compressed=body_data.results_compressed
     )
+
+
+@compute_v1.route("/tasks/queue_depth", methods=["GET"])
+@wrap_route("READ")
+def get_task_queue_depth_v1():
+    """Number of waiting tasks, per tag and set of required programs"""
+
+    return storage_socket.tasks.get_queue_depth()
+
+
+@api_v1.route("/tasks/queue_depth", methods=["GET"])
+@wrap_route("READ")
+def get_task_queue_depth_api_v1():
+    """Number of waiting tasks, per tag and set of required programs"""
+
+    return storage_socket.tasks.get_queue_depth()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import time
 import traceback
 from collections import defaultdict
 from typing import TYPE_CHECKING
@@ -10,10 +11,11 @@ try:
 except ImportError:
     import pydantic
 from qcelemental.models import FailedOperation
-from sqlalchemy import select, update
-from sqlalchemy.dialects.postgresql import array
-from sqlalchemy.orm import joinedload, load_only, lazyload
+from sqlalchemy import select, update, delete, case, literal, func, union_all
+from sqlalchemy.dialects.postgresql import array, insert
+from sqlalchemy.orm import joinedload
 
+from qcfractal import metrics
 from qcfractal.components.managers.db_models import ComputeManagerORM
 from qcfractal.components.record_db_models import BaseRecordORM
 from qcportal.all_results import AllResultTypes
@@ -24,11 +26,12 @@ from qcportal.managers import ManagerStatusEnum
 from qcportal.metadata_models import TaskReturnMetadata
 from qcportal.record_models import RecordStatusEnum
 from qcportal.utils import calculate_limit, now_at_utc
-from .db_models import TaskQueueORM
+from .db_models import TaskQueueORM, TaskQueueDepthORM, TaskQueueDepthDeltaORM
 from .reset_logic import should_reset
 
 if TYPE_CHECKING:
     from sqlalchemy.orm.session import Session
+    from qcfractal.components.internal_jobs.status import JobProgress
     from qcfractal.db_socket.socket import SQLAlchemySocket
     from typing import List, Dict, Tuple, Optional, Any
 
@@ -44,6 +47,197 @@ class TaskSocket:
 
         self._tasks_claim_limit = root_socket.qcf_config.api_limits.manager_tasks_claim
         self._strict_queue_tags = root_socket.qcf_config.strict_queue_tags
+        self._task_generation_frequency = root_socket.qcf_config.task_generation_frequency
+
+        # Function kwargs are only stored until the task is finished, so favor speed over size
+        self._kwargs_compression_level = 3
+
+        # How many tasks to generate function kwargs for in a single transaction
+        self._task_generation_batch_size = 500
+
+        # How often to fold changes into the queue depth table (in seconds)
+        self._queue_depth_frequency = root_socket.qcf_config.task_queue_depth_frequency
+
+        if self._queue_depth_frequency > 0:
+            with self.root_socket.session_scope() as session:
+                self.root_socket.internal_jobs.add(
+                    "update_task_queue_depth",
+                    now_at_utc(),
+                    "tasks.update_queue_depth",
+                    {},
+                    user_id=None,
+                    unique_name=True,
+                    repeat_delay=self._queue_depth_frequency,
+                    session=session,
+                )
+
+        if self._task_generation_frequency > 0:
+            with self.root_socket.session_scope() as session:
+                self.root_socket.internal_jobs.add(
+                    "generate_task_specifications",
+                    now_at_utc(),
+                    "tasks.generate_task_specifications",
+                    {},
+                    user_id=None,
+                    unique_name=True,
+                    repeat_delay=self._task_generation_frequency,
+                    session=session,
+                )
+
+    def update_queue_depth(self, session: Session) -> None:
+        """
+        Folds recorded changes to the number of available tasks into the queue depth table
+
+        This is run periodically as an internal job. Queue depths obtained via get_queue_depth are
+        always up-to-date, regardless of how often this is run. It only keeps the table of changes small.
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session to use.
+        """
+
+        # Remove all the changes, and add them to the existing depths, in a single statement
+        folded = delete(TaskQueueDepthDeltaORM)
+        folded = folded.returning(
+            TaskQueueDepthDeltaORM.tag, TaskQueueDepthDeltaORM.required_programs, TaskQueueDepthDeltaORM.delta
+        )
+        folded = folded.cte("folded_deltas")
+
+        totals = select(folded.c.tag, folded.c.required_programs, func.sum(folded.c.delta))
+        totals = totals.group_by(folded.c.tag, folded.c.required_programs)
+
+        stmt = insert(TaskQueueDepthORM).from_select(["tag", "required_programs", "n_waiting"], totals)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TaskQueueDepthORM.tag, TaskQueueDepthORM.required_programs],
+            set_={"n_waiting": TaskQueueDepthORM.n_waiting + stmt.excluded.n_waiting},
+        )
+        session.execute(stmt.add_cte(folded))
+
+        session.execute(delete(TaskQueueDepthORM).where(TaskQueueDepthORM.n_waiting == 0))
+
+    def get_queue_depth(self, *, session: Optional[Session] = None) -> List[Dict[str, Any]]:
+        """
+        Obtain the number of available (waiting) tasks in the task queue, per tag and set of required programs
+
+        This does not need to scan the task queue itself
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session to use. If None, one will be created. If an existing session
+            is used, it will be flushed (but not committed) before returning from this function.
+
+        Returns
+        -------
+        :
+            List of dictionaries with tag, required_programs, and n_waiting. Tags/programs with no
+            waiting tasks are not included
+        """
+
+        all_changes = union_all(
+            select(TaskQueueDepthORM.tag, TaskQueueDepthORM.required_programs, TaskQueueDepthORM.n_waiting),
+            select(TaskQueueDepthDeltaORM.tag, TaskQueueDepthDeltaORM.required_programs, TaskQueueDepthDeltaORM.delta),
+        ).subquery()
+
+        n_waiting = func.sum(all_changes.c.n_waiting)
+        stmt = select(all_changes.c.tag, all_changes.c.required_programs, n_waiting)
+        stmt = stmt.group_by(all_changes.c.tag, all_changes.c.required_programs)
+        stmt = stmt.having(n_waiting > 0)
+        stmt = stmt.order_by(all_changes.c.tag, all_changes.c.required_programs)
+
+        with self.root_socket.optional_session(session, True) as session:
+            return [
+                {"tag": tag, "required_programs": programs, "n_waiting": n}
+                for tag, programs, n in session.execute(stmt).all()
+            ]
+
+    def _generate_task_specifications(
+        self, session: Session, record_type: str, record_ids: List[int]
+    ) -> List[Tuple[str, bytes]]:
+        """
+        Generates the function and compressed function kwargs for tasks, given their record ids
+
+        All records must be of the given type. Returned in the same order as the record ids.
+        """
+
+        record_socket = self.root_socket.records.get_socket(record_type)
+        task_specs = record_socket.generate_task_specifications(session, record_ids)
+
+        ret = []
+        for task_spec in task_specs:
+            kwargs_compressed, _, _ = compress(
+                task_spec["function_kwargs"], CompressionEnum.zstd, self._kwargs_compression_level
+            )
+            ret.append((task_spec["function"], kwargs_compressed))
+
+        return ret
+
+    def generate_task_specifications(self, session: Session, job_progress: Optional[JobProgress] = None) -> int:
+        """
+        Fills in the function and function kwargs of waiting tasks that do not have them yet
+
+        This is run periodically as an internal job, so that this does not need to be done
+        when the tasks are claimed by a manager. Tasks are processed in batches, with each
+        batch being committed separately.
+
+        Parameters
+        ----------
+        session
+            An existing SQLAlchemy session to use. This session will be periodically committed
+        job_progress
+            Object used to check if the job has been cancelled
+
+        Returns
+        -------
+        :
+            The number of tasks that had their function kwargs generated
+        """
+
+        n_generated = 0
+
+        while True:
+            if job_progress is not None:
+                job_progress.raise_if_cancelled()
+
+            # Tasks are not locked. If a manager claims the task in the meantime, it will generate
+            # identical function kwargs, so it doesn't matter who writes them.
+            # This matches the partial index ix_task_queue_generate_sort, which only contains the tasks still
+            # needing generation, so each batch starts right at the next tasks to generate
+            stmt = select(TaskQueueORM.id, TaskQueueORM.record_id, BaseRecordORM.record_type)
+            stmt = stmt.join(BaseRecordORM, BaseRecordORM.id == TaskQueueORM.record_id)
+            stmt = stmt.where(TaskQueueORM.function.is_(None))
+            stmt = stmt.where(TaskQueueORM.available == True)
+            stmt = stmt.order_by(TaskQueueORM.priority.desc(), TaskQueueORM.sort_date.asc(), TaskQueueORM.id.asc())
+            stmt = stmt.limit(self._task_generation_batch_size)
+
+            to_generate = defaultdict(list)
+            for task_id, record_id, record_type in session.execute(stmt).all():
+                to_generate[record_type].append((task_id, record_id))
+
+            if not to_generate:
+                break
+
+            task_updates = []
+            for record_type, task_info in to_generate.items():
+                task_ids, record_ids = zip(*task_info)
+                task_specs = self._generate_task_specifications(session, record_type, list(record_ids))
+
+                for task_id, (function, kwargs_compressed) in zip(task_ids, task_specs):
+                    task_updates.append(
+                        {"id": task_id, "function": function, "function_kwargs_compressed": kwargs_compressed}
+                    )
+
+            stmt = update(TaskQueueORM).where(TaskQueueORM.function.is_(None))
+            session.execute(stmt, task_updates, execution_options={"synchronize_session": None})
+            session.commit()
+
+            n_generated += len(task_updates)
+
+        if n_generated > 0:
+            self._logger.info(f"Generated function kwargs for {n_generated} tasks")
+
+        return n_generated
 
     def update_finished(
         self, manager_name: str, results_compressed: Dict[int, bytes], *, session: Optional[Session] = None
@@ -62,6 +256,7 @@ class TaskSocket:
             is used, it will be flushed (but not committed) before returning from this function.
         """
 
+        start = time.perf_counter()
         all_task_ids = list(results_compressed.keys())
 
         self._logger.info("Received completed tasks from {}.".format(manager_name))
@@ -103,6 +298,10 @@ class TaskSocket:
             all_record_info = session.execute(stmt).all()
             all_record_info = {x[0]: x[1:] for x in all_record_info}
 
+            # Successful results, grouped by record type, for bulk insertion
+            # Values are (task_id, record_id, result)
+            completed_by_type: Dict[str, List[Tuple[int, int, AllResultTypes]]] = defaultdict(list)
+
             for task_id, result_compressed in results_compressed.items():
 
                 record_info = all_record_info.get(task_id, None)
@@ -138,81 +337,75 @@ class TaskSocket:
                 result_dict = decompress(result_compressed, CompressionEnum.zstd)
                 result = pydantic.parse_obj_as(AllResultTypes, result_dict)
 
-                notify_status = None
+                # Successful results are handled in bulk below
+                if result.success is True and not isinstance(result, FailedOperation):
+                    completed_by_type[record_type].append((task_id, record_id, result))
+                    continue
 
-                ##################################################################
-                # The rest of the checks are done in a try/except block because
-                # they are much more complicated and can result in exceptions
-                # which should be handled
-                ##################################################################
+                self._update_finished_single(
+                    session,
+                    manager_name,
+                    task_id,
+                    record_id,
+                    record_type,
+                    result,
+                    to_be_reset,
+                    tasks_success,
+                    tasks_failures,
+                    tasks_rejected,
+                )
 
+            ##################################################################
+            # Now store all the successful results. Each record type is
+            # stored with multi-row statements in a single savepoint. If that
+            # fails, fall back to storing each result in its own savepoint
+            # so that the offending result(s) can be found
+            ##################################################################
+            for record_type, completed in completed_by_type.items():
                 try:
                     savepoint = session.begin_nested()
 
-                    # Failed task returning FailedOperation
-                    if result.success is False and isinstance(result, FailedOperation):
-                        self.root_socket.records.update_failed_task(session, record_id, result, manager_name)
-
-                        notify_status = RecordStatusEnum.error
-                        tasks_failures.append(task_id)
-
-                        # Should we automatically reset?
-                        if self.root_socket.qcf_config.auto_reset.enabled:
-                            # TODO - Move to update_failed_task?
-                            stmt = select(BaseRecordORM).where(BaseRecordORM.id == record_id)
-                            record_orm = session.execute(stmt).scalar_one()
-                            if should_reset(record_orm, self.root_socket.qcf_config.auto_reset):
-                                to_be_reset.append(record_id)
-
-                    elif result.success is not True:
-                        # QCEngine should always return either FailedOperation, or some result with success == True
-                        msg = f"Unexpected return from manager for task {task_id}/base result {record_id}: Returned success != True, but not a FailedOperation"
-                        error = {"error_type": "internal_fractal_error", "error_message": msg}
-                        failed_op = FailedOperation(error=error, success=False)
-
-                        self.root_socket.records.update_failed_task(session, record_id, failed_op, manager_name)
-                        notify_status = RecordStatusEnum.error
-
-                        self._logger.error(msg)
-                        tasks_rejected.append((task_id, "Returned success=False, but not a FailedOperation"))
-
-                    # Manager returned a full, successful result
-                    else:
-                        self.root_socket.records.update_completed_task(
-                            session, record_id, record_type, result, manager_name
-                        )
+                    bulk_results = [(record_id, result) for _, record_id, result in completed]
+                    self.root_socket.records.update_completed_tasks(session, record_type, bulk_results, manager_name)
+                    savepoint.commit()
 
-                        notify_status = RecordStatusEnum.complete
+                    for task_id, record_id, _ in completed:
                         tasks_success.append(task_id)
-
-                    savepoint.commit()  # Release the savepoint (doesn't actually fully commit)
+                        self.root_socket.notify_finished_watch(record_id, RecordStatusEnum.complete)
 
                 except Exception:
-                    # We have no idea what was added or is pending for removal
-                    # So rollback the transaction to the most recent commit
                     savepoint.rollback()
-                    savepoint = session.begin_nested()
-
-                    msg = "Internal FractalServer Error:\n" + traceback.format_exc()
-                    error = {"error_type": "internal_fractal_error", "error_message": msg}
-                    failed_op = FailedOperation(error=error, success=False)
 
-                    self.root_socket.records.update_failed_task(session, record_id, failed_op, manager_name)
-                    notify_status = RecordStatusEnum.error
-
-                    self._logger.error(msg)
-                    tasks_rejected.append((task_id, "Internal server error"))
-
-                    savepoint.commit()
+                    self._logger.warning(
+                        f"Bulk storage of {len(completed)} {record_type} results failed. Storing individually:\n"
+                        + traceback.format_exc()
+                    )
 
-                finally:
-                    # Send notifications that tasks were completed
-                    # Notifications are sent after the transaction is committed
-                    if notify_status is not None:
-                        self.root_socket.notify_finished_watch(record_id, notify_status)
+                    for task_id, record_id, _ in completed:
+                        # Storing the result modifies it (removing things from extras), so parse it again
+                        result_dict = decompress(results_compressed[task_id], CompressionEnum.zstd)
+                        result = pydantic.parse_obj_as(AllResultTypes, result_dict)
+
+                        self._update_finished_single(
+                            session,
+                            manager_name,
+                            task_id,
+                            record_id,
+                            record_type,
+                            result,
+                            to_be_reset,
+                            tasks_success,
+                            tasks_failures,
+                            tasks_rejected,
+                        )
 
             session.commit()
 
+            # Services whose last outstanding dependency was just completed can be iterated right away
+            # (this is checked after committing, so that concurrent returns see each other's results)
+            completed_record_ids = [all_record_info[task_id][0] for task_id in tasks_success]
+            self.root_socket.services.queue_ready_services(session, completed_record_ids)
+
             # Update the stats for the manager
             manager.successes += len(tasks_success)
             manager.failures += len(tasks_failures)
@@ -232,8 +425,103 @@ class TaskSocket:
             )
         )
 
+        metrics.task_return_size.observe(len(results_compressed))
+        metrics.task_return_duration.observe(time.perf_counter() - start)
+
         return TaskReturnMetadata(rejected_info=tasks_rejected, accepted_ids=(tasks_success + tasks_failures))
 
+    def _update_finished_single(
+        self,
+        session: Session,
+        manager_name: str,
+        task_id: int,
+        record_id: int,
+        record_type: str,
+        result: AllResultTypes,
+        to_be_reset: List[int],
+        tasks_success: List[int],
+        tasks_failures: List[int],
+        tasks_rejected: List[Tuple[int, str]],
+    ) -> None:
+        """
+        Store a single returned result in its own savepoint
+
+        This is used for failed results, and as a fallback for successful results
+        when storing them in bulk fails. The task id is appended to one of the
+        tasks_success, tasks_failures, or tasks_rejected lists.
+        """
+
+        notify_status = None
+
+        ##################################################################
+        # The rest of the checks are done in a try/except block because
+        # they are much more complicated and can result in exceptions
+        # which should be handled
+        ##################################################################
+
+        try:
+            savepoint = session.begin_nested()
+
+            # Failed task returning FailedOperation
+            if result.success is False and isinstance(result, FailedOperation):
+                self.root_socket.records.update_failed_task(session, record_id, result, manager_name)
+
+                notify_status = RecordStatusEnum.error
+                tasks_failures.append(task_id)
+
+                # Should we automatically reset?
+                if self.root_socket.qcf_config.auto_reset.enabled:
+                    # TODO - Move to update_failed_task?
+                    stmt = select(BaseRecordORM).where(BaseRecordORM.id == record_id)
+                    record_orm = session.execute(stmt).scalar_one()
+                    if should_reset(record_orm, self.root_socket.qcf_config.auto_reset):
+                        to_be_reset.append(record_id)
+
+            elif result.success is not True:
+                # QCEngine should always return either FailedOperation, or some result with success == True
+                msg = f"Unexpected return from manager for task {task_id}/base result {record_id}: Returned success != True, but not a FailedOperation"
+                error = {"error_type": "internal_fractal_error", "error_message": msg}
+                failed_op = FailedOperation(error=error, success=False)
+
+                self.root_socket.records.update_failed_task(session, record_id, failed_op, manager_name)
+                notify_status = RecordStatusEnum.error
+
+                self._logger.error(msg)
+                tasks_rejected.append((task_id, "Returned success=False, but not a FailedOperation"))
+
+            # Manager returned a full, successful result
+            else:
+                self.root_socket.records.update_completed_task(session, record_id, record_type, result, manager_name)
+
+                notify_status = RecordStatusEnum.complete
+                tasks_success.append(task_id)
+
+            savepoint.commit()  # Release the savepoint (doesn't actually fully commit)
+
+        except Exception:
+            # We have no idea what was added or is pending for removal
+            # So rollback the transaction to the most recent commit
+            savepoint.rollback()
+            savepoint = session.begin_nested()
+
+            msg = "Internal FractalServer Error:\n" + traceback.format_exc()
+            error = {"error_type": "internal_fractal_error", "error_message": msg}
+            failed_op = FailedOperation(error=error, success=False)
+
+            self.root_socket.records.update_failed_task(session, record_id, failed_op, manager_name)
+            notify_status = RecordStatusEnum.error
+
+            self._logger.error(msg)
+            tasks_rejected.append((task_id, "Internal server error"))
+
+            savepoint.commit()
+
+        finally:
+            # Send notifications that tasks were completed
+            # Notifications are sent after the transaction is committed
+            if notify_status is not None:
+                self.root_socket.notify_finished_watch(record_id, notify_status)
+
     def claim_tasks(
         self,
         manager_name: str,
@@ -261,6 +549,8 @@ class TaskSocket:
             is used, it will be flushed (but not committed) before returning from this function.
         """
 
+        start = time.perf_counter()
+
         # Normally, checking limits is done in the route code. However, we really do not want a manager
         # to claim absolutely everything. So double check here
         limit = calculate_limit(self._tasks_claim_limit, limit)
@@ -294,114 +584,121 @@ class TaskSocket:
                 self._logger.warning(f"Manager {manager_name} did not send any valid queue tags to claim")
                 raise ComputeManagerError(f"Manager {manager_name} did not send any valid queue tags to claim")
 
-            found: Dict[int, Dict[str, Any]] = {}
-            return_order: List[int] = []  # Order of task ids
-
-            for tag in search_tags:
-                new_limit = limit - len(found)
-
-                # Have we found all we needed to find
-                # (should always be >= 0, but can never be too careful. If it wasn't this could be an infinite loop)
-                if new_limit <= 0:
-                    break
-
-                # Find tasks/base result:
-                #   1. Status is waiting
-                #   2. Whose required programs I am able to match
-                #   3. Whose tags I am able to compute
-                # with_for_update locks the rows. skip_locked=True makes it skip already-locked rows
-                # (possibly from another process)
-                # Also, load the base_result object so we can update stuff there (status)
-                # TODO - we only test for the presence of the available_programs in the requirements. Eventually
-                #        we want to then verify the versions
-
-                # This is a very tricky query. We only want to load two columns of BaseRecord, but we need to join.
-                # Sqlalchemy likes to load more columns if there is a relationship. So we join outside of the
-                # relationship (ie, NOT TaskQueueORM.record) and then load the columns we want.
-                stmt = select(TaskQueueORM, BaseRecordORM).join(
-                    BaseRecordORM, BaseRecordORM.id == TaskQueueORM.record_id
+            # If tag is "*" (and strict_queue_tags is False), then the manager can pull anything. Any tags after
+            # the "*" are then irrelevant, since they will be claimed by the "*" at the same preference
+            wildcard = False
+            if not self._strict_queue_tags and "*" in search_tags:
+                search_tags = search_tags[: search_tags.index("*")]
+                wildcard = True
+
+            # Find tasks/base result:
+            #   1. Status is waiting
+            #   2. Whose required programs I am able to match
+            #   3. Whose tags I am able to compute
+            # with_for_update locks the rows. skip_locked=True makes it skip already-locked rows
+            # (possibly from another process)
+            # TODO - we only test for the presence of the available_programs in the requirements. Eventually
+            #        we want to then verify the versions
+            #
+            # All the tags are searched at once, ordered by the preference of the tag (its position in the list of
+            # tags), then priority, then date (earliest first). The tasks and records are then marked as claimed
+            # in the same statement.
+            # The sort_date usually comes from the created_on of the record, or the created_on of the record's parent service
+            order_by = [TaskQueueORM.priority.desc(), TaskQueueORM.sort_date.asc(), TaskQueueORM.id.asc()]
+
+            if wildcard and not search_tags:
+                tag_rank = literal(0)
+            else:
+                # Only one tag - the ordering of the index can be used directly
+                tag_rank = case(
+                    {t: i for i, t in enumerate(search_tags)}, value=TaskQueueORM.tag, else_=len(search_tags)
                 )
+                if len(search_tags) > 1 or wildcard:
+                    order_by.insert(0, tag_rank)
 
-                stmt = stmt.filter(TaskQueueORM.available == True)
-                stmt = stmt.filter(search_programs.contains(TaskQueueORM.required_programs))
-                stmt = stmt.options(load_only(BaseRecordORM.id, BaseRecordORM.record_type))
-                stmt = stmt.options(lazyload(BaseRecordORM.owner_user), lazyload(BaseRecordORM.owner_group))
-
-                # Order by priority, then date (earliest first)
-                # The sort_date usually comes from the created_on of the record, or the created_on of the record's parent service
-                stmt = stmt.order_by(TaskQueueORM.priority.desc(), TaskQueueORM.sort_date.asc(), TaskQueueORM.id.asc())
-
-                # If tag is "*" (and strict_queue_tags is False), then the manager can pull anything
-                # If tag is "*" and strict_queue_tags is enabled, only pull tasks with tag == '*'
-                if tag != "*" or self._strict_queue_tags:
-                    stmt = stmt.filter(TaskQueueORM.tag == tag)
-
-                # Skip locked rows - They may be in the process of being claimed by someone else
-                stmt = stmt.limit(new_limit).with_for_update(of=[BaseRecordORM, TaskQueueORM], skip_locked=True)
+            candidates = select(
+                TaskQueueORM.id, TaskQueueORM.record_id, BaseRecordORM.record_type, tag_rank.label("tag_rank")
+            )
+            candidates = candidates.join(BaseRecordORM, BaseRecordORM.id == TaskQueueORM.record_id)
+            candidates = candidates.where(TaskQueueORM.available == True)
+            candidates = candidates.where(search_programs.contains(TaskQueueORM.required_programs))
+
+            if not wildcard:
+                candidates = candidates.where(TaskQueueORM.tag.in_(search_tags))
+
+            # Skip locked rows - They may be in the process of being claimed by someone else
+            candidates = candidates.order_by(*order_by).limit(limit)
+            candidates = candidates.with_for_update(of=[BaseRecordORM, TaskQueueORM], skip_locked=True)
+            candidates = candidates.cte("claim_candidates")
+
+            # Data-modifying CTEs are always executed, even if not referenced by the main statement
+            record_update = (
+                update(BaseRecordORM)
+                .where(BaseRecordORM.id == candidates.c.record_id)
+                .values(status=RecordStatusEnum.running, manager_name=manager_name, modified_on=now_at_utc())
+                .returning(BaseRecordORM.id)
+                .cte("claim_records")
+            )
 
-                new_items = session.execute(stmt).all()
+            stmt = (
+                update(TaskQueueORM)
+                .where(TaskQueueORM.id == candidates.c.id)
+                .values(available=False)
+                .returning(TaskQueueORM, candidates.c.record_type, candidates.c.tag_rank)
+                .add_cte(record_update)
+                .execution_options(synchronize_session=False)
+            )
 
-                # Update all the task records to reflect this manager claiming them
-                task_ids = [x[0].id for x in new_items]
-                record_ids = [x[1].id for x in new_items]
+            new_items = session.execute(stmt).all()
 
-                return_order.extend(task_ids)  # Keep the order as returned from the db
-                stmt = update(TaskQueueORM).where(TaskQueueORM.id.in_(task_ids)).values(available=False)
-                session.execute(stmt)
+            # UPDATE ... RETURNING does not return rows in any particular order
+            new_items = sorted(new_items, key=lambda x: (x[2], -x[0].priority, x[0].sort_date, x[0].id))
 
-                stmt = (
-                    update(BaseRecordORM)
-                    .where(BaseRecordORM.id.in_(record_ids))
-                    .values(status=RecordStatusEnum.running, manager_name=manager_name, modified_on=now_at_utc())
-                )
-                session.execute(stmt)
-
-                # Store in dict form for returning, but no need to store the info from the base record
-                # Also, retrieve the actual function kwargs. Eventually we may want the managers
-                # to retrieve the kwargs themselves
-                tasks_to_generate = defaultdict(list)
-                task_updates = []
-
-                # Find what tasks need their function and kwargs generated
-                # Otherwise, just add them to the returned list
-                for task_orm, record_orm in new_items:
-                    if task_orm.function is None:
-                        tasks_to_generate[record_orm.record_type].append(task_orm)
-                    else:
-                        found[task_orm.id] = task_orm.model_dict(exclude=["record"])
-
-                # Create the task data on the fly if it doesn't exist
-                for record_type, tasks_orm in tasks_to_generate.items():
-                    record_socket = self.root_socket.records.get_socket(record_type)
-
-                    record_ids = [task_orm.record_id for task_orm in tasks_orm]
-                    task_specs = record_socket.generate_task_specifications(session, record_ids)
-
-                    for task_orm, task_spec in zip(tasks_orm, task_specs):
-                        task_dict = task_orm.model_dict(exclude=["record"])
-
-                        kwargs = task_spec["function_kwargs"]
-                        kwargs_compressed, _, _ = compress(kwargs, CompressionEnum.zstd)
-
-                        # Add this to the orm for any future managers claiming this task
-                        task_updates.append(
-                            {
-                                "id": task_orm.id,
-                                "function": task_spec["function"],
-                                "function_kwargs_compressed": kwargs_compressed,
-                            }
-                        )
+            # Store in dict form for returning, but no need to store the info from the base record
+            # Also, retrieve the actual function kwargs. Eventually we may want the managers
+            # to retrieve the kwargs themselves
+            found: Dict[int, Dict[str, Any]] = {}
+            return_order: List[int] = [x[0].id for x in new_items]  # Order of task ids
+
+            tasks_to_generate = defaultdict(list)
+            task_updates = []
+
+            # Find what tasks need their function and kwargs generated
+            # Otherwise, just add them to the returned list
+            for task_orm, record_type, _ in new_items:
+                if task_orm.function is None:
+                    tasks_to_generate[record_type].append(task_orm)
+                else:
+                    found[task_orm.id] = task_orm.model_dict(exclude=["record"])
+
+            # Create the task data on the fly if it doesn't exist
+            # (this is normally done ahead of time by the generate_task_specifications internal job)
+            for record_type, tasks_orm in tasks_to_generate.items():
+                record_ids = [task_orm.record_id for task_orm in tasks_orm]
+                task_specs = self._generate_task_specifications(session, record_type, record_ids)
+
+                for task_orm, (function, kwargs_compressed) in zip(tasks_orm, task_specs):
+                    task_dict = task_orm.model_dict(exclude=["record"])
+
+                    # Add this to the orm for any future managers claiming this task
+                    task_updates.append(
+                        {
+                            "id": task_orm.id,
+                            "function": function,
+                            "function_kwargs_compressed": kwargs_compressed,
+                        }
+                    )
 
-                        # But just use what we created when returning to this manager
-                        task_dict["function"] = task_spec["function"]
-                        task_dict["function_kwargs_compressed"] = kwargs_compressed
-                        found[task_orm.id] = task_dict
+                    # But just use what we created when returning to this manager
+                    task_dict["function"] = function
+                    task_dict["function_kwargs_compressed"] = kwargs_compressed
+                    found[task_orm.id] = task_dict
 
-                # Update the task records with the function and kwargs
-                if task_updates:
-                    session.execute(update(TaskQueueORM), task_updates)
+            # Update the task records with the function and kwargs
+            if task_updates:
+                session.execute(update(TaskQueueORM), task_updates)
 
-                session.flush()
+            session.flush()
 
             manager.claimed += len(found)
 
@@ -410,4 +707,7 @@ class TaskSocket:
 
             self._logger.info(f"Manager {manager_name} has claimed {len(found)} new tasks")
 
+        metrics.task_claim_size.observe(len(found))
+        metrics.task_claim_duration.observe(time.perf_counter() - start)
+
         return [found[i] for i in return_order]
@@ -19,9 +19,10 @@ from qcfractal.components.torsiondrive.testing_helpers import (
 )
 from qcfractal.testing_helpers import run_service
 from qcfractalcompute.compress import compress_result
+from qcportal.compression import CompressionEnum, decompress
 from qcportal.exceptions import ComputeManagerError
 from qcportal.managers import ManagerName
-from qcportal.record_models import PriorityEnum
+from qcportal.record_models import PriorityEnum, RecordStatusEnum
 from qcportal.utils import now_at_utc
 
 if TYPE_CHECKING:
@@ -315,6 +316,56 @@ def test_task_socket_claim_tag(storage_socket: SQLAlchemySocket, session: Sessio
     assert tasks[0]["id"] == recs[4].task.id
 
 
+def test_task_socket_claim_tag_priority(storage_socket: SQLAlchemySocket, session: Session):
+    # Tag preference takes precedence over priority, and all tags are claimed from at once
+    mname1 = ManagerName(cluster="test_cluster", hostname="a_host1", uuid="1234-5678-1234-5678")
+    mprog1 = {"qcengine": ["unknown"], "psi4": ["unknown"], "geometric": ["v3.0"]}
+    storage_socket.managers.activate(
+        name_data=mname1,
+        manager_version="v2.0",
+        username="bill",
+        programs=mprog1,
+        tags=["tag3", "tag2", "tag1"],
+    )
+
+    meta, id_1 = storage_socket.records.singlepoint.add(
+        [molecule_1], input_spec_1, "tag1", PriorityEnum.high, None, None, True
+    )
+    meta, id_2 = storage_socket.records.singlepoint.add(
+        [molecule_2], input_spec_2, "tag2", PriorityEnum.low, None, None, True
+    )
+    meta, id_3 = storage_socket.records.singlepoint.add(
+        [molecule_3], input_spec_3, "tag3", PriorityEnum.low, None, None, True
+    )
+    meta, id_4 = storage_socket.records.optimization.add(
+        [molecule_4], input_spec_4, "tag2", PriorityEnum.high, None, None, True
+    )
+    meta, id_5 = storage_socket.records.singlepoint.add(
+        [molecule_5], input_spec_5, "tag3", PriorityEnum.normal, None, None, True
+    )
+
+    all_id = id_1 + id_2 + id_3 + id_4 + id_5
+    recs = []
+    for rid in all_id:
+        rec = session.get(BaseRecordORM, rid)
+        recs.append(rec)
+
+    tasks = storage_socket.tasks.claim_tasks(mname1.fullname, mprog1, ["tag3", "tag2", "tag1"], 4)
+    assert [t["id"] for t in tasks] == [recs[4].task.id, recs[2].task.id, recs[3].task.id, recs[1].task.id]
+
+    session.expire_all()
+    for r in recs[1:]:
+        assert r.status == RecordStatusEnum.running
+        assert r.manager_name == mname1.fullname
+        assert r.task.available is False
+    assert recs[0].status == RecordStatusEnum.waiting
+    assert recs[0].task.available is True
+
+    tasks = storage_socket.tasks.claim_tasks(mname1.fullname, mprog1, ["tag3", "tag2", "tag1"], 4)
+    assert len(tasks) == 1
+    assert tasks[0]["id"] == recs[0].task.id
+
+
 def test_task_socket_claim_tag_wildcard(storage_socket: SQLAlchemySocket, session: Session):
     mname1 = ManagerName(cluster="test_cluster", hostname="a_host1", uuid="1234-5678-1234-5678")
     mprog1 = {"qcengine": ["unknown"], "psi4": ["unknown"], "geometric": ["v3.0"]}
@@ -409,6 +460,51 @@ def test_task_socket_claim_tag_wildcard_strict(postgres_server, pytestconfig):
         assert len(tasks) == 0
 
 
+def test_task_socket_generate_task_specifications(storage_socket: SQLAlchemySocket, session: Session):
+    # Function kwargs generated ahead of time are the same as those generated when claiming
+    mname1 = ManagerName(cluster="test_cluster", hostname="a_host1", uuid="1234-5678-1234-5678")
+    mprog1 = {"qcengine": ["unknown"], "psi4": ["unknown"], "geometric": ["v3.0"]}
+    storage_socket.managers.activate(
+        name_data=mname1,
+        manager_version="v2.0",
+        username="bill",
+        programs=mprog1,
+        tags=["*"],
+    )
+
+    meta, id_1 = storage_socket.records.singlepoint.add(
+        [molecule_1], input_spec_1, "tag1", PriorityEnum.normal, None, None, True
+    )
+    meta, id_2 = storage_socket.records.optimization.add(
+        [molecule_4], input_spec_4, "tag1", PriorityEnum.normal, None, None, True
+    )
+
+    # Claim one task, generating the kwargs on the fly
+    tasks_1 = storage_socket.tasks.claim_tasks(mname1.fullname, mprog1, ["*"], 1)
+    assert len(tasks_1) == 1
+
+    # Only the unclaimed task still needs generating
+    n_generated = storage_socket.tasks.generate_task_specifications(session)
+    assert n_generated == 1
+    assert storage_socket.tasks.generate_task_specifications(session) == 0
+
+    session.expire_all()
+    rec_2 = session.get(BaseRecordORM, id_2[0])
+    assert rec_2.task.function is not None
+    assert rec_2.task.function_kwargs_compressed is not None
+
+    tasks_2 = storage_socket.tasks.claim_tasks(mname1.fullname, mprog1, ["*"], 1)
+    assert len(tasks_2) == 1
+    assert tasks_2[0]["record_id"] == id_2[0]
+    assert tasks_2[0]["function"] == rec_2.task.function
+    assert tasks_2[0]["function_kwargs_compressed"] == rec_2.task.function_kwargs_compressed
+
+    # Generated kwargs are what the record socket generates
+    rec_socket = storage_socket.records.optimization
+    task_spec = rec_socket.generate_task_specifications(session, id_2)[0]
+    assert decompress(tasks_2[0]["function_kwargs_compressed"], CompressionEnum.zstd) == task_spec["function_kwargs"]
+
+
 def test_task_socket_claim_program(storage_socket: SQLAlchemySocket, session: Session):
     mname1 = ManagerName(cluster="test_cluster", hostname="a_host1", uuid="1234-5678-1234-5678")
 
@@ -10,8 +10,11 @@ from qcelemental.models import ComputeError, FailedOperation
 
 from qcfractal.components.managers.db_models import ComputeManagerORM
 from qcfractal.components.record_db_models import BaseRecordORM
+from qcfractal.components.optimization.record_db_models import OptimizationRecordORM
+from qcfractal.components.optimization.testing_helpers import submit_test_data as submit_opt_test_data
 from qcfractal.components.singlepoint.testing_helpers import load_test_data, submit_test_data
 from qcfractalcompute.compress import compress_result
+from qcportal.compression import CompressionEnum, compress, decompress
 from qcportal.record_models import PriorityEnum, RecordStatusEnum, OutputTypeEnum
 from qcportal.utils import now_at_utc
 
@@ -144,6 +147,111 @@ def test_task_socket_fullworkflow_error(snowflake: QCATestingSnowflake):
         assert manager.claimed == 2
 
 
+def test_task_socket_fullworkflow_mixed(snowflake: QCATestingSnowflake):
+    # Return successful results of different record types along with failures in a single call
+    storage_socket = snowflake.get_storage_socket()
+    mname, mid = snowflake.activate_manager()
+    activated_manager_programs = snowflake.activated_manager_programs()
+
+    id1, result_data1 = submit_test_data(storage_socket, "sp_psi4_benzene_energy_1")
+    id2, result_data2 = submit_test_data(storage_socket, "sp_psi4_fluoroethane_wfn")
+    id3, result_data3 = submit_test_data(storage_socket, "sp_psi4_water_energy")
+    id4, result_data4 = submit_opt_test_data(storage_socket, "opt_psi4_benzene")
+    id5, result_data5 = submit_opt_test_data(storage_socket, "opt_psi4_methane_sometraj")
+
+    fop = FailedOperation(error=ComputeError(error_type="test_error", error_message="this is a test error"))
+    result_map = {id1: result_data1, id2: result_data2, id3: fop, id4: result_data4, id5: result_data5}
+
+    tasks = storage_socket.tasks.claim_tasks(mname.fullname, activated_manager_programs, ["*"])
+    assert len(tasks) == 5
+
+    rmeta = storage_socket.tasks.update_finished(
+        mname.fullname, {t["id"]: compress_result(result_map[t["record_id"]].dict()) for t in tasks}
+    )
+
+    assert rmeta.n_accepted == 5
+    assert rmeta.n_rejected == 0
+
+    with storage_socket.session_scope() as session:
+        for rec_id in [id1, id2, id4, id5]:
+            rec = session.get(BaseRecordORM, rec_id)
+            assert rec.status == RecordStatusEnum.complete
+            assert rec.task is None
+            assert len(rec.compute_history) == 1
+            assert rec.compute_history[0].status == RecordStatusEnum.complete
+            assert OutputTypeEnum.stdout in rec.compute_history[0].outputs
+
+        for rec_id, result in [(id1, result_data1), (id2, result_data2)]:
+            rec = session.get(BaseRecordORM, rec_id)
+            assert rec.properties["return_energy"] == result.properties.return_energy
+
+        rec = session.get(BaseRecordORM, id3)
+        assert rec.status == RecordStatusEnum.error
+        assert rec.task is not None
+
+        for rec_id, result in [(id4, result_data4), (id5, result_data5)]:
+            rec = session.get(OptimizationRecordORM, rec_id)
+            assert rec.final_molecule_id is not None
+            assert rec.energies == result.energies
+            assert len(rec.trajectory) == len(result.trajectory)
+
+        manager = session.get(ComputeManagerORM, mid)
+        assert manager.successes == 4
+        assert manager.failures == 1
+        assert manager.rejected == 0
+
+
+def test_task_socket_fullworkflow_bulk_fallback(snowflake: QCATestingSnowflake):
+    # One result that can't be stored in a batch of successful results. The batch is then
+    # stored one result at a time, so only the bad result is rejected
+    storage_socket = snowflake.get_storage_socket()
+    mname, mid = snowflake.activate_manager()
+    activated_manager_programs = snowflake.activated_manager_programs()
+
+    id1, result_data1 = submit_test_data(storage_socket, "sp_psi4_benzene_energy_1")
+    id2, result_data2 = submit_test_data(storage_socket, "sp_psi4_fluoroethane_wfn")
+    id3, result_data3 = submit_test_data(storage_socket, "sp_psi4_water_energy")
+    result_map = {id1: result_data1, id2: result_data2, id3: result_data3}
+
+    tasks = storage_socket.tasks.claim_tasks(mname.fullname, activated_manager_programs, ["*"])
+    assert len(tasks) == 3
+
+    results_compressed = {t["id"]: compress_result(result_map[t["record_id"]].dict()) for t in tasks}
+
+    # Corrupt the compression type of the stdout of the second record
+    bad_task_id = next(t["id"] for t in tasks if t["record_id"] == id2)
+    bad_result = decompress(results_compressed[bad_task_id], CompressionEnum.zstd)
+    bad_result["extras"]["_qcfractal_compressed_outputs"]["stdout"]["compression_type"] = "not_a_compression_type"
+    results_compressed[bad_task_id], _, _ = compress(bad_result, CompressionEnum.zstd)
+
+    rmeta = storage_socket.tasks.update_finished(mname.fullname, results_compressed)
+
+    assert rmeta.n_accepted == 2
+    assert rmeta.rejected_info == [(bad_task_id, "Internal server error")]
+    assert sorted(rmeta.accepted_ids) == sorted(t["id"] for t in tasks if t["id"] != bad_task_id)
+
+    with storage_socket.session_scope() as session:
+        for rec_id in [id1, id3]:
+            rec = session.get(BaseRecordORM, rec_id)
+            assert rec.status == RecordStatusEnum.complete
+            assert rec.task is None
+            assert len(rec.compute_history) == 1
+            assert rec.properties["return_energy"] == result_map[rec_id].properties.return_energy
+            assert OutputTypeEnum.stdout in rec.compute_history[0].outputs
+
+        rec = session.get(BaseRecordORM, id2)
+        assert rec.status == RecordStatusEnum.error
+        assert rec.task is not None
+        assert rec.compute_history[-1].status == RecordStatusEnum.error
+        err = rec.compute_history[-1].outputs[OutputTypeEnum.error].get_output()
+        assert err["error_type"] == "internal_fractal_error"
+
+        manager = session.get(ComputeManagerORM, mid)
+        assert manager.successes == 2
+        assert manager.failures == 0
+        assert manager.rejected == 1
+
+
 def test_task_socket_fullworkflow_error_retry(snowflake: QCATestingSnowflake):
     storage_socket = snowflake.get_storage_socket()
     mname, mid = snowflake.activate_manager()
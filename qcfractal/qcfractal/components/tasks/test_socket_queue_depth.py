@@ -0,0 +1,108 @@
+"""
+Tests the queue depth summary of the task queue
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from qcarchivetesting.testing_classes import QCATestingSnowflake
+from qcfractal.components.optimization.testing_helpers import load_test_data as load_opt_test_data
+from qcfractal.components.singlepoint.testing_helpers import load_test_data as load_sp_test_data
+from qcfractal.components.tasks.db_models import TaskQueueDepthDeltaORM
+from qcportal.managers import ManagerName
+from qcportal.record_models import PriorityEnum
+
+if TYPE_CHECKING:
+    from qcfractal.db_socket import SQLAlchemySocket
+    from sqlalchemy.orm.session import Session
+
+input_spec_1, molecule_1, _ = load_sp_test_data("sp_psi4_water_energy")
+input_spec_2, molecule_2, _ = load_sp_test_data("sp_psi4_water_gradient")
+input_spec_3, molecule_3, _ = load_sp_test_data("sp_psi4_water_hessian")
+input_spec_4, molecule_4, _ = load_opt_test_data("opt_psi4_benzene")
+input_spec_5, molecule_5, _ = load_sp_test_data("sp_rdkit_benzene_energy")
+
+
+def _depth_dict(depth):
+    return {(x["tag"], tuple(sorted(x["required_programs"]))): x["n_waiting"] for x in depth}
+
+
+def test_task_socket_queue_depth(storage_socket: SQLAlchemySocket, session: Session):
+    mname1 = ManagerName(cluster="test_cluster", hostname="a_host1", uuid="1234-5678-1234-5678")
+    mprog1 = {"qcengine": ["unknown"], "psi4": ["unknown"], "geometric": ["v3.0"], "rdkit": ["v1.0"]}
+    storage_socket.managers.activate(
+        name_data=mname1,
+        manager_version="v2.0",
+        username="bill",
+        programs=mprog1,
+        tags=["*"],
+    )
+
+    assert storage_socket.tasks.get_queue_depth() == []
+
+    storage_socket.records.singlepoint.add(
+        [molecule_1, molecule_4], input_spec_1, "tag1", PriorityEnum.normal, None, None, True
+    )
+    storage_socket.records.singlepoint.add([molecule_3], input_spec_3, "tag2", PriorityEnum.high, None, None, True)
+    storage_socket.records.optimization.add([molecule_4], input_spec_4, "tag1", PriorityEnum.normal, None, None, True)
+    meta, id_5 = storage_socket.records.singlepoint.add(
+        [molecule_5], input_spec_5, "tag1", PriorityEnum.normal, None, None, True
+    )
+
+    expected = {
+        ("tag1", ("psi4", "qcengine")): 2,
+        ("tag2", ("psi4", "qcengine")): 1,
+        ("tag1", ("geometric", "psi4", "qcengine")): 1,
+        ("tag1", ("qcengine", "rdkit")): 1,
+    }
+    assert _depth_dict(storage_socket.tasks.get_queue_depth()) == expected
+
+    # Claiming removes from the queue depth
+    tasks = storage_socket.tasks.claim_tasks(mname1.fullname, mprog1, ["*"], 1)
+    assert len(tasks) == 1
+    del expected[("tag2", ("psi4", "qcengine"))]
+    assert _depth_dict(storage_socket.tasks.get_queue_depth()) == expected
+
+    # Folding the changes into the depth table does not change anything
+    storage_socket.tasks.update_queue_depth(session)
+    session.commit()
+    assert session.query(TaskQueueDepthDeltaORM).count() == 0
+    assert _depth_dict(storage_socket.tasks.get_queue_depth()) == expected
+
+    # Cancelling, then changing the tag of a record
+    storage_socket.records.cancel(id_5)
+    del expected[("tag1", ("qcengine", "rdkit"))]
+    assert _depth_dict(storage_socket.tasks.get_queue_depth()) == expected
+
+    storage_socket.records.uncancel(id_5)
+    storage_socket.records.modify_generic(id_5, None, tag="tag3")
+    expected[("tag3", ("qcengine", "rdkit"))] = 1
+    assert _depth_dict(storage_socket.tasks.get_queue_depth()) == expected
+
+    # Resetting the claimed task puts it back
+    storage_socket.records.reset_running([tasks[0]["record_id"]])
+    expected[("tag2", ("psi4", "qcengine"))] = 1
+    assert _depth_dict(storage_socket.tasks.get_queue_depth()) == expected
+
+    storage_socket.tasks.update_queue_depth(session)
+    session.commit()
+    assert _depth_dict(storage_socket.tasks.get_queue_depth()) == expected
+
+
+def test_task_client_queue_depth(snowflake: QCATestingSnowflake):
+    storage_socket = snowflake.get_storage_socket()
+    storage_socket.records.singlepoint.add(
+        [molecule_1, molecule_4], input_spec_1, "tag1", PriorityEnum.normal, None, None, True
+    )
+
+    client = snowflake.client()
+    depth = client.get_task_queue_depth()
+    assert len(depth) == 1
+    assert depth[0].tag == "tag1"
+    assert sorted(depth[0].required_programs) == ["psi4", "qcengine"]
+    assert depth[0].n_waiting == 2
+
+    mname1 = ManagerName(cluster="test_cluster", hostname="a_host1", uuid="1234-5678-1234-5678")
+    mclient1 = snowflake.manager_client(mname1)
+    assert mclient1.get_queue_depth() == depth
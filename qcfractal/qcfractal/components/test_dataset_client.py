@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
 from typing import TYPE_CHECKING, Optional
 
+import numpy as np
 import pytest
 
 from qcfractal.components.singlepoint.testing_helpers import load_test_data, run_test_data
 from qcportal import PortalRequestError
+from qcportal.dataset_models import DatasetFetchRecordPropertiesBody
 from qcportal.molecules import Molecule
-from qcportal.record_models import PriorityEnum
+from qcportal.record_models import PriorityEnum, RecordStatusEnum
 from qcportal.singlepoint import SinglepointDataset
 
 if TYPE_CHECKING:
@@ -236,3 +239,115 @@ def test_dataset_client_get_computed_properties(snowflake: QCATestingSnowflake):
     assert "spec_1" in computed_prop
     assert "scf_total_energy" in computed_prop["spec_1"]
     assert "calcinfo_natom" in computed_prop["spec_1"]
+
+
+def test_dataset_client_get_record_properties(snowflake: QCATestingSnowflake):
+    snowflake_client = snowflake.client()
+    storage_socket = snowflake.get_storage_socket()
+    manager_name, _ = snowflake.activate_manager()
+
+    ds: SinglepointDataset = snowflake_client.add_dataset("singlepoint", "Test dataset")
+
+    input_spec, molecule, _ = load_test_data("sp_psi4_peroxide_energy_wfn")
+    record_id = run_test_data(storage_socket, manager_name, "sp_psi4_peroxide_energy_wfn")
+
+    # One complete record, and one that is waiting
+    ds.add_specification("spec_1", input_spec)
+    ds.add_entry(name="test_molecule", molecule=molecule)
+    ds.add_entry(name="test_molecule_2", molecule=Molecule(symbols=["He"], geometry=[0, 0, 0]))
+    ds.submit()
+
+    record = snowflake_client.get_records(record_id)
+    energy = record.properties["scf_total_energy"]
+    natom = record.properties["calcinfo_natom"]
+
+    df = ds.get_record_properties(["scf_total_energy", "calcinfo_natom", "does_not_exist"])
+    assert len(df) == 2
+    assert list(df.columns) == [
+        "entry",
+        "specification",
+        "record_id",
+        "scf_total_energy",
+        "calcinfo_natom",
+        "does_not_exist",
+    ]
+    assert df["scf_total_energy"].dtype == np.float64
+    assert df["does_not_exist"].isna().all()
+
+    df = df.set_index("entry")
+    assert df.loc["test_molecule", "record_id"] == record_id
+    assert df.loc["test_molecule", "scf_total_energy"] == energy
+    assert df.loc["test_molecule", "calcinfo_natom"] == natom
+    assert np.isnan(df.loc["test_molecule_2", "scf_total_energy"])
+
+    df = ds.get_record_properties("scf_total_energy", status=RecordStatusEnum.complete)
+    assert len(df) == 1
+    assert df["entry"][0] == "test_molecule"
+
+    df = ds.get_record_properties("scf_total_energy", entry_names=["test_molecule_2"])
+    assert df["entry"].tolist() == ["test_molecule_2"]
+
+    # Same result as compiling values from the full records
+    props_df = ds.get_properties_df(["scf_total_energy", "calcinfo_natom"])
+    assert props_df[("spec_1", "scf_total_energy")]["test_molecule"] == energy
+    assert props_df[("spec_1", "calcinfo_natom")]["test_molecule"] == natom
+    assert list(props_df.index) == ["test_molecule"]
+
+
+def test_dataset_client_get_record_properties_limit(snowflake: QCATestingSnowflake):
+    snowflake_client = snowflake.client()
+
+    ds: SinglepointDataset = snowflake_client.add_dataset("singlepoint", "Test dataset")
+    limit = snowflake_client.api_limits["get_dataset_properties"]
+
+    body = DatasetFetchRecordPropertiesBody(
+        property_names=["scf_total_energy"],
+        entry_names=[f"entry_{i}" for i in range(limit + 1)],
+        specification_names=["spec_1"],
+    )
+
+    with pytest.raises(PortalRequestError, match="limit is"):
+        snowflake_client.make_request(
+            "post", f"api/v1/datasets/singlepoint/{ds.id}/records/properties/bulkFetch", None, body=body
+        )
+
+
+def test_dataset_client_record_changes(snowflake_client: PortalClient):
+    ds: SinglepointDataset = snowflake_client.add_dataset("singlepoint", "Test dataset")
+
+    input_spec, molecule, _ = load_test_data("sp_psi4_peroxide_energy_wfn")
+    ds.add_specification("spec_1", input_spec)
+    ds.add_entry(name="test_molecule", molecule=molecule)
+    ds.add_entry(name="test_molecule_2", molecule=Molecule(symbols=["He"], geometry=[0, 0, 0]))
+    ds.submit()
+
+    # Sets the high-water mark
+    ds.fetch_records()
+    since = ds._cache_data.get_metadata("record_changes_since")
+    assert since is not None
+
+    # Nothing has changed since the start of the margin
+    changes, _ = ds._fetch_record_changes(datetime.now(tz=timezone.utc))
+    assert changes == []
+
+    # Records modified before the mark are still reported (within the margin)
+    changes, _ = ds._fetch_record_changes(datetime.fromtimestamp(since, tz=timezone.utc))
+    assert {x[0] for x in changes} == {"test_molecule", "test_molecule_2"}
+
+    # Only the modified record is fetched again
+    rec = ds.get_record("test_molecule", "spec_1")
+    rec_2 = ds.get_record("test_molecule_2", "spec_1")
+    time_0 = datetime.now(tz=timezone.utc)
+    snowflake_client.cancel_records(rec.id)
+
+    changes, _ = ds._fetch_record_changes(time_0)
+    assert [(x[0], x[2], x[3]) for x in changes] == [("test_molecule", rec.id, RecordStatusEnum.cancelled)]
+
+    records = {e: r for e, _, r in ds.iterate_records()}
+    assert records["test_molecule"].status == RecordStatusEnum.cancelled
+    assert records["test_molecule_2"].status == RecordStatusEnum.waiting
+    assert ds._cache_data.get_metadata("record_changes_since") > since
+
+    # The unchanged record stayed in the cache
+    assert ds._cache_data.get_dataset_record("test_molecule_2", "spec_1").modified_on == rec_2.modified_on
+    assert ds.get_record("test_molecule", "spec_1").status == RecordStatusEnum.cancelled
@@ -4,6 +4,8 @@ Tests the general record socket
 
 from __future__ import annotations
 
+from typing import Any, Dict, List, Optional
+
 import pytest
 
 from qcarchivetesting import test_users
@@ -14,14 +16,20 @@ from qcfractal.components.optimization.testing_helpers import (
 )
 from qcfractal.components.record_db_models import BaseRecordORM
 from qcfractal.components.singlepoint.testing_helpers import (
+    load_test_data as load_sp_test_data,
     run_test_data as run_sp_test_data,
     submit_test_data as submit_sp_test_data,
 )
 from qcfractal.components.testing_helpers import populate_records_status
 from qcfractal.components.torsiondrive.testing_helpers import submit_test_data as submit_td_test_data
 from qcportal import PortalRequestError
+from qcportal.base_models import CommonBulkGetBody
+from qcportal.compression import compression_dictionaries_header
+from qcportal.dataset_models import load_dataset_view
 from qcportal.molecules import Molecule
-from qcportal.record_models import PriorityEnum, RecordStatusEnum
+from qcportal.record_models import PriorityEnum, RecordStatusEnum, OutputTypeEnum
+from qcportal.serialization import serialize, deserialize_stream, get_stream_content_type
+from qcportal.singlepoint import SinglepointDatasetNewEntry
 from qcportal.utils import now_at_utc
 
 
@@ -68,6 +76,42 @@ def test_record_client_get_missing(snowflake: QCATestingSnowflake):
     assert r[2].id == all_id[1]
 
 
+def test_record_client_get_streaming(snowflake: QCATestingSnowflake):
+    storage_socket = snowflake.get_storage_socket()
+    snowflake_client = snowflake.client()
+
+    id1, _ = submit_sp_test_data(storage_socket, "sp_psi4_benzene_energy_1")
+    id2, _ = submit_opt_test_data(storage_socket, "opt_psi4_benzene")
+    all_id = [id1, 9999, id2]
+
+    # Lists are streamed, and the elements can be read one at a time
+    body = CommonBulkGetBody(ids=all_id, missing_ok=True)
+    expected = snowflake_client.make_request(
+        "post", "api/v1/records/bulkGet", List[Optional[Dict[str, Any]]], body=body
+    )
+
+    r = snowflake_client._request(
+        "post",
+        "api/v1/records/bulkGet",
+        body=serialize(body, snowflake_client.encoding),
+        additional_headers={"Accept": get_stream_content_type(snowflake_client.encoding)},
+        stream=True,
+    )
+    assert r.headers["Content-Type"] == get_stream_content_type(snowflake_client.encoding)
+    assert list(deserialize_stream(r.iter_content(chunk_size=7), r.headers["Content-Type"])) == expected
+
+    it = snowflake_client.make_streaming_request("post", "api/v1/records/bulkGet", Optional[Dict[str, Any]], body=body)
+    assert list(it) == expected
+
+    # Errors are still raised
+    with pytest.raises(PortalRequestError, match=r"Could not find all requested"):
+        list(
+            snowflake_client.make_streaming_request(
+                "post", "api/v1/records/bulkGet", Dict[str, Any], body={"ids": all_id}
+            )
+        )
+
+
 def test_record_client_get_empty(snowflake: QCATestingSnowflake):
     storage_socket = snowflake.get_storage_socket()
     snowflake_client = snowflake.client()
@@ -79,6 +123,70 @@ def test_record_client_get_empty(snowflake: QCATestingSnowflake):
     assert r == []
 
 
+def test_record_client_output_dictionaries(snowflake: QCATestingSnowflake, tmp_path):
+    storage_socket = snowflake.get_storage_socket()
+    activated_manager_name, _ = snowflake.activate_manager()
+    snowflake_client = snowflake.client()
+
+    test_names = [
+        "sp_psi4_benzene_energy_1",
+        "sp_psi4_benzene_energy_2",
+        "sp_psi4_benzene_energy_3",
+        "sp_psi4_water_energy",
+        "sp_psi4_water_gradient",
+        "sp_psi4_water_hessian",
+        "sp_psi4_peroxide_energy_wfn",
+        "sp_psi4_fluoroethane_wfn",
+    ]
+
+    record_ids = [run_sp_test_data(storage_socket, activated_manager_name, name) for name in test_names]
+    expected = {r.id: r.stdout for r in snowflake_client.get_records(record_ids)}
+
+    all_info = storage_socket.records.train_output_dictionaries(dictionary_size=4096)
+    dict_id = all_info[0]["id"]
+
+    with storage_socket.session_scope() as session:
+        assert storage_socket.records.recompress_outputs(session) == len(test_names)
+
+    # Outputs are sent as stored, and the client downloads the dictionary when needed
+    for include in (None, ["outputs"]):
+        for r in snowflake_client.get_records(record_ids, include=include):
+            assert r.compute_history[-1].outputs[OutputTypeEnum.stdout].compression_dictionary_id == dict_id
+            assert r.stdout == expected[r.id]
+
+    assert list(snowflake_client._compression_dictionaries) == [dict_id]
+
+    # Older clients do not send the header, and get outputs recompressed without the dictionary
+    old_client = snowflake.client()
+    del old_client._req_session.headers[compression_dictionaries_header]
+
+    for include in (None, ["outputs"]):
+        for r in old_client.get_records(record_ids, include=include):
+            assert r.compute_history[-1].outputs[OutputTypeEnum.stdout].compression_dictionary_id is None
+            assert r.stdout == expected[r.id]
+
+    assert old_client._compression_dictionaries == {}
+
+    # Dataset views created through the client can be read without the server
+    ds = snowflake_client.add_dataset("singlepoint", "Test dataset")
+    view_names = ["sp_psi4_benzene_energy_1", "sp_psi4_benzene_energy_2", "sp_psi4_benzene_energy_3"]
+    for name in view_names:
+        input_spec, molecule, _ = load_sp_test_data(name)
+        ds.add_specification(name, input_spec)
+    ds.add_entries([SinglepointDatasetNewEntry(name="benzene", molecule=molecule)])
+    ds.submit()
+
+    view_path = str(tmp_path / "dataset_view.sqlite")
+    snowflake_client.create_dataset_view(ds.id, view_path, include=["outputs"])
+
+    view = load_dataset_view(view_path)
+    for name in view_names:
+        r = view.get_record("benzene", name)
+        assert r.id in expected
+        assert r.compute_history[-1].outputs[OutputTypeEnum.stdout].compression_dictionary_id is None
+        assert r.stdout == expected[r.id]
+
+
 def test_record_client_query_parents_children(snowflake: QCATestingSnowflake):
     storage_socket = snowflake.get_storage_socket()
     activated_manager_name, _ = snowflake.activate_manager()
@@ -271,7 +379,7 @@ def test_record_client_modify_service(snowflake: QCATestingSnowflake):
         storage_socket.services.iterate_services(s)
 
         svc_id = s.get(BaseRecordORM, rec_id).service.id
-        storage_socket.services._iterate_service(s, svc_id)
+        storage_socket.services._iterate_service(s, svc_id, initialize=True)
 
     with storage_socket.session_scope() as session:
         rec = session.get(BaseRecordORM, rec_id)
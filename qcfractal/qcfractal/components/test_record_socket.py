@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from sqlalchemy import select, func
+
+from qcfractal.components.record_db_models import OutputStoreChunkORM, OutputStoreORM, NativeFileORM
+from qcfractal.components.singlepoint.record_db_models import SinglepointRecordORM
+from qcfractal.components.singlepoint.testing_helpers import run_test_data
+from qcportal.compression import decompress, get_zstd_dictionary
+from qcportal.record_models import OutputTypeEnum
+
+if TYPE_CHECKING:
+    from qcfractal.db_socket import SQLAlchemySocket
+    from qcportal.managers import ManagerName
+
+
+def test_record_socket_append_output(storage_socket: SQLAlchemySocket, activated_manager_name: ManagerName):
+    record_id = run_test_data(storage_socket, activated_manager_name, "sp_psi4_water_energy")
+
+    with storage_socket.session_scope() as session:
+        record = session.get(SinglepointRecordORM, record_id)
+        history_id = record.compute_history[-1].id
+
+        # Create a new output, then append to it
+        storage_socket.records.append_output(session, record, OutputTypeEnum.stderr, "line 1\n")
+        storage_socket.records.append_output(session, record, OutputTypeEnum.stderr, "line 2\n")
+        storage_socket.records.append_output(session, record, OutputTypeEnum.stderr, "")
+        storage_socket.records.append_output(session, record, OutputTypeEnum.stderr, "line 3\n")
+
+    expected = "line 1\nline 2\nline 3\n"
+
+    with storage_socket.session_scope() as session:
+        n_chunks = session.execute(select(func.count()).select_from(OutputStoreChunkORM)).scalar_one()
+        assert n_chunks == 2
+
+    # Getting the full record merges the chunks, without changing what is stored
+    rec = storage_socket.records.get([record_id], include=["**", "outputs"])[0]
+    out = rec["compute_history"][-1]["outputs"][OutputTypeEnum.stderr]
+    assert decompress(out["data"], out["compression_type"]) == expected
+
+    with storage_socket.session_scope() as session:
+        record = session.get(SinglepointRecordORM, record_id)
+        assert record.compute_history[-1].outputs[OutputTypeEnum.stderr].get_output() == expected
+
+    with storage_socket.session_scope() as session:
+        n_chunks = session.execute(select(func.count()).select_from(OutputStoreChunkORM)).scalar_one()
+        assert n_chunks == 2
+
+    # Getting the raw data merges the chunks into the stored output
+    sp_socket = storage_socket.records.singlepoint
+    data, ctype, dictionary_id = sp_socket.get_single_output_rawdata(record_id, history_id, OutputTypeEnum.stderr)
+    assert dictionary_id is None
+    assert decompress(data, ctype) == expected
+
+    with storage_socket.session_scope() as session:
+        n_chunks = session.execute(select(func.count()).select_from(OutputStoreChunkORM)).scalar_one()
+        assert n_chunks == 0
+
+        stmt = select(OutputStoreORM).where(OutputStoreORM.history_id == history_id)
+        out_orm = session.execute(stmt.where(OutputStoreORM.output_type == OutputTypeEnum.stderr)).scalar_one()
+        assert out_orm.data == data
+        assert out_orm.get_output() == expected
+
+    # Appending after merging
+    with storage_socket.session_scope() as session:
+        record = session.get(SinglepointRecordORM, record_id)
+        storage_socket.records.append_output(session, record, OutputTypeEnum.stderr, "line 4\n")
+
+    expected += "line 4\n"
+    assert sp_socket.get_single_output_uncompressed(record_id, history_id, OutputTypeEnum.stderr) == expected
+
+    with storage_socket.session_scope() as session:
+        n_chunks = session.execute(select(func.count()).select_from(OutputStoreChunkORM)).scalar_one()
+        assert n_chunks == 0
+
+        # Nothing left to compact
+        record = session.get(SinglepointRecordORM, record_id)
+        storage_socket.records.compact_outputs(session, record)
+
+    data, ctype, dictionary_id = sp_socket.get_single_output_rawdata(record_id, history_id, OutputTypeEnum.stderr)
+    assert dictionary_id is None
+    assert decompress(data, ctype) == expected
+
+
+def test_record_socket_output_dictionaries(storage_socket: SQLAlchemySocket, activated_manager_name: ManagerName):
+    test_names = [
+        "sp_psi4_benzene_energy_1",
+        "sp_psi4_benzene_energy_2",
+        "sp_psi4_benzene_energy_3",
+        "sp_psi4_water_energy",
+        "sp_psi4_water_gradient",
+        "sp_psi4_water_hessian",
+        "sp_psi4_peroxide_energy_wfn",
+        "sp_psi4_fluoroethane_wfn",
+    ]
+
+    record_ids = [run_test_data(storage_socket, activated_manager_name, name) for name in test_names]
+    expected = {}
+    with storage_socket.session_scope() as session:
+        for record_id in record_ids:
+            record = session.get(SinglepointRecordORM, record_id)
+            expected[record_id] = record.compute_history[-1].outputs[OutputTypeEnum.stdout].get_output()
+
+    # Nothing to do without dictionaries
+    with storage_socket.session_scope() as session:
+        assert storage_socket.records.recompress_outputs(session) == 0
+
+    # Only psi4 stdout exists
+    all_info = storage_socket.records.train_output_dictionaries(dictionary_size=4096)
+    assert len(all_info) == 1
+    assert all_info[0]["output_type"] == OutputTypeEnum.stdout
+    assert all_info[0]["program"] == "psi4"
+    assert all_info[0]["n_samples"] == len(test_names)
+    assert all_info[0]["version"] == 1
+    assert all_info[0]["samples_dictionary_size"] < all_info[0]["samples_compressed_size"]
+    dict_id_1 = all_info[0]["id"]
+
+    # Can't train anything
+    all_info = storage_socket.records.train_output_dictionaries(programs=["rdkit"])
+    assert all_info == []
+
+    # Existing outputs are not affected until they are recompressed
+    with storage_socket.session_scope() as session:
+        assert storage_socket.records.recompress_outputs(session) == len(test_names)
+        assert storage_socket.records.recompress_outputs(session) == 0
+
+        outputs = session.execute(select(OutputStoreORM)).scalars().all()
+        assert all(o.compression_dictionary_id == dict_id_1 for o in outputs)
+
+    # Outputs are sent as stored, along with the id of the dictionary needed to decompress them
+    zstd_dict_1 = get_zstd_dictionary(storage_socket.records.get_compression_dictionary(dict_id_1))
+
+    sp_socket = storage_socket.records.singlepoint
+    for record_id in record_ids:
+        with storage_socket.session_scope() as session:
+            record = session.get(SinglepointRecordORM, record_id)
+            history_id = record.compute_history[-1].id
+            assert record.compute_history[-1].outputs[OutputTypeEnum.stdout].get_output() == expected[record_id]
+
+        data, ctype, dictionary_id = sp_socket.get_single_output_rawdata(record_id, history_id, OutputTypeEnum.stdout)
+        assert dictionary_id == dict_id_1
+        assert decompress(data, ctype, zstd_dict_1) == expected[record_id]
+
+        stdout = sp_socket.get_single_output_uncompressed(record_id, history_id, OutputTypeEnum.stdout)
+        assert stdout == expected[record_id]
+
+        rec = storage_socket.records.get([record_id], include=["**", "outputs"])[0]
+        out = rec["compute_history"][-1]["outputs"][OutputTypeEnum.stdout]
+        assert out["compression_dictionary_id"] == dict_id_1
+        assert decompress(out["data"], out["compression_type"], zstd_dict_1) == expected[record_id]
+
+        # Recompressed without the dictionary (for clients without dictionary support)
+        storage_socket.records.remove_record_output_dictionaries([rec])
+        assert "compression_dictionary_id" not in out
+        assert decompress(out["data"], out["compression_type"]) == expected[record_id]
+
+    # Training the same dictionary again doesn't improve anything
+    all_info = storage_socket.records.train_output_dictionaries(dictionary_size=4096)
+    assert all_info[0]["version"] is None
+    assert all_info[0]["message"] == "Dictionary does not improve compression"
+
+    # A new version (bigger dictionary). Outputs are moved to the new version when recompressed
+    all_info = storage_socket.records.train_output_dictionaries(dictionary_size=16384)
+    assert all_info[0]["version"] == 2
+    dict_id_2 = all_info[0]["id"]
+
+    with storage_socket.session_scope() as session:
+        assert storage_socket.records.recompress_outputs(session, batch_size=3) == len(test_names)
+
+    dict_info = storage_socket.records.get_output_dictionaries()
+    assert [(d["id"], d["version"], d["n_outputs"]) for d in dict_info] == [
+        (dict_id_1, 1, 0),
+        (dict_id_2, 2, len(test_names)),
+    ]
+
+    # Outputs with appended chunks are merged and sent without a dictionary
+    with storage_socket.session_scope() as session:
+        record = session.get(SinglepointRecordORM, record_ids[0])
+        history_id = record.compute_history[-1].id
+        storage_socket.records.append_output(session, record, OutputTypeEnum.stdout, "extra line\n")
+
+    rec = storage_socket.records.get([record_ids[0]], include=["**", "outputs"])[0]
+    out = rec["compute_history"][-1]["outputs"][OutputTypeEnum.stdout]
+    assert out["compression_dictionary_id"] is None
+    assert decompress(out["data"], out["compression_type"]) == expected[record_ids[0]] + "extra line\n"
+
+    # Compacting outputs also uses the dictionary
+    with storage_socket.session_scope() as session:
+        record = session.get(SinglepointRecordORM, record_ids[0])
+        storage_socket.records.compact_outputs(session, record)
+
+    with storage_socket.session_scope() as session:
+        record = session.get(SinglepointRecordORM, record_ids[0])
+        out_orm = record.compute_history[-1].outputs[OutputTypeEnum.stdout]
+        assert out_orm.compression_dictionary_id == dict_id_2
+        assert out_orm.get_output() == expected[record_ids[0]] + "extra line\n"
+
+    # Merging when reading the raw data does not use the dictionary
+    with storage_socket.session_scope() as session:
+        record = session.get(SinglepointRecordORM, record_ids[0])
+        storage_socket.records.append_output(session, record, OutputTypeEnum.stdout, "another line\n")
+
+    data, ctype, dictionary_id = sp_socket.get_single_output_rawdata(record_ids[0], history_id, OutputTypeEnum.stdout)
+    assert dictionary_id is None
+    assert decompress(data, ctype) == expected[record_ids[0]] + "extra line\nanother line\n"
+
+
+def test_record_socket_recompress_cold_data(storage_socket: SQLAlchemySocket, activated_manager_name: ManagerName):
+    test_names = ["sp_psi4_benzene_energy_1", "sp_psi4_h2_b3lyp_nativefiles", "sp_rdkit_water_energy"]
+    for name in test_names:
+        run_test_data(storage_socket, activated_manager_name, name)
+
+    with storage_socket.session_scope() as session:
+        outputs = {o.id: o.get_output() for o in session.execute(select(OutputStoreORM)).scalars()}
+        native_files = {nf.id: nf.get_file() for nf in session.execute(select(NativeFileORM)).scalars()}
+
+    assert len(outputs) > 0
+    assert len(native_files) > 0
+
+    records_socket = storage_socket.records
+    cold_data_age = records_socket._recompress_cold_data_age
+    cold_data_level = records_socket._recompress_cold_data_level
+
+    try:
+        # Data was compressed by the manager at the default level, which is good enough
+        with storage_socket.session_scope() as session:
+            assert records_socket.recompress_cold_data(session) == 0
+
+        # Data is not cold yet
+        records_socket._recompress_cold_data_level = 19
+        with storage_socket.session_scope() as session:
+            assert records_socket.recompress_cold_data(session) == 0
+
+        records_socket._recompress_cold_data_age = 0
+        with storage_socket.session_scope() as session:
+            assert records_socket.recompress_cold_data(session, batch_size=2) == len(outputs) + len(native_files)
+            assert records_socket.recompress_cold_data(session) == 0
+    finally:
+        records_socket._recompress_cold_data_age = cold_data_age
+        records_socket._recompress_cold_data_level = cold_data_level
+
+    with storage_socket.session_scope() as session:
+        for o in session.execute(select(OutputStoreORM)).scalars():
+            assert o.compression_level == 19
+            assert o.get_output() == outputs[o.id]
+
+        for nf in session.execute(select(NativeFileORM)).scalars():
+            assert nf.compression_level == 19
+            assert nf.get_file() == native_files[nf.id]
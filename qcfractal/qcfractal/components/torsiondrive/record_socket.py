@@ -83,7 +83,6 @@ class TorsiondriveServiceState(BaseModel):
 
 # Meaningless, but unique to torsiondrives
 torsiondrive_insert_lock_id = 14200
-torsiondrive_spec_insert_lock_id = 14201
 
 
 class TorsiondriveRecordSocket(BaseRecordSocket):
@@ -186,24 +185,25 @@ class TorsiondriveRecordSocket(BaseRecordSocket):
         # All that matters is that position 1 for a particular key comes before position 2, etc
         complete_tasks = sorted(service_orm.dependencies, key=lambda x: x.extras["position"])
 
+        # Lookup the initial and final molecules of all the optimizations at once
+        mol_ids = []
+        for task in complete_tasks:
+            mol_ids.extend((task.record.initial_molecule_id, task.record.final_molecule_id))
+
+        geometries = self.root_socket.molecules.get_geometries(mol_ids, session=session)
+
         # Populate task results needed by the torsiondrive package
         task_results = {}
-        for task in complete_tasks:
+        for i, task in enumerate(complete_tasks):
             td_api_key = task.extras["td_api_key"]
             task_results.setdefault(td_api_key, [])
 
             # This is an ORM for an optimization
             opt_record = task.record
 
-            # Lookup molecules
-            initial_id = opt_record.initial_molecule_id
-            final_id = opt_record.final_molecule_id
-            mol_ids = [initial_id, final_id]
-            mol_data = self.root_socket.molecules.get(molecule_id=mol_ids, include=["geometry"], session=session)
-
             # Use plain lists rather than numpy arrays
-            initial_mol_geom = mol_data[0]["geometry"].tolist()
-            final_mol_geom = mol_data[1]["geometry"].tolist()
+            initial_mol_geom = geometries[2 * i].tolist()
+            final_mol_geom = geometries[2 * i + 1].tolist()
 
             task_results[td_api_key].append((initial_mol_geom, final_mol_geom, opt_record.energies[-1]))
 
@@ -396,7 +396,7 @@ class TorsiondriveRecordSocket(BaseRecordSocket):
                     TorsiondriveSpecificationORM.optimization_specification_id,
                 ),
                 (TorsiondriveSpecificationORM.id,),
-                torsiondrive_spec_insert_lock_id,
+                lock_id=None,
             )
 
             return meta, [x[0] for x in ids]
@@ -261,6 +261,12 @@ class APILimitConfig(ConfigBase):
     add_records: int = Field(500, description="Number of calculation records that can be added")
 
     get_dataset_entries: int = Field(2000, description="Number of dataset entries that can be retrieved")
+    get_dataset_properties: int = Field(
+        100000, description="Number of dataset records whose properties can be retrieved at once"
+    )
+    get_dataset_record_changes: int = Field(
+        100000, description="Number of modified dataset records that can be retrieved at once"
+    )
 
     get_molecules: int = Field(1000, description="Number of molecules that can be retrieved")
     add_molecules: int = Field(1000, description="Number of molecules that can be added")
@@ -301,6 +307,14 @@ class WebAPIConfig(ConfigBase):
         60 * 60 * 24, description="The time (in seconds) a refresh token is valid for. Default is 1 day"
     )
 
+    compress_responses: bool = Field(
+        True, description="Compress responses (with zstd or gzip) if the client accepts compressed responses"
+    )
+    compress_min_size: int = Field(4096, description="Minimum size of a response (in bytes) before it is compressed")
+    max_decompressed_request_size: int = Field(
+        1024**3, description="Maximum size of a compressed request body (in bytes) after it has been decompressed"
+    )
+
     extra_flask_options: Optional[Dict[str, Any]] = Field(
         None, description="Any additional options to pass directly to flask"
     )
@@ -396,7 +410,38 @@ class FractalConfig(ConfigBase):
 
     # Periodics
     service_frequency: int = Field(60, description="The frequency at which to update services (in seconds)")
-    max_active_services: int = Field(20, description="The maximum number of concurrent active services")
+    max_active_services: int = Field(
+        20,
+        description="The maximum number of concurrent active services. With adaptive scheduling "
+        "(see adaptive_max_active_services), more services may be started if compute managers would otherwise "
+        "run out of tasks",
+    )
+    adaptive_max_active_services: int = Field(
+        500,
+        description="Upper limit on the number of concurrent active services when scheduling adaptively. More than "
+        "max_active_services are only started if there are not enough waiting tasks to keep the active compute "
+        "managers busy. If this is not larger than max_active_services, adaptive scheduling is disabled",
+        ge=0,
+    )
+    adaptive_service_queue_factor: float = Field(
+        2.0,
+        description="When scheduling services adaptively, try to keep this many waiting tasks for each task "
+        "currently running on compute managers",
+        gt=0,
+    )
+    task_generation_frequency: int = Field(
+        30,
+        description="The frequency (in seconds) at which the function and arguments of new tasks are generated "
+        "ahead of time (rather than when they are claimed by a manager). 0 disables this",
+        ge=0,
+    )
+    task_queue_depth_frequency: int = Field(
+        60,
+        description="The frequency (in seconds) at which recorded changes to the number of waiting tasks are folded "
+        "into the task queue depth table. Queue depths are always up-to-date regardless; this only keeps the "
+        "table of changes small. 0 disables this",
+        ge=0,
+    )
     heartbeat_frequency: int = Field(
         1800,
         description="The frequency (in seconds) to check the heartbeat of compute managers",
@@ -416,6 +461,32 @@ class FractalConfig(ConfigBase):
     access_log_keep: int = Field(
         0, description="How far back to keep access logs (in days or as a duration string). 0 means keep all"
     )
+    access_log_flush_frequency: float = Field(
+        5.0,
+        description="How often (in seconds) buffered access log entries are written to the database. "
+        "0 means entries are written immediately, as part of handling the request",
+        ge=0,
+    )
+    access_log_batch_size: int = Field(
+        500, description="Write buffered access log entries as soon as this many are waiting to be written", gt=0
+    )
+    access_log_max_buffered: int = Field(
+        50000,
+        description="Maximum number of access log entries waiting to be written. Further entries are dropped",
+        gt=0,
+    )
+
+    # Metrics
+    metrics_dir: Optional[str] = Field(
+        None,
+        description="Directory where the processes of the server (API and internal job runners) share their metrics. "
+        "Defaults to [base_folder]/metrics. This directory will be created if needed.",
+    )
+    metrics_write_frequency: float = Field(
+        15.0,
+        description="How often (in seconds) internal job runners write their metrics to the metrics directory",
+        gt=0,
+    )
 
     # maxmind_account_id: Optional[int] = Field(None, description="Account ID for MaxMind GeoIP2 service")
     maxmind_license_key: Optional[str] = Field(
@@ -440,6 +511,28 @@ class FractalConfig(ConfigBase):
         0, description="How far back to keep finished internal jobs (in days or as a duration string). 0 means keep all"
     )
 
+    # Recompression of cold data
+    recompress_cold_data_frequency: int = Field(
+        0,
+        description="How often (in seconds) to recompress outputs and native files of records that have not been "
+        "modified in a while (see recompress_cold_data_age). This allows compute managers to use fast, low "
+        "compression levels without wasting storage. 0 disables this",
+        ge=0,
+    )
+    recompress_cold_data_age: int = Field(
+        7 * 86400,
+        description="Outputs and native files of records that have not been modified for this long "
+        "(in days or as a duration string) are recompressed",
+        ge=0,
+    )
+    recompress_cold_data_level: int = Field(
+        16,
+        description="zstd compression level used when recompressing cold data. Data already compressed with this "
+        "level or higher (or with a compression dictionary) is left alone",
+        ge=1,
+        le=22,
+    )
+
     # Homepage settings
     homepage_redirect_url: Optional[str] = Field(None, description="Redirect to this URL when going to the root path")
     homepage_directory: Optional[str] = Field(None, description="Use this directory to serve the homepage")
@@ -481,6 +574,10 @@ class FractalConfig(ConfigBase):
     def _check_geoip2_dir(cls, v, values):
         return _make_abs_path(v, values["base_folder"], "geoip2")
 
+    @validator("metrics_dir", always=True)
+    def _check_metrics_dir(cls, v, values):
+        return _make_abs_path(v, values["base_folder"], "metrics")
+
     @validator("homepage_directory")
     def _check_hompepage_directory_path(cls, v, values):
         return _make_abs_path(v, values["base_folder"], None)
@@ -496,11 +593,18 @@ class FractalConfig(ConfigBase):
             raise ValidationError(f"{v} is not a valid loglevel. Must be DEBUG, INFO, WARNING, ERROR, or CRITICAL")
         return v
 
-    @validator("service_frequency", "heartbeat_frequency", pre=True)
+    @validator(
+        "service_frequency",
+        "heartbeat_frequency",
+        "task_generation_frequency",
+        "task_queue_depth_frequency",
+        "recompress_cold_data_frequency",
+        pre=True,
+    )
     def _convert_durations(cls, v):
         return duration_to_seconds(v)
 
-    @validator("access_log_keep", "internal_job_keep", pre=True)
+    @validator("access_log_keep", "internal_job_keep", "recompress_cold_data_age", pre=True)
     def _convert_durations_days(cls, v):
         if isinstance(v, int) or (isinstance(v, str) and v.isdigit()):
             return int(v) * 86400
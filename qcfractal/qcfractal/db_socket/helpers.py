@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import dataclasses
+import hashlib
+import json
 import logging
 from typing import TYPE_CHECKING
 
-from sqlalchemy import tuple_, and_, or_, func, select, inspect
+from sqlalchemy import tuple_, and_, or_, func, select, inspect, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import load_only, lazyload, defer
 
@@ -312,12 +315,44 @@ def unpack(lst: TupleSequence) -> List[_T]:
     return [x for t in lst for x in t]
 
 
+def _insert_lock_key(lock_id: int, values: Tuple) -> int:
+    # A stable 64-bit hash of the lock id and the values of the search columns
+    key_str = json.dumps([lock_id, *values], default=str)
+    return int.from_bytes(hashlib.blake2b(key_str.encode(), digest_size=8).digest(), "little", signed=True)
+
+
+def lock_insert_keys(
+    session: sqlalchemy.orm.session.Session,
+    data: Iterable[_ORM_T],
+    search_cols: Sequence[InstrumentedAttribute],
+    lock_id: int,
+) -> None:
+    """
+    Obtain transaction-level advisory locks for the search column values of the data being inserted
+
+    Each distinct set of values of the search columns has its own advisory lock (a 64-bit hash of
+    the values and ``lock_id``). Concurrent inserts of the same data are therefore serialized (preventing
+    duplicates), while inserts of different data do not block each other.
+
+    Locks are obtained in sorted order, so concurrent inserts do not deadlock within a single call. Like
+    with ``INSERT ... ON CONFLICT``, transactions inserting the same data in a different order over several
+    calls can still deadlock, in which case PostgreSQL aborts one of them.
+    """
+
+    keys = sorted({_insert_lock_key(lock_id, get_values(orm, search_cols)) for orm in data})
+
+    if keys:
+        # unnest returns the elements in order
+        stmt = text("SELECT pg_advisory_xact_lock(k) FROM unnest(CAST(:keys AS bigint[])) AS k")
+        session.execute(stmt, {"keys": keys}).all()
+
+
 def insert_general(
     session: sqlalchemy.orm.session.Session,
     data: Sequence[_ORM_T],
     search_cols: Sequence[InstrumentedAttribute],
     returning: Sequence[InstrumentedAttribute],
-    lock_id: int,
+    lock_id: Optional[int],
 ) -> Tuple[InsertMetadata, List[Tuple]]:
     """
     Perform a general insert, taking into account existing data
@@ -336,8 +371,13 @@ def insert_general(
     The ORM object passed in through ``data`` may be modified, and they may be attached to the given session upon
     returning. Various fields may be filled in.
 
-    The ``lock_id`` parameter is used to block other inserts into the table for the duration of this insert.
-    This is used to prevent duplicate entries.
+    How duplicate entries are prevented depends on ``lock_id``. If the table has a unique constraint on the
+    search columns (such as molecules and specifications), ``lock_id`` should be None. Rows are then inserted
+    with ``INSERT ... ON CONFLICT DO NOTHING``, and rows inserted concurrently by other transactions are
+    selected afterwards. Concurrent inserts then only wait on each other if they contain the same data.
+
+    Otherwise, the ``lock_id`` parameter is used to block other inserts of the same data into the table for the
+    duration of the transaction (see :func:`lock_insert_keys`).
 
     .. note::
         This function is used for various fields, such as records. Since records are not unique, we don't
@@ -360,6 +400,7 @@ def insert_general(
     lock_id
         Unique ID for locking. The ID should be the same for a given table or type of record inserted,
         but different from IDs for other tables or record types.
+        If None, the search columns must correspond to a unique constraint of the table, and no lock is taken.
 
     Returns
     -------
@@ -368,21 +409,24 @@ def insert_general(
         will contain tuples with whatever data was requested in the returning parameter.
     """
 
-    # Lock for the entire transaction. Even if the caller does more after this
-    session.execute(select(func.pg_advisory_xact_lock(lock_id))).scalar()
-
     n_data = len(data)
 
     # Return early if not given anything
     if n_data == 0:
         return InsertMetadata(), []
 
+    # Lock for the entire transaction. Even if the caller does more after this
+    if lock_id is not None:
+        lock_insert_keys(session, data, search_cols, lock_id)
+
     inserted_idx: List[int] = []
     existing_idx: List[int] = []
     all_ret = []
 
     for start in range(0, n_data, batchsize):
-        ins, ext, ret = _insert_general_batch(session, data[start : start + batchsize], search_cols, returning)
+        ins, ext, ret = _insert_general_batch(
+            session, data[start : start + batchsize], search_cols, returning, lock_id is None
+        )
         inserted_idx.extend([start + x for x in ins])
         existing_idx.extend([start + x for x in ext])
         all_ret.extend(ret)
@@ -397,7 +441,7 @@ def insert_mixed_general(
     id_col: InstrumentedAttribute,
     search_cols: Sequence[InstrumentedAttribute],
     returning: Sequence[InstrumentedAttribute],
-    lock_id: int,
+    lock_id: Optional[int],
 ) -> Tuple[InsertMetadata, List[Optional[Tuple]]]:
     """
     Insert mixed input (ids or orm objects) taking into account existing data.
@@ -429,6 +473,7 @@ def insert_mixed_general(
     lock_id
         Unique ID for locking. The ID should be the same for a given table or type of record inserted,
         but different from IDs for other tables or record types.
+        If None, the search columns must correspond to a unique constraint of the table, and no lock is taken.
 
     Returns
     -------
@@ -437,15 +482,16 @@ def insert_mixed_general(
         will contain tuples with whatever data was requested in the returning parameter.
     """
 
-    # Lock for the entire transaction. Even if the caller does more after this
-    session.execute(select(func.pg_advisory_xact_lock(lock_id))).scalar()
-
     n_data = len(data)
 
     # Return early if not given anything
     if n_data == 0:
         return InsertMetadata(), []
 
+    # Lock for the entire transaction. Even if the caller does more after this
+    if lock_id is not None:
+        lock_insert_keys(session, [x for x in data if not isinstance(x, int)], search_cols, lock_id)
+
     inserted_idx: List[int] = []
     existing_idx: List[int] = []
     errors: List[Tuple[int, str]] = []
@@ -453,7 +499,7 @@ def insert_mixed_general(
 
     for start in range(0, n_data, batchsize):
         ins, ext, err, ret = _insert_mixed_general_batch(
-            session, orm_type, data[start : start + batchsize], id_col, search_cols, returning
+            session, orm_type, data[start : start + batchsize], id_col, search_cols, returning, lock_id is None
         )
         inserted_idx.extend([start + x for x in ins])
         existing_idx.extend([start + x for x in ext])
@@ -617,11 +663,72 @@ def delete_general(
     return DeleteMetadata(deleted_idx=deleted_idx, errors=errors)
 
 
+def _insert_on_conflict(
+    session: sqlalchemy.orm.session.Session,
+    data: Sequence[_ORM_T],
+    search_cols: Sequence[InstrumentedAttribute],
+    returning: Sequence[InstrumentedAttribute],
+) -> List[Tuple[bool, Tuple]]:
+    """
+    Inserts ORM objects with ``INSERT ... ON CONFLICT DO NOTHING``
+
+    The search columns must correspond to a unique constraint of the table, and the data must not contain
+    duplicates. Rows that conflict (because they were inserted by another transaction after the existing
+    data was searched for) are selected afterwards.
+
+    Not meant for general use - should only be called from _insert_general_batch
+
+    Returns a list containing, for each ORM object, whether the object was inserted and the data of
+    the returning columns
+    """
+
+    if len(data) == 0:
+        return []
+
+    mapper = inspect(type(data[0]))
+    table_cols = [(col, mapper.get_property_by_column(col).key) for col in mapper.local_table.columns]
+
+    search_values = [get_values(r, search_cols) for r in data]
+
+    # Insert in a consistent order. Concurrent inserts of the same data then wait on each other, rather than deadlock
+    rows = []
+    for _, orm in sorted(zip(search_values, data), key=lambda x: x[0]):
+        row = {}
+        for col, key in table_cols:
+            v = getattr(orm, key)
+
+            if v is None:
+                if col.primary_key:
+                    continue
+                if col.default is not None and col.default.is_scalar:
+                    v = col.default.arg
+
+            row[col.name] = v
+
+        rows.append(row)
+
+    stmt = insert(mapper.local_table).values(rows)
+    stmt = stmt.on_conflict_do_nothing(index_elements=[x.expression for x in search_cols])
+    stmt = stmt.returning(*search_cols, *returning)
+
+    n_search_cols = len(search_cols)
+    inserted = {tuple(x[:n_search_cols]): tuple(x[n_search_cols:]) for x in session.execute(stmt)}
+
+    conflicting = [x for x in search_values if x not in inserted]
+    existing = {}
+    if conflicting:
+        stmt = select(*search_cols, *returning).where(form_query_filter(search_cols, conflicting))
+        existing = {tuple(x[:n_search_cols]): tuple(x[n_search_cols:]) for x in session.execute(stmt)}
+
+    return [(True, inserted[x]) if x in inserted else (False, existing[x]) for x in search_values]
+
+
 def _insert_general_batch(
     session: sqlalchemy.orm.session.Session,
     data: Sequence[_ORM_T],
     search_cols: Sequence[InstrumentedAttribute],
     returning: Sequence[InstrumentedAttribute],
+    on_conflict: bool,
 ) -> Tuple[List[int], List[int], List[Tuple]]:
     """
     Inserts a batch of data to the session. See documentation for insert_general
@@ -669,24 +776,31 @@ def _insert_general_batch(
     # Contains tuples. Each tuple contains indices of duplicates
     missing_idx = [search_values_unique_map[x] for x in search_values_missing]
 
-    # TODO: can we bulk add here, since now we don't have duplicates or existing data, and no errors
-    # But then we might need another query at the end
-    for idxs in missing_idx:
-        # Only need one of the records, since the rest are equivalent
-        rec = data[idxs[0]]
-        session.add(rec)
+    # Only need one of the records, since the rest are equivalent
+    to_add = [data[idxs[0]] for idxs in missing_idx]
 
-    session.flush()
+    if on_conflict:
+        added_data = _insert_on_conflict(session, to_add, search_cols, returning)
+    else:
+        # TODO: can we bulk add here, since now we don't have duplicates or existing data, and no errors
+        # But then we might need another query at the end
+        session.add_all(to_add)
+        session.flush()
 
-    # For inserted, we say we only inserted the first one. The rest are considered duplicates
-    inserted_idx = [x[0] for x in missing_idx]
-    existing_idx.extend(unpack(x[1:] for x in missing_idx))
+        # Get the fields we should be returning from the full orm that we added
+        added_data = [(True, get_values(rec, returning)) for rec in to_add]
 
-    # Get the fields we should be returning from the full orm that we added
+    inserted_idx = []
     ret_added = []
-    for idxs in missing_idx:
-        # Only the first one was added and now contains the relevant data
-        ret_data = get_values(data[idxs[0]], returning)
+    for idxs, (was_inserted, ret_data) in zip(missing_idx, added_data):
+        if was_inserted:
+            # For inserted, we say we only inserted the first one. The rest are considered duplicates
+            inserted_idx.append(idxs[0])
+            existing_idx.extend(idxs[1:])
+        else:
+            # Inserted by another transaction in the meantime
+            existing_idx.extend(idxs)
+
         ret_added.extend([(idx, ret_data) for idx in idxs])
 
     # Now from existing
@@ -708,6 +822,7 @@ def _insert_mixed_general_batch(
     id_col: InstrumentedAttribute,
     search_cols: Sequence[InstrumentedAttribute],
     returning: Sequence[InstrumentedAttribute],
+    on_conflict: bool,
 ) -> Tuple[List[int], List[int], List[Tuple[int, str]], List[Optional[Tuple]]]:
     """
     Insert a batched of mixed input (ids or orm objects) taking into account existing data.
@@ -738,7 +853,9 @@ def _insert_mixed_general_batch(
 
     # Add all the data that are ORM objects
     orm_to_add = [x[1] for x in input_orm]
-    inserted_idx_tmp, existing_idx_tmp, added_data = _insert_general_batch(session, orm_to_add, search_cols, returning)
+    inserted_idx_tmp, existing_idx_tmp, added_data = _insert_general_batch(
+        session, orm_to_add, search_cols, returning, on_conflict
+    )
 
     # All the returned info is in the same order as in the input list (input_orm/orm_to_add in this case)
     # Look up the original indices
@@ -8,15 +8,17 @@ import importlib
 import logging
 import os
 import shutil
+import time
 from contextlib import contextmanager
 from functools import lru_cache
 from typing import TYPE_CHECKING
 
 from sqlalchemy import create_engine, exc, event, inspect, select, union, MetaData, Engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 
 import qcfractal
+from .. import metrics
 
 if TYPE_CHECKING:
     from typing import List, Optional, Generator, Any
@@ -24,6 +26,30 @@ if TYPE_CHECKING:
     from ..config import FractalConfig, DatabaseConfig
 
 
+class _TimedCheckoutMixin:
+    """
+    Records how long it takes to obtain a connection from a connection pool
+
+    This includes waiting for a connection to be returned to the pool (if it is exhausted)
+    and creating new connections.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.db_checkout_duration.observe(time.perf_counter() - start)
+
+
+class _TimedNullPool(_TimedCheckoutMixin, NullPool):
+    pass
+
+
+class _TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
 class SQLAlchemySocket:
     """
     Main/Root socket accessing/managing an SQLAlchemy database
@@ -49,13 +75,14 @@ class SQLAlchemySocket:
             self.engine = create_engine(
                 self.qcf_config.database.sqlalchemy_url,
                 echo=qcf_config.database.echo_sql,
-                poolclass=NullPool,
+                poolclass=_TimedNullPool,
                 future=True,
             )
         else:
             self.engine = create_engine(
                 self.qcf_config.database.sqlalchemy_url,
                 echo=qcf_config.database.echo_sql,
+                poolclass=_TimedQueuePool,
                 pool_size=qcf_config.database.pool_size,
                 future=True,
             )
@@ -7,9 +7,11 @@ from sqlalchemy import select
 
 from qcfractal.components.optimization.record_db_models import OptimizationRecordORM
 from qcfractal.components.optimization.testing_helpers import submit_test_data
+from qcfractal.components.singlepoint.testing_helpers import load_test_data as load_sp_test_data
 from qcfractal.db_socket import SQLAlchemySocket
 from qcfractal.db_socket.helpers import get_query_proj_options
 from qcportal.molecules import Molecule
+from qcportal.record_models import PriorityEnum
 
 
 def test_dbsocket_helper_duplicate_insert(storage_socket: SQLAlchemySocket):
@@ -35,10 +37,88 @@ def test_dbsocket_helper_duplicate_insert(storage_socket: SQLAlchemySocket):
     t2.start()
     time.sleep(0.25)
 
-    # Now do ours
-    _insert_molecules(storage_socket)
+    # Now do ours. This waits for the other thread, and then finds the molecules it inserted
+    meta, ids = _insert_molecules(storage_socket)
     t2.join()
 
+    assert meta.n_inserted == 0
+    assert meta.n_existing == 3
+    assert ids == storage_socket.molecules.add([m1, m2, m3])[1]
+
+
+def test_dbsocket_helper_disjoint_insert(storage_socket: SQLAlchemySocket):
+    # Tests that inserts of different data do not block each other
+
+    storage_socket_2 = SQLAlchemySocket(storage_socket.qcf_config)
+
+    m1 = Molecule(symbols=["h", "h"], geometry=[0, 0, 0, 0, 0, 2])
+    m2 = Molecule(symbols=["h", "h"], geometry=[0, 0, 0, 0, 0, 3])
+
+    def _insert_molecules(s: SQLAlchemySocket, m: Molecule, delay: float):
+        with s.session_scope() as session:
+            # Add & flush, but don't commit
+            s.molecules.add([m], session=session)
+            time.sleep(delay)
+            session.commit()
+
+    # other thread inserts first, and does not commit for a while
+    t2 = threading.Thread(target=_insert_molecules, args=(storage_socket_2, m1, 3.0))
+    t2.start()
+    time.sleep(0.25)
+
+    # Now do ours - this should not wait for the other thread
+    time_0 = time.time()
+    _insert_molecules(storage_socket, m2, 0.0)
+    assert time.time() - time_0 < 2.0
+    t2.join()
+
+    meta, ids = storage_socket.molecules.add([m1, m2])
+    assert meta.n_existing == 2
+
+
+def test_dbsocket_helper_duplicate_record_insert(storage_socket: SQLAlchemySocket):
+    # Records do not have a unique constraint, and are locked by the values being searched for
+
+    storage_socket_2 = SQLAlchemySocket(storage_socket.qcf_config)
+
+    spec, molecule, _ = load_sp_test_data("sp_psi4_water_energy")
+    m1 = Molecule(symbols=["h", "h"], geometry=[0, 0, 0, 0, 0, 2])
+    m2 = Molecule(symbols=["h", "h"], geometry=[0, 0, 0, 0, 0, 3])
+
+    # Add the specification and molecules beforehand, so that only the records themselves are being inserted
+    storage_socket.records.singlepoint.add_specification(spec)
+    storage_socket.molecules.add([molecule, m1, m2])
+
+    def _insert_records(s: SQLAlchemySocket, molecules, delay: float, results: list):
+        with s.session_scope() as session:
+            # Add & flush, but don't commit
+            r = s.records.singlepoint.add(molecules, spec, "*", PriorityEnum.normal, None, None, True, session=session)
+            time.sleep(delay)
+            session.commit()
+            results.append(r)
+
+    # other thread inserts first, and does not commit for a while
+    results_2 = []
+    t2 = threading.Thread(target=_insert_records, args=(storage_socket_2, [molecule, m1], 3.0, results_2))
+    t2.start()
+    time.sleep(0.25)
+
+    # Different data does not wait for the other thread
+    results = []
+    time_0 = time.time()
+    _insert_records(storage_socket, [m2], 0.0, results)
+    assert time.time() - time_0 < 2.0
+    assert results[0][0].n_inserted == 1
+
+    # The same data waits, and then finds the records inserted by the other thread
+    _insert_records(storage_socket, [m1, molecule], 0.0, results)
+    t2.join()
+
+    assert results_2[0][0].n_inserted == 2
+    assert results[1][0].n_inserted == 0
+    assert results[1][0].n_existing == 2
+    assert results[1][1] == results_2[0][1][::-1]
+
 
 def test_dbsocket_helper_proj(storage_socket: SQLAlchemySocket):
     empty_record_keys = {"id", "record_type"}
@@ -5,11 +5,29 @@ try:
     import pydantic.v1 as pydantic
 except ImportError:
     import pydantic
-from flask import request, Response
+from flask import request, Response, g
 from werkzeug.exceptions import BadRequest
 
 from qcfractal.flask_app.helpers import assert_role_permissions
-from qcportal.serialization import deserialize, serialize
+from qcportal.serialization import deserialize, serialize, serialize_stream
+
+# Streaming content types, and the content type of the individual elements of the stream
+_stream_element_types = {
+    "application/x-msgpack-stream": "application/msgpack",
+    "application/x-ndjson": "application/json",
+}
+
+
+def _release_elements(data: list):
+    """
+    Yields the elements of a list, removing the reference to each element from the list as it goes
+
+    This allows for the elements to be freed once they are sent to the client
+    """
+
+    for i in range(len(data)):
+        element, data[i] = data[i], None
+        yield element
 
 
 def wrap_route(
@@ -25,6 +43,11 @@ def wrap_route(
         3. Serializes the response returned from the wrapped function into the appropriate
            type (taken from the accepted mimetypes)
 
+    If the client accepts a streaming type (msgpack stream or newline-delimited json) and the wrapped
+    function returns a list, each element of the list is serialized and sent separately as the response
+    is being written. This avoids building the entire serialized response in memory, and lets the client
+    start processing the response before it has been completely received.
+
     The data packaged with the request may be json, msgpack, or maybe others in the future.
     This is deserialized and converted to the types needed by the wrapped function. These
     types are read from the type annotations on the wrapped function.
@@ -55,7 +78,13 @@ def wrap_route(
             # Find an appropriate return type (from the "Accept" header)
             # Flask helpfully parses this for us
             # By default, use plain json
-            possible_types = ["text/html", "application/msgpack", "application/json"]
+            possible_types = [
+                "text/html",
+                "application/msgpack",
+                "application/json",
+                "application/x-msgpack-stream",
+                "application/x-ndjson",
+            ]
             accept_type = request.accept_mimetypes.best_match(possible_types, "application/json")
 
             # If text/html is first, then this is probably a browser. Send json, as most browsers
@@ -70,16 +99,16 @@ def wrap_route(
             body_model = annotations.get("body_data", None)
             url_params_model = annotations.get("url_params", None)
 
-            # 1. The body is stored in request.data
+            # 1. The (decompressed) body is stored in g.request_data (see before_request_func)
             if body_model is not None:
                 if content_type is None:
                     raise BadRequest("No Content-Type specified")
 
-                if not request.data:
+                if not g.request_data:
                     raise BadRequest("Expected body, but it is empty")
 
                 try:
-                    deserialized_data = deserialize(request.data, content_type)
+                    deserialized_data = deserialize(g.request_data, content_type)
                     kwargs["body_data"] = pydantic.parse_obj_as(body_model, deserialized_data)
                 except Exception as e:
                     raise BadRequest("Invalid body: " + str(e))
@@ -98,6 +127,13 @@ def wrap_route(
             if isinstance(ret, Response):
                 return ret
 
+            if accept_type in _stream_element_types:
+                if isinstance(ret, list):
+                    return Response(serialize_stream(_release_elements(ret), accept_type), content_type=accept_type)
+
+                # Only lists are streamed. Anything else is sent as a single object
+                accept_type = _stream_element_types[accept_type]
+
             serialized = serialize(ret, accept_type)
             return Response(serialized, content_type=accept_type)
 
@@ -1,8 +1,22 @@
-from flask import jsonify
+from flask import jsonify, current_app, Response
 
+from qcfractal import metrics
+from qcfractal.flask_app import storage_socket
 from qcfractal.flask_app.api_v1.blueprint import api_v1
+from qcfractal.flask_app.helpers import assert_role_permissions
 
 
 @api_v1.route("/ping", methods=["GET"])
 def ping():
     return jsonify(success=True)
+
+
+@api_v1.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Metrics are in the prometheus text format, so this doesn't go through wrap_route
+    assert_role_permissions("READ")
+
+    metrics_dir = current_app.config["QCFRACTAL_CONFIG"].metrics_dir
+    text = metrics.registry.render(metrics.read_snapshots(metrics_dir))
+    text += metrics.render_access_log_stats(storage_socket.serverinfo.get_access_log_writer_stats())
+    return Response(text, content_type="text/plain; version=0.0.4; charset=utf-8")
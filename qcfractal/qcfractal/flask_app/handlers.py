@@ -11,11 +11,13 @@ from flask_jwt_extended import (
     get_jwt_request_location,
 )
 from jwt.exceptions import InvalidSubjectError
-from werkzeug.exceptions import InternalServerError, HTTPException
+from werkzeug.exceptions import InternalServerError, HTTPException, BadRequest, UnsupportedMediaType
 
+from qcfractal import metrics
 from qcfractal.flask_app import storage_socket
 from qcfractal.flask_app.helpers import access_token_from_user
 from qcportal.auth import UserInfo, RoleInfo
+from qcportal.compression import content_encodings, encode_content, encode_content_stream, decode_content
 from qcportal.exceptions import UserReportableError, AuthenticationFailure, ComputeManagerError
 from .home_v1 import home_v1
 
@@ -39,12 +41,61 @@ def before_request_func():
     else:
         g.request_bytes = 0
 
+    # The body of the request may be compressed. The uncompressed body is stored in g.request_data,
+    # and should be used instead of request.data
+    g.request_data = request.data
+    g.request_bytes_uncompressed = g.request_bytes
+
+    content_encoding = request.headers.get("Content-Encoding", None)
+    if content_encoding and request.data:
+        if content_encoding not in content_encodings:
+            raise UnsupportedMediaType(f"Unsupported content encoding: {content_encoding}")
+
+        max_size = current_app.config["QCFRACTAL_CONFIG"].api.max_decompressed_request_size
+
+        try:
+            g.request_data = decode_content(request.data, content_encoding, max_size)
+        except Exception as e:
+            raise BadRequest(f"Unable to decompress request body: {str(e)}")
+
+        g.request_bytes_uncompressed = len(g.request_data)
+
+
+def _compress_response(response: Response) -> None:
+    """
+    Compresses the body of a response, if the client accepts it and the response is large enough
+    """
+
+    api_config = current_app.config["QCFRACTAL_CONFIG"].api
+    if not api_config.compress_responses:
+        return
+
+    # Don't compress errors, files (which are sent directly), or already-compressed data
+    if response.status_code != 200 or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return
+
+    content_encoding = request.accept_encodings.best_match(content_encodings)
+    if content_encoding is None:
+        return
+
+    if response.is_streamed:
+        # Compress as the response is being sent. We don't know the size beforehand, so always compress
+        response.response = encode_content_stream(response.response, content_encoding)
+    elif response.content_length is not None and response.content_length >= api_config.compress_min_size:
+        response.set_data(encode_content(response.get_data(), content_encoding))
+    else:
+        return
+
+    response.headers["Content-Encoding"] = content_encoding
+    response.vary.add("Accept-Encoding")
+
 
 @home_v1.after_app_request
 def after_request_func(response: Response):
     #################################################################
     # NOTE: Do not touch response.response! It may mess up streaming
     #       responses and result in no content being sent
+    #       (wrapping it when compressing is ok - see _compress_response)
     #################################################################
 
     # Determine the time the request took
@@ -52,6 +103,14 @@ def after_request_func(response: Response):
 
     request_duration = time.time() - g.request_start
 
+    # Use the route rule (ie, /api/v1/records/<int:record_id>) rather than the full path, to keep
+    # the number of distinct routes small
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    metrics.request_duration.observe(request_duration, method=request.method, route=route, status=response.status_code)
+
+    response_bytes_uncompressed = response.content_length
+    _compress_response(response)
+
     log_access = current_app.config["QCFRACTAL_CONFIG"].log_access
     if log_access:
         # What we are going to log to the DB
@@ -78,15 +137,18 @@ def after_request_func(response: Response):
         log["user_agent"] = request.headers.get("User-Agent", "")
 
         log["request_bytes"] = 0 if g.request_bytes is None else g.request_bytes
+        log["request_bytes_uncompressed"] = g.request_bytes_uncompressed
         log["request_duration"] = request_duration
         log["user_id"] = g.get("user_id", None)
 
         response_bytes = response.content_length
         log["response_bytes"] = 0 if response_bytes is None else response_bytes
+        log["response_bytes_uncompressed"] = response_bytes_uncompressed
 
         storage_socket.serverinfo.save_access(log)
         current_app.logger.debug(
-            f"{request.method} {request.blueprint}: {g.request_bytes} -> {response_bytes} [{request_duration*1000:.1f}ms]"
+            f"{request.method} {request.blueprint}: {g.request_bytes} ({g.request_bytes_uncompressed} uncompressed) -> "
+            f"{response_bytes} ({response_bytes_uncompressed} uncompressed) [{request_duration*1000:.1f}ms]"
         )
 
         # Basically taken from the flask-jwt-extended docs
@@ -134,7 +196,7 @@ def handle_internal_error(error):
         "user_id": g.get("user_id", None),
         "request_path": request.full_path,
         "request_headers": str(headers),
-        "request_body": str(request.data)[:8192],
+        "request_body": str(g.get("request_data", request.data))[:8192],
     }
 
     # Log it to the internal error table
@@ -17,6 +17,7 @@ from werkzeug.exceptions import BadRequest, Forbidden
 
 from qcfractal.flask_app import storage_socket
 from qcportal.auth import UserInfo, RoleInfo
+from qcportal.compression import content_encodings
 from qcportal.exceptions import AuthorizationFailure, AuthenticationFailure
 
 if TYPE_CHECKING:
@@ -186,6 +187,7 @@ def get_public_server_information():
         "manager_heartbeat_max_missed": qcf_cfg.heartbeat_max_missed,
         "version": qcfractal_version,
         "api_limits": qcf_cfg.api_limits.dict(),
+        "request_encodings": list(content_encodings),
         "client_version_lower_limit": "0.50",
         "client_version_upper_limit": "1.00",
         "manager_version_lower_limit": "0.50",
@@ -14,6 +14,7 @@ import threading
 from typing import TYPE_CHECKING, Optional
 
 from .db_socket.socket import SQLAlchemySocket
+from .metrics import registry, MetricsWriter
 
 if TYPE_CHECKING:
     from .config import FractalConfig
@@ -58,7 +59,14 @@ class FractalJobRunner:
             root_logger.handlers.clear()
             root_logger.addHandler(log_handler)
 
-        self.storage_socket.internal_jobs.run_loop(self._end_event)
+        # Share our metrics with the API process (which serves them)
+        qcf_config = self.storage_socket.qcf_config
+        metrics_writer = MetricsWriter(registry, qcf_config.metrics_dir, qcf_config.metrics_write_frequency)
+
+        try:
+            self.storage_socket.internal_jobs.run_loop(self._end_event)
+        finally:
+            metrics_writer.stop()
 
     def stop(self) -> None:
         """
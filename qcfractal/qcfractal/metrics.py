@@ -0,0 +1,408 @@
+"""
+Metrics (histograms) of the time taken by various parts of the server
+
+Metrics are kept in memory by each process, and are exposed in the Prometheus text format
+through the ``/api/v1/metrics`` endpoint of the API process. Other processes (such as the internal job
+runners) periodically write a snapshot of their metrics to a shared directory, which the API process
+merges with its own metrics when they are requested.
+
+Some counters that are kept elsewhere (such as those of the access log writer) are rendered along with them.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Dict, Any, List, Tuple, Sequence, Optional, Iterable, Generator
+
+
+# Default buckets for durations, in seconds
+duration_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Buckets for the number of items handled in one go
+size_buckets = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_metrics_file_prefix = "metrics-"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    s = ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in labels)
+    return "{" + s + "}" if s else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """
+    A histogram of observed values, optionally split by the values of some labels
+
+    Each distinct combination of label values has its own set of buckets, sum, and count.
+    Bucket counts are stored non-cumulatively, and made cumulative only when exported.
+    """
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets if buckets else duration_buckets))
+
+        self._lock = threading.Lock()
+
+        # Label values -> [bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def _label_key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"Metric {self.name} requires labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[k]) for k in self.label_names)
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Adds an observation to the histogram
+        """
+
+        key = self._label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            v = self._values.get(key, None)
+            if v is None:
+                v = [[0] * (len(self.buckets) + 1), 0.0]
+                self._values[key] = v
+
+            v[0][idx] += 1
+            v[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Generator[None, None, None]:
+        """
+        Context manager that observes the time (in seconds) spent inside its block
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def snapshot(self) -> List[Tuple[List[str], List[int], float]]:
+        """
+        Returns the current values of this histogram, as a list of (label values, bucket counts, sum)
+        """
+
+        with self._lock:
+            return [(list(k), list(v[0]), v[1]) for k, v in self._values.items()]
+
+
+class MetricsRegistry:
+    """
+    A collection of metrics, which can be exported and merged with metrics from other processes
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = ()):
+        """
+        Creates a new histogram and adds it to this registry
+        """
+
+        if name in self._metrics:
+            raise ValueError(f"Metric {name} already exists")
+
+        h = Histogram(name, description, labels, buckets)
+        self._metrics[name] = h
+        return h
+
+    def clear(self) -> None:
+        """
+        Removes all observations from all metrics (but not the metrics themselves)
+        """
+
+        for m in self._metrics.values():
+            m.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the current values of all metrics in this registry, in a form that can be stored as JSON
+        """
+
+        return {name: m.snapshot() for name, m in self._metrics.items()}
+
+    def render(self, other_snapshots: Iterable[Dict[str, Any]] = ()) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format
+
+        Values from snapshots of other processes (see :meth:`snapshot`) are added to the values of this process
+        """
+
+        merged = self.snapshot()
+
+        for other in other_snapshots:
+            for name, other_values in other.items():
+                metric = self._metrics.get(name, None)
+                if metric is None:
+                    continue
+
+                # Skip snapshots made with different buckets (from a different version of the code)
+                these_values = {tuple(k): (c, s) for k, c, s in merged[name]}
+                for k, c, s in other_values:
+                    if len(c) != len(metric.buckets) + 1:
+                        continue
+
+                    existing = these_values.get(tuple(k), None)
+                    if existing is None:
+                        these_values[tuple(k)] = (c, s)
+                    else:
+                        these_values[tuple(k)] = ([x + y for x, y in zip(existing[0], c)], existing[1] + s)
+
+                merged[name] = [(list(k), c, s) for k, (c, s) in these_values.items()]
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} histogram")
+
+            for label_values, counts, total in sorted(merged[name]):
+                labels = list(zip(metric.label_names, label_values))
+
+                cumulative = 0
+                for upper, count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels + [("le", _format_value(upper))])
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, metrics_dir: str) -> None:
+        """
+        Writes a snapshot of the metrics of this process to a file in the given directory
+        """
+
+        os.makedirs(metrics_dir, exist_ok=True)
+
+        file_path = os.path.join(metrics_dir, f"{_metrics_file_prefix}{os.getpid()}.json")
+        tmp_path = file_path + ".tmp"
+
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+
+        # Atomic, so readers never see a partially-written file
+        os.replace(tmp_path, file_path)
+
+
+def render_values(name: str, description: str, metric_type: str, values: Iterable[Tuple[Dict[str, Any], float]]) -> str:
+    """
+    Renders counters or gauges in the Prometheus text exposition format
+
+    These are values kept elsewhere (not in a registry), given as (labels, value) pairs
+    """
+
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+    for labels, value in values:
+        lines.append(f"{name}{_format_labels((k, str(v)) for k, v in labels.items())} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def render_access_log_stats(stats: Dict[str, int]) -> str:
+    """
+    Renders the counters of the access log writer of this process (see ServerInfoSocket.get_access_log_writer_stats)
+    """
+
+    entries = [({"status": k}, stats[k]) for k in ("logged", "written", "dropped", "failed")]
+
+    return (
+        render_values(
+            "qcfractal_access_log_entries_total",
+            "Access log entries handled by this process, by what happened to them",
+            "counter",
+            entries,
+        )
+        + render_values(
+            "qcfractal_access_log_flushes_total",
+            "Number of batches of access log entries written by this process",
+            "counter",
+            [({}, stats["flushes"])],
+        )
+        + render_values(
+            "qcfractal_access_log_buffered_entries",
+            "Access log entries currently waiting to be written by this process",
+            "gauge",
+            [({}, stats["buffered"])],
+        )
+    )
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(metrics_dir: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Reads snapshots of metrics written by other (still running) processes
+
+    Snapshots written by processes that no longer exist are removed
+    """
+
+    if metrics_dir is None or not os.path.isdir(metrics_dir):
+        return []
+
+    snapshots = []
+    this_pid = os.getpid()
+
+    for filename in os.listdir(metrics_dir):
+        if not (filename.startswith(_metrics_file_prefix) and filename.endswith(".json")):
+            continue
+
+        try:
+            pid = int(filename[len(_metrics_file_prefix) : -len(".json")])
+        except ValueError:
+            continue
+
+        if pid == this_pid:
+            continue
+
+        file_path = os.path.join(metrics_dir, filename)
+
+        if not _pid_alive(pid):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            continue
+
+        try:
+            with open(file_path, "r") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # May have been removed in the meantime
+            continue
+
+    return snapshots
+
+
+class MetricsWriter:
+    """
+    Periodically writes a snapshot of the metrics of this process in a background thread
+    """
+
+    def __init__(self, registry: MetricsRegistry, metrics_dir: str, write_frequency: float):
+        self._logger = logging.getLogger(__name__)
+        self._registry = registry
+        self._metrics_dir = metrics_dir
+        self._write_frequency = write_frequency
+
+        self._th_cancel = threading.Event()
+        self._th = threading.Thread(
+            target=self._writer_thread, args=(self._th_cancel,), name="metrics_writer", daemon=True
+        )
+        self._th.start()
+
+        self._finalizer = weakref.finalize(self, self._stop_thread, self._th_cancel, self._th)
+
+    def _write(self):
+        try:
+            self._registry.write_snapshot(self._metrics_dir)
+        except Exception as e:
+            self._logger.warning(f"Unable to write metrics to {self._metrics_dir}: {str(e)}")
+
+    def _writer_thread(self, end_thread: threading.Event):
+        while not end_thread.wait(self._write_frequency):
+            self._write()
+
+    @staticmethod
+    def _stop_thread(cancel_event: threading.Event, thread: threading.Thread):
+        ####################################################################################
+        # This is written as a class method so that it can be called by a weakref finalizer
+        ####################################################################################
+
+        cancel_event.set()
+        thread.join()
+
+    def stop(self):
+        """
+        Stops the background thread
+        """
+
+        self._finalizer()
+
+
+#######################################################
+# All the metrics of the server
+#######################################################
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    "qcfractal_request_duration_seconds",
+    "Time taken to handle API requests (not including streaming of the response)",
+    labels=("method", "route", "status"),
+)
+
+db_checkout_duration = registry.histogram(
+    "qcfractal_db_connection_checkout_seconds",
+    "Time taken to obtain a database connection from the connection pool",
+)
+
+task_claim_duration = registry.histogram(
+    "qcfractal_task_claim_duration_seconds", "Time taken for a manager to claim a batch of tasks"
+)
+
+task_claim_size = registry.histogram(
+    "qcfractal_task_claim_batch_size", "Number of tasks claimed by a manager at once", buckets=size_buckets
+)
+
+task_return_duration = registry.histogram(
+    "qcfractal_task_return_duration_seconds", "Time taken to process a batch of tasks returned by a manager"
+)
+
+task_return_size = registry.histogram(
+    "qcfractal_task_return_batch_size", "Number of tasks returned by a manager at once", buckets=size_buckets
+)
+
+internal_job_duration = registry.histogram(
+    "qcfractal_internal_job_duration_seconds",
+    "Time taken to run internal jobs",
+    labels=("function", "status"),
+)
+
+service_iteration_duration = registry.histogram(
+    "qcfractal_service_iteration_duration_seconds",
+    "Time taken to iterate a single service",
+    labels=("record_type",),
+)
+
+service_sweep_duration = registry.histogram(
+    "qcfractal_service_sweep_duration_seconds",
+    "Time taken to check all running services, and to start new services",
+)
@@ -297,6 +297,53 @@ def parse_args() -> argparse.Namespace:
     # role reset
     role_subparsers.add_parser("reset", help="Reset all the original roles to their defaults", parents=[base_parser])
 
+    #####################################
+    # compression subcommand
+    #####################################
+    compression = subparsers.add_parser(
+        "compression", help="Manage the dictionaries used for compressing outputs", parents=[base_parser]
+    )
+
+    # compression sub-subcommands
+    compression_subparsers = compression.add_subparsers(dest="compression_command")
+
+    # compression list
+    compression_subparsers.add_parser("list", help="List all compression dictionaries", parents=[base_parser])
+
+    # compression train
+    compression_train = compression_subparsers.add_parser(
+        "train",
+        help="Train new versions of the compression dictionaries from existing outputs",
+        parents=[base_parser],
+    )
+    compression_train.add_argument(
+        "--output-type",
+        nargs="+",
+        choices=["stdout", "stderr", "error"],
+        help="Only train dictionaries for these types of outputs",
+    )
+    compression_train.add_argument(
+        "--program", nargs="+", help="Only train dictionaries for outputs created by these programs"
+    )
+    compression_train.add_argument(
+        "--max-samples", type=int, default=2000, help="Maximum number of outputs to train each dictionary with"
+    )
+    compression_train.add_argument(
+        "--dictionary-size", type=int, default=112640, help="Maximum size of each dictionary (in bytes)"
+    )
+    compression_train.add_argument(
+        "--recompress",
+        action="store_true",
+        help="Recompress existing outputs with the new dictionaries (in the background, by the internal job runner)",
+    )
+
+    # compression recompress
+    compression_subparsers.add_parser(
+        "recompress",
+        help="Recompress existing outputs with the latest dictionaries (in the background, by the internal job runner)",
+        parents=[base_parser],
+    )
+
     #####################################
     # backup subcommand
     #####################################
@@ -777,6 +824,94 @@ def server_role(args: argparse.Namespace, config: FractalConfig):
         storage.roles.reset_defaults()
 
 
+def server_compression(args: argparse.Namespace, config: FractalConfig):
+    compression_command = args.compression_command
+
+    # Don't check revision here - it will be done in the SQLAlchemySocket constructor
+    start_database(config, check_revision=False)
+    storage = SQLAlchemySocket(config)
+
+    def _queue_recompress():
+        job_id = storage.records.add_recompress_outputs_job()
+        print(f"Added internal job {job_id} to recompress outputs. It will be run by the internal job runner.")
+
+    if compression_command == "list":
+        table_rows = []
+        for d in storage.records.get_output_dictionaries():
+            table_rows.append(
+                (
+                    d["id"],
+                    d["output_type"].value,
+                    d["program"],
+                    d["version"],
+                    d["created_on"],
+                    d["n_samples"],
+                    pretty_bytes(d["samples_compressed_size"]),
+                    pretty_bytes(d["samples_dictionary_size"]),
+                    d["n_outputs"],
+                )
+            )
+
+        print()
+        table_str = tabulate.tabulate(
+            table_rows,
+            headers=[
+                "id",
+                "output type",
+                "program",
+                "version",
+                "created on",
+                "samples",
+                "samples size (before)",
+                "samples size (dictionary)",
+                "outputs",
+            ],
+        )
+        print(table_str)
+        print()
+
+    if compression_command == "train":
+        print("Training compression dictionaries. This may take a while...")
+
+        all_info = storage.records.train_output_dictionaries(
+            args.output_type, args.program, args.max_samples, args.dictionary_size
+        )
+
+        table_rows = []
+        for info in all_info:
+            if info["samples_dictionary_size"] is not None:
+                dict_size = pretty_bytes(info["samples_dictionary_size"])
+            else:
+                dict_size = ""
+
+            result = f"new version {info['version']}" if info["version"] is not None else info["message"]
+
+            table_rows.append(
+                (
+                    info["output_type"].value,
+                    info["program"],
+                    info["n_samples"],
+                    pretty_bytes(info["samples_compressed_size"]),
+                    dict_size,
+                    result,
+                )
+            )
+
+        print()
+        table_str = tabulate.tabulate(
+            table_rows,
+            headers=["output type", "program", "samples", "size (before)", "size (dictionary)", "result"],
+        )
+        print(table_str)
+        print()
+
+        if args.recompress:
+            _queue_recompress()
+
+    if compression_command == "recompress":
+        _queue_recompress()
+
+
 def server_backup(args: argparse.Namespace, config: FractalConfig):
     pg_harness = start_database(config, check_revision=True)
 
@@ -983,6 +1118,8 @@ def main():
         server_user(args, qcf_config)
     elif args.command == "role":
         server_role(args, qcf_config)
+    elif args.command == "compression":
+        server_compression(args, qcf_config)
     elif args.command == "backup":
         server_backup(args, qcf_config)
     elif args.command == "restore":
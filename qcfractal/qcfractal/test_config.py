@@ -20,6 +20,9 @@ def test_config_durations_plain(tmp_path):
     base_config["heartbeat_frequency"] = 30
     base_config["access_log_keep"] = 31
     base_config["internal_job_keep"] = 7
+    base_config["recompress_cold_data_frequency"] = 3600
+    base_config["task_queue_depth_frequency"] = 120
+    base_config["recompress_cold_data_age"] = 14
     base_config["api"]["jwt_access_token_expires"] = 7450
     base_config["api"]["jwt_refresh_token_expires"] = 637277
     cfg = FractalConfig(base_folder=base_folder, **base_config)
@@ -28,6 +31,9 @@ def test_config_durations_plain(tmp_path):
     assert cfg.heartbeat_frequency == 30
     assert cfg.access_log_keep == 2678400  # interpreted as days
     assert cfg.internal_job_keep == 604800
+    assert cfg.recompress_cold_data_frequency == 3600
+    assert cfg.task_queue_depth_frequency == 120
+    assert cfg.recompress_cold_data_age == 1209600
     assert cfg.api.jwt_access_token_expires == 7450
     assert cfg.api.jwt_refresh_token_expires == 637277
 
@@ -40,6 +46,9 @@ def test_config_durations_str(tmp_path):
     base_config["heartbeat_frequency"] = "30s"
     base_config["access_log_keep"] = "1d4h2s"
     base_config["internal_job_keep"] = "1d4h7s"
+    base_config["recompress_cold_data_frequency"] = "1h"
+    base_config["task_queue_depth_frequency"] = "2m"
+    base_config["recompress_cold_data_age"] = "2d"
     base_config["api"]["jwt_access_token_expires"] = "2h4m10s"
     base_config["api"]["jwt_refresh_token_expires"] = "7d9h77s"
     cfg = FractalConfig(base_folder=base_folder, **base_config)
@@ -48,6 +57,9 @@ def test_config_durations_str(tmp_path):
     assert cfg.heartbeat_frequency == 30
     assert cfg.access_log_keep == 100802
     assert cfg.internal_job_keep == 100807
+    assert cfg.recompress_cold_data_frequency == 3600
+    assert cfg.task_queue_depth_frequency == 120
+    assert cfg.recompress_cold_data_age == 172800
     assert cfg.api.jwt_access_token_expires == 7450
     assert cfg.api.jwt_refresh_token_expires == 637277
 
@@ -60,6 +72,9 @@ def test_config_durations_dhms(tmp_path):
     base_config["heartbeat_frequency"] = "30"
     base_config["access_log_keep"] = "1:04:00:02"
     base_config["internal_job_keep"] = "1:04:00:07"
+    base_config["recompress_cold_data_frequency"] = "1:00:00"
+    base_config["task_queue_depth_frequency"] = "2:00"
+    base_config["recompress_cold_data_age"] = "2:00:00:00"
     base_config["api"]["jwt_access_token_expires"] = "2:04:10"
     base_config["api"]["jwt_refresh_token_expires"] = "7:09:00:77"
     cfg = FractalConfig(base_folder=base_folder, **base_config)
@@ -68,6 +83,9 @@ def test_config_durations_dhms(tmp_path):
     assert cfg.heartbeat_frequency == 30
     assert cfg.access_log_keep == 100802
     assert cfg.internal_job_keep == 100807
+    assert cfg.recompress_cold_data_frequency == 3600
+    assert cfg.task_queue_depth_frequency == 120
+    assert cfg.recompress_cold_data_age == 172800
     assert cfg.api.jwt_access_token_expires == 7450
     assert cfg.api.jwt_refresh_token_expires == 637277
 
@@ -80,3 +98,20 @@ def test_config_tmpdir_create(tmp_path):
 
     assert cfg.temporary_dir == str(tmp_path / "qcatmpdir")
     assert os.path.exists(cfg.temporary_dir)
+
+
+def test_config_periodics_disabled(tmp_path):
+    base_config = copy.deepcopy(_base_config)
+    base_config["task_generation_frequency"] = 0
+    base_config["task_queue_depth_frequency"] = "0"
+    base_config["recompress_cold_data_frequency"] = 0
+    cfg = FractalConfig(base_folder=str(tmp_path), **base_config)
+
+    assert cfg.task_generation_frequency == 0
+    assert cfg.task_queue_depth_frequency == 0
+    assert cfg.recompress_cold_data_frequency == 0
+
+    # Defaults
+    cfg = FractalConfig(base_folder=str(tmp_path), **_base_config)
+    assert cfg.task_queue_depth_frequency == 60
+    assert cfg.recompress_cold_data_frequency == 0
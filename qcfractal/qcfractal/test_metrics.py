@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from qcarchivetesting import test_users
+from qcfractal.metrics import MetricsRegistry, read_snapshots, render_access_log_stats
+from qcportal.managers import ManagerName
+
+if TYPE_CHECKING:
+    from qcarchivetesting.testing_classes import QCATestingSnowflake
+
+
+def test_metrics_histogram_render():
+    registry = MetricsRegistry()
+    h = registry.histogram("test_duration_seconds", "A test histogram", labels=("route",), buckets=(0.1, 1.0))
+
+    h.observe(0.05, route="/a")
+    h.observe(0.5, route="/a")
+    h.observe(5.0, route="/a")
+    h.observe(1.0, route='/b"c')
+
+    with pytest.raises(ValueError):
+        h.observe(1.0)
+
+    text = registry.render()
+    lines = text.splitlines()
+
+    assert "# TYPE test_duration_seconds histogram" in lines
+    assert 'test_duration_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'test_duration_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_duration_seconds_sum{route="/a"} 5.55' in lines
+    assert 'test_duration_seconds_count{route="/a"} 3' in lines
+
+    # Upper bounds are inclusive. Label values are escaped
+    assert 'test_duration_seconds_bucket{route="/b\\"c",le="1"} 1' in lines
+
+    with h.time(route="/c"):
+        pass
+    assert 'test_duration_seconds_count{route="/c"} 1' in registry.render().splitlines()
+
+    registry.clear()
+    assert "test_duration_seconds_count" not in registry.render()
+
+
+def test_metrics_access_log_stats_render():
+    stats = {"logged": 10, "written": 7, "dropped": 2, "failed": 1, "flushes": 3, "buffered": 2}
+    lines = render_access_log_stats(stats).splitlines()
+
+    assert "# TYPE qcfractal_access_log_entries_total counter" in lines
+    assert 'qcfractal_access_log_entries_total{status="logged"} 10' in lines
+    assert 'qcfractal_access_log_entries_total{status="written"} 7' in lines
+    assert 'qcfractal_access_log_entries_total{status="dropped"} 2' in lines
+    assert 'qcfractal_access_log_entries_total{status="failed"} 1' in lines
+    assert "qcfractal_access_log_flushes_total 3" in lines
+    assert "# TYPE qcfractal_access_log_buffered_entries gauge" in lines
+    assert "qcfractal_access_log_buffered_entries 2" in lines
+
+
+def test_metrics_merge_snapshots(tmp_path):
+    registry = MetricsRegistry()
+    h = registry.histogram("test_size", "A test histogram", buckets=(1, 10))
+    h.observe(2)
+
+    other = MetricsRegistry()
+    other_h = other.histogram("test_size", "A test histogram", buckets=(1, 10))
+    other_h.observe(1)
+    other_h.observe(20)
+
+    lines = registry.render([other.snapshot()]).splitlines()
+    assert 'test_size_bucket{le="1"} 1' in lines
+    assert 'test_size_bucket{le="10"} 2' in lines
+    assert "test_size_count 3" in lines
+    assert "test_size_sum 23" in lines
+
+    # Snapshots from this process are ignored (we already have those)
+    metrics_dir = str(tmp_path / "metrics")
+    registry.write_snapshot(metrics_dir)
+    assert read_snapshots(metrics_dir) == []
+
+    # Snapshots from running processes are read. Those from processes that don't exist anymore are removed
+    alive_path = os.path.join(metrics_dir, f"metrics-{os.getppid()}.json")
+    dead_path = os.path.join(metrics_dir, "metrics-999999999.json")
+    for p in (alive_path, dead_path):
+        with open(p, "w") as f:
+            json.dump(other.snapshot(), f)
+
+    snapshots = read_snapshots(metrics_dir)
+    assert snapshots == [json.loads(json.dumps(other.snapshot()))]
+    assert not os.path.exists(dead_path)
+
+
+def test_metrics_endpoint(snowflake: QCATestingSnowflake):
+    client = snowflake.client()
+    client.get_molecules([123], missing_ok=True)
+
+    mname = ManagerName(cluster="test_cluster", hostname="a_host", uuid="1234-5678-1234-5678")
+    mclient = snowflake.manager_client(mname)
+    mclient.activate("v2.0", {"psi4": ["unknown"]}, ["*"])
+    mclient.claim({"psi4": ["unknown"]}, ["*"], 2)
+
+    r = client._req_session.get(client.address + "api/v1/metrics")
+    assert r.status_code == 200
+    assert r.headers["Content-Type"].startswith("text/plain")
+
+    text = r.text
+    assert (
+        'qcfractal_request_duration_seconds_count{method="POST",route="/api/v1/molecules/bulkGet",status="200"}' in text
+    )
+    assert 'qcfractal_task_claim_batch_size_bucket{le="0"}' in text
+    assert "qcfractal_db_connection_checkout_seconds_count" in text
+    assert 'qcfractal_access_log_entries_total{status="dropped"} 0' in text
+
+    # Metrics from the internal job runner are written periodically
+    snowflake.start_job_runner()
+    for _ in range(30):
+        text = client._req_session.get(client.address + "api/v1/metrics").text
+        if 'qcfractal_internal_job_duration_seconds_count{function="services.iterate_services"' in text:
+            break
+        time.sleep(1)
+    else:
+        raise RuntimeError("Metrics from the internal job runner were not found")
+
+    assert "qcfractal_service_sweep_duration_seconds_count" in text
+
+
+def test_metrics_endpoint_permissions(secure_snowflake_allow_read: QCATestingSnowflake):
+    read_client = secure_snowflake_allow_read.client()
+    r = read_client._req_session.get(read_client.address + "api/v1/metrics")
+    assert r.status_code == 403
+
+    client = secure_snowflake_allow_read.client("admin_user", test_users["admin_user"]["pw"])
+    r = client._req_session.get(client.address + "api/v1/metrics")
+    assert r.status_code == 200
+    assert "# TYPE qcfractal_request_duration_seconds histogram" in r.text
@@ -264,6 +264,19 @@ def test_cli_role_reset(cli_runner):
     assert "Resetting default roles to their original" in output
 
 
+def test_cli_compression(cli_runner):
+    output = cli_runner(["compression", "list"])
+    assert "output type" in output
+
+    # Nothing to train from
+    output = cli_runner(["compression", "train", "--output-type", "stdout", "--program", "psi4", "--recompress"])
+    assert "Training compression dictionaries" in output
+    assert "to recompress outputs" in output
+
+    output = cli_runner(["compression", "recompress"])
+    assert "to recompress outputs" in output
+
+
 def test_cli_restore_noinit(cli_runner_core):
     # Restore where the db does not exist and has not been initialized
     migdata_path = os.path.join(migrationdata_path, "empty_v0.15.8.sql_dump")
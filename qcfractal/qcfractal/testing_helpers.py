@@ -10,7 +10,6 @@ from qcfractal.components.internal_jobs.db_models import InternalJobORM
 from qcfractal.components.record_db_models import BaseRecordORM
 from qcfractal.db_socket import SQLAlchemySocket
 from qcfractalcompute.compress import compress_result
-from qcportal.compression import decompress, CompressionEnum
 from qcportal.managers import ManagerName
 from qcportal.record_models import RecordStatusEnum, RecordTask
 
@@ -31,9 +30,11 @@ class DummyJobProgress:
     def update_progress(self, progress: int):
         pass
 
+    @property
     def cancelled(self) -> bool:
         return False
 
+    @property
     def deleted(self) -> bool:
         return False
 
@@ -92,7 +93,7 @@ def run_service(
                         print("Error in service dependency")
                         print(rec.status)
                         print(rec.compute_history[-1].status)
-                        print(decompress(rec.compute_history[-1].outputs["error"].data, CompressionEnum.zstd))
+                        print(rec.compute_history[-1].outputs["error"].get_output())
 
                     assert rec.status == RecordStatusEnum.complete
                     assert rec.service is None
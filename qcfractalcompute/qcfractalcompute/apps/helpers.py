@@ -8,6 +8,7 @@ import time
 from typing import Optional, Dict, Tuple, List
 
 from qcfractalcompute.compress import compress_result
+from qcfractalcompute.config import ResultCompressionSettings
 from .models import AppTaskResult
 
 _apptainer_cmd = None
@@ -28,12 +29,26 @@ def get_apptainer_cmd() -> str:
     return _apptainer_cmd
 
 
-def run_apptainer(sif_path: str, command: List[str], volumes: List[Tuple[str, str]]) -> AppTaskResult:
+def get_apptainer_command(sif_path: str, command: List[str], volumes: List[Tuple[str, str]]) -> List[str]:
+    """
+    Builds the full command for running a command inside an apptainer/singularity container
+    """
+
     cmd = [get_apptainer_cmd()]
 
     volumes_tmp = [f"{v[0]}:{v[1]}" for v in volumes]
     cmd.extend(["run", "--bind", ",".join(volumes_tmp), sif_path])
     cmd.extend(command)
+    return cmd
+
+
+def run_apptainer(
+    sif_path: str,
+    command: List[str],
+    volumes: List[Tuple[str, str]],
+    compression_settings: Optional[ResultCompressionSettings] = None,
+) -> AppTaskResult:
+    cmd = get_apptainer_command(sif_path, command, volumes)
 
     time_0 = time.time()
     proc_result = subprocess.run(cmd, capture_output=True, text=True)
@@ -53,12 +68,16 @@ def run_apptainer(sif_path: str, command: List[str], volumes: List[Tuple[str, st
     return AppTaskResult(
         success=ret["success"],
         walltime=time_1 - time_0,
-        result_compressed=compress_result(ret),
+        result_compressed=compress_result(ret, compression_settings),
     )
 
 
 def run_conda_subprocess(
-    conda_env_name: Optional[str], cmd: List[str], cwd: Optional[str], env: Dict[str, str]
+    conda_env_name: Optional[str],
+    cmd: List[str],
+    cwd: Optional[str],
+    env: Dict[str, str],
+    compression_settings: Optional[ResultCompressionSettings] = None,
 ) -> AppTaskResult:
     if cwd:
         cwd = os.path.expandvars(cwd)
@@ -87,5 +106,5 @@ def run_conda_subprocess(
     return AppTaskResult(
         success=ret["success"],
         walltime=time_1 - time_0,
-        result_compressed=compress_result(ret),
+        result_compressed=compress_result(ret, compression_settings),
     )
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from typing import Optional, Dict, Tuple, List, Any
+
+from qcfractalcompute.compress import compress_result
+from qcfractalcompute.config import PersistentWorkerSettings, ResultCompressionSettings
+from .models import AppTaskResult
+
+_logger = logging.getLogger(__name__)
+
+# Idle workers, keyed by the command used to start them (and the working directory).
+# These are local to the process running the apps (ie, the parsl worker process).
+_idle_workers: Dict[Tuple[Tuple[str, ...], Optional[str]], List[PersistentWorker]] = defaultdict(list)
+_idle_workers_lock = threading.Lock()
+
+
+class PersistentWorker:
+    """
+    A long-lived python process that runs tasks sent to it over a pipe
+
+    The process is expected to read a single line of json (the function kwargs) from stdin,
+    and respond with a single line of json containing the result and its current memory usage.
+    See run_scripts/qcengine_worker.py
+    """
+
+    def __init__(self, cmd: List[str], cwd: Optional[str]):
+        self.n_tasks = 0
+        self.rss = 0
+
+        # stderr is inherited, and so ends up wherever the stderr of the parsl worker goes
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=cwd)
+
+    def is_alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def run(self, function_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sends a task to the worker process, and waits for the result
+        """
+
+        self._proc.stdin.write(json.dumps(function_kwargs) + "\n")
+        self._proc.stdin.flush()
+
+        # Skip anything printed to stdout before the worker itself started
+        # (for example, by conda activation scripts)
+        while True:
+            response = self._proc.stdout.readline()
+            if not response:
+                raise RuntimeError(f"Persistent worker exited unexpectedly with return code {self._proc.wait()}")
+            if response.startswith("{"):
+                break
+            _logger.debug(f"Ignoring output from persistent worker: {response.rstrip()}")
+
+        response = json.loads(response)
+        self.n_tasks += 1
+        self.rss = response["rss"]
+        return response["result"]
+
+    def stop(self) -> None:
+        """
+        Stops the worker process, killing it if it does not exit after closing its stdin
+        """
+
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self._proc.kill()
+            self._proc.wait()
+
+
+def _stop_all_workers() -> None:
+    with _idle_workers_lock:
+        for workers in _idle_workers.values():
+            for worker in workers:
+                worker.stop()
+        _idle_workers.clear()
+
+
+atexit.register(_stop_all_workers)
+
+
+def run_persistent_worker(
+    cmd: List[str],
+    cwd: Optional[str],
+    function_kwargs: Dict[str, Any],
+    settings: PersistentWorkerSettings,
+    compression_settings: Optional[ResultCompressionSettings] = None,
+) -> AppTaskResult:
+    """
+    Runs a task in an idle persistent worker started with the given command, starting a new worker if needed
+
+    Workers are recycled (stopped, to be replaced by a fresh process on the next task)
+    after running a given number of tasks, or when their memory usage grows too large.
+    """
+
+    if cwd:
+        cwd = os.path.expandvars(cwd)
+
+    key = (tuple(cmd), cwd)
+
+    worker = None
+    with _idle_workers_lock:
+        while _idle_workers[key]:
+            w = _idle_workers[key].pop()
+            if w.is_alive():
+                worker = w
+                break
+            w.stop()
+
+    if worker is None:
+        _logger.debug(f"Starting new persistent worker: {' '.join(cmd)}")
+        worker = PersistentWorker(cmd, cwd)
+
+    time_0 = time.time()
+    try:
+        ret = worker.run(function_kwargs)
+    except Exception as e:
+        worker.stop()
+        worker = None
+
+        msg = f"Persistent worker failed: {str(e)}"
+        ret = {"success": False, "error": {"error_type": "RuntimeError", "error_message": msg}}
+    time_1 = time.time()
+
+    if worker is not None:
+        max_memory = settings.max_memory
+        if worker.n_tasks >= settings.max_tasks or (max_memory is not None and worker.rss > max_memory * 1024**3):
+            _logger.debug(f"Recycling persistent worker after {worker.n_tasks} tasks ({worker.rss} bytes RSS)")
+            worker.stop()
+        else:
+            with _idle_workers_lock:
+                _idle_workers[key].append(worker)
+
+    return AppTaskResult(
+        success=ret["success"],
+        walltime=time_1 - time_0,
+        result_compressed=compress_result(ret, compression_settings),
+    )
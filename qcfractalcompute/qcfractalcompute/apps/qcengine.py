@@ -38,12 +38,30 @@ def qcengine_conda_app(
     function_kwargs = decompress(function_kwargs_compressed, CompressionEnum.zstd)
     function_kwargs = {**function_kwargs, "task_config": qcengine_options}
 
+    if executor_config.persistent_workers.enabled:
+        from qcfractalcompute.apps.persistent_worker import run_persistent_worker
+
+        # Run through conda, so that the environment is activated (PATH, activation scripts, etc) the
+        # same way as when running tasks in a new process. This is only done once per worker
+        cmd = ["python3", get_script_path("qcengine_worker.py")]
+        if conda_env_name:
+            cmd = ["conda", "run", "--no-capture-output", "-n", conda_env_name] + cmd
+        return run_persistent_worker(
+            cmd,
+            executor_config.scratch_directory,
+            function_kwargs,
+            executor_config.persistent_workers,
+            executor_config.result_compression,
+        )
+
     with tempfile.NamedTemporaryFile("w") as f:
         json.dump(function_kwargs, f)
         f.flush()
 
         cmd = ["python3", script_path, f.name]
-        return run_conda_subprocess(conda_env_name, cmd, executor_config.scratch_directory, {})
+        return run_conda_subprocess(
+            conda_env_name, cmd, executor_config.scratch_directory, {}, executor_config.result_compression
+        )
 
 
 def qcengine_apptainer_app(
@@ -76,6 +94,17 @@ def qcengine_apptainer_app(
     function_kwargs = decompress(function_kwargs_compressed, CompressionEnum.zstd)
     function_kwargs = {**function_kwargs, "task_config": qcengine_options}
 
+    if executor_config.persistent_workers.enabled:
+        from qcfractalcompute.apps.helpers import get_apptainer_command
+        from qcfractalcompute.apps.persistent_worker import run_persistent_worker
+
+        worker_script_path = get_script_path("qcengine_worker.py")
+        volumes = [(script_path, "/qcengine_compute.py"), (worker_script_path, "/qcengine_worker.py")]
+        cmd = get_apptainer_command(sif_path, command=["python3", "/qcengine_worker.py"], volumes=volumes)
+        return run_persistent_worker(
+            cmd, None, function_kwargs, executor_config.persistent_workers, executor_config.result_compression
+        )
+
     with tempfile.NamedTemporaryFile("w") as f:
         json.dump(function_kwargs, f)
         f.flush()
@@ -83,4 +112,6 @@ def qcengine_apptainer_app(
         volumes = [(script_path, "/qcengine_compute.py"), (f.name, "/input.json")]
         cmd = ["python3", "/qcengine_compute.py", "/input.json"]
 
-        return run_apptainer(sif_path, command=cmd, volumes=volumes)
+        return run_apptainer(
+            sif_path, command=cmd, volumes=volumes, compression_settings=executor_config.result_compression
+        )
@@ -2,14 +2,19 @@
 Helpers for compressing data to send back to the server
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 import numpy
 
+from qcfractalcompute.config import ResultCompressionSettings
 from qcportal.compression import CompressionEnum, compress
 
 
-def _compress_common(result: Dict[str, Any]):
+def _compress(data: Any, settings: ResultCompressionSettings) -> Tuple[bytes, CompressionEnum, int]:
+    return compress(data, CompressionEnum.zstd, settings.compression_level, threads=settings.threads)
+
+
+def _compress_common(result: Dict[str, Any], settings: ResultCompressionSettings):
     """
     Compresses outputs of an AtomicResult or OptimizationResult, storing them in extras
     """
@@ -22,19 +27,19 @@ def _compress_common(result: Dict[str, Any]):
 
     if stdout is not None:
         result["extras"].setdefault("_qcfractal_compressed_outputs", {})
-        new_stdout, ctype, clevel = compress(stdout, CompressionEnum.zstd)
+        new_stdout, ctype, clevel = _compress(stdout, settings)
         compressed_outputs["stdout"] = {"compression_type": ctype, "compression_level": clevel, "data": new_stdout}
         result["stdout"] = None
 
     if stderr is not None:
         result["extras"].setdefault("_qcfractal_compressed_outputs", {})
-        new_stderr, ctype, clevel = compress(stderr, CompressionEnum.zstd)
+        new_stderr, ctype, clevel = _compress(stderr, settings)
         compressed_outputs["stderr"] = {"compression_type": ctype, "compression_level": clevel, "data": new_stderr}
         result["stderr"] = None
 
     if error is not None:
         result["extras"].setdefault("_qcfractal_compressed_outputs", {})
-        new_error, ctype, clevel = compress(error.dict(), CompressionEnum.zstd)
+        new_error, ctype, clevel = _compress(error.dict(), settings)
         compressed_outputs["error"] = {"compression_type": ctype, "compression_level": clevel, "data": new_error}
         result["error"] = None
 
@@ -42,7 +47,7 @@ def _compress_common(result: Dict[str, Any]):
         result["extras"]["_qcfractal_compressed_outputs"] = compressed_outputs
 
 
-def _compress_native_files(result: Dict[str, Any]):
+def _compress_native_files(result: Dict[str, Any], settings: ResultCompressionSettings):
     """
     Compresses outputs and native files, storing them in extras
     """
@@ -53,14 +58,14 @@ def _compress_native_files(result: Dict[str, Any]):
 
     compressed_nf = {}
     for name, data in native_files.items():
-        nf, ctype, clevel = compress(data, CompressionEnum.zstd)
+        nf, ctype, clevel = _compress(data, settings)
         compressed_nf[name] = {"compression_type": ctype, "compression_level": clevel, "data": nf}
 
     result["native_files"] = {}
     result["extras"]["_qcfractal_compressed_native_files"] = compressed_nf
 
 
-def _compress_optimizationresult(result: Dict[str, Any]):
+def _compress_optimizationresult(result: Dict[str, Any], settings: ResultCompressionSettings):
     """
     Compresses outputs inside an OptimizationResult, storing them in extras
 
@@ -70,10 +75,10 @@ def _compress_optimizationresult(result: Dict[str, Any]):
     # Handle the trajectory
     if result.get("trajectory", None):
         for x in result["trajectory"]:
-            _compress_common(x)
+            _compress_common(x, settings)
 
     # Now handle the outputs of the optimization itself
-    _compress_common(result)
+    _compress_common(result, settings)
 
 
 def _convert_numpy(obj):
@@ -90,7 +95,7 @@ def _convert_numpy(obj):
         return obj
 
 
-def compress_result(result: Dict[str, Any]) -> bytes:
+def compress_result(result: Dict[str, Any], settings: Optional[ResultCompressionSettings] = None) -> bytes:
     """
     Compress outputs and native files inside results, storing them in extras. Then compress the whole result
 
@@ -100,21 +105,26 @@ def compress_result(result: Dict[str, Any]) -> bytes:
     The compressed outputs are stored in extras. For OptimizationResult, the outputs for the optimization
     are stored in the extras field of the OptimizationResult, while the outputs for the trajectory
     are stored in the extras field for the AtomicResults within the trajectory
+
+    The compression level and number of threads are taken from the given settings (defaults if None)
     """
 
+    if settings is None:
+        settings = ResultCompressionSettings()
+
     result = _convert_numpy(result)
     schema_type = result.get("schema_name", None)
 
     if schema_type == "qcschema_output":
-        _compress_common(result)
-        _compress_native_files(result)
+        _compress_common(result, settings)
+        _compress_native_files(result, settings)
     elif schema_type == "qcschema_optimization_output":
-        _compress_optimizationresult(result)
+        _compress_optimizationresult(result, settings)
     elif schema_type == "qca_generic_task_result":
-        _compress_common(result)
+        _compress_common(result, settings)
     else:
         pass
 
     # Compress the whole thing
-    r, _, _ = compress(result, CompressionEnum.zstd)
+    r, _, _ = _compress(result, settings)
     return r
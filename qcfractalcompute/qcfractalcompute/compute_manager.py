@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import math
 import sched
 import socket
 import threading
@@ -8,7 +9,7 @@ import time
 import traceback
 import uuid
 from collections import defaultdict
-from typing import TYPE_CHECKING, Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Iterable
 
 import parsl.executors.high_throughput.interchange
 import tabulate
@@ -47,7 +48,17 @@ class InterruptableScheduler(sched.scheduler):
 
     def __init__(self):
         self._int_event = threading.Event()
-        super().__init__(time.monotonic, self._int_event.wait)
+        super().__init__(time.monotonic, self._wait)
+
+    def _wait(self, timeout: float):
+        # Wait, but return early if interrupted or woken up
+        self._int_event.wait(timeout)
+        self._int_event.clear()
+
+    def wake(self):
+        # Interrupt the current sleep period, so that any newly-entered events
+        # are taken into account (this can be called from other threads)
+        self._int_event.set()
 
     def interrupt(self):
         # Clear all events in the queue, then interrupt the current sleep period
@@ -81,6 +92,53 @@ class ManagerStatistics(BaseModel):
         return self.total_successful_tasks + self.total_failed_tasks
 
 
+class TaskWalltimeStatistics:
+    """
+    Running averages of the walltime of successful tasks run on an executor
+
+    Averages are kept over all tasks, as well as broken down by task type (queue tag and required programs),
+    since different types of tasks can take vastly different amounts of time.
+    """
+
+    # Weight given to the newest walltime in the (exponentially-weighted) running averages
+    smoothing = 0.1
+
+    def __init__(self):
+        self.n_tasks: int = 0
+        self.mean_walltime: Optional[float] = None
+
+        # key = (tag, programs)
+        self.n_tasks_by_type: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.mean_walltime_by_type: Dict[Tuple[str, str], float] = {}
+
+    def _update_average(self, current: Optional[float], walltime: float, n: int) -> float:
+        # A plain average for the first few tasks, so that the very first task doesn't dominate
+        weight = max(1.0 / n, self.smoothing)
+        return walltime if current is None else current + weight * (walltime - current)
+
+    def add(self, task_type: Tuple[str, str], walltime: float) -> None:
+        self.n_tasks += 1
+        self.mean_walltime = self._update_average(self.mean_walltime, walltime, self.n_tasks)
+
+        self.n_tasks_by_type[task_type] += 1
+        self.mean_walltime_by_type[task_type] = self._update_average(
+            self.mean_walltime_by_type.get(task_type), walltime, self.n_tasks_by_type[task_type]
+        )
+
+    def estimate(self, task_types: Iterable[Tuple[str, str]]) -> Optional[float]:
+        """
+        Estimate the average walltime of the given types of tasks
+
+        Types of tasks that have not been seen before are ignored. If none of the given types have been seen,
+        the average over all tasks is returned (which is None if no tasks have finished yet).
+        """
+
+        known = [self.mean_walltime_by_type[t] for t in task_types if t in self.mean_walltime_by_type]
+        if known:
+            return sum(known) / len(known)
+        return self.mean_walltime
+
+
 class ComputeManager:
     """
     This object maintains a computational queue and watches for finished tasks for different
@@ -130,6 +188,14 @@ class ComputeManager:
         # Mapping of task_id to record_id
         self._record_id_map: Dict[int, int] = {}
 
+        # Mapping of task_id to the type of task (tag, programs) for active tasks
+        self._task_type_map: Dict[int, Tuple[str, str]] = {}
+
+        # Walltime statistics for each executor. Used to determine how many tasks to claim
+        self._walltime_stats: Dict[str, TaskWalltimeStatistics] = {
+            exl: TaskWalltimeStatistics() for exl in config.executors.keys()
+        }
+
         self.all_queue_tags = []
         for ex_label, ex_config in config.executors.items():
             if len(ex_config.queue_tags) == 0:
@@ -207,6 +273,15 @@ class ComputeManager:
         # Time at which the worker started idling (no jobs being run)
         self._idle_start_time = None
 
+        # Are updates being done manually (ie, for testing)
+        self._manual_updates = False
+
+        # For returning results (and claiming new tasks) as tasks finish, rather than
+        # waiting for the next periodic update. The callbacks for finished futures run in other threads
+        self._early_update_lock = threading.Lock()
+        self._early_update_event = None
+        self._n_finished_since_update = 0
+
     @staticmethod
     def _get_max_workers(executor: ParslExecutor) -> int:
         """
@@ -285,6 +360,8 @@ class ComputeManager:
             ex = build_executor(ex_label, ex_config)
             self.dflow_kernel.add_executors([ex])
 
+        self._manual_updates = manual_updates
+
         def scheduler_update():
             if not manual_updates:
                 self.update(new_tasks=True)
@@ -468,6 +545,86 @@ class ComputeManager:
             )
             self._task_futures[executor_label][task.id] = task_future
             self._record_id_map[task.id] = task.record_id
+            self._task_type_map[task.id] = self._get_task_type(task)
+            task_future.add_done_callback(self._task_done_callback)
+
+    @staticmethod
+    def _get_task_type(task: RecordTask) -> Tuple[str, str]:
+        return task.tag, ",".join(sorted(task.required_programs))
+
+    def _get_claim_size(self, executor_label: str, max_workers: int, n_active: int) -> int:
+        """
+        Determine how many new tasks to claim for an executor
+
+        Enough tasks are claimed to keep all the workers busy until the next update, based on the
+        walltime of recently-finished tasks (of the same types as those currently active, if possible).
+        Before any tasks have finished, enough tasks are claimed to fill the workers three times over.
+        """
+
+        active_types = [self._task_type_map[t] for t in self._task_futures[executor_label] if t in self._task_type_map]
+        est_walltime = self._walltime_stats[executor_label].estimate(active_types)
+
+        if est_walltime is None:
+            target = 3 * max_workers
+        else:
+            # Time until the next update. If tasks are returned as they finish, the next update
+            # will come (at most) return_batch_delay after a task finishes
+            interval = self.manager_config.update_frequency
+            if self.manager_config.return_batch_delay is not None:
+                interval = min(interval, self.manager_config.return_batch_delay)
+
+            # Tasks that are running now, plus the tasks the workers will get through before the next update
+            n_per_worker = 1 + math.ceil(interval / max(est_walltime, 0.001))
+            n_per_worker = min(n_per_worker, self.manager_config.claim_limit_per_worker)
+            target = n_per_worker * max_workers
+
+            self.logger.debug(
+                f"Executor {executor_label}: estimated task walltime {est_walltime:.2f}s, "
+                f"targeting {target} claimed tasks"
+            )
+
+        return target - n_active
+
+    def _task_done_callback(self, future: ParslFuture) -> None:
+        """
+        Called (from another thread) when a task future finishes
+
+        This schedules an update of the manager (returning finished tasks and claiming new ones)
+        rather than waiting for the next periodic update. Finished tasks are batched - the update is run
+        return_batch_delay seconds after the first task finishes, or immediately when return_batch_size
+        tasks have finished.
+        """
+
+        delay = self.manager_config.return_batch_delay
+        if delay is None or self._manual_updates or self._is_stopping:
+            return
+
+        with self._early_update_lock:
+            self._n_finished_since_update += 1
+            batch_full = self._n_finished_since_update >= self.manager_config.return_batch_size
+
+            if self._early_update_event is not None:
+                if not batch_full:
+                    return
+
+                # Replace the already-scheduled update with an immediate one
+                try:
+                    self.scheduler.cancel(self._early_update_event)
+                except ValueError:
+                    # Already running or finished. It will pick up this task anyway
+                    return
+
+            self._early_update_event = self.scheduler.enter(0.0 if batch_full else delay, 1, self._early_update)
+
+        self.scheduler.wake()
+
+    def _early_update(self) -> None:
+        with self._early_update_lock:
+            self._early_update_event = None
+            self._n_finished_since_update = 0
+
+        if not self._is_stopping:
+            self.update(new_tasks=True)
 
     def _return_finished(self, results: Dict[int, AppTaskResult]) -> TaskReturnMetadata:
         # Handling of exceptions is expected to be done in the calling function
@@ -566,9 +723,12 @@ class ComputeManager:
 
                 for task_id, app_result in executor_results.items():
                     walltime_seconds = app_result.walltime
+                    task_type = self._task_type_map.pop(task_id, None)
 
                     if app_result.success:
                         n_success += 1
+                        if task_type is not None:
+                            self._walltime_stats[executor_label].add(task_type, walltime_seconds)
                     else:
                         self.logger.debug(f"Task {task_id} (record {self._record_id_map[task_id]}) failed:")
                         self.logger.debug(app_result.result["error"]["error_message"])
@@ -640,8 +800,9 @@ class ComputeManager:
                 executor = self.dflow_kernel.executors[executor_label]
 
                 # How many slots do we have?
-                # TODO - intelligently figure out the number tasks to claim over the number of slots
-                open_slots = (3 * self._get_max_workers(executor)) - active_tasks[executor_label]
+                open_slots = self._get_claim_size(
+                    executor_label, self._get_max_workers(executor), active_tasks[executor_label]
+                )
 
                 self.logger.info(
                     f"Executor {executor_label} has {active_tasks[executor_label]} active tasks and {open_slots} open slots"
@@ -46,6 +46,59 @@ class PackageEnvironmentSettings(BaseModel):
     )
 
 
+class PersistentWorkerSettings(BaseModel):
+    """
+    Settings for keeping long-lived (warm) qcengine worker processes
+
+    When enabled, qcengine tasks are sent to a persistent python process (one per conda environment
+    or apptainer image, per concurrent task) rather than starting a new process for each task. This
+    avoids paying the startup cost (importing qcengine, etc) for every task.
+    """
+
+    enabled: bool = Field(False, description="Run qcengine tasks in persistent worker processes")
+    max_tasks: int = Field(
+        100, description="Number of tasks a persistent worker will run before being replaced with a fresh process", gt=0
+    )
+    max_memory: Optional[float] = Field(
+        None,
+        description="If a persistent worker's memory usage (resident set size, in GiB) grows beyond this, "
+        "it will be replaced with a fresh process. If None, memory usage is not checked.",
+    )
+
+    class Config(BaseModel.Config):
+        case_insensitive = True
+        extra = "forbid"
+
+
+class ResultCompressionSettings(BaseModel):
+    """
+    Settings for compressing results (outputs, native files, and the result itself) before returning them
+
+    Compression is done by the worker right after each calculation, so it competes with calculations for CPU time.
+    Lower compression levels are much faster, at the cost of somewhat larger results. Outputs and native files are
+    stored by the server as they are sent, unless the server is configured to recompress cold data
+    (see recompress_cold_data_frequency in the server configuration).
+    """
+
+    compression_level: Optional[int] = Field(
+        None,
+        description="zstd compression level (1-22). Low levels (1-3) are fastest. If None, the level is chosen "
+        "based on the size of the data (16, or 6 for very large data)",
+        ge=1,
+        le=22,
+    )
+    threads: int = Field(
+        0,
+        description="Number of threads used to compress large data (over 1 MiB). 0 means compression only "
+        "uses a single thread, and -1 means use one thread per CPU",
+        ge=-1,
+    )
+
+    class Config(BaseModel.Config):
+        case_insensitive = True
+        extra = "forbid"
+
+
 class ExecutorConfig(BaseModel):
     type: str
     queue_tags: List[str]
@@ -60,6 +113,8 @@ class ExecutorConfig(BaseModel):
     extra_executor_options: Dict[str, Any] = {}
 
     environments: PackageEnvironmentSettings = PackageEnvironmentSettings()
+    persistent_workers: PersistentWorkerSettings = PersistentWorkerSettings()
+    result_compression: ResultCompressionSettings = ResultCompressionSettings()
 
     class Config(BaseModel.Config):
         case_insensitive = True
@@ -200,6 +255,28 @@ class FractalComputeConfig(BaseModel):
         ge=0,
     )
 
+    return_batch_size: int = Field(
+        50,
+        description="Finished tasks are returned to the server (and new tasks claimed) as soon as this many "
+        "tasks have finished, rather than waiting for the next update.",
+        gt=0,
+    )
+    return_batch_delay: Optional[float] = Field(
+        5.0,
+        description="After a task finishes, wait at most this long (in seconds) for other tasks to finish before "
+        "returning them to the server and claiming new tasks, rather than waiting for the next update. "
+        "If None, finished tasks are only returned on the regular updates (see update_frequency).",
+        ge=0,
+    )
+
+    claim_limit_per_worker: int = Field(
+        25,
+        description="The number of tasks to claim is based on how long recent tasks took to run, so that workers "
+        "stay busy until the next update. This is the maximum number of tasks claimed for each worker "
+        "(including the task it is running), which limits how many tasks are claimed when tasks are very short.",
+        gt=0,
+    )
+
     max_idle_time: Optional[int] = Field(
         None,
         description="Maximum consecutive time in seconds that the manager "
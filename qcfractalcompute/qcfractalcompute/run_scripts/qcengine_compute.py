@@ -35,11 +35,11 @@ _qcvar_transitions = {
     "valiron-mayer function couterpoise interaction energy": "vmfc-corrected interaction energy",  # note misspelling
 }
 
-if __name__ == "__main__":
-    function_kwargs_file = sys.argv[1]
 
-    with open(function_kwargs_file, "r") as f:
-        function_kwargs = json.load(f)
+def compute(function_kwargs):
+    """
+    Runs qcengine.compute or qcengine.compute_procedure, returning the result as a (json-compatible) dictionary
+    """
 
     if "procedure" in function_kwargs:
         ret = qcengine.compute_procedure(**function_kwargs)
@@ -60,4 +60,13 @@ if __name__ == "__main__":
             # Replace any names with underscores (and other modifications)
             ret.extras["qcvars"] = {_qcvar_transitions.get(k, k): v for k, v in ret.extras["qcvars"].items()}
 
-    print(json.dumps(ret.dict(encoding="json")))
+    return ret.dict(encoding="json")
+
+
+if __name__ == "__main__":
+    function_kwargs_file = sys.argv[1]
+
+    with open(function_kwargs_file, "r") as f:
+        function_kwargs = json.load(f)
+
+    print(json.dumps(compute(function_kwargs)))
@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+import traceback
+
+# qcengine_compute.py is expected to be in the same directory as this script
+# (this is also true inside apptainer containers)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from qcengine_compute import compute
+
+
+def current_rss() -> int:
+    """
+    Returns the current resident set size of this process (in bytes)
+    """
+
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Not linux. Use the peak RSS instead (which is in bytes on macos)
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+if __name__ == "__main__":
+    # Keep the original stdout for communicating with the compute manager.
+    # Anything else written to stdout (by qcengine or by programs running
+    # in this process) is sent to stderr instead
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    # Each line of stdin contains the function kwargs of a single task.
+    # Each response is a single line containing the result and the current memory usage
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        try:
+            ret = compute(json.loads(line))
+        except Exception:
+            msg = "Error running task in persistent worker:\n" + traceback.format_exc()
+            ret = {"success": False, "error": {"error_type": "RuntimeError", "error_message": msg}}
+
+        protocol_out.write(json.dumps({"result": ret, "rss": current_rss()}) + "\n")
+        protocol_out.flush()
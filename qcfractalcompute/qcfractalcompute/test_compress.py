@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from qcfractalcompute.compress import compress_result
+from qcfractalcompute.config import ResultCompressionSettings
+from qcportal.compression import CompressionEnum, decompress
+
+# Large enough to be compressed with multiple threads
+_stdout = "\n".join(f"Iteration {i}: energy = {-76.0 - i * 1.0e-6:.10f}" for i in range(100000))
+
+
+def _make_result():
+    return {
+        "schema_name": "qcschema_output",
+        "success": True,
+        "stdout": _stdout,
+        "stderr": "some warnings",
+        "native_files": {"input": "an input file"},
+        "extras": {},
+    }
+
+
+@pytest.mark.parametrize(
+    "settings, expected_level",
+    [
+        (None, 16),
+        (ResultCompressionSettings(compression_level=1), 1),
+        (ResultCompressionSettings(compression_level=3, threads=2), 3),
+    ],
+)
+def test_compress_result_settings(settings, expected_level):
+    result = decompress(compress_result(_make_result(), settings), CompressionEnum.zstd)
+
+    assert result["stdout"] is None
+    assert result["stderr"] is None
+    assert result["native_files"] == {}
+
+    outputs = result["extras"]["_qcfractal_compressed_outputs"]
+    native_files = result["extras"]["_qcfractal_compressed_native_files"]
+
+    assert outputs["stdout"]["compression_level"] == expected_level
+    assert outputs["stderr"]["compression_level"] == expected_level
+    assert native_files["input"]["compression_level"] == expected_level
+
+    assert decompress(outputs["stdout"]["data"], outputs["stdout"]["compression_type"]) == _stdout
+    assert decompress(outputs["stderr"]["data"], outputs["stderr"]["compression_type"]) == "some warnings"
+    assert decompress(native_files["input"]["data"], native_files["input"]["compression_type"]) == "an input file"
+
+
+def test_compress_result_settings_validation():
+    with pytest.raises(ValueError):
+        ResultCompressionSettings(compression_level=23)
+    with pytest.raises(ValueError):
+        ResultCompressionSettings(threads=-2)
+    with pytest.raises(ValueError):
+        ResultCompressionSettings(level=3)
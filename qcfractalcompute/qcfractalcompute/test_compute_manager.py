@@ -6,7 +6,7 @@ from typing import TYPE_CHECKING
 
 import pytest
 
-from qcfractalcompute.compute_manager import ComputeManager
+from qcfractalcompute.compute_manager import ComputeManager, TaskWalltimeStatistics
 from qcfractalcompute.config import FractalComputeConfig, FractalServerSettings, LocalExecutorConfig
 from qcfractalcompute.testing_helpers import QCATestingComputeThread, populate_db
 from qcportal.managers import ManagerStatusEnum, ManagerQueryFilters
@@ -176,6 +176,19 @@ def test_manager_claim_return(snowflake: QCATestingSnowflake):
     assert r is True
 
 
+def test_manager_claim_return_early(snowflake: QCATestingSnowflake):
+    # Periodic updates are rare, so tasks are only returned/claimed as other tasks finish
+    storage_socket = snowflake.get_storage_socket()
+    all_id, result_data = populate_db(storage_socket)
+
+    add_config = {"update_frequency": 300, "return_batch_delay": 0.5}
+    compute = QCATestingComputeThread(snowflake._qcf_config, result_data, additional_manager_config=add_config)
+    compute.start(manual_updates=False)
+
+    r = snowflake.await_results(all_id, 60.0)
+    assert r is True
+
+
 def test_manager_deferred_return(snowflake: QCATestingSnowflake):
     storage_socket = snowflake.get_storage_socket()
     all_id, result_data = populate_db(storage_socket)
@@ -220,6 +233,58 @@ def test_manager_deferred_return(snowflake: QCATestingSnowflake):
     assert all(x["manager_name"] == compute.name for x in r)
 
 
+def test_manager_walltime_statistics():
+    stats = TaskWalltimeStatistics()
+    assert stats.estimate([("tag1", "psi4")]) is None
+
+    stats.add(("tag1", "psi4"), 2.0)
+    stats.add(("tag1", "psi4"), 4.0)
+    stats.add(("tag2", "geometric,psi4"), 30.0)
+
+    assert stats.n_tasks == 3
+    assert stats.estimate([("tag1", "psi4")]) == pytest.approx(3.0)
+    assert stats.estimate([("tag2", "geometric,psi4")]) == pytest.approx(30.0)
+    assert stats.estimate([("tag1", "psi4"), ("tag2", "geometric,psi4")]) == pytest.approx(16.5)
+
+    # Unknown types fall back to the average over all tasks
+    assert stats.estimate([("tag3", "rdkit")]) == pytest.approx(12.0)
+    assert stats.estimate([]) == pytest.approx(12.0)
+
+
+def test_manager_adaptive_claim(snowflake: QCATestingSnowflake):
+    storage_socket = snowflake.get_storage_socket()
+    all_id, result_data = populate_db(storage_socket)
+
+    compute_thread = QCATestingComputeThread(snowflake._qcf_config, result_data)
+    compute_thread.start(manual_updates=True)
+    compute = compute_thread._compute
+
+    time.sleep(1)  # wait for manager to register
+
+    # No statistics yet - fill the (single) worker three times over
+    compute.update(new_tasks=True)
+    assert compute.n_total_active_tasks == 3
+
+    # Mock tasks take two seconds
+    time.sleep(3)
+    compute.update(new_tasks=True)
+
+    stats = compute._walltime_stats["local"]
+    assert stats.n_tasks >= 1
+    assert stats.estimate([]) == pytest.approx(2.0)
+
+    # Updates are every second, and tasks take ~2 seconds. So only one more task
+    # per worker is needed to keep it busy
+    assert compute.n_total_active_tasks <= 2
+    assert compute._get_claim_size("local", 1, 0) == 2
+    assert compute._get_claim_size("local", 4, 3) == 5
+
+    # Very short tasks are limited by claim_limit_per_worker
+    for i in range(50):
+        stats.add(("*", "psi4"), 0.0)
+    assert compute._get_claim_size("local", 1, 0) == compute.manager_config.claim_limit_per_worker
+
+
 def test_manager_missed_heartbeats_shutdown(snowflake: QCATestingSnowflake):
     compute_thread = QCATestingComputeThread(snowflake._qcf_config)
     compute_thread.start(manual_updates=False)
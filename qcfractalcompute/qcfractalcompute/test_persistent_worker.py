@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import sys
+
+from qcfractalcompute.apps.persistent_worker import run_persistent_worker, _idle_workers
+from qcfractalcompute.config import PersistentWorkerSettings
+from qcfractalcompute.run_scripts import get_script_path
+
+_water = {"symbols": ["O", "H", "H"], "geometry": [0.0, 0.0, 0.0, 0.0, 0.0, 1.8, 0.0, 1.8, 0.0]}
+
+# Program does not exist, so qcengine returns a FailedOperation
+_function_kwargs = {
+    "input_data": {
+        "molecule": _water,
+        "driver": "energy",
+        "model": {"method": "hf", "basis": "sto-3g"},
+    },
+    "program": "not_a_program",
+}
+
+
+def test_persistent_worker_reuse():
+    cmd = [sys.executable, get_script_path("qcengine_worker.py")]
+    settings = PersistentWorkerSettings(enabled=True, max_tasks=3)
+
+    pids = []
+    for i in range(5):
+        r = run_persistent_worker(cmd, None, _function_kwargs, settings)
+        assert r.success is False
+        assert "not_a_program" in r.result["error"]["error_message"]
+
+        idle = _idle_workers[(tuple(cmd), None)]
+        pids.append(idle[0]._proc.pid if idle else None)
+
+    # Recycled after the third task
+    assert pids[0] == pids[1]
+    assert pids[2] is None
+    assert pids[3] is not None and pids[3] != pids[0]
+    assert pids[3] == pids[4]
+
+    idle[0].stop()
+    idle.clear()
+
+
+def test_persistent_worker_memory():
+    cmd = [sys.executable, get_script_path("qcengine_worker.py")]
+    settings = PersistentWorkerSettings(enabled=True, max_memory=1.0e-6)
+
+    r = run_persistent_worker(cmd, None, _function_kwargs, settings)
+    assert r.success is False
+
+    # Memory usage exceeded, so the worker is not kept
+    assert len(_idle_workers[(tuple(cmd), None)]) == 0
+
+
+def test_persistent_worker_died():
+    cmd = [sys.executable, "-c", "import sys; sys.exit(1)"]
+    settings = PersistentWorkerSettings(enabled=True)
+
+    r = run_persistent_worker(cmd, None, _function_kwargs, settings)
+    assert r.success is False
+    assert "Persistent worker failed" in r.result["error"]["error_message"]
+    assert len(_idle_workers[(tuple(cmd), None)]) == 0
+
+
+def test_persistent_worker_startup_output():
+    # Like 'conda run', where activation scripts may print to stdout before the worker starts
+    script = get_script_path("qcengine_worker.py")
+    cmd = ["sh", "-c", f"echo 'activating environment'; exec {sys.executable} {script}"]
+    settings = PersistentWorkerSettings(enabled=True)
+
+    for i in range(2):
+        r = run_persistent_worker(cmd, None, _function_kwargs, settings)
+        assert r.success is False
+        assert "not_a_program" in r.result["error"]["error_message"]
+
+    idle = _idle_workers[(tuple(cmd), None)]
+    assert len(idle) == 1
+    idle[0].stop()
+    idle.clear()
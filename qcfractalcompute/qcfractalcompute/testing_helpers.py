@@ -112,6 +112,7 @@ class MockTestingComputeManager(ComputeManager):
 
         for task in tasks:
             self._record_id_map[task.id] = task.record_id
+            self._task_type_map[task.id] = self._get_task_type(task)
 
             if self._result_data:
                 task_future = _mock_app(self._result_data.get(task.record_id, None))
@@ -119,6 +120,7 @@ class MockTestingComputeManager(ComputeManager):
                 task_future = _mock_app(None)
 
             self._task_futures[executor_label][task.id] = task_future
+            task_future.add_done_callback(self._task_done_callback)
 
 
 class QCATestingComputeThread:
@@ -0,0 +1,405 @@
+"""
+Asyncio interface for the PortalClient
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib.util
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Sequence, Iterable, Type, TypeVar, Union
+
+import requests
+
+try:
+    import pydantic.v1 as pydantic
+except ImportError:
+    import pydantic
+
+from .base_models import CommonBulkGetBody
+from .client import PortalClient
+from .client_base import PortalRequestError, _connection_error_msg
+from .molecules import Molecule
+from .record_models import BaseRecord, records_from_dicts
+from .serialization import deserialize
+from .utils import chunk_iterable
+
+# httpx package is optional
+_httpx_spec = importlib.util.find_spec("httpx")
+
+if _httpx_spec is not None:
+    import httpx
+
+_T = TypeVar("_T")
+_U = TypeVar("_U")
+_V = TypeVar("_V")
+
+
+class AsyncPortalClient:
+    """
+    Client for obtaining data from a QCFractal server from asyncio code
+
+    Requests are sent asynchronously with `httpx <https://www.python-httpx.org>`_ (which must be installed
+    separately), using a pool of up to ``max_concurrent_requests`` connections. Requests are prepared,
+    retried, and authenticated (including refreshing of tokens) the same way as by a regular
+    :class:`PortalClient`, which is created along with this client and used for logging in.
+
+    Records returned from this client are attached to the underlying (synchronous) client, so any
+    data not fetched initially can still be accessed as usual. Children of records (requested via
+    ``include``), as well as renewing of tokens, go through the synchronous client in worker threads.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        verify: bool = True,
+        show_motd: bool = True,
+        *,
+        max_concurrent_requests: int = 64,
+        cache_dir: Optional[str] = None,
+        cache_max_size: int = 0,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        address
+            The host or IP address of the FractalServer instance, including protocol and port if necessary
+        username
+            The username to authenticate with.
+        password
+            The password to authenticate with.
+        verify
+            Verifies the SSL connection with a third party server.
+        show_motd
+            If a Message-of-the-Day is available, display it
+        max_concurrent_requests
+            Maximum number of requests to the server that can be in flight at once
+        cache_dir
+            Directory to store an internal cache of records and other data
+        cache_max_size
+            Maximum size of the cache directory (in bytes)
+        """
+
+        if _httpx_spec is None:
+            raise RuntimeError("httpx package is required for the AsyncPortalClient")
+
+        self._logger = logging.getLogger("AsyncPortalClient")
+
+        self.client = PortalClient(
+            address,
+            username,
+            password,
+            verify,
+            show_motd,
+            cache_dir=cache_dir,
+            cache_max_size=cache_max_size,
+        )
+
+        self.max_concurrent_requests = max_concurrent_requests
+
+        limits = httpx.Limits(
+            max_connections=max_concurrent_requests, max_keepalive_connections=max_concurrent_requests
+        )
+        self._http_client = httpx.AsyncClient(verify=verify, limits=limits, follow_redirects=False)
+
+        # For fetching children of records and renewing tokens with the synchronous client
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qcportal_async")
+
+        # Children of records are fetched by the synchronous client in threads as well
+        self.client.n_download_threads = max(self.client.n_download_threads, min(max_concurrent_requests, 16))
+
+    def __repr__(self) -> str:
+        return f"AsyncPortalClient(server_name='{self.client.server_name}', address='{self.client.address}')"
+
+    async def __aenter__(self) -> AsyncPortalClient:
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Closes all connections to the server, and shuts down the worker threads
+        """
+
+        await self._http_client.aclose()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+
+    @property
+    def api_limits(self) -> Dict[str, int]:
+        return self.client.api_limits
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _send_request(self, req: requests.Request, allow_retries: bool = True) -> httpx.Response:
+        """
+        Sends a request, optionally retrying on connection errors
+
+        The request is prepared by the session of the synchronous client (adding authorization,
+        encoding, and other headers), and then sent with httpx.
+        """
+
+        prep_req = self.client._req_session.prepare_request(req)
+
+        # httpx sets the length of the body itself
+        headers = {k: v for k, v in prep_req.headers.items() if k.lower() != "content-length"}
+
+        http_req = self._http_client.build_request(
+            prep_req.method, prep_req.url, headers=headers, content=prep_req.body, timeout=self.client.timeout
+        )
+
+        retry_count = 0
+
+        while True:
+            try:
+                ret = await self._http_client.send(http_req)
+                break
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if not allow_retries or retry_count >= self.client.retry_max:
+                    raise ConnectionRefusedError(_connection_error_msg.format(self.client.address)) from None
+
+                time_to_wait = self.client._retry_wait_time(retry_count)
+
+                retry_count += 1
+                self._logger.warning(
+                    f"Connection error for {prep_req.url}: {str(e)} - retrying in {time_to_wait:.2f} seconds "
+                    f"[{retry_count}/{self.client.retry_max}]"
+                )
+                await asyncio.sleep(time_to_wait)
+
+        if ret.is_redirect:
+            raise RuntimeError("Redirection is not allowed")
+
+        return ret
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        *,
+        body: Optional[Union[bytes, str]] = None,
+        url_params: Optional[Dict[str, Any]] = None,
+        internal_retry: Optional[bool] = True,
+        allow_retries: bool = True,
+        additional_headers: Optional[Dict[str, Any]] = None,
+    ) -> httpx.Response:
+        """
+        Sends a request to the server, handling authentication and errors like :meth:`PortalClient._request`
+        """
+
+        # Renewing the token is rare, and done (blocking) by the synchronous client
+        if self.client._jwt_expired():
+            await self._run(self.client._renew_JWT_token)
+
+        full_uri = self.client.address + endpoint
+        req = requests.Request(
+            method=method.upper(), url=full_uri, data=body, params=url_params, headers=additional_headers
+        )
+        r = await self._send_request(req, allow_retries=allow_retries)
+
+        # If JWT token expired, automatically renew it and retry once
+        if internal_retry and (r.status_code == 401) and "Token has expired" in r.json()["msg"]:
+            await self._run(self.client._renew_JWT_token, force_refresh=True)
+            return await self._request(
+                method,
+                endpoint,
+                body=body,
+                url_params=url_params,
+                internal_retry=False,
+                additional_headers=additional_headers,
+            )
+
+        if r.status_code != 200:
+            try:
+                # For many errors returned by our code, the error details are returned as json
+                # with the error message stored under "msg"
+                details = r.json()
+            except:
+                # If this error comes from, ie, the web server or something else, then
+                # we have to use 'reason'
+                details = {"msg": r.reason_phrase}
+
+            raise PortalRequestError(f"Request failed: {details['msg']}", r.status_code, details)
+
+        return r
+
+    async def make_request(
+        self,
+        method: str,
+        endpoint: str,
+        response_model: Optional[Type[_V]],
+        *,
+        body_model: Optional[Type[_T]] = None,
+        url_params_model: Optional[Type[_U]] = None,
+        body: Optional[Union[_T, Dict[str, Any]]] = None,
+        url_params: Optional[Union[_U, Dict[str, Any]]] = None,
+        allow_retries: bool = True,
+        additional_headers: Optional[Dict[str, Any]] = None,
+    ) -> _V:
+        """
+        Makes a request to the server
+
+        This takes the same arguments as :meth:`PortalClient.make_request`
+        """
+
+        serialized_body, parsed_url_params, headers = self.client._prepare_request_data(
+            body_model, url_params_model, body, url_params, additional_headers
+        )
+
+        r = await self._request(
+            method,
+            endpoint,
+            body=serialized_body,
+            url_params=parsed_url_params,
+            allow_retries=allow_retries,
+            additional_headers=headers,
+        )
+
+        # httpx has already decompressed the body
+        d = deserialize(r.content, r.headers["Content-Type"])
+
+        if response_model is None:
+            return None
+        else:
+            return pydantic.parse_obj_as(response_model, d)
+
+    async def _bulk_get(
+        self, endpoint: str, item_model: Type[_T], ids: Sequence[int], batch_size: int, **kwargs
+    ) -> List[Optional[_T]]:
+        """
+        Gets data via a bulkGet endpoint, sending all the batches at once
+        """
+
+        if not ids:
+            return []
+
+        batches = [CommonBulkGetBody(ids=id_batch, **kwargs) for id_batch in chunk_iterable(ids, batch_size)]
+
+        results = await asyncio.gather(
+            *[self.make_request("post", endpoint, List[Optional[item_model]], body=b) for b in batches]
+        )
+        return [x for batch_result in results for x in batch_result]
+
+    async def get_records(
+        self,
+        record_ids: Union[int, Sequence[int]],
+        missing_ok: bool = False,
+        *,
+        include: Optional[Iterable[str]] = None,
+        record_type: Optional[Type[BaseRecord]] = None,
+        batch_size: Optional[int] = None,
+    ) -> Union[List[Optional[BaseRecord]], Optional[BaseRecord]]:
+        """
+        Obtain records of all types with specified IDs
+
+        Records will be returned in the same order as the record ids. Records are requested in
+        batches, all of which are sent to the server at once (up to ``max_concurrent_requests``).
+
+        Children of the records are fetched if enough information is included (see :meth:`PortalClient.get_records`).
+
+        Parameters
+        ----------
+        record_ids
+            Single ID or sequence/list of records to obtain
+        missing_ok
+            If set to True, then missing records will be tolerated, and the returned
+            records will contain None for the corresponding IDs that were not found.
+        include
+            Additional fields to include in the returned record
+        record_type
+            Type of the records (for example, ``OptimizationRecord``). Fields specific to a type of record
+            (such as children) can only be included if this is given.
+        batch_size
+            Number of records to request at a time. Defaults to the server limit.
+
+        Returns
+        -------
+        :
+            If a single ID was specified, returns just that record. Otherwise, returns
+            a list of records.  If missing_ok was specified, None will be substituted for a record
+            that was not found.
+        """
+
+        is_single = not isinstance(record_ids, Sequence)
+        record_ids = [record_ids] if is_single else list(record_ids)
+
+        if include is not None:
+            # Always include the base stuff
+            include = list(include) + ["*"]
+
+        if batch_size is None:
+            batch_size = self.api_limits["get_records"]
+
+        if record_type is None:
+            endpoint = "api/v1/records/bulkGet"
+        else:
+            record_type_str = record_type.__fields__["record_type"].default
+            endpoint = f"api/v1/records/{record_type_str}/bulkGet"
+
+        record_dicts = await self._bulk_get(
+            endpoint, Dict[str, Any], record_ids, batch_size, include=include, missing_ok=missing_ok
+        )
+        records = records_from_dicts(record_dicts, self.client)
+
+        # Records may be of different types, but children can only be fetched for one type at a time
+        if include:
+            records_by_type: Dict[Type[BaseRecord], List[BaseRecord]] = {}
+            for r in records:
+                if r is not None:
+                    records_by_type.setdefault(type(r), []).append(r)
+
+            await asyncio.gather(
+                *[self._run(rtype.fetch_children_multi, recs, include) for rtype, recs in records_by_type.items()]
+            )
+
+        return records[0] if is_single else records
+
+    async def get_molecules(
+        self,
+        molecule_ids: Union[int, Sequence[int]],
+        missing_ok: bool = False,
+        *,
+        batch_size: Optional[int] = None,
+    ) -> Union[Optional[Molecule], List[Optional[Molecule]]]:
+        """
+        Obtain molecules from the server
+
+        Molecules are requested in batches, all of which are sent to the server at once.
+
+        Parameters
+        ----------
+        molecule_ids
+            An id or list of ids to query.
+        missing_ok
+            If True, return ``None`` for ids that were not found on the server.
+            If False, raise ``KeyError`` if any ids were not found on the server.
+        batch_size
+            Number of molecules to request at a time. Defaults to the server limit.
+
+        Returns
+        -------
+        :
+            The requested molecules, in the same order as the requested ids.
+            If given a list of ids, the return value will be a list.
+            Otherwise, it will be a single Molecule.
+        """
+
+        is_single = not isinstance(molecule_ids, Sequence)
+        molecule_ids = [molecule_ids] if is_single else list(molecule_ids)
+
+        if batch_size is None:
+            batch_size = self.api_limits["get_molecules"]
+
+        molecules = await self._bulk_get(
+            "api/v1/molecules/bulkGet", Molecule, molecule_ids, batch_size, missing_ok=missing_ok
+        )
+
+        return molecules[0] if is_single else molecules
@@ -5,8 +5,16 @@ Caching for the PortalClient
 from __future__ import annotations
 
 import datetime
+import functools
+import glob
+import json
+import logging
 import os
-from typing import TYPE_CHECKING, Optional, TypeVar, Type, Any, List, Iterable, Tuple, Sequence
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, TypeVar, Type, Any, List, Iterable, Tuple, Sequence, Dict, Callable, Set
 from urllib.parse import urlparse
 
 import apsw
@@ -31,6 +39,27 @@ _DATASET_T = TypeVar("_DATASET_T")
 _RECORD_T = TypeVar("_RECORD_T")
 
 _query_chunk_size = 125
+_update_chunk_size = 1000
+
+# Records are (de)compressed in chunks of this size, in parallel in a thread pool
+_compression_chunk_size = 64
+
+# A zstd dictionary is trained for each record type once this many records of that type are added at once
+_dictionary_min_samples = 128
+_dictionary_max_samples = 4096
+_dictionary_size = 32 * 1024
+
+# When the cache directory grows beyond its maximum size, records are evicted until
+# it is below this fraction of the maximum size (so that eviction doesn't run on every update)
+_eviction_target = 0.9
+
+# How long to wait (in ms) for other processes using a cache file
+_busy_timeout = 5000
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_thread_pool_lock = threading.Lock()
+
+_logger = logging.getLogger(__name__)
 
 
 def compress_for_cache(data: Any) -> bytes:
@@ -45,11 +74,74 @@ def decompress_from_cache(data: bytes, value_type) -> Any:
     return pydantic.parse_obj_as(value_type, deserialized_data)
 
 
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            n_workers = min(8, os.cpu_count() or 1)
+            _thread_pool = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="qcportal_cache")
+        return _thread_pool
+
+
+def _compress_chunk(zdict: Optional[zstandard.ZstdCompressionDict], data: List[bytes]) -> List[bytes]:
+    # Compressor objects are not thread-safe, so each chunk gets its own
+    compressor = zstandard.ZstdCompressor(level=1, dict_data=zdict)
+    return [compressor.compress(x) for x in data]
+
+
+def _decompress_chunk(zdicts: Dict[int, zstandard.ZstdCompressionDict], data: List[bytes]) -> List[bytes]:
+    decompressors = {}
+    ret = []
+
+    for x in data:
+        # The id of the dictionary used (or 0 if none) is stored in the zstd frame
+        dict_id = zstandard.get_frame_parameters(x).dict_id
+
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id != 0 and dict_id not in zdicts:
+                raise RuntimeError(f"Compression dictionary {dict_id} not found in the cache")
+
+            decompressor = zstandard.ZstdDecompressor(dict_data=zdicts.get(dict_id))
+            decompressors[dict_id] = decompressor
+
+        ret.append(decompressor.decompress(x))
+
+    return ret
+
+
+def _map_chunks(func: Callable[[List[bytes]], List[bytes]], data: List[bytes]) -> List[bytes]:
+    """
+    Applies a function to chunks of data, running the chunks in parallel
+
+    zstandard releases the GIL while (de)compressing, so this runs on multiple cores.
+    """
+
+    if len(data) <= _compression_chunk_size:
+        return func(data)
+
+    chunks = [data[i : i + _compression_chunk_size] for i in range(0, len(data), _compression_chunk_size)]
+    return [x for chunk_result in _get_thread_pool().map(func, chunks) for x in chunk_result]
+
+
 class RecordCache:
-    def __init__(self, cache_uri: str, read_only: bool):
+    def __init__(self, cache_uri: str, read_only: bool, use_dictionaries: bool = True):
         self.cache_uri = cache_uri
         self.read_only = read_only
 
+        # If true, train zstd dictionaries to use when compressing records
+        # Caches containing records compressed with a dictionary can't be read by older versions of QCPortal
+        self.use_dictionaries = use_dictionaries
+
+        # Dictionaries by id (for decompressing) and by record type (for compressing)
+        self._dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+        self._type_dictionaries: Dict[str, zstandard.ZstdCompressionDict] = {}
+        self._dictionary_lock = threading.Lock()
+
+        # Set by the PortalCache that owns this cache (if any), which enforces the size limit of the cache directory
+        self._portal_cache: Optional[PortalCache] = None
+
         if self.read_only:
             self._conn = apsw.Connection(self.cache_uri, flags=apsw.SQLITE_OPEN_READONLY | apsw.SQLITE_OPEN_URI)
         else:
@@ -58,10 +150,13 @@ class RecordCache:
             )
 
         self._conn.pragma("foreign_keys", "ON")
+        self._conn.set_busy_timeout(_busy_timeout)
 
         if not read_only:
             self._create_tables()
 
+        self._load_dictionaries()
+
     def __str__(self):
         return f"<{self.__class__.__name__} path={self.cache_uri} {'ro' if self.read_only else 'rw'}>"
 
@@ -71,19 +166,151 @@ class RecordCache:
     def _create_tables(self):
         self._assert_writable()
 
-        self._conn.execute(
-            """
+        self._conn.execute("""
             CREATE TABLE IF NOT EXISTS records (
                 id INTEGER PRIMARY KEY,
                 status TEXT NOT NULL,
                 modified_on DECIMAL NOT NULL,
+                accessed_on DECIMAL NOT NULL DEFAULT 0,
                 record BLOB NOT NULL
             )
-            """
-        )
+            """)
+
+        # Caches from older versions do not track access time
+        columns = [x[1] for x in self._conn.execute("PRAGMA table_info(records)").fetchall()]
+        if "accessed_on" not in columns:
+            self._conn.execute("ALTER TABLE records ADD COLUMN accessed_on DECIMAL NOT NULL DEFAULT 0")
 
         self._conn.execute("CREATE INDEX IF NOT EXISTS records_status ON records (status)")
 
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                id INTEGER PRIMARY KEY,
+                record_type TEXT NOT NULL UNIQUE,
+                dictionary BLOB NOT NULL
+            )
+            """)
+
+    def _load_dictionaries(self):
+        # Caches from older versions may not have this table
+        stmt = "SELECT 1 FROM sqlite_master WHERE type='table' AND name='compression_dictionaries'"
+        if self._conn.execute(stmt).fetchone() is None:
+            return
+
+        # Other cache objects (possibly in other processes) may be using the same file, so this
+        # may be called again to pick up dictionaries they have added
+        stmt = "SELECT id, record_type, dictionary FROM compression_dictionaries"
+        for dict_id, record_type, dict_data in self._conn.execute(stmt).fetchall():
+            if dict_id in self._dictionaries:
+                continue
+
+            zdict = zstandard.ZstdCompressionDict(dict_data)
+            zdict.precompute_compress(level=1)
+            self._dictionaries[dict_id] = zdict
+            self._type_dictionaries[record_type] = zdict
+
+    def _get_dictionary(self, record_type: str, samples: List[bytes]) -> Optional[zstandard.ZstdCompressionDict]:
+        """
+        Obtains the compression dictionary for a record type, training a new one from the samples if needed
+        """
+
+        with self._dictionary_lock:
+            zdict = self._type_dictionaries.get(record_type)
+
+            if zdict is not None or not self.use_dictionaries or len(samples) < _dictionary_min_samples:
+                return zdict
+
+            # Another cache object may have already trained one
+            self._load_dictionaries()
+            zdict = self._type_dictionaries.get(record_type)
+            if zdict is not None:
+                return zdict
+
+            try:
+                zdict = zstandard.train_dictionary(_dictionary_size, samples[:_dictionary_max_samples])
+            except zstandard.ZstdError:
+                # Training can fail if the samples are too small or too few. Try again next time
+                return None
+
+            # Another cache object may store a dictionary for this record type at the same time.
+            # Only one of them is kept, so always use the one that was actually stored
+            stmt = "INSERT OR IGNORE INTO compression_dictionaries (id, record_type, dictionary) VALUES (?, ?, ?)"
+            self._conn.execute(stmt, (zdict.dict_id(), record_type, zdict.as_bytes()))
+
+            self._load_dictionaries()
+            return self._type_dictionaries.get(record_type)
+
+    def _compress_records(self, records: Sequence[_RECORD_T]) -> List[bytes]:
+        # The cache may be read without a client (to fetch the dictionaries from the server)
+        for r in records:
+            r._remove_output_dictionaries()
+
+        serialized = [serialize(r, "msgpack") for r in records]
+
+        # Group by record type, since each type has its own dictionary
+        type_idx = defaultdict(list)
+        for idx, r in enumerate(records):
+            type_idx[r.record_type].append(idx)
+
+        compressed = [None] * len(records)
+        for record_type, idx in type_idx.items():
+            type_data = [serialized[i] for i in idx]
+            zdict = self._get_dictionary(record_type, type_data)
+
+            for i, c in zip(idx, _map_chunks(functools.partial(_compress_chunk, zdict), type_data)):
+                compressed[i] = c
+
+        return compressed
+
+    def _decompress_records(self, compressed: List[bytes], record_type: Type[_RECORD_T]) -> List[_RECORD_T]:
+        # Records may have been compressed with a dictionary added by another cache object using the same file
+        dict_ids = {zstandard.get_frame_parameters(x).dict_id for x in compressed}
+        if not dict_ids.issubset(self._dictionaries.keys() | {0}):
+            with self._dictionary_lock:
+                self._load_dictionaries()
+
+        decompressed = _map_chunks(functools.partial(_decompress_chunk, self._dictionaries), compressed)
+
+        # Parsing holds the GIL, so there is nothing to gain from doing this in the thread pool
+        records = [pydantic.parse_obj_as(record_type, deserialize(x, "msgpack")) for x in decompressed]
+
+        for r in records:
+            r._record_cache = self
+
+        return records
+
+    def _touch_records(self, record_ids: Iterable[int]):
+        """
+        Updates the access time of records (used for determining which records to evict)
+        """
+
+        if self.read_only:
+            return
+
+        ts = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
+
+        with self._conn:
+            for record_id_batch in chunk_iterable(record_ids, _query_chunk_size):
+                id_params = ",".join("?" * len(record_id_batch))
+                stmt = f"UPDATE records SET accessed_on = ? WHERE id IN ({id_params})"
+                self._conn.execute(stmt, (ts, *record_id_batch))
+
+    def get_records_size(self) -> List[Tuple[int, float, int]]:
+        """
+        Returns the id, access time, and (compressed) size of all records in this cache
+        """
+
+        stmt = "SELECT id, accessed_on, length(record) FROM records"
+        return self._conn.execute(stmt).fetchall()
+
+    def vacuum(self):
+        """
+        Rebuilds the cache file, returning the space from deleted records to the filesystem
+        """
+
+        self._assert_writable()
+        self._conn.execute("VACUUM")
+
     def update_metadata(self, key: str, value: Any) -> None:
         self._assert_writable()
         stmt = "REPLACE INTO metadata (key, value) VALUES (?, ?)"
@@ -96,29 +323,23 @@ class RecordCache:
         if record_data is None:
             return None
 
-        record = decompress_from_cache(record_data[1], record_type)
-
-        record._record_cache = self
-
-        return record
+        self._touch_records([record_id])
+        return self._decompress_records([record_data[0]], record_type)[0]
 
     def get_records(self, record_ids: Iterable[int], record_type: Type[_RECORD_T]) -> List[_RECORD_T]:
-        all_records = []
+        found_ids = []
+        compressed_records = []
 
         for record_id_batch in chunk_iterable(record_ids, _query_chunk_size):
             id_params = ",".join("?" * len(record_id_batch))
-            stmt = f"SELECT record FROM records WHERE id IN ({id_params})"
+            stmt = f"SELECT id, record FROM records WHERE id IN ({id_params})"
 
             rdata = self._conn.execute(stmt, record_id_batch).fetchall()
+            found_ids.extend(x[0] for x in rdata)
+            compressed_records.extend(x[1] for x in rdata)
 
-            for compressed_record in rdata:
-                record = decompress_from_cache(compressed_record[0], record_type)
-
-                record._record_cache = self
-
-                all_records.append(record)
-
-        return all_records
+        self._touch_records(found_ids)
+        return self._decompress_records(compressed_records, record_type)
 
     def get_existing_records(self, record_ids: Iterable[int]) -> List[int]:
         ret = []
@@ -135,37 +356,49 @@ class RecordCache:
     def update_records(self, records: Iterable[_RECORD_T]):
         self._assert_writable()
 
-        with self._conn:
-            for record_batch in chunk_iterable(records, 10):
-                n_batch = len(record_batch)
-
-                values_params = ",".join(["(?, ?, ?, ?)"] * n_batch)
+        stmt = "REPLACE INTO records (id, status, modified_on, accessed_on, record) VALUES (?, ?, ?, ?, ?)"
+        ts = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
 
-                all_params = []
-                for r in record_batch:
-                    all_params.extend((r.id, r.status, r.modified_on.timestamp(), compress_for_cache(r)))
-
-                stmt = f"REPLACE INTO records (id, status, modified_on, record) VALUES {values_params}"
+        with self._conn:
+            for record_batch in chunk_iterable(records, _update_chunk_size):
+                compressed_records = self._compress_records(record_batch)
 
-                self._conn.execute(stmt, all_params)
+                all_params = [
+                    (r.id, r.status, r.modified_on.timestamp(), ts, c) for r, c in zip(record_batch, compressed_records)
+                ]
+                self._conn.executemany(stmt, all_params)
 
         for r in records:
             r._record_cache = self
             r._cache_dirty = False
 
+        if self._portal_cache is not None:
+            self._portal_cache.enforce_size_limit()
+
     def writeback_record(self, record):
         self._assert_writable()
 
-        compressed_record = compress_for_cache(record)
+        compressed_record = self._compress_records([record])[0]
 
         # Only update if timestamp is same or newer, and if this record is larger
         # than what is stored already
-        stmt = f"""INSERT OR REPLACE INTO records (id, status, modified_on, record)
-                   SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM records WHERE id = ?
+        stmt = f"""INSERT OR REPLACE INTO records (id, status, modified_on, accessed_on, record)
+                   SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM records WHERE id = ?
                    AND (modified_on > ? OR (modified_on = ? and length(record) > ?)))"""
 
         ts = record.modified_on.timestamp()
-        row_data = (record.id, record.status, ts, compressed_record, record.id, ts, ts, len(compressed_record))
+        access_ts = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
+        row_data = (
+            record.id,
+            record.status,
+            ts,
+            access_ts,
+            compressed_record,
+            record.id,
+            ts,
+            ts,
+            len(compressed_record),
+        )
         self._conn.execute(stmt, row_data)
 
     def delete_record(self, record_id: int):
@@ -184,45 +417,38 @@ class RecordCache:
 
 
 class DatasetCache(RecordCache):
-    def __init__(self, cache_uri: str, read_only: bool, dataset_type: Type[_DATASET_T]):
+    def __init__(self, cache_uri: str, read_only: bool, dataset_type: Type[_DATASET_T], use_dictionaries: bool = True):
         self._entry_type = dataset_type._entry_type
         self._specification_type = dataset_type._specification_type
         self._record_type = dataset_type._record_type
 
-        RecordCache.__init__(self, cache_uri=cache_uri, read_only=read_only)
+        RecordCache.__init__(self, cache_uri=cache_uri, read_only=read_only, use_dictionaries=use_dictionaries)
 
     def _create_tables(self):
         RecordCache._create_tables(self)
 
-        self._conn.execute(
-            """
+        self._conn.execute("""
             CREATE TABLE IF NOT EXISTS metadata (
                 key TEXT PRIMARY KEY,
                 value BLOB NOT NULL
             )
-        """
-        )
+        """)
 
-        self._conn.execute(
-            """
+        self._conn.execute("""
             CREATE TABLE IF NOT EXISTS dataset_entries (
                 name TEXT PRIMARY KEY,
                 entry BLOB NOT NULL
             )
-        """
-        )
+        """)
 
-        self._conn.execute(
-            """
+        self._conn.execute("""
             CREATE TABLE IF NOT EXISTS dataset_specifications (
                 name TEXT PRIMARY KEY,
                 specification BLOB NOT NULL
             )
-        """
-        )
+        """)
 
-        self._conn.execute(
-            """
+        self._conn.execute("""
             CREATE TABLE IF NOT EXISTS dataset_records (
                 entry_name TEXT NOT NULL,
                 specification_name TEXT NOT NULL,
@@ -231,8 +457,7 @@ class DatasetCache(RecordCache):
                 FOREIGN KEY (entry_name) REFERENCES dataset_entries(name) ON DELETE CASCADE ON UPDATE CASCADE,
                 FOREIGN KEY (specification_name) REFERENCES dataset_specifications(name) ON DELETE CASCADE ON UPDATE CASCADE
             )
-        """
-        )
+        """)
 
         self._conn.execute("CREATE INDEX IF NOT EXISTS dataset_records_entry_name ON dataset_records (entry_name)")
         self._conn.execute(
@@ -243,6 +468,8 @@ class DatasetCache(RecordCache):
     def get_metadata(self, key) -> Any:
         stmt = "SELECT value FROM metadata WHERE key = ?"
         r = self._conn.execute(stmt, (key,)).fetchone()
+        if r is None:
+            return None
         return deserialize(r[0], "msgpack")
 
     def entry_exists(self, name: str) -> bool:
@@ -274,17 +501,11 @@ class DatasetCache(RecordCache):
 
         assert all(isinstance(e, self._entry_type) for e in entries)
 
-        with self._conn:
-            for entry_batch in chunk_iterable(entries, 50):
-                n_batch = len(entry_batch)
-                values_params = ",".join(["(?, ?)"] * n_batch)
-
-                all_params = []
-                for e in entry_batch:
-                    all_params.extend((e.name, compress_for_cache(e)))
+        stmt = "REPLACE INTO dataset_entries (name, entry) VALUES (?, ?)"
 
-                stmt = f"REPLACE INTO dataset_entries (name, entry) VALUES {values_params}"
-                self._conn.execute(stmt, all_params)
+        with self._conn:
+            for entry_batch in chunk_iterable(entries, _update_chunk_size):
+                self._conn.executemany(stmt, [(e.name, compress_for_cache(e)) for e in entry_batch])
 
     def rename_entry(self, old_name: str, new_name: str):
         self._assert_writable()
@@ -336,17 +557,11 @@ class DatasetCache(RecordCache):
 
         assert all(isinstance(s, self._specification_type) for s in specifications)
 
-        with self._conn:
-            for specification_batch in chunk_iterable(specifications, 50):
-                n_batch = len(specification_batch)
-                values_params = ",".join(["(?, ?)"] * n_batch)
-
-                all_params = []
-                for s in specification_batch:
-                    all_params.extend((s.name, compress_for_cache(s)))
+        stmt = "REPLACE INTO dataset_specifications (name, specification) VALUES (?, ?)"
 
-                stmt = f"REPLACE INTO dataset_specifications (name, specification) VALUES {values_params}"
-                self._conn.execute(stmt, all_params)
+        with self._conn:
+            for specification_batch in chunk_iterable(specifications, _update_chunk_size):
+                self._conn.executemany(stmt, [(s.name, compress_for_cache(s)) for s in specification_batch])
 
     def rename_specification(self, old_name: str, new_name: str):
         self._assert_writable()
@@ -371,7 +586,7 @@ class DatasetCache(RecordCache):
         return self._conn.execute(stmt, (entry_name, specification_name)).fetchone() is not None
 
     def get_dataset_record(self, entry_name: str, specification_name: str) -> Optional[_RECORD_T]:
-        stmt = """SELECT r.record FROM records r
+        stmt = """SELECT r.id, r.record FROM records r
                   INNER JOIN dataset_records dr ON r.id = dr.record_id
                   WHERE dr.entry_name=? and dr.specification_name=?"""
 
@@ -379,10 +594,8 @@ class DatasetCache(RecordCache):
         if record_data is None:
             return None
 
-        record = decompress_from_cache(record_data[0], self._record_type)
-        record._record_cache = self
-
-        return record
+        self._touch_records([record_data[0]])
+        return self._decompress_records([record_data[1]], self._record_type)[0]
 
     def get_dataset_records(
         self,
@@ -391,12 +604,14 @@ class DatasetCache(RecordCache):
         status: Optional[Iterable[RecordStatusEnum]] = None,
     ) -> List[Tuple[str, str, _RECORD_T]]:
         specification_params = ",".join("?" * len(specification_names))
-        all_records = []
+        all_names = []
+        found_ids = []
+        compressed_records = []
 
         for entry_names_batch in chunk_iterable(entry_names, _query_chunk_size):
             entry_params = ",".join("?" * len(entry_names_batch))
 
-            stmt = f"""SELECT dr.entry_name, dr.specification_name, r.record
+            stmt = f"""SELECT dr.entry_name, dr.specification_name, r.id, r.record
                        FROM dataset_records dr
                        INNER JOIN records r ON r.id = dr.record_id
                        WHERE dr.entry_name IN ({entry_params})
@@ -411,29 +626,23 @@ class DatasetCache(RecordCache):
 
             rdata = self._conn.execute(stmt, all_params).fetchall()
 
-            for ename, sname, compressed_record in rdata:
-                record = decompress_from_cache(compressed_record, self._record_type)
-                record._record_cache = self
-
-                all_records.append((ename, sname, record))
+            for ename, sname, record_id, compressed_record in rdata:
+                all_names.append((ename, sname))
+                found_ids.append(record_id)
+                compressed_records.append(compressed_record)
 
-        return all_records
+        self._touch_records(found_ids)
+        all_records = self._decompress_records(compressed_records, self._record_type)
+        return [(ename, sname, record) for (ename, sname), record in zip(all_names, all_records)]
 
     def update_dataset_records(self, record_info: Iterable[Tuple[str, str, int]]):
         self._assert_writable()
 
-        with self._conn:
-            for info_batch in chunk_iterable(record_info, 10):
-                n_batch = len(info_batch)
-                values_params = ",".join(["(?, ?, ?)"] * n_batch)
-
-                all_params = []
-                for e, s, rid in info_batch:
-                    all_params.extend((e, s, rid))
+        stmt = "REPLACE INTO dataset_records (entry_name, specification_name, record_id) VALUES (?, ?, ?)"
 
-                stmt = f"""REPLACE INTO dataset_records (entry_name, specification_name, record_id)
-                          VALUES {values_params}"""
-                self._conn.execute(stmt, all_params)
+        with self._conn:
+            for info_batch in chunk_iterable(record_info, _update_chunk_size):
+                self._conn.executemany(stmt, info_batch)
 
     def delete_dataset_record(self, entry_name: str, specification_name: str):
         self._assert_writable()
@@ -530,14 +739,20 @@ class PortalCache:
         # Should work as a reasonable fingerprint?
         self.server_fingerprint = f"{parsed_url.hostname}_{parsed_url.port}"
 
+        # Maximum size (in bytes) of the entire cache directory. Zero means no limit
+        self.max_size = max_size
+        self._eviction_lock = threading.Lock()
+
         if cache_dir:
             # _shared_memory shouldn't be used, so we don't set it and wait for errors
             self._is_disk = True
-            self.cache_dir = os.path.join(os.path.abspath(cache_dir), self.server_fingerprint)
+            self.cache_root = os.path.abspath(cache_dir)
+            self.cache_dir = os.path.join(self.cache_root, self.server_fingerprint)
             os.makedirs(self.cache_dir, exist_ok=True)
         else:
             self._is_disk = False
 
+            self.cache_root = None
             self.cache_dir = None
 
     def get_cache_path(self, cache_name: str) -> str:
@@ -565,17 +780,166 @@ class PortalCache:
         uri = self.get_dataset_cache_uri(dataset_id)
 
         # If you are asking this for a dataset cache, it should be writable
-        return DatasetCache(uri, False, dataset_type)
+        dcache = DatasetCache(uri, False, dataset_type)
+
+        if self._is_disk:
+            dcache._portal_cache = self
+
+        return dcache
 
     @property
     def is_disk(self) -> bool:
         return self._is_disk
 
+    def _pinned_path(self, server_dir: str) -> str:
+        return os.path.join(server_dir, "pinned_datasets.json")
+
+    def _read_pinned(self, server_dir: str) -> Set[int]:
+        pinned_path = self._pinned_path(server_dir)
+        if not os.path.isfile(pinned_path):
+            return set()
+
+        with open(pinned_path, "r") as f:
+            return set(json.load(f))
+
+    def _write_pinned(self, pinned: Set[int]):
+        with open(self._pinned_path(self.cache_dir), "w") as f:
+            json.dump(sorted(pinned), f)
+
+    @property
+    def pinned_datasets(self) -> Set[int]:
+        """
+        IDs of datasets whose cached records will never be evicted
+        """
+
+        if not self._is_disk:
+            return set()
+
+        return self._read_pinned(self.cache_dir)
+
+    def pin_dataset(self, dataset_id: int):
+        """
+        Prevents records of a dataset from being evicted from the cache
+        """
+
+        if not self._is_disk:
+            raise RuntimeError("Cannot pin datasets in a memory-only cache")
+
+        self._write_pinned(self.pinned_datasets | {dataset_id})
+
+    def unpin_dataset(self, dataset_id: int):
+        """
+        Allows records of a previously-pinned dataset to be evicted from the cache
+        """
+
+        if not self._is_disk:
+            raise RuntimeError("Cannot pin datasets in a memory-only cache")
+
+        self._write_pinned(self.pinned_datasets - {dataset_id})
+
+    def _cache_files(self) -> List[Tuple[str, bool]]:
+        """
+        Returns all the cache files in the cache directory (for all servers) and whether they are pinned
+        """
+
+        ret = []
+        for server_dir in glob.glob(os.path.join(self.cache_root, "*")):
+            if not os.path.isdir(server_dir):
+                continue
+
+            pinned = self._read_pinned(server_dir)
+            for file_path in glob.glob(os.path.join(server_dir, "*.sqlite")):
+                m = re.fullmatch(r"dataset_(\d+)\.sqlite", os.path.basename(file_path))
+                ret.append((file_path, m is not None and int(m.group(1)) in pinned))
+
+        return ret
+
+    def get_size(self) -> int:
+        """
+        Returns the total size (in bytes) of all the cache files in the cache directory
+        """
+
+        if not self._is_disk:
+            return 0
+
+        # Include any journal files
+        files = glob.glob(os.path.join(self.cache_root, "*", "*.sqlite*"))
+        return sum(os.path.getsize(x) for x in files if os.path.isfile(x))
+
+    def enforce_size_limit(self):
+        """
+        Evicts the least-recently-used records from the cache directory if it is larger than the maximum size
+
+        Records of all (unpinned) cache files in the cache directory are considered together,
+        and the cache files are vacuumed after records are removed.
+        """
+
+        if not self._is_disk or self.max_size <= 0:
+            return
+
+        # Only one thread needs to do this at a time
+        if not self._eviction_lock.acquire(blocking=False):
+            return
+
+        try:
+            total_size = self.get_size()
+            if total_size <= self.max_size:
+                return
+
+            to_free = total_size - int(self.max_size * _eviction_target)
+
+            # (accessed_on, size, file_path, record_id)
+            candidates = []
+            for file_path, pinned in self._cache_files():
+                if pinned:
+                    continue
+
+                try:
+                    rcache = RecordCache(f"file:{file_path}", read_only=False)
+                    candidates.extend((t, size, file_path, rid) for rid, t, size in rcache.get_records_size())
+                except apsw.Error as e:
+                    _logger.warning(f"Unable to read cache file {file_path} for eviction: {str(e)}")
+
+            candidates.sort()
+
+            to_evict = defaultdict(list)
+            freed = 0
+            for _, size, file_path, rid in candidates:
+                if freed >= to_free:
+                    break
+                to_evict[file_path].append(rid)
+                freed += size
+
+            for file_path, record_ids in to_evict.items():
+                try:
+                    rcache = RecordCache(f"file:{file_path}", read_only=False)
+                    rcache.delete_records(record_ids)
+                    rcache.vacuum()
+                except apsw.Error as e:
+                    _logger.warning(f"Unable to evict records from cache file {file_path}: {str(e)}")
+
+            _logger.debug(f"Evicted {sum(len(x) for x in to_evict.values())} records from the cache")
+        finally:
+            self._eviction_lock.release()
+
     def vacuum(self, cache_name: Optional[str] = None):
-        if self._is_disk:
-            # TODO
+        """
+        Rebuilds cache files, returning the space from deleted records to the filesystem
+
+        If `cache_name` is not given, all cache files for this server are vacuumed.
+        """
+
+        if not self._is_disk:
             return
 
+        if cache_name is not None:
+            file_paths = [self.get_cache_path(cache_name)]
+        else:
+            file_paths = glob.glob(os.path.join(self.cache_dir, "*.sqlite"))
+
+        for file_path in file_paths:
+            RecordCache(f"file:{file_path}", read_only=False).vacuum()
+
 
 def read_dataset_metadata(file_path: str):
     """
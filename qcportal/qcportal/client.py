@@ -6,6 +6,7 @@ import os
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple, Union, Sequence, Iterable, TypeVar, Type, Literal
 
+import zstandard
 from tabulate import tabulate
 
 from qcportal.cache import DatasetCache, read_dataset_metadata
@@ -71,6 +72,7 @@ from .auth import (
 from .base_models import CommonBulkGetNamesBody, CommonBulkGetBody
 from .cache import PortalCache
 from .client_base import PortalClientBase
+from .compression import compression_dictionaries_header, get_zstd_dictionary
 from .dataset_models import (
     BaseDataset,
     DatasetQueryModel,
@@ -94,7 +96,7 @@ from .record_models import (
     RecordRevertBody,
     BaseRecord,
     RecordQueryIterator,
-    records_from_dicts,
+    record_from_dict,
 )
 from .serverinfo import (
     AccessLogQueryFilters,
@@ -106,6 +108,7 @@ from .serverinfo import (
     ErrorLogQueryIterator,
     DeleteBeforeDateBody,
 )
+from .tasks import TaskQueueDepth
 from .utils import make_list, chunk_iterable, process_chunk_iterable
 
 _T = TypeVar("_T", bound=BaseRecord)
@@ -146,13 +149,19 @@ class PortalClient(PortalClientBase):
         cache_dir
             Directory to store an internal cache of records and other data
         cache_max_size
-            Maximum size of the cache directory
+            Maximum size of the cache directory (in bytes). When exceeded, the least-recently-used records
+            are evicted (except for those of datasets pinned with ``client.cache.pin_dataset``).
+            If 0, the size of the cache is not limited.
         """
 
         PortalClientBase.__init__(self, address, username, password, verify, show_motd)
         self._logger = logging.getLogger("PortalClient")
         self.cache = PortalCache(address, cache_dir, cache_max_size)
 
+        # Dictionaries used by the server to compress outputs, keyed by id
+        self._compression_dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+        self._req_session.headers.update({compression_dictionaries_header: "1"})
+
     def __repr__(self) -> str:
         """A short representation of the current PortalClient.
 
@@ -562,6 +571,31 @@ class PortalClient(PortalClientBase):
     # General record functions
     ##############################################################
 
+    def get_compression_dictionary(self, dictionary_id: int) -> zstandard.ZstdCompressionDict:
+        """
+        Obtain a dictionary used by the server to compress outputs
+
+        Dictionaries do not change once created, so they are only downloaded once.
+
+        Parameters
+        ----------
+        dictionary_id
+            ID of the compression dictionary
+
+        Returns
+        -------
+        :
+            The zstd dictionary, for use with :func:`qcportal.compression.decompress`
+        """
+
+        zstd_dict = self._compression_dictionaries.get(dictionary_id)
+        if zstd_dict is None:
+            dictionary_data = self.make_request("get", f"api/v1/compression_dictionaries/{dictionary_id}", bytes)
+            zstd_dict = get_zstd_dictionary(dictionary_data)
+            self._compression_dictionaries[dictionary_id] = zstd_dict
+
+        return zstd_dict
+
     def _fetch_records(
         self,
         record_type: Optional[Type[_T]],
@@ -615,11 +649,18 @@ class PortalClient(PortalClientBase):
         initial_batch_size = math.ceil(max_batch_size // 10)
 
         def _download_chunk(id_chunk: List[int]):
+            # Records are streamed from the server, and each record is created as soon as it is received.
+            # So the raw data for the entire chunk is never held in memory at once
             body = CommonBulkGetBody(ids=id_chunk, include=include, missing_ok=missing_ok)
-            return self.make_request("post", endpoint, List[Optional[Dict[str, Any]]], body=body)
+            record_dicts = self.make_streaming_request("post", endpoint, Optional[Dict[str, Any]], body=body)
+
+            if record_type is None:
+                return [record_from_dict(r, self) if r is not None else None for r in record_dicts]
+            else:
+                return [record_type(self, **r) if r is not None else None for r in record_dicts]
 
         all_records = []
-        for record_dicts in process_chunk_iterable(
+        for records in process_chunk_iterable(
             _download_chunk,
             record_ids,
             self.download_target_time,
@@ -628,10 +669,7 @@ class PortalClient(PortalClientBase):
             self.n_download_threads,
             keep_order=True,
         ):
-            if record_type is None:
-                all_records.extend(records_from_dicts(record_dicts, self))
-            else:
-                all_records.extend([record_type(self, **r) if r is not None else None for r in record_dicts])
+            all_records.extend(records)
 
         # Just to really make sure the process_chunk_iterable code is correct
         assert all((x is None or x.id == rid) for x, rid in zip(all_records, record_ids))
@@ -2605,6 +2643,15 @@ class PortalClient(PortalClientBase):
         filter_data = ManagerQueryFilters(**filter_dict)
         return ManagerQueryIterator(self, filter_data)
 
+    def get_task_queue_depth(self) -> List[TaskQueueDepth]:
+        """
+        Obtain the number of waiting tasks on the server, per tag and set of required programs
+
+        Tags and sets of programs without any waiting tasks are not included.
+        """
+
+        return self.make_request("get", "api/v1/tasks/queue_depth", List[TaskQueueDepth])
+
     def query_access_log(
         self,
         *,
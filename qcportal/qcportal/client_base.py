@@ -3,10 +3,13 @@ from __future__ import annotations
 import logging
 import os
 import random
+import threading
 import time
 from typing import (
     Any,
     Dict,
+    Iterator,
+    List,
     Optional,
     Union,
     TypeVar,
@@ -20,14 +23,45 @@ try:
 except ImportError:
     import pydantic
 import requests
+import urllib3
 from typing import Tuple
 import yaml
 import hashlib
 from packaging.version import parse as parse_version
 
 from . import __version__
+from .compression import content_encodings, encode_content, decode_content, decode_content_stream
 from .exceptions import AuthenticationFailure
-from .serialization import serialize, deserialize
+from .serialization import serialize, deserialize, deserialize_stream, get_stream_content_type
+
+# Size of the chunks read from a streaming response
+_stream_chunk_size = 256 * 1024
+
+# urllib3 only decompresses zstd-encoded responses itself if it has zstd support available
+# Otherwise, we have to do it ourselves
+_urllib3_decodes_zstd = "zstd" in urllib3.util.request.ACCEPT_ENCODING
+
+
+def _get_content(r: requests.Response) -> bytes:
+    """
+    Returns the (decompressed) body of a response
+    """
+
+    if r.headers.get("Content-Encoding") == "zstd" and not _urllib3_decodes_zstd:
+        return decode_content(r.content, "zstd")
+    return r.content
+
+
+def _iter_content(r: requests.Response, chunk_size: int) -> Iterator[bytes]:
+    """
+    Returns an iterator over chunks of the (decompressed) body of a streamed response
+    """
+
+    chunks = r.iter_content(chunk_size=chunk_size)
+    if r.headers.get("Content-Encoding") == "zstd" and not _urllib3_decodes_zstd:
+        return decode_content_stream(chunks, "zstd")
+    return chunks
+
 
 _T = TypeVar("_T")
 _U = TypeVar("_U")
@@ -118,6 +152,9 @@ class PortalClientBase:
         self.username = username
         self._verify = verify
 
+        # Requests may be made from multiple threads. Only one of them should renew the JWT
+        self._jwt_lock = threading.Lock()
+
         # A persistent session
         # This results in significant speedup (~65% faster in my test)
         # https://docs.python-requests.org/en/master/user/advanced/#session-objects
@@ -143,6 +180,13 @@ class PortalClientBase:
         # Chunk size will be adjusted to try to reach this target time
         self.download_target_time = 0.50
 
+        # Request bodies at least this large (in bytes) are compressed, if the server supports it.
+        # Set to None to disable compression of requests
+        self.compress_request_min_size: Optional[int] = 4096
+
+        # Compression of request bodies supported by the server (filled in from the server information)
+        self._request_encodings: List[str] = []
+
         # If no 3rd party verification, quiet urllib
         if self._verify is False:
             from urllib3.exceptions import InsecureRequestWarning
@@ -163,6 +207,7 @@ class PortalClientBase:
         self.server_info = self.get_server_information()
         self.server_name = self.server_info["name"]
         self.api_limits = self.server_info["api_limits"]
+        self._request_encodings = [x for x in content_encodings if x in self.server_info.get("request_encodings", [])]
 
         server_version = parse_version(self.server_info["version"])
         client_version = parse_version(__version__)
@@ -282,7 +327,9 @@ class PortalClientBase:
         enc_headers = {"Content-Type": encoding, "Accept": encoding}
         self._req_session.headers.update(enc_headers)
 
-    def _send_request(self, req: requests.Request, allow_retries: bool = True) -> requests.Response:
+    def _send_request(
+        self, req: requests.Request, allow_retries: bool = True, stream: bool = False
+    ) -> requests.Response:
         """
         Sends a prepared request, optionally retrying on errors
 
@@ -292,6 +339,9 @@ class PortalClientBase:
             A prepared request to send
         allow_retries
             If true, attempts to retry on certain kinds of errors
+        stream
+            If true, the body of the response is not downloaded immediately, and must be read
+            via the methods of the returned response (such as ``iter_content``)
 
         Returns
         -------
@@ -305,7 +355,9 @@ class PortalClientBase:
             pretty_print_request(prep_req)
 
         if not allow_retries:
-            ret = self._req_session.send(prep_req, verify=self._verify, timeout=self.timeout, allow_redirects=False)
+            ret = self._req_session.send(
+                prep_req, verify=self._verify, timeout=self.timeout, allow_redirects=False, stream=stream
+            )
 
             if self.debug_requests:
                 pretty_print_response(ret)
@@ -320,7 +372,7 @@ class PortalClientBase:
             while True:
                 try:
                     ret = self._req_session.send(
-                        prep_req, verify=self._verify, timeout=self.timeout, allow_redirects=False
+                        prep_req, verify=self._verify, timeout=self.timeout, allow_redirects=False, stream=stream
                     )
                     break
                 except requests.exceptions.SSLError:
@@ -329,9 +381,7 @@ class PortalClientBase:
                     if retry_count >= self.retry_max:
                         raise
 
-                    # eg, if jitter fraction is 0.05, then multiply by something on the range 0.95 to 1.05
-                    jitter = random.uniform(1.0 - self.retry_jitter_fraction, 1.0 + self.retry_jitter_fraction)
-                    time_to_wait = self.retry_delay * (self.retry_backoff**retry_count) * jitter
+                    time_to_wait = self._retry_wait_time(retry_count)
 
                     retry_count += 1
                     self._logger.warning(
@@ -352,6 +402,42 @@ class PortalClientBase:
 
         return ret
 
+    def _retry_wait_time(self, retry_count: int) -> float:
+        """
+        Returns the time to wait (in seconds) before retrying a request that has already been retried retry_count times
+        """
+
+        # eg, if jitter fraction is 0.05, then multiply by something on the range 0.95 to 1.05
+        jitter = random.uniform(1.0 - self.retry_jitter_fraction, 1.0 + self.retry_jitter_fraction)
+        return self.retry_delay * (self.retry_backoff**retry_count) * jitter
+
+    def _jwt_expired(self) -> bool:
+        """
+        Returns True if the JWT access or refresh token has expired
+        """
+
+        now = time.time()
+        return bool(
+            (self._jwt_refresh_exp and self._jwt_refresh_exp < now)
+            or (self._jwt_access_exp and self._jwt_access_exp < now)
+        )
+
+    def _renew_JWT_token(self, force_refresh: bool = False) -> None:
+        """
+        Renews the JWT access token if it has expired (or always, if force_refresh is True)
+
+        Requests may be made from multiple threads. Only one of them renews the token at a time.
+        """
+
+        with self._jwt_lock:
+            # If refresh token has expired, log in again
+            if self._jwt_refresh_exp and self._jwt_refresh_exp < time.time():
+                self._get_JWT_token()
+
+            # If only the JWT token is expired, automatically renew it
+            if force_refresh or (self._jwt_access_exp and self._jwt_access_exp < time.time()):
+                self._refresh_JWT_token()
+
     def _get_JWT_token(self) -> None:
 
         full_uri = self.address + "auth/v1/login"
@@ -424,27 +510,30 @@ class PortalClientBase:
         internal_retry: Optional[bool] = True,
         allow_retries: bool = True,
         additional_headers: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
     ) -> requests.Response:
-        # If refresh token has expired, log in again
-        if self._jwt_refresh_exp and self._jwt_refresh_exp < time.time():
-            self._get_JWT_token()
-
-        # If only the JWT token is expired, automatically renew it
-        if self._jwt_access_exp and self._jwt_access_exp < time.time():
-            self._refresh_JWT_token()
+        self._renew_JWT_token()
 
         full_uri = self.address + endpoint
         req = requests.Request(
             method=method.upper(), url=full_uri, data=body, params=url_params, headers=additional_headers
         )
-        r = self._send_request(req, allow_retries=allow_retries)
+        r = self._send_request(req, allow_retries=allow_retries, stream=stream)
 
         # If JWT token expired, automatically renew it and retry once. This should have been caught above,
         # but can happen in rare instances where the token expires between the time we check it and the time
         # we use it.
         if internal_retry and (r.status_code == 401) and "Token has expired" in r.json()["msg"]:
-            self._refresh_JWT_token()
-            return self._request(method, endpoint, body=body, url_params=url_params, internal_retry=False)
+            self._renew_JWT_token(force_refresh=True)
+            return self._request(
+                method,
+                endpoint,
+                body=body,
+                url_params=url_params,
+                internal_retry=False,
+                additional_headers=additional_headers,
+                stream=stream,
+            )
 
         if r.status_code != 200:
             try:
@@ -460,19 +549,24 @@ class PortalClientBase:
 
         return r
 
-    def make_request(
+    def _prepare_request_data(
         self,
-        method: str,
-        endpoint: str,
-        response_model: Optional[Type[_V]],
-        *,
-        body_model: Optional[Type[_T]] = None,
-        url_params_model: Optional[Type[_U]] = None,
-        body: Optional[Union[_T, Dict[str, Any]]] = None,
-        url_params: Optional[Union[_U, Dict[str, Any]]] = None,
-        allow_retries: bool = True,
-        additional_headers: Optional[Dict[str, Any]] = None,
-    ) -> _V:
+        body_model: Optional[Type[_T]],
+        url_params_model: Optional[Type[_U]],
+        body: Optional[Union[_T, Dict[str, Any]]],
+        url_params: Optional[Union[_U, Dict[str, Any]]],
+        additional_headers: Optional[Dict[str, Any]],
+    ) -> Tuple[Optional[bytes], Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Validates the body and URL parameters of a request
+
+        Returns the serialized (and possibly compressed) body, the URL parameters, and the headers to send
+        """
+
+        headers = {"Accept-Encoding": ", ".join(content_encodings)}
+        if additional_headers:
+            headers.update(additional_headers)
+
         # If body_model or url_params_model are None, then use the type given
         if body_model is None and body is not None:
             body_model = type(body)
@@ -492,21 +586,97 @@ class PortalClientBase:
         if isinstance(parsed_url_params, pydantic.BaseModel):
             parsed_url_params = parsed_url_params.dict()
 
+        if (
+            serialized_body is not None
+            and self._request_encodings
+            and self.compress_request_min_size is not None
+            and len(serialized_body) >= self.compress_request_min_size
+        ):
+            content_encoding = self._request_encodings[0]
+            serialized_body = encode_content(serialized_body, content_encoding)
+            headers["Content-Encoding"] = content_encoding
+
+        return serialized_body, parsed_url_params, headers
+
+    def make_request(
+        self,
+        method: str,
+        endpoint: str,
+        response_model: Optional[Type[_V]],
+        *,
+        body_model: Optional[Type[_T]] = None,
+        url_params_model: Optional[Type[_U]] = None,
+        body: Optional[Union[_T, Dict[str, Any]]] = None,
+        url_params: Optional[Union[_U, Dict[str, Any]]] = None,
+        allow_retries: bool = True,
+        additional_headers: Optional[Dict[str, Any]] = None,
+    ) -> _V:
+        serialized_body, parsed_url_params, headers = self._prepare_request_data(
+            body_model, url_params_model, body, url_params, additional_headers
+        )
+
         r = self._request(
             method,
             endpoint,
             body=serialized_body,
             url_params=parsed_url_params,
             allow_retries=allow_retries,
-            additional_headers=additional_headers,
+            additional_headers=headers,
         )
-        d = deserialize(r.content, r.headers["Content-Type"])
+        d = deserialize(_get_content(r), r.headers["Content-Type"])
 
         if response_model is None:
             return None
         else:
             return pydantic.parse_obj_as(response_model, d)
 
+    def make_streaming_request(
+        self,
+        method: str,
+        endpoint: str,
+        item_model: Type[_V],
+        *,
+        body_model: Optional[Type[_T]] = None,
+        url_params_model: Optional[Type[_U]] = None,
+        body: Optional[Union[_T, Dict[str, Any]]] = None,
+        url_params: Optional[Union[_U, Dict[str, Any]]] = None,
+        allow_retries: bool = True,
+    ) -> Iterator[_V]:
+        """
+        Makes a request to an endpoint that returns a list, yielding the elements as they are received
+
+        The elements of the list are sent by the server one at a time (as a msgpack stream or newline-delimited
+        json), and each element is deserialized and converted to ``item_model`` once it has been completely received.
+        This avoids holding the entire (serialized) response in memory at once.
+
+        If the server does not support streaming, the entire list is downloaded and the elements yielded from that.
+        """
+
+        stream_type = get_stream_content_type(self.encoding)
+        additional_headers = None if stream_type is None else {"Accept": stream_type}
+
+        serialized_body, parsed_url_params, headers = self._prepare_request_data(
+            body_model, url_params_model, body, url_params, additional_headers
+        )
+
+        with self._request(
+            method,
+            endpoint,
+            body=serialized_body,
+            url_params=parsed_url_params,
+            allow_retries=allow_retries,
+            additional_headers=headers,
+            stream=True,
+        ) as r:
+            content_type = r.headers["Content-Type"]
+
+            if content_type == stream_type:
+                for d in deserialize_stream(_iter_content(r, _stream_chunk_size), content_type):
+                    yield pydantic.parse_obj_as(item_model, d)
+            else:
+                for d in deserialize(_get_content(r), content_type):
+                    yield pydantic.parse_obj_as(item_model, d)
+
     def download_file(self, endpoint: str, destination_path: str, overwrite: bool = False) -> Tuple[int, str]:
 
         sha256 = hashlib.sha256()
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import io
 import lzma
+import zlib
 from enum import Enum
-from typing import Optional, Tuple, Any
+from functools import lru_cache
+from typing import Optional, Tuple, Any, Iterable, Iterator
 
 import msgpack
 import zstandard
 
+# Data smaller than this is always compressed with a single thread. zstd splits data into jobs of
+# at least this size anyway, so multiple threads would only add overhead
+_zstd_multithread_min_size = 1048576
+
+# Header sent by clients that can decompress data compressed with one of the server's compression
+# dictionaries (obtaining the dictionaries from the server as needed)
+compression_dictionaries_header = "QCPortal-Compression-Dictionaries"
+
 
 class CompressionEnum(str, Enum):
     """
@@ -28,19 +39,47 @@ def get_compressed_ext(compression_type: str) -> str:
         raise TypeError(f"Unknown compression type: {compression_type}")
 
 
+@lru_cache(maxsize=32)
+def get_zstd_dictionary(
+    dictionary_data: bytes, compression_level: Optional[int] = None
+) -> zstandard.ZstdCompressionDict:
+    """
+    Creates a zstd dictionary object from the raw contents of a trained dictionary
+
+    If a compression level is given, the dictionary is prepared for compression at that level. Dictionaries
+    are cached, since they are generally used many times and can be expensive to set up.
+    """
+
+    zstd_dict = zstandard.ZstdCompressionDict(dictionary_data)
+    if compression_level is not None:
+        zstd_dict.precompute_compress(level=compression_level)
+    return zstd_dict
+
+
 def compress(
     input_data: Any,
     compression_type: CompressionEnum = CompressionEnum.zstd,
     compression_level: Optional[int] = None,
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+    threads: int = 0,
 ) -> Tuple[bytes, CompressionEnum, int]:
     """Serializes and compresses data given a compression scheme and level
 
     If compression_level is None, but a compression_type is specified, an appropriate default level is chosen
 
+    A trained zstd dictionary may be given, in which case the same dictionary is needed for decompression.
+    Dictionaries are only supported with zstd compression.
+
+    For zstd, large data can be compressed using multiple threads (-1 means one thread per CPU). This does not
+    change the format of the compressed data. The number of threads is ignored for other compression types.
+
     Returns a tuple containing the compressed data, applied compression type, and compression level (which may
     be different from the provided arguments)
     """
 
+    if dictionary is not None and compression_type != CompressionEnum.zstd:
+        raise ValueError(f"Compression dictionaries are not supported with compression type {compression_type}")
+
     data = msgpack.packb(input_data, use_bin_type=True)
 
     # No compression
@@ -65,7 +104,15 @@ def compress(
                 compression_level = 6
             else:
                 compression_level = 16
-        data = zstandard.compress(data, level=compression_level)
+        if len(data) < _zstd_multithread_min_size:
+            threads = 0
+
+        if dictionary is None and threads == 0:
+            data = zstandard.compress(data, level=compression_level)
+        else:
+            data = zstandard.ZstdCompressor(level=compression_level, dict_data=dictionary, threads=threads).compress(
+                data
+            )
     else:
         # Shouldn't ever happen, unless we change CompressionEnum but not the rest of this function
         raise TypeError(f"Unknown compression type: {compression_type}")
@@ -73,18 +120,123 @@ def compress(
     return (data, compression_type, compression_level)
 
 
-def decompress(compressed_data: bytes, compression_type: CompressionEnum) -> Any:
+def decompress(
+    compressed_data: bytes,
+    compression_type: CompressionEnum,
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+) -> Any:
     """
     Decompresses and deserializes data into python objects
+
+    If the data was compressed with a zstd dictionary, that dictionary must be given.
     """
+
+    if dictionary is not None and compression_type != CompressionEnum.zstd:
+        raise ValueError(f"Compression dictionaries are not supported with compression type {compression_type}")
+
     if compression_type == CompressionEnum.none:
         decompressed_data = compressed_data
     elif compression_type == CompressionEnum.lzma:
         decompressed_data = lzma.decompress(compressed_data)
     elif compression_type == CompressionEnum.zstd:
-        decompressed_data = zstandard.decompress(compressed_data)
+        if dictionary is None:
+            decompressed_data = zstandard.decompress(compressed_data)
+        else:
+            decompressed_data = zstandard.ZstdDecompressor(dict_data=dictionary).decompress(compressed_data)
     else:
         # Shouldn't ever happen, unless we change CompressionEnum but not the rest of this function
         raise TypeError(f"Unknown compression type: {compression_type}")
 
     return msgpack.unpackb(decompressed_data, raw=False)
+
+
+# Content encodings (compression of HTTP request & response bodies) that are supported, in order of preference
+content_encodings = ("zstd", "gzip")
+
+# Compression levels used for content encoding. These are low, since (de)compression
+# happens for every request/response
+_content_encoding_levels = {"zstd": 3, "gzip": 5}
+
+
+def _gzip_compressobj():
+    # wbits = 16 + MAX_WBITS writes a gzip header & trailer
+    return zlib.compressobj(_content_encoding_levels["gzip"], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def encode_content(data: bytes, content_encoding: str) -> bytes:
+    """
+    Compresses the body of an HTTP request or response with the given content encoding
+    """
+
+    if content_encoding == "zstd":
+        return zstandard.ZstdCompressor(level=_content_encoding_levels["zstd"]).compress(data)
+    elif content_encoding == "gzip":
+        cobj = _gzip_compressobj()
+        return cobj.compress(data) + cobj.flush()
+    else:
+        raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+
+def encode_content_stream(chunks: Iterable[bytes], content_encoding: str) -> Iterator[bytes]:
+    """
+    Compresses the body of an HTTP response that is being streamed
+
+    Compressed data is yielded as it becomes available, so this can be used with responses that are generated
+    incrementally.
+    """
+
+    if content_encoding == "zstd":
+        cobj = zstandard.ZstdCompressor(level=_content_encoding_levels["zstd"]).compressobj()
+    elif content_encoding == "gzip":
+        cobj = _gzip_compressobj()
+    else:
+        raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+    for chunk in chunks:
+        compressed = cobj.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield cobj.flush()
+
+
+def decode_content(data: bytes, content_encoding: str, max_size: Optional[int] = None) -> bytes:
+    """
+    Decompresses the body of an HTTP request or response with the given content encoding
+
+    If max_size is given and the decompressed data would be larger than that, a ValueError is raised.
+    """
+
+    # Read one more than the max size, so we can tell if the data is too large
+    max_length = -1 if max_size is None else max_size + 1
+
+    if content_encoding == "zstd":
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            decompressed = reader.read(max_length)
+    elif content_encoding == "gzip":
+        decompressed = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data, max(max_length, 0))
+    else:
+        raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+    if max_size is not None and len(decompressed) > max_size:
+        raise ValueError(f"Decompressed data is larger than the maximum size of {max_size} bytes")
+
+    return decompressed
+
+
+def decode_content_stream(chunks: Iterable[bytes], content_encoding: str) -> Iterator[bytes]:
+    """
+    Decompresses the body of an HTTP response as it is being received
+    """
+
+    if content_encoding == "zstd":
+        dobj = zstandard.ZstdDecompressor().decompressobj()
+    elif content_encoding == "gzip":
+        dobj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    else:
+        raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+    for chunk in chunks:
+        decompressed = dobj.decompress(chunk)
+        if decompressed:
+            yield decompressed
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import math
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 from typing import (
     TYPE_CHECKING,
@@ -26,6 +26,7 @@ try:
 except ImportError:
     import pydantic
     from pydantic import BaseModel, Extra, validator, PrivateAttr, Field
+import numpy as np
 from qcelemental.models.types import Array
 from tabulate import tabulate
 from tqdm import tqdm
@@ -1261,26 +1262,14 @@ class BaseDataset(BaseModel):
             return []
 
         batch_size = math.ceil(self._client.api_limits["get_records"] / 4)
-        server_modified_time: Dict[int, datetime] = {}  # record_id -> modified time on server
 
         # Find out which records have been updated on the server
-        for record_info_batch in chunk_iterable(updateable_record_info, batch_size):
-            record_id_batch = [x[2] for x in record_info_batch]
+        server_record_info = self._fetch_record_modified_info([x[2] for x in updateable_record_info])
 
-            # Do a raw call to the records/bulkGet endpoint. This allows us to only get
-            # the 'modified_on' and 'status' fields
-            server_record_info = self._client.make_request(
-                "post",
-                f"api/v1/records/bulkGet",
-                List[Dict[str, Any]],
-                body=CommonBulkGetBody(ids=record_id_batch, include=["id", "modified_on", "status"]),
-            )
-
-            # Too lazy to look up how pydantic stores datetime, so use pydantic to parse it
-            for sri in server_record_info:
-                # Only store if the status on the server matches what the caller wants
-                if status is None or sri["status"] in status:
-                    server_modified_time[sri["id"]] = pydantic.parse_obj_as(datetime, sri["modified_on"])
+        # Only keep if the status on the server matches what the caller wants
+        server_modified_time: Dict[int, datetime] = {
+            rid: mtime for rid, (rstatus, mtime) in server_record_info.items() if status is None or rstatus in status
+        }
 
         # Which ones need to be fully updated
         need_updating: Dict[str, List[str]] = {}  # key is specification, value is list of entry names
@@ -1307,6 +1296,120 @@ class BaseDataset(BaseModel):
 
         return updated_records
 
+    def _fetch_record_modified_info(self, record_ids: List[int]) -> Dict[int, Tuple[RecordStatusEnum, datetime]]:
+        """
+        Obtains the status and modification time of records on the server
+
+        Records that do not exist on the server are not included in the returned dictionary
+        """
+
+        batch_size = math.ceil(self._client.api_limits["get_records"] / 4)
+        ret = {}
+
+        for record_id_batch in chunk_iterable(record_ids, batch_size):
+            # Do a raw call to the records/bulkGet endpoint. This allows us to only get
+            # the 'modified_on' and 'status' fields
+            server_record_info = self._client.make_request(
+                "post",
+                f"api/v1/records/bulkGet",
+                List[Dict[str, Any]],
+                body=CommonBulkGetBody(ids=record_id_batch, include=["id", "modified_on", "status"], missing_ok=True),
+            )
+
+            # Too lazy to look up how pydantic stores datetime, so use pydantic to parse it
+            for sri in server_record_info:
+                if sri is not None:
+                    ret[sri["id"]] = (sri["status"], pydantic.parse_obj_as(datetime, sri["modified_on"]))
+
+        return ret
+
+    def _fetch_record_changes(
+        self, since: Optional[datetime]
+    ) -> Tuple[List[Tuple[str, str, int, RecordStatusEnum, datetime]], datetime]:
+        """
+        Obtains information about records that have been modified on the server since the given time
+
+        Returns
+        -------
+        :
+            List of (entry_name, spec_name, record_id, status, modified_on) of the modified records, and the
+            time to use as `since` the next time this is called
+        """
+
+        limit = self._client.api_limits["get_dataset_record_changes"]
+        changes = []
+        next_since = None
+
+        while True:
+            body = DatasetRecordChangesBody(since=since, skip=len(changes), limit=limit)
+            r = self._client.make_request(
+                "post",
+                f"api/v1/datasets/{self.dataset_type}/{self.id}/records/changes",
+                DatasetRecordChanges,
+                body=body,
+            )
+
+            # Changes made while paging will be returned next time
+            if next_since is None:
+                next_since = r.next_since
+
+            changes.extend(r.changes)
+            if len(r.changes) < limit:
+                return changes, next_since
+
+    def _sync_record_changes(self) -> bool:
+        """
+        Removes records from the cache that have been modified on the server since the last sync
+
+        The removed records are then fetched from the server like any other records missing from the cache.
+        The time of the last sync is stored in the cache, so this only needs to process records that changed since then.
+        The first time this is done, all the records in the cache are checked against the server.
+
+        Returns
+        -------
+        :
+            False if the server does not support this (in which case records need to be checked individually)
+        """
+
+        if self.is_view or self._cache_data.read_only or self._client is None:
+            return False
+
+        if "get_dataset_record_changes" not in self._client.api_limits:
+            return False
+
+        since = self._cache_data.get_metadata("record_changes_since")
+
+        if since is None:
+            # Obtain the starting point first, so that records modified while checking the cache are not missed
+            _, next_since = self._fetch_record_changes(None)
+
+            cached_info = self._cache_data.get_dataset_record_info(
+                self._cache_data.get_entry_names(), self._cache_data.get_specification_names(), None
+            )
+            server_info = self._fetch_record_modified_info([x[2] for x in cached_info])
+
+            changes = [(e, s, rid, *server_info[rid]) for e, s, rid, _, _ in cached_info if rid in server_info]
+        else:
+            changes, next_since = self._fetch_record_changes(datetime.fromtimestamp(since, tz=timezone.utc))
+
+        if changes:
+            changed_entries = list({x[0] for x in changes})
+            changed_specs = list({x[1] for x in changes})
+            cached_info = self._cache_data.get_dataset_record_info(changed_entries, changed_specs, None)
+            cached_map = {(e, s): (rid, mtime) for e, s, rid, _, mtime in cached_info}
+
+            stale_ids = []
+            for entry_name, spec_name, record_id, _, modified_on in changes:
+                cached = cached_map.get((entry_name, spec_name), None)
+                if cached is not None and (cached[0] != record_id or cached[1] < modified_on):
+                    self._cache_data.delete_dataset_record(entry_name, spec_name)
+                    stale_ids.append(cached[0])
+
+            self._cache_data.delete_records(stale_ids)
+
+        self._cache_data.update_metadata("record_changes_since", next_since.timestamp())
+        return True
+
     def fetch_records(
         self,
         entry_names: Optional[Union[str, Iterable[str]]] = None,
@@ -1348,6 +1451,10 @@ class BaseDataset(BaseModel):
 
         status = make_list(status)
 
+        # Out-of-date records are removed from the cache, and then fetched like any other missing record
+        if fetch_updated and not force_refetch and self._sync_record_changes():
+            fetch_updated = False
+
         # if not specified, do all entries and specs
         # we make copies because fetching records can modify _specification_names and _entry_names members
         if entry_names is None:
@@ -1429,7 +1536,7 @@ class BaseDataset(BaseModel):
             records = self._internal_fetch_records([entry_name], [specification_name], None, include)
             if records:
                 record = records[0][2]
-        elif fetch_updated:
+        elif fetch_updated and not self._sync_record_changes():
             records = self._internal_update_records([entry_name], [specification_name], None, include)
             if records:
                 record = records[0][2]
@@ -1475,6 +1582,10 @@ class BaseDataset(BaseModel):
 
         status = make_list(status)
 
+        # Out-of-date records are removed from the cache, and then fetched like any other missing record
+        if fetch_updated and not force_refetch and self._sync_record_changes():
+            fetch_updated = False
+
         # if not specified, do all entries and specs
         # we make copies because fetching records can modify _specification_names and _entry_names members
         if entry_names is None:
@@ -1859,6 +1970,91 @@ class BaseDataset(BaseModel):
         # Make specification top level index.
         return return_val.swaplevel(axis=1)
 
+    def get_record_properties(
+        self,
+        property_names: Union[str, Iterable[str]],
+        entry_names: Optional[Union[str, Iterable[str]]] = None,
+        specification_names: Optional[Union[str, Iterable[str]]] = None,
+        status: Optional[Union[RecordStatusEnum, Iterable[RecordStatusEnum]]] = None,
+    ) -> "DataFrame":
+        """
+        Retrieve properties of records in this dataset, without fetching the full records
+
+        The properties are obtained from the server by column, rather than record by record.
+        This is much faster than iterating over records when only a few properties are needed.
+
+        Parameters
+        ----------
+        property_names
+            Names of the properties (keys in the properties dictionary of the records) to retrieve
+        entry_names
+            Names of the entries whose records to use. If None, use all entries
+        specification_names
+            Names of the specifications whose records to use. If None, use all specifications
+        status
+            Only use records with these statuses
+
+        Returns
+        -------
+        :
+            A DataFrame with one row per record. Columns are "entry", "specification", "record_id",
+            and then one column per property. Numeric properties have a float dtype, with missing values
+            as NaN.
+        """
+
+        import pandas as pd
+
+        self.assert_is_not_view()
+        self.assert_online()
+
+        property_names = make_list(property_names)
+        status = make_list(status)
+
+        if entry_names is None:
+            entry_names = self.entry_names
+        else:
+            entry_names = make_list(entry_names)
+
+        if specification_names is None:
+            specification_names = self.specification_names
+        else:
+            specification_names = make_list(specification_names)
+
+        # Batch over entries, assuming there are many more entries than specifications
+        limit = self._client.api_limits["get_dataset_properties"]
+        batch_size = max(1, limit // max(1, len(specification_names)))
+
+        all_df = []
+        for entry_batch in chunk_iterable(entry_names, batch_size):
+            body = DatasetFetchRecordPropertiesBody(
+                property_names=property_names,
+                entry_names=entry_batch,
+                specification_names=specification_names,
+                status=status,
+            )
+
+            prop_columns = self._client.make_request(
+                "post",
+                f"api/v1/datasets/{self.dataset_type}/{self.id}/records/properties/bulkFetch",
+                DatasetRecordPropertyColumns,
+                body=body,
+            )
+
+            df_data = {
+                "entry": prop_columns.entry_names,
+                "specification": prop_columns.specification_names,
+                "record_id": prop_columns.record_ids,
+            }
+            for name in property_names:
+                df_data[name] = decode_property_column(prop_columns.columns[name])
+
+            all_df.append(pd.DataFrame(df_data))
+
+        if not all_df:
+            return pd.DataFrame(columns=["entry", "specification", "record_id", *property_names])
+
+        return pd.concat(all_df, ignore_index=True)
+
     def get_properties_df(self, properties_list: Sequence[str]) -> "DataFrame":
         """
         Retrieve a DataFrame populated with the specified properties from dataset records.
@@ -1880,11 +2076,17 @@ class BaseDataset(BaseModel):
             A DataFrame populated with the specified properties for each record.
         """
 
-        # create lambda function to get all properties at once
-        extract_properties = lambda x: [x.properties.get(property_name) for property_name in properties_list]
+        # Get the properties directly from the server if we can. Otherwise, extract them from the full records
+        if not self.offline and not self.is_view and "get_dataset_properties" in self._client.api_limits:
+            df = self.get_record_properties(properties_list, status=RecordStatusEnum.complete)
+            result = df.pivot(index="entry", columns="specification", values=list(properties_list))
+            result = result.swaplevel(axis=1)
+        else:
+            # create lambda function to get all properties at once
+            extract_properties = lambda x: [x.properties.get(property_name) for property_name in properties_list]
 
-        # retrieve values.
-        result = self.compile_values(extract_properties, value_names=properties_list, unpack=True)
+            # retrieve values.
+            result = self.compile_values(extract_properties, value_names=properties_list, unpack=True)
 
         # Drop columns with all nan  values. This will occur if a property that is not part of a
         # specification is requested.
@@ -2103,6 +2305,87 @@ class DatasetFetchRecordsBody(RestModelBase):
     status: Optional[List[RecordStatusEnum]] = None
 
 
+class DatasetFetchRecordPropertiesBody(RestModelBase):
+    property_names: List[str]
+    entry_names: List[str]
+    specification_names: List[str]
+    status: Optional[List[RecordStatusEnum]] = None
+
+
+class DatasetRecordChangesBody(RestModelBase):
+    since: Optional[datetime] = None
+    skip: int = 0
+    limit: Optional[int] = None
+
+
+class DatasetRecordChanges(BaseModel):
+    """
+    Records of a dataset that were modified since a given time
+    """
+
+    # (entry_name, specification_name, record_id, status, modified_on)
+    changes: List[Tuple[str, str, int, RecordStatusEnum, datetime]]
+
+    # Time to pass as `since` for obtaining the next set of changes
+    next_since: datetime
+
+
+class DatasetRecordPropertyColumns(BaseModel):
+    """
+    Properties of dataset records, stored by column
+
+    Row ``i`` of each column corresponds to the record for ``entry_names[i]`` and ``specification_names[i]``.
+    Columns are encoded with :func:`encode_property_column`.
+    """
+
+    class Config:
+        extra = Extra.forbid
+
+    entry_names: List[str]
+    specification_names: List[str]
+    record_ids: List[int]
+    columns: Dict[str, Dict[str, Any]]
+
+
+def encode_property_column(values: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Encodes a column of property values into a compact, typed form
+
+    Columns containing only numbers (or missing values) are stored as the raw bytes of a float64 array, with
+    missing values stored as NaN. Columns containing only booleans are stored as the raw bytes of a boolean array.
+    Anything else is stored as a plain list.
+    """
+
+    if len(values) > 0 and all(isinstance(v, bool) for v in values):
+        return {"dtype": "bool", "data": np.asarray(values, dtype=np.bool_).tobytes()}
+
+    if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+        arr = np.asarray([np.nan if v is None else v for v in values], dtype="<f8")
+        return {"dtype": "float64", "data": arr.tobytes()}
+
+    return {"dtype": "object", "data": list(values)}
+
+
+def decode_property_column(column: Dict[str, Any]) -> np.ndarray:
+    """
+    Decodes a column of property values encoded with :func:`encode_property_column`
+    """
+
+    dtype = column["dtype"]
+    if dtype == "float64":
+        return np.frombuffer(column["data"], dtype="<f8")
+    elif dtype == "bool":
+        return np.frombuffer(column["data"], dtype=np.bool_)
+    elif dtype == "object":
+        # Assign one at a time, so that numpy doesn't try to broadcast values that are lists
+        arr = np.empty(len(column["data"]), dtype=object)
+        for i, v in enumerate(column["data"]):
+            arr[i] = v
+        return arr
+    else:
+        raise ValueError(f"Unknown property column dtype: {dtype}")
+
+
 class DatasetCreateViewBody(RestModelBase):
     description: Optional[str]
     provenance: Dict[str, Any]
@@ -2213,7 +2496,10 @@ def create_dataset_view(
 
     # Manually get it, because we want to use a different cache file
     ds_dict = client.make_request("get", f"api/v1/datasets/{dataset_id}", Dict[str, Any])
-    ds_cache = DatasetCache(f"file:{file_path}", False, BaseDataset.get_subclass(ds_dict["dataset_type"]))
+    # Views may be read by older versions of QCPortal, which do not support dictionaries
+    ds_cache = DatasetCache(
+        f"file:{file_path}", False, BaseDataset.get_subclass(ds_dict["dataset_type"]), use_dictionaries=False
+    )
 
     ds = dataset_from_dict(ds_dict, client, ds_cache)
 
@@ -9,7 +9,7 @@ from .managers import (
     ManagerStatusEnum,
 )
 from .metadata_models import TaskReturnMetadata
-from .tasks import TaskClaimBody, TaskReturnBody
+from .tasks import TaskClaimBody, TaskReturnBody, TaskQueueDepth
 
 
 class ManagerClient(PortalClientBase):
@@ -130,6 +130,9 @@ class ManagerClient(PortalClientBase):
 
         return self.make_request("post", "compute/v1/tasks/claim", List[RecordTask], body=body)
 
+    def get_queue_depth(self) -> List[TaskQueueDepth]:
+        return self.make_request("get", "compute/v1/tasks/queue_depth", List[TaskQueueDepth])
+
     def return_finished(self, results_compressed: Dict[int, bytes]) -> TaskReturnMetadata:
         # Chunk based on the server limit
         results_flat = list(results_compressed.items())
@@ -21,7 +21,7 @@ from qcportal.base_models import (
 )
 
 from qcportal.cache import RecordCache, get_records_with_cache
-from qcportal.compression import CompressionEnum, decompress, get_compressed_ext
+from qcportal.compression import CompressionEnum, compress, decompress, get_compressed_ext
 
 _T = TypeVar("_T")
 
@@ -113,6 +113,9 @@ class OutputStore(BaseModel):
 
     output_type: OutputTypeEnum = Field(..., description="The type of output this is (stdout, error, etc)")
     compression_type: CompressionEnum = Field(CompressionEnum.none, description="Compression method (such as lzma)")
+    compression_dictionary_id: Optional[int] = Field(
+        None, description="ID of the server-side dictionary the data was compressed with"
+    )
     data_: Optional[bytes] = Field(None, alias="data")
 
     _data_url: Optional[str] = PrivateAttr(None)
@@ -129,19 +132,44 @@ class OutputStore(BaseModel):
         if self._client is None:
             raise RuntimeError("No client to fetch output data from")
 
-        cdata, ctype = self._client.make_request(
+        # Older servers do not return a dictionary id
+        cdata, ctype, *dictionary_id = self._client.make_request(
             "get",
             self._data_url,
-            Tuple[bytes, CompressionEnum],
+            Union[Tuple[bytes, CompressionEnum, Optional[int]], Tuple[bytes, CompressionEnum]],
         )
 
         assert self.compression_type == ctype
         self.data_ = cdata
 
+        # Merging appended output may have removed the dictionary
+        self.compression_dictionary_id = dictionary_id[0] if dictionary_id else None
+
     @property
     def data(self) -> Any:
         self._fetch_raw_data()
-        return decompress(self.data_, self.compression_type)
+
+        zstd_dict = None
+        if self.compression_dictionary_id is not None:
+            if self._client is None:
+                raise RuntimeError("No client to fetch the compression dictionary from")
+            zstd_dict = self._client.get_compression_dictionary(self.compression_dictionary_id)
+
+        return decompress(self.data_, self.compression_type, zstd_dict)
+
+    def _remove_dictionary(self):
+        """
+        Stores the data without compression if it was compressed with a server-side dictionary
+
+        This is done before storing in a cache or view file, which may be read without a client.
+        The record itself is compressed when stored, so the data is not compressed again here.
+        """
+
+        if self.compression_dictionary_id is None or self.data_ is None:
+            return
+
+        self.data_, self.compression_type, _ = compress(self.data, CompressionEnum.none)
+        self.compression_dictionary_id = None
 
 
 class ComputeHistory(BaseModel):
@@ -536,6 +564,18 @@ class BaseRecord(BaseModel):
     def __str__(self) -> str:
         return f"<{self.__class__.__name__} id={self.id} status={self.status}>"
 
+    def _remove_output_dictionaries(self):
+        """
+        Removes the server-side dictionary compression from any outputs that have been fetched
+
+        See :meth:`OutputStore._remove_dictionary`
+        """
+
+        if self.compute_history_ is not None:
+            for ch in self.compute_history_:
+                for o in (ch.outputs_ or {}).values():
+                    o._remove_dictionary()
+
     def propagate_client(self, client):
         """
         Propagates a client and related information to this record to any fields within this record that need it
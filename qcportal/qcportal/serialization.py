@@ -1,6 +1,6 @@
 import base64
 import json
-from typing import Union, Any, Optional
+from typing import Union, Any, Optional, Iterable, Iterator
 
 import msgpack
 import numpy as np
@@ -137,6 +137,81 @@ def serialize(data, content_type: str) -> bytes:
         raise RuntimeError(f"Unknown content type for serialization: {content_type}")
 
 
+# Content types for streams of objects, keyed by the content type of the individual objects
+_stream_content_types = {
+    "msgpack": "application/x-msgpack-stream",
+    "json": "application/x-ndjson",
+}
+
+
+def get_stream_content_type(content_type: str) -> Optional[str]:
+    """
+    Returns the content type used for streaming a sequence of objects of the given content type
+
+    If streaming is not supported for that content type, None is returned.
+    """
+
+    if content_type.startswith("application/"):
+        content_type = content_type[12:]
+
+    return _stream_content_types.get(content_type)
+
+
+def serialize_stream(data: Iterable[Any], content_type: str) -> Iterator[bytes]:
+    """
+    Serializes a sequence of objects one at a time
+
+    With msgpack, this is just the concatenation of the individual msgpack objects. With json, each
+    object is on its own line (newline-delimited json).
+    """
+
+    if content_type == "application/x-msgpack-stream":
+        packer = msgpack.Packer(default=_msgpack_encode, use_bin_type=True)
+        for obj in data:
+            yield packer.pack(obj)
+    elif content_type == "application/x-ndjson":
+        encoder = _JSONEncoder()
+        for obj in data:
+            yield encoder.encode(obj).encode("utf-8") + b"\n"
+    else:
+        raise RuntimeError(f"Unknown content type for stream serialization: {content_type}")
+
+
+def deserialize_stream(chunks: Iterable[bytes], content_type: str) -> Iterator[Any]:
+    """
+    Deserializes a stream of objects, yielding each object as soon as it has been fully received
+
+    The chunks can be split at arbitrary points (they do not need to correspond to object boundaries).
+    """
+
+    if content_type == "application/x-msgpack-stream":
+        # max_buffer_size = 0 means no limit - a single object can be large
+        unpacker = msgpack.Unpacker(object_hook=_msgpack_decode, raw=False, strict_map_key=False, max_buffer_size=0)
+        for chunk in chunks:
+            unpacker.feed(chunk)
+            yield from unpacker
+    elif content_type == "application/x-ndjson":
+        # Pieces of a line that has not been completely received yet
+        pending = []
+        for chunk in chunks:
+            first, *lines = chunk.split(b"\n")
+            pending.append(first)
+            if not lines:
+                continue
+
+            complete_lines = [b"".join(pending)] + lines[:-1]
+            pending = [lines[-1]]
+            for line in complete_lines:
+                if line.strip():
+                    yield json.loads(line, object_hook=_json_decode)
+
+        line = b"".join(pending)
+        if line.strip():
+            yield json.loads(line, object_hook=_json_decode)
+    else:
+        raise RuntimeError(f"Unknown content type for stream deserialization: {content_type}")
+
+
 def convert_numpy_recursive(obj, flatten=False):
     if isinstance(obj, dict):
         return {k: convert_numpy_recursive(v, flatten) for k, v in obj.items()}
@@ -57,6 +57,8 @@ class AccessLogEntry(BaseModel):
     request_duration: Optional[float]
     request_bytes: Optional[float]
     response_bytes: Optional[float]
+    request_bytes_uncompressed: Optional[float]
+    response_bytes_uncompressed: Optional[float]
 
     user: Optional[str]
 
@@ -1 +1 @@
-from .models import TaskClaimBody, TaskReturnBody
+from .models import TaskClaimBody, TaskReturnBody, TaskQueueDepth
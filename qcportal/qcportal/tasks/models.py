@@ -36,3 +36,16 @@ class TaskClaimBody(RestModelBase):
 class TaskReturnBody(RestModelBase):
     name_data: ManagerName = Field(..., description="Name information about this manager")
     results_compressed: Dict[int, bytes]
+
+
+class TaskQueueDepth(BaseModel):
+    """
+    Number of waiting tasks with a given tag and set of required programs
+    """
+
+    class Config:
+        extra = Extra.forbid
+
+    tag: str
+    required_programs: List[str]
+    n_waiting: int
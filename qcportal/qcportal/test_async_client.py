@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from qcarchivetesting import test_users
+from qcfractal.components.optimization.testing_helpers import run_test_data
+from qcportal import AsyncPortalClient, PortalRequestError
+from qcportal.molecules import Molecule
+from qcportal.optimization import OptimizationRecord
+
+if TYPE_CHECKING:
+    from qcarchivetesting.testing_classes import QCATestingSnowflake
+
+pytest.importorskip("httpx")
+
+
+def test_async_client_get_molecules(snowflake: QCATestingSnowflake):
+    client = snowflake.client()
+    molecules = [Molecule(symbols=["he", "he"], geometry=[0, 0, 0, 0, 0, 2.0 + 0.01 * i]) for i in range(25)]
+    _, mol_ids = client.add_molecules(molecules)
+
+    async def _run():
+        async with AsyncPortalClient(snowflake.get_uri(), max_concurrent_requests=8) as aclient:
+            aclient.client.encoding = snowflake.encoding
+
+            # Many small batches, all in flight at once
+            mols = await aclient.get_molecules(mol_ids, batch_size=2)
+            assert [m.id for m in mols] == mol_ids
+            assert [m.get_hash() for m in mols] == [m.get_hash() for m in molecules]
+
+            mol = await aclient.get_molecules(mol_ids[3])
+            assert mol.id == mol_ids[3]
+
+            mols = await aclient.get_molecules([mol_ids[0], max(mol_ids) + 1], missing_ok=True)
+            assert mols[0].id == mol_ids[0]
+            assert mols[1] is None
+
+            with pytest.raises(PortalRequestError):
+                await aclient.get_molecules([mol_ids[0], max(mol_ids) + 1])
+
+    asyncio.run(_run())
+
+
+def test_async_client_get_records(snowflake: QCATestingSnowflake):
+    storage_socket = snowflake.get_storage_socket()
+    manager_name, _ = snowflake.activate_manager()
+    opt_id = run_test_data(storage_socket, manager_name, "opt_psi4_benzene")
+
+    sync_record = snowflake.client().get_optimizations(opt_id, include=["trajectory"])
+
+    async def _run():
+        async with AsyncPortalClient(snowflake.get_uri()) as aclient:
+            aclient.client.encoding = snowflake.encoding
+
+            # Children (trajectory) are fetched as well
+            record = await aclient.get_records(opt_id, include=["trajectory"], record_type=OptimizationRecord)
+            assert isinstance(record, OptimizationRecord)
+            assert record.trajectory_ids_ == sync_record.trajectory_ids_
+            assert [r.id for r in record._trajectory_records] == sync_record.trajectory_ids_
+
+            # Child records can be fetched all at once
+            traj_ids = sync_record.trajectory_ids_
+            traj_records = await aclient.get_records(traj_ids, batch_size=1)
+            assert [r.id for r in traj_records] == traj_ids
+
+            # Records are attached to the underlying client
+            assert traj_records[0].molecule.id == sync_record.trajectory[0].molecule.id
+
+    asyncio.run(_run())
+
+
+@pytest.mark.slow
+def test_async_client_jwt_refresh(secure_snowflake: QCATestingSnowflake):
+    client = secure_snowflake.client("admin_user", test_users["admin_user"]["pw"])
+    _, mol_ids = client.add_molecules([Molecule(symbols=["he", "he"], geometry=[0, 0, 0, 0, 0, 2.0])])
+
+    async def _run():
+        async with AsyncPortalClient(
+            secure_snowflake.get_uri(), "submit_user", test_users["submit_user"]["pw"]
+        ) as aclient:
+            aclient.client.encoding = secure_snowflake.encoding
+
+            # Token has expired, and the client knows it. It is renewed before making the request
+            await asyncio.sleep(aclient.client._jwt_access_exp - time.time() + 1)
+            token = aclient.client._jwt_access_token
+            mol = await aclient.get_molecules(mol_ids[0])
+            assert mol.id == mol_ids[0]
+            assert aclient.client._jwt_access_token != token
+
+            # Token has expired, but the client doesn't know it. The server rejects the request,
+            # and the request is retried with a new token
+            await asyncio.sleep(aclient.client._jwt_access_exp - time.time() + 1)
+            token = aclient.client._jwt_access_token
+            aclient.client._jwt_access_exp = time.time() + 3600
+            mol = await aclient.get_molecules(mol_ids[0])
+            assert mol.id == mol_ids[0]
+            assert aclient.client._jwt_access_token != token
+
+    asyncio.run(_run())
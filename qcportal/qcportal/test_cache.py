@@ -5,9 +5,11 @@ import threading
 from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
+from qcportal.cache import RecordCache
 from qcportal.dataset_models import load_dataset_view
+from qcportal.molecules import Molecule
 from qcportal.record_models import RecordStatusEnum
-from qcportal.singlepoint import SinglepointDataset
+from qcportal.singlepoint import SinglepointDataset, SinglepointRecord, SinglepointDatasetNewEntry
 from qcportal.singlepoint.test_dataset_models import test_specs, test_entries
 
 if TYPE_CHECKING:
@@ -277,3 +279,108 @@ def test_dataset_cache_fromfile_view(snowflake: QCATestingSnowflake, tmp_path):
     ds2 = load_dataset_view(cachefile_path)
     assert ds2.is_view
     assert ds2.get_record(test_entries[0].name, "spec_1") is not None
+
+
+def test_record_cache_dictionary(snowflake_client: PortalClient, tmp_path):
+    molecules = [Molecule(symbols=["he", "he"], geometry=[0, 0, 0, 0, 0, 2.0 + 0.01 * i]) for i in range(200)]
+    _, record_ids = snowflake_client.add_singlepoints(molecules, "psi4", "energy", "b3lyp", "sto-3g")
+    records = snowflake_client.get_singlepoints(record_ids, include=["molecule"])
+
+    # Dictionary is trained when enough records are added at once
+    cache_path = tmp_path / "record_cache.sqlite"
+    cache = RecordCache(f"file:{cache_path}", read_only=False)
+    cache.update_records(records)
+    assert "singlepoint" in cache._type_dictionaries
+
+    # Not when disabled
+    cache_nodict = RecordCache(f"file:{tmp_path / 'record_cache_nodict.sqlite'}", False, use_dictionaries=False)
+    cache_nodict.update_records(records)
+    assert cache_nodict._type_dictionaries == {}
+
+    for c in (cache, cache_nodict, RecordCache(f"file:{cache_path}?mode=ro", read_only=True)):
+        cached_records = c.get_records(record_ids, SinglepointRecord)
+        assert len(cached_records) == len(record_ids)
+
+        cached_map = {r.id: r for r in cached_records}
+        for r in records:
+            assert cached_map[r.id].molecule == r.molecule
+            assert cached_map[r.id]._record_cache is c
+
+        r = c.get_record(record_ids[0], SinglepointRecord)
+        assert r.molecule == records[0].molecule
+
+
+def test_record_cache_dictionary_shared_file(snowflake_client: PortalClient, tmp_path):
+    molecules = [Molecule(symbols=["he", "he"], geometry=[0, 0, 0, 0, 0, 2.0 + 0.01 * i]) for i in range(300)]
+    _, record_ids = snowflake_client.add_singlepoints(molecules, "psi4", "energy", "b3lyp", "sto-3g")
+    records = snowflake_client.get_singlepoints(record_ids, include=["molecule"])
+
+    # Two cache objects using the same file, both created before any dictionary exists
+    cache_uri = f"file:{tmp_path / 'record_cache.sqlite'}"
+    cache_1 = RecordCache(cache_uri, read_only=False)
+    cache_2 = RecordCache(cache_uri, read_only=False)
+
+    cache_1.update_records(records[:150])
+    dict_id = cache_1._type_dictionaries["singlepoint"].dict_id()
+
+    # The second object picks up the dictionary added by the first, for reading and writing
+    cached_records = cache_2.get_records(record_ids[:150], SinglepointRecord)
+    assert {r.id: r.molecule for r in cached_records} == {r.id: r.molecule for r in records[:150]}
+
+    cache_2.update_records(records[150:])
+    assert cache_2._type_dictionaries["singlepoint"].dict_id() == dict_id
+
+    cached_records = cache_1.get_records(record_ids, SinglepointRecord)
+    assert {r.id: r.molecule for r in cached_records} == {r.id: r.molecule for r in records}
+
+
+def test_portal_cache_eviction(snowflake: QCATestingSnowflake, tmp_path):
+    cache_dir = tmp_path / "ptlcache"
+    client = snowflake.client(cache_dir=str(cache_dir))
+    ds: SinglepointDataset = client.add_dataset("singlepoint", "Test dataset")
+
+    entries = [
+        SinglepointDatasetNewEntry(
+            name=f"he2_{i}", molecule=Molecule(symbols=["he", "he"], geometry=[0, 0, 0, 0, 0, 2.0 + 0.01 * i])
+        )
+        for i in range(100)
+    ]
+    ds.add_specification("spec_1", test_specs[0])
+    ds.add_entries(entries)
+    ds.submit()
+    ds.fetch_records(include=["molecule"])
+
+    # Access some records after the rest
+    recent_entries = [e.name for e in entries[:10]]
+    recent_ids = {r.id for _, _, r in ds._cache_data.get_dataset_records(recent_entries, ["spec_1"])}
+    all_ids = {x[2] for x in ds._cache_data.get_existing_dataset_records(ds.entry_names, ["spec_1"])}
+    for rid, accessed_on, _ in ds._cache_data.get_records_size():
+        if rid not in recent_ids:
+            ds._cache_data._conn.execute("UPDATE records SET accessed_on = ? WHERE id = ?", (accessed_on - 60, rid))
+
+    # No limit
+    client.cache.enforce_size_limit()
+    assert len(ds._cache_data.get_records_size()) == len(all_ids)
+
+    # Pinned datasets are never evicted
+    client.cache.max_size = 1
+    client.cache.pin_dataset(ds.id)
+    assert client.cache.pinned_datasets == {ds.id}
+    client.cache.enforce_size_limit()
+    assert len(ds._cache_data.get_records_size()) == len(all_ids)
+
+    # Evict records to get under a limit a little smaller than the current size
+    client.cache.unpin_dataset(ds.id)
+    assert client.cache.pinned_datasets == set()
+
+    records_size = sum(x[2] for x in ds._cache_data.get_records_size())
+    client.cache.max_size = client.cache.get_size() - records_size // 5
+    client.cache.enforce_size_limit()
+
+    remaining_ids = {x[0] for x in ds._cache_data.get_records_size()}
+    assert 0 < len(remaining_ids) < len(all_ids)
+    assert recent_ids <= remaining_ids
+    assert client.cache.get_size() <= client.cache.max_size
+
+    # Evicted records are fetched again from the server
+    assert len(list(ds.iterate_records())) == len(all_ids)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from qcportal.molecules import Molecule
+from qcportal.serialization import serialize, deserialize, serialize_stream, deserialize_stream, get_stream_content_type
+
+
+@pytest.mark.parametrize("encoding", ["application/json", "application/msgpack"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+def test_serialization_stream(encoding, chunk_size):
+    mol = Molecule(symbols=["he", "he"], geometry=[0, 0, 0, 0, 0, 2.0])
+    data = [{"a": 1, "b": "line 1\nline 2"}, None, [1.0, 2.0], {"bytes": b"\x00\x01\n\x02"}, mol, np.arange(4.0), ""]
+
+    # Elements of the stream are the same as the non-streamed list
+    expected = deserialize(serialize(data, encoding), encoding)
+
+    stream_type = get_stream_content_type(encoding)
+    serialized = b"".join(serialize_stream(data, stream_type))
+
+    # Chunks don't correspond to element boundaries
+    chunks = [serialized[i : i + chunk_size] for i in range(0, len(serialized), chunk_size)]
+    assert list(deserialize_stream(chunks, stream_type)) == expected
+
+    assert list(deserialize_stream([], stream_type)) == []
+    assert list(deserialize_stream(serialize_stream([], stream_type), stream_type)) == []